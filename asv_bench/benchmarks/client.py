@@ -0,0 +1,69 @@
+"""
+Microbenchmarks of the client side of pg-utils, run against a :class:`pg_utils.testing.FakeConnection` so that no time at all is spent in a server. To profile one of them::
+
+    asv profile client.Construction.time_construct
+"""
+import numpy as np
+import pandas as pd
+
+from pg_utils.testing import FakeConnection
+from pg_utils.table import Table
+
+COLUMNS = [1, 100, 1000]
+
+ROWS = [10 ** 4, 10 ** 6]
+
+
+def fake_table(rows, columns):
+    conn = FakeConnection()
+
+    frame = pd.DataFrame(np.random.RandomState(0).random_sample((rows, columns)),
+                         columns=["c{}".format(i) for i in range(columns)])
+    conn.add_table("fake", frame)
+
+    return Table("fake", schema="public", conn=conn)
+
+
+class Construction(object):
+    params = [COLUMNS]
+    param_names = ["columns"]
+
+    def setup(self, columns):
+        self.table = fake_table(10, columns)
+
+    def time_construct(self, columns):
+        Table("fake", schema="public", conn=self.table.conn)
+
+    def time_project(self, columns):
+        self.table[self.table.column_names[:max(columns // 2, 1)]]
+
+    def time_get_column(self, columns):
+        self.table[self.table.column_names[-1]]
+
+    def time_render_describe(self, columns):
+        self.table._describe_query(self.table.numeric_columns, [0.25, 0.5, 0.75])
+
+
+class Decoding(object):
+    # Column and Table cache their results, so every sample needs fresh objects
+    number = 1
+    repeat = (3, 10, 20.0)
+    warmup_time = 0
+
+    params = [ROWS]
+    param_names = ["rows"]
+
+    def setup(self, rows):
+        self.table = fake_table(rows, 2)
+
+    def time_column_values(self, rows):
+        self.table.c0.values
+
+    def peakmem_column_values(self, rows):
+        self.table.c0.values
+
+    def time_column_unique(self, rows):
+        self.table.c0.unique()
+
+    def time_table_head_all(self, rows):
+        self.table.head("all")
@@ -0,0 +1,45 @@
+from pg_utils import bin_counts
+
+from .common import ROWS, NULL_RATES, TYPES, synthetic_table
+from .table import _Base
+
+
+class ColumnMethods(_Base):
+    params = [ROWS, NULL_RATES, TYPES]
+    param_names = ["rows", "null_rate", "type"]
+
+    def setup(self, rows, null_rate, type_):
+        self.column = synthetic_table(rows, 1, null_rate, type_).c0
+
+    def time_values(self, *args):
+        self.column.values
+
+    def peakmem_values(self, *args):
+        self.column.values
+
+    def time_head_all(self, *args):
+        self.column.head("all")
+
+    def time_unique(self, *args):
+        self.column.unique()
+
+    def time_is_unique(self, *args):
+        self.column.is_unique
+
+    def time_describe(self, *args):
+        self.column.describe()
+
+    def time_sort_values(self, *args):
+        self.column.sort_values()
+
+    def time_mean(self, *args):
+        self.column.mean
+
+    def time_max(self, *args):
+        self.column.max
+
+    def time_min(self, *args):
+        self.column.min
+
+    def time_bin_counts(self, *args):
+        bin_counts.counts(self.column)
@@ -0,0 +1,114 @@
+"""
+Synthetic tables for the benchmarks.
+
+Each combination of parameters gets its own table (named after the parameters), which is created the first time it's needed and reused afterwards. Combinations with more than ``$PG_UTILS_BENCH_MAX_CELLS`` cells (rows times columns, 10 million by default) are skipped, so that a default run finishes in minutes; raise the cap to benchmark the larger tables.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from pg_utils.table import Table
+
+from . import server
+
+MAX_CELLS = float(os.environ.get("PG_UTILS_BENCH_MAX_CELLS", 1e7))
+
+ROWS = [10 ** 4, 10 ** 6, 10 ** 8]
+
+# PostgreSQL tables are limited to 1600 columns
+COLUMNS = [1, 20, 1000]
+
+NULL_RATES = [0.0, 0.5]
+
+TYPES = ["double precision", "integer", "numeric"]
+
+SCHEMA = "public"
+
+_expressions = {
+    "double precision": "random()",
+    "integer": "(random() * 1000000)::integer",
+    "numeric": "(random() * 1000000)::numeric(12, 4)",
+}
+
+_connection = None
+
+
+def connection():
+    global _connection
+
+    if _connection is None:
+        _connection = server.connect()
+
+    return _connection
+
+
+def check_size(rows, columns=1):
+    """
+    Skips the benchmark (as far as asv is concerned) if the table would be over the size cap.
+    """
+
+    if rows * columns > MAX_CELLS:
+        raise NotImplementedError("{} x {} is over PG_UTILS_BENCH_MAX_CELLS".format(rows, columns))
+
+
+def table_name(rows, columns, null_rate, type_):
+    return "bench_{}_{}_{}_{}".format(rows, columns, int(round(100 * null_rate)), type_.split()[0])
+
+
+def synthetic_table(rows, columns=1, null_rate=0.0, type_="double precision"):
+    """
+    A table of random values, with columns ``c0``, ``c1``, ...
+
+    :param int rows: The number of rows.
+    :param int columns: The number of columns.
+    :param float null_rate: The (expected) fraction of nulls in each column.
+    :param str type_: The type of every column (one of :data:`TYPES`).
+    :rtype: pg_utils.table.Table
+    """
+
+    check_size(rows, columns)
+
+    conn = connection()
+    name = table_name(rows, columns, null_rate, type_)
+
+    if not Table.exists(name, schema=SCHEMA, conn=conn):
+        expression = _expressions[type_]
+
+        if null_rate > 0:
+            expression = "case when random() < {} then null else {} end".format(null_rate, expression)
+
+        select_list = ", ".join(["{} as c{}".format(expression, i) for i in range(columns)])
+
+        Table.create(name,
+                     "create table {}.{} as select {} from generate_series(1, {})".format(
+                         SCHEMA, name, select_list, rows),
+                     conn=conn, schema=SCHEMA, analyze=True)
+
+    return Table(name, schema=SCHEMA, conn=conn)
+
+
+def synthetic_frame(rows, columns=1, null_rate=0.0):
+    """
+    A DataFrame of random doubles, with columns ``c0``, ``c1``, ... (for the benchmarks that load data).
+    """
+
+    check_size(rows, columns)
+
+    values = np.random.RandomState(0).random_sample((rows, columns))
+
+    if null_rate > 0:
+        values[np.random.RandomState(1).random_sample((rows, columns)) < null_rate] = np.nan
+
+    return pd.DataFrame(values, columns=["c{}".format(i) for i in range(columns)])
+
+
+def empty_table(name, columns=1):
+    """
+    (Re)creates an empty table of doubles to load into.
+    """
+
+    return Table.create(name,
+                        "create table {}.{} ({})".format(
+                            SCHEMA, name, ", ".join(["c{} double precision".format(i) for i in range(columns)])),
+                        conn=connection(), schema=SCHEMA)
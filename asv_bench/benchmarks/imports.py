@@ -0,0 +1,17 @@
+class Imports(object):
+    """
+    The time taken to import pg-utils in a fresh interpreter.
+    """
+
+    def timeraw_import_pg_utils(self):
+        return "import pg_utils"
+
+    def timeraw_import_table(self):
+        return "from pg_utils import connection, table"
+
+    def timeraw_first_describe_query(self):
+        # includes building and compiling the shape of the statement
+        return """
+        from pg_utils.sql import queries
+        queries.describe_column("public.t", "x", "double precision", [0.25, 0.5, 0.75])
+        """
@@ -0,0 +1,56 @@
+from .common import ROWS, COLUMNS, check_size, empty_table, synthetic_frame, synthetic_table
+from .table import _Base
+
+# loading is slower than reading, so the largest tables are left out
+LOAD_ROWS = ROWS[:-1]
+
+
+class InsertDataFrame(_Base):
+    params = [LOAD_ROWS, COLUMNS, [None, 4]]
+    param_names = ["rows", "columns", "parallel"]
+
+    def setup(self, rows, columns, parallel):
+        self.frame = synthetic_frame(rows, columns)
+        self.table = empty_table("bench_load_target", columns)
+
+    def time_insert_dataframe(self, rows, columns, parallel):
+        self.table.insert_dataframe(self.frame, parallel=parallel)
+
+    def time_bulk_load(self, rows, columns, parallel):
+        self.table.bulk_load(self.frame, parallel=parallel)
+
+    def peakmem_insert_dataframe(self, rows, columns, parallel):
+        self.table.insert_dataframe(self.frame, parallel=parallel)
+
+
+class Upsert(_Base):
+    params = [LOAD_ROWS]
+    param_names = ["rows"]
+
+    def setup(self, rows):
+        self.frame = synthetic_frame(rows, 2)
+        self.frame["c0"] = range(rows)
+        self.table = empty_table("bench_upsert_target", 2)
+
+        cur = self.table.conn.cursor()
+        cur.execute("alter table {} add primary key (c0)".format(self.table))
+        self.table.conn.commit()
+
+        # half of the rows will be updates
+        self.table.insert_dataframe(self.frame.iloc[::2])
+
+    def time_upsert_dataframe(self, rows):
+        self.table.upsert_dataframe(self.frame, key_columns=["c0"])
+
+
+class CopyTo(_Base):
+    params = [LOAD_ROWS, [None, 4]]
+    param_names = ["rows", "parallel"]
+
+    def setup(self, rows, parallel):
+        check_size(rows)
+        self.source = synthetic_table(rows, 1)
+        self.target = empty_table("bench_copy_target", 1)
+
+    def time_copy_to(self, rows, parallel):
+        self.source.copy_to(self.target, parallel=parallel)
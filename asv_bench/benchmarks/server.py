@@ -0,0 +1,125 @@
+"""
+A throwaway local PostgreSQL cluster for the benchmarks.
+
+The cluster is created (with ``initdb``) the first time it's needed and then left running, so that the synthetic tables survive across benchmark processes and runs. It's tuned for speed rather than safety (``fsync`` is off), so never point it at anything you care about. Stop it with ``python -m benchmarks.server stop`` (from ``asv_bench``).
+
+Set ``PG_UTILS_BENCH_EXTERNAL=1`` to benchmark against the server given by the usual ``pg_username``, ``pg_password``, ``pg_hostname``, and ``pg_database`` environment variables instead.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import psycopg2
+
+from pg_utils.connection import Connection
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+DATA_DIR = os.environ.get("PG_UTILS_BENCH_PGDATA",
+                          os.path.join(_here, "..", "..", ".asv", "pgdata"))
+PORT = int(os.environ.get("PG_UTILS_BENCH_PORT", 54329))
+USER = "pg_utils_bench"
+DATABASE = "pg_utils_bench"
+
+_settings = [
+    "fsync=off",
+    "synchronous_commit=off",
+    "full_page_writes=off",
+    "listen_addresses=localhost",
+    "max_wal_size=4GB",
+    "shared_buffers=256MB",
+]
+
+
+def external():
+    return os.environ.get("PG_UTILS_BENCH_EXTERNAL", "") not in ("", "0")
+
+
+def _bin(name):
+    """
+    Finds a PostgreSQL binary: in ``$PG_UTILS_BENCH_PGBIN``, on the ``PATH``, or in ``pg_config --bindir``.
+    """
+
+    bin_dir = os.environ.get("PG_UTILS_BENCH_PGBIN")
+
+    if bin_dir:
+        return os.path.join(bin_dir, name)
+
+    path = shutil.which(name)
+
+    if path:
+        return path
+
+    try:
+        bin_dir = subprocess.check_output(["pg_config", "--bindir"]).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        raise RuntimeError("Unable to find '{}'; set PG_UTILS_BENCH_PGBIN to PostgreSQL's bin directory".format(name))
+
+    return os.path.join(bin_dir, name)
+
+
+def _running():
+    return subprocess.call([_bin("pg_ctl"), "status", "-D", DATA_DIR],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
+
+
+def ensure_running():
+    """
+    Creates and starts the cluster (and its database) if need be.
+    """
+
+    if external():
+        return
+
+    if not os.path.exists(os.path.join(DATA_DIR, "PG_VERSION")):
+        subprocess.check_call([_bin("initdb"), "-D", DATA_DIR, "-U", USER, "--auth=trust",
+                               "--encoding=UTF8", "--no-sync"], stdout=subprocess.DEVNULL)
+
+    if not _running():
+        options = " ".join(["-p {}".format(PORT), "-k {}".format(DATA_DIR)] +
+                           ["-c {}".format(setting) for setting in _settings])
+
+        subprocess.check_call([_bin("pg_ctl"), "start", "-w", "-D", DATA_DIR,
+                               "-l", os.path.join(DATA_DIR, "server.log"), "-o", options],
+                              stdout=subprocess.DEVNULL)
+
+    raw = psycopg2.connect(dbname="postgres", user=USER, host="localhost", port=PORT)
+    raw.autocommit = True
+
+    try:
+        cur = raw.cursor()
+        cur.execute("select 1 from pg_database where datname = %s", (DATABASE,))
+
+        if cur.fetchone() is None:
+            cur.execute("create database {}".format(DATABASE))
+    finally:
+        raw.close()
+
+
+def stop():
+    if not external() and os.path.exists(DATA_DIR) and _running():
+        subprocess.check_call([_bin("pg_ctl"), "stop", "-m", "fast", "-D", DATA_DIR],
+                              stdout=subprocess.DEVNULL)
+
+
+def connect(**kwargs):
+    """
+    Opens a :class:`pg_utils.connection.Connection` to the benchmark database (starting the cluster first if need be).
+
+    :param dict kwargs: Other keyword arguments for the connection.
+    :rtype: pg_utils.connection.Connection
+    """
+
+    ensure_running()
+
+    if external():
+        return Connection(**kwargs)
+
+    # the cluster trusts local connections, but Connection insists on a password
+    return Connection(username=USER, password="unused", hostname="localhost",
+                      database=DATABASE, port=PORT, **kwargs)
+
+
+if __name__ == "__main__":
+    {"start": ensure_running, "stop": stop}[sys.argv[1]]()
@@ -0,0 +1,75 @@
+from pg_utils.table import Table
+
+from .common import ROWS, COLUMNS, NULL_RATES, TYPES, SCHEMA, connection, synthetic_table
+
+
+class _Base(object):
+    # Table and Column cache their results (eg ``count``), so every sample gets fresh objects
+    number = 1
+    repeat = (3, 10, 60.0)
+    warmup_time = 0
+    timeout = 3600
+
+
+class Describe(_Base):
+    params = [ROWS, COLUMNS, NULL_RATES, TYPES]
+    param_names = ["rows", "columns", "null_rate", "type"]
+
+    def setup(self, rows, columns, null_rate, type_):
+        self.table = synthetic_table(rows, columns, null_rate, type_)
+
+    def time_describe(self, *args):
+        self.table.describe()
+
+    def peakmem_describe(self, *args):
+        self.table.describe()
+
+
+class Fetch(_Base):
+    params = [ROWS, COLUMNS]
+    param_names = ["rows", "columns"]
+
+    def setup(self, rows, columns):
+        self.table = synthetic_table(rows, columns)
+
+    def time_count(self, *args):
+        self.table.count
+
+    def time_head(self, *args):
+        self.table.head()
+
+    def time_head_all(self, *args):
+        self.table.head("all")
+
+    def peakmem_head_all(self, *args):
+        self.table.head("all")
+
+    def time_sort_values(self, *args):
+        self.table.sort_values("c0")
+
+    def time_to_arrow(self, *args):
+        self.table.to_arrow()
+
+    def peakmem_to_arrow(self, *args):
+        self.table.to_arrow()
+
+
+class Metadata(_Base):
+    params = [COLUMNS]
+    param_names = ["columns"]
+
+    def setup(self, columns):
+        self.name = synthetic_table(ROWS[0], columns).table_name
+        self.table = Table(self.name, schema=SCHEMA, conn=connection())
+
+    def time_construct(self, columns):
+        Table(self.name, schema=SCHEMA, conn=connection())
+
+    def time_project(self, columns):
+        self.table[self.table.column_names[:max(columns // 2, 1)]]
+
+    def time_dtypes(self, columns):
+        self.table.dtypes
+
+    def time_explain_describe(self, columns):
+        self.table.explain("describe")
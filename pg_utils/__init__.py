@@ -1,10 +1,15 @@
+import importlib
 import re
 
 from ._version import __version__
 import os
 
 base_dir = os.path.realpath(os.path.dirname(__file__))
-template_dir = os.path.join(base_dir, "templates")
+
+# the subpackages are imported when first accessed (eg ``pg_utils.table``), rather than by ``import pg_utils``
+_submodules = ["arrow", "bin_counts", "budget", "cache", "column", "connection", "dtypes", "exception",
+               "explain", "instrumentation", "memory", "partition", "sql", "summary", "table", "testing", "util",
+               "view"]
 
 
 
@@ -24,3 +29,15 @@ numeric_datatypes = [
 
 def _pretty_print(query):
     print("\n".join([line for line in re.split("\r?\n", query) if not re.match("^\s*$", line)]))
+
+
+def __getattr__(name):
+
+    if name in _submodules:
+        return importlib.import_module("." + name, __name__)
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules)
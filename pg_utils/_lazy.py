@@ -0,0 +1,52 @@
+"""
+Lazy imports of heavy dependencies (pandas, numpy, psycopg2), so that importing pg-utils stays fast and those modules are only imported once they're actually used.
+"""
+import importlib
+import types
+
+__all__ = ["LazyModule", "lazy_import"]
+
+
+class LazyModule(types.ModuleType):
+    """
+    A stand-in for a module that imports the real module when one of its attributes is first accessed. Attributes are cached on the stand-in once they've been looked up, so later accesses cost no more than they would on the real module.
+
+    :param str name: The (absolute) name of the module.
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+
+        module = self.__dict__["_lazy_module"]
+
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+
+        return module
+
+    def __getattr__(self, item):
+
+        value = getattr(self._load(), item)
+        self.__dict__[item] = value
+
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return "<lazy module '{}'>".format(self.__name__)
+
+
+def lazy_import(name):
+    """
+    Returns a :class:`LazyModule` for the given module.
+
+    :param str name: The (absolute) name of the module.
+    :rtype: LazyModule
+    """
+    return LazyModule(name)
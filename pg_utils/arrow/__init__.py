@@ -0,0 +1,4 @@
+"""
+This package streams tables into `Apache Arrow <https://arrow.apache.org/>`_ record batches and Parquet files. It requires pyarrow (ie ``pip install pg-utils[arrow]``).
+"""
+from .base import arrow_type, arrow_schema, record_batches, write_parquet
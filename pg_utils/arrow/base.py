@@ -0,0 +1,169 @@
+import uuid
+
+from ..sql import Alias, Cast, Identifier, Select, queries
+
+__all__ = ["arrow_type", "arrow_schema", "record_batches", "write_parquet"]
+
+# Types that psycopg2 doesn't hand back as plain Python scalars (eg numeric values come
+# back as Decimals and json is parsed into dicts) are cast in the database: numeric types to
+# double precision, and every type that is exported as a string to text.
+_float_datatypes = ["numeric", "decimal"]
+
+
+def arrow_type(data_type):
+    """
+    Maps a PostgreSQL datatype (as found in :attr:`pg_utils.table.Table.column_data_types`) to a pyarrow datatype.
+
+    Note that ``numeric``/``decimal`` columns are mapped to ``float64``. Any type without a natural counterpart is mapped to ``string`` (and cast to ``text`` in the database).
+
+    :param str data_type: The PostgreSQL datatype.
+    :rtype: pyarrow.DataType
+    """
+
+    import pyarrow as pa
+
+    if data_type.endswith("[]"):
+        return pa.list_(arrow_type(data_type[:-2]))
+
+    mapping = {
+        "smallint": pa.int16(),
+        "integer": pa.int32(),
+        "int": pa.int64(),
+        "bigint": pa.int64(),
+        "serial": pa.int32(),
+        "bigserial": pa.int64(),
+        "real": pa.float32(),
+        "double precision": pa.float64(),
+        "float": pa.float64(),
+        "numeric": pa.float64(),
+        "decimal": pa.float64(),
+        "boolean": pa.bool_(),
+        "bool": pa.bool_(),
+        "date": pa.date32(),
+        "timestamp without time zone": pa.timestamp("us"),
+        "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+        "time without time zone": pa.time64("us"),
+        "interval": pa.duration("us"),
+        "bytea": pa.binary()
+    }
+
+    return mapping.get(data_type, pa.string())
+
+
+def arrow_schema(table, types=None):
+    """
+    Builds the pyarrow schema corresponding to the columns of a table.
+
+    :param pg_utils.table.Table table: The table.
+    :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding those given by :func:`arrow_type`.
+    :rtype: pyarrow.Schema
+    """
+
+    import pyarrow as pa
+
+    types = types or {}
+
+    return pa.schema([
+        pa.field(col, types.get(col, arrow_type(table.column_data_types[col])))
+        for col in table.column_names
+    ])
+
+
+def _select_expression(column, data_type, field_type):
+
+    import pyarrow as pa
+
+    element_type, suffix = (data_type[:-2], "[]") if data_type.endswith("[]") else (data_type, "")
+
+    if pa.types.is_list(field_type):
+        field_type = field_type.value_type
+
+    if pa.types.is_string(field_type):
+        return Alias(Cast(Identifier(column), "text" + suffix), column)
+
+    if element_type in _float_datatypes:
+        return Alias(Cast(Identifier(column), "double precision" + suffix), column)
+
+    return Identifier(column)
+
+
+def record_batches(table, batch_size=65536, types=None):
+    """
+    A generator of pyarrow ``RecordBatch`` objects holding the rows of a table. The rows are streamed from a server-side cursor, so at most ``batch_size`` rows are held as Python objects at once.
+
+    :param pg_utils.table.Table table: The table to export.
+    :param int batch_size: The (maximum) number of rows per batch.
+    :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding those given by :func:`arrow_type`.
+    :return: The record batches.
+    :rtype: collections.Iterable[pyarrow.RecordBatch]
+    """
+
+    import pyarrow as pa
+
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer (got {})".format(batch_size))
+
+    data_types = table.column_data_types
+    columns = list(table.column_names)
+    schema = arrow_schema(table, types=types)
+
+    query = str(Select([_select_expression(col, data_types[col], schema.field(col).type) for col in columns],
+                       from_=queries.relation(table)))
+
+    cur = table.conn.cursor(name="pg_utils_arrow_{}".format(uuid.uuid4().hex))
+    cur.itersize = batch_size
+
+    try:
+        cur.execute(query)
+
+        while True:
+            rows = cur.fetchmany(batch_size)
+
+            if not rows:
+                break
+
+            values = list(zip(*rows))
+
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values[i], type=field.type) for i, field in enumerate(schema)],
+                schema=schema)
+
+            del rows, values
+    finally:
+        cur.close()
+
+
+def write_parquet(table, path, row_group_size=65536, types=None, **writer_kwargs):
+    """
+    Writes the rows of a table to a Parquet file, one row group at a time, so that memory use is bounded by the size of a single row group.
+
+    :param pg_utils.table.Table table: The table to export.
+    :param str path: The path of the Parquet file.
+    :param int row_group_size: The number of rows in each row group.
+    :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding those given by :func:`arrow_type`.
+    :param dict writer_kwargs: Other keyword arguments passed to ``pyarrow.parquet.ParquetWriter`` (eg ``compression``).
+    :return: The number of rows written.
+    :rtype: int
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    num_rows = 0
+
+    try:
+        for batch in record_batches(table, batch_size=row_group_size, types=types):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, **writer_kwargs)
+
+            writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_size)
+            num_rows += batch.num_rows
+
+        if writer is None:
+            writer = pq.ParquetWriter(path, arrow_schema(table, types=types), **writer_kwargs)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return num_rows
@@ -2,4 +2,4 @@
 This package allows for bin counting to form histograms.
 """
 from . import freedman_diaconis
-from .base import counts
+from .base import counts, counts_query, pairwise_counts
@@ -1,18 +1,26 @@
 import six
 from . import freedman_diaconis
-from .. import template_dir
-from jinja2 import Environment, FileSystemLoader
+from ..budget import resolve_budget, execute_within_budget
+from ..instrumentation.base import instrumented
+from .._lazy import lazy_import
+from .. import partition
+from ..sql import queries
 
-_env = Environment(loader=FileSystemLoader(template_dir))
-_bin_counts_template = _env.get_template("bin_counts.j2")
+np = lazy_import("numpy")
 
-def counts(column, bins=None):
+@instrumented(name="bin_counts.counts")
+def counts(column, bins=None, budget=None, by_partition=False, where=None, parallel=None, store=None):
     """
     Retrieves the counts of values in a given column for a given number of bin_counts.
 
-    :param pg_utils.column.Column column: The name of a column which you want to bin_counts.
+    :param pg_utils.column.Column column: The name of a column which you want to bin_counts. For a numeric array column, the elements of its arrays are counted (see :meth:`pg_utils.column.Column.describe_elements`).
     :param int|None bins: The number of bin_counts that you want. If set to ``None``,
      then the `Freedman-Diaconis rule <https://en.wikipedia.org/wiki/Freedman%E2%80%93Diaconis_rule>`_ will be used.
+    :param None|float|pg_utils.budget.Budget budget: A budget for the queries (defaulting to the connection's). If it would be exceeded, the counts are taken over a sample of the table and scaled up to its full size. See :mod:`pg_utils.budget`.
+    :param bool by_partition: Whether to count a declaratively partitioned table partition by partition, reusing the counts of partitions that haven't changed (for the same bins). The range of the bins comes from merged per-partition summaries (see ``Table.describe(by_partition=True)``), and ``budget`` doesn't apply. See :func:`pg_utils.partition.bin_counts`.
+    :param None|str where: With ``by_partition``, a condition on the rows (as raw SQL).
+    :param None|int parallel: With ``by_partition``, how many partitions to count at once.
+    :param None|pg_utils.summary.SummaryStore store: With ``by_partition``, where the summaries and counts of the partitions are kept.
     :return: A list of lists. Each sublist represents the count of items in a particular bin_counts and is of the form ``[left_endpoint, right_endpoint, bin_count]``.
     :rtype: list[list[float]]
     """
@@ -20,25 +28,136 @@ def counts(column, bins=None):
     if bins is not None and (not isinstance(bins, six.integer_types) or bins <= 0):
         raise ValueError("'bin_counts' must be a positive integer or None!")
 
-    if not column.is_numeric:
+    if not column.is_numeric and not column.is_numeric_array:
         raise ValueError("The column {} is not a numeric column of {}".format(column, column.parent_table))
 
-    desc = column.describe(percentiles=[0.25, 0.75])
+    if by_partition:
+        if column.is_numeric_array:
+            raise ValueError("The elements of array columns can't be counted by partition")
+
+        return _partition_counts(column, bins, where, parallel, store)
+
+    budget = resolve_budget(column.parent_table.conn, budget)
+
+    desc = column.describe(percentiles=[0.25, 0.75], budget=budget)
 
     if bins is None:
         bins = min(freedman_diaconis.num_bins(column, desc=desc), 50)
 
     cur = column.parent_table.conn.cursor()
 
-    sql = _bin_counts_template.render(
-        bin_width=(desc["maximum"] - desc["minimum"]) / bins,
-        bins=bins,
-        table_name=column.parent_table.name,
-        column=column,
-        minimum=desc["minimum"],
-        maximum=desc["maximum"]
+    info = execute_within_budget(
+        cur, column.parent_table,
+        lambda source: counts_query(column, bins, desc["minimum"], desc["maximum"], source=source),
+        budget
     )
 
-    cur.execute(sql)
+    if info["method"] == "sample":
+        return [[left, right, int(round(count / info["sample_fraction"]))]
+                for _, left, right, count in cur.fetchall()]
 
     return [row[1:] for row in cur.fetchall()]
+
+
+def _partition_counts(column, bins, where, parallel, store):
+
+    result, _ = partition.describe(column.parent_table, [column.name], [0.25, 0.75], where=where, parallel=parallel,
+                                   store=store)
+    desc = dict(zip(["count", "mean", "std_dev", "minimum", "25%", "75%", "maximum"], result[column.name]))
+
+    if bins is None:
+        bins = min(freedman_diaconis.num_bins(column, desc=desc), 50)
+
+    return partition.bin_counts(column, bins, desc["minimum"], desc["maximum"], where=where, parallel=parallel,
+                                store=store)
+
+
+@instrumented(name="bin_counts.pairwise_counts")
+def pairwise_counts(table, columns=None, bins=50, budget=None):
+    """
+    The bin counts of each of several numeric columns, and the 2-D bin counts of each pair of them (eg for a binned pairplot, see :meth:`pg_utils.table.Table.pairplot`). It takes two scans of the table, whatever the number of columns: one for the range of each column, and one for all of the counts (see :func:`pg_utils.sql.queries.pairwise_bin_counts`). Only ``O(columns ** 2 * bins ** 2)`` counts are fetched.
+
+    :param pg_utils.table.Table table: The table.
+    :param None|list[str] columns: The columns (defaulting to all of the numeric columns of the table).
+    :param int bins: The number of (equal-width) bins of each column.
+    :param None|float|pg_utils.budget.Budget budget: A budget for the queries (defaulting to the connection's). If it would be exceeded, the rows of a sample of the table are counted, and the counts scaled up to its full size.
+    :return: The edges of the bins of each column (an array of ``bins + 1`` of them), the counts of the bins of each column (an array of ``bins`` counts), and the counts of each pair of columns ``(a, b)`` with ``a`` before ``b`` in ``columns`` (a ``bins`` by ``bins`` array, whose rows are the bins of ``a``), all by column. Null values are left out, as are the rows where either column of a pair is null.
+    :rtype: (dict, dict, dict)
+    """
+
+    columns = list(table.numeric_columns if columns is None else columns)
+
+    if not isinstance(bins, six.integer_types) or bins <= 0:
+        raise ValueError("'bins' must be a positive integer!")
+
+    if not columns:
+        raise ValueError("There are no columns to count")
+
+    for column in columns:
+        if column not in table.numeric_columns:
+            raise ValueError("The column {} is not a numeric column of {}".format(column, table))
+
+    budget = resolve_budget(table.conn, budget)
+    cur = table.conn.cursor()
+
+    execute_within_budget(cur, table, lambda source: queries.column_ranges(source, columns), budget)
+    ranges = cur.fetchone()
+
+    edges = {}
+
+    for column, minimum, maximum in zip(columns, ranges[1::2], ranges[2::2]):
+
+        # columns with a single value (or none) get bins of width 1 / bins around it
+        if minimum is None:
+            minimum, maximum = 0.0, 1.0
+        elif maximum <= minimum:
+            minimum, maximum = float(minimum) - 0.5, float(minimum) + 0.5
+
+        edges[column] = np.linspace(float(minimum), float(maximum), bins + 1)
+
+    info = execute_within_budget(
+        cur, table,
+        lambda source: queries.pairwise_bin_counts(source, columns, bins, [edges[c][0] for c in columns],
+                                                   [edges[c][-1] for c in columns]),
+        budget
+    )
+
+    scale = 1.0 / info["sample_fraction"] if info["method"] == "sample" else 1.0
+    k = len(columns)
+
+    column_counts = {column: np.zeros(bins) for column in columns}
+    pair_counts = {(a, b): np.zeros((bins, bins)) for i, a in enumerate(columns) for b in columns[i + 1:]}
+
+    for row in cur.fetchall():
+        counted = [i for i in range(k) if row[i] == 0]
+        buckets = [row[k + i] for i in counted]
+
+        # the bins of nulls
+        if any(bucket is None for bucket in buckets):
+            continue
+
+        if len(counted) == 1:
+            column_counts[columns[counted[0]]][buckets[0]] += row[-1] * scale
+        else:
+            pair_counts[(columns[counted[0]], columns[counted[1]])][buckets[0], buckets[1]] += row[-1] * scale
+
+    return edges, column_counts, pair_counts
+
+
+def counts_query(column, bins, minimum, maximum, source=None):
+    """
+    Renders the SQL that computes the bin counts of a column, given its minimum and maximum.
+
+    :param pg_utils.column.Column column: The column.
+    :param int bins: The number of bins.
+    :param float minimum: The minimum value of the column.
+    :param float maximum: The maximum value of the column.
+    :param None|str source: The ``FROM`` expression to count over (eg a sample of the table). Defaults to the column's table.
+    :rtype: str
+    """
+
+    if column.is_numeric_array:
+        return queries.bin_counts(queries.array_elements(source or column.parent_table, column.name), "value", bins,
+                                  minimum, maximum)
+
+    return queries.bin_counts(source or column.parent_table, column.name, bins, minimum, maximum)
@@ -29,4 +29,4 @@ def num_bins(column, desc=None):
     if h == 0:
         return math.ceil(math.sqrt(desc["count"]))
     else:
-        return math.ceil((desc["maximum"] - desc["minimum"]) / h)
+        return math.ceil((float(desc["maximum"]) - float(desc["minimum"])) / h)
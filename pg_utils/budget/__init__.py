@@ -0,0 +1,4 @@
+"""
+Budgets that limit how expensive the statements issued by pg-utils may be, falling back to approximate (sampled or catalog-based) results when a statement would go over.
+"""
+from .base import Budget, resolve_budget, statement_timeout, execute_within_budget, catalog_describe
@@ -0,0 +1,258 @@
+from contextlib import contextmanager
+
+import six
+
+from .._lazy import lazy_import
+from ..explain import explain, summarize_plan
+from ..exception import BudgetExceededError
+from ..sql import queries
+
+np = lazy_import("numpy")
+psycopg2 = lazy_import("psycopg2")
+
+__all__ = ["Budget", "resolve_budget", "statement_timeout", "execute_within_budget", "catalog_describe"]
+
+
+class Budget(object):
+    """
+    A limit on how expensive a single statement issued by pg-utils is allowed to be.
+
+    Before running a statement under a budget, its cost is estimated with ``EXPLAIN``. If the estimate is within the budget, the statement runs as usual. Otherwise (and if ``approximate`` is enabled), a cheaper plan is used instead: the same statement over a ``TABLESAMPLE SYSTEM`` sample of the table, or, when even the sample would be too expensive, the planner's own statistics from ``pg_stats``. Either way, ``statement_timeout`` is set for the duration of the statement as a hard backstop against bad estimates.
+
+    :param None|float seconds: The wall-clock budget for each statement, in seconds.
+    :param None|float cost: The budget in planner cost units (as reported by ``EXPLAIN``). Takes precedence over ``seconds`` for deciding which plan to use.
+    :param float cost_per_second: How many planner cost units the server gets through per second. This is used to turn ``seconds`` into a cost, and is worth calibrating against your own server (eg by comparing :meth:`pg_utils.table.Table.explain` with and without ``analyze``).
+    :param bool approximate: Whether to fall back to approximate results when the estimate exceeds the budget. If ``False``, a :class:`pg_utils.exception.BudgetExceededError` is raised instead.
+    :param float min_sample_fraction: The smallest fraction of a table worth sampling. Below it, statistics from ``pg_stats`` are used where possible.
+    :param None|float timeout: The ``statement_timeout`` (in seconds) to use. Defaults to ``seconds``; set it to ``0`` to disable the backstop.
+    """
+
+    def __init__(self, seconds=None, cost=None, cost_per_second=1e5, approximate=True,
+                 min_sample_fraction=0.0001, timeout=None):
+
+        if seconds is None and cost is None:
+            raise ValueError("A budget needs either 'seconds' or 'cost'")
+
+        if cost_per_second <= 0:
+            raise ValueError("'cost_per_second' must be positive (got {})".format(cost_per_second))
+
+        if not 0 < min_sample_fraction <= 1:
+            raise ValueError("'min_sample_fraction' must be between 0 and 1 (got {})".format(min_sample_fraction))
+
+        self.seconds = seconds
+        self.cost = cost
+        self.cost_per_second = cost_per_second
+        self.approximate = approximate
+        self.min_sample_fraction = min_sample_fraction
+        self.timeout = seconds if timeout is None else timeout
+
+    @property
+    def max_cost(self):
+        """
+        The largest planner cost allowed by this budget.
+
+        :rtype: float
+        """
+
+        if self.cost is not None:
+            return float(self.cost)
+
+        return float(self.seconds) * self.cost_per_second
+
+    @classmethod
+    def coerce(cls, budget):
+        """
+        Turns the value of a ``budget`` parameter into a :class:`Budget`: a plain number is taken to be a number of seconds.
+
+        :param None|float|Budget budget: The value.
+        :rtype: None|Budget
+        """
+
+        if budget is None or isinstance(budget, Budget):
+            return budget
+
+        if isinstance(budget, (six.integer_types, float)) and not isinstance(budget, bool):
+            return cls(seconds=budget)
+
+        raise ValueError("A budget must be a number of seconds or a Budget (got {!r})".format(budget))
+
+    def __repr__(self):
+        return "Budget(seconds={}, cost={}, approximate={})".format(self.seconds, self.cost, self.approximate)
+
+
+def resolve_budget(conn, budget=None):
+    """
+    The budget that applies to a call: the one given to the call itself, or else the connection's.
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param None|float|Budget budget: The budget given to the call (if any).
+    :rtype: None|Budget
+    """
+
+    if budget is None:
+        budget = getattr(conn, "budget", None)
+
+    return Budget.coerce(budget)
+
+
+@contextmanager
+def statement_timeout(cursor, seconds):
+    """
+    Sets ``statement_timeout`` on the cursor's connection for the duration of the block, and resets it however the block exits (on autocommit connections too, where the setting would otherwise outlive the block). If the server cancels a statement because of it, a :class:`pg_utils.exception.BudgetExceededError` is raised. Either way, if the block leaves the transaction aborted, it's rolled back so that the timeout can be reset.
+
+    The timeout is set and reset through a cursor of its own, so the results of the statements executed in the block can still be fetched from ``cursor`` afterwards.
+
+    :param cursor: The cursor.
+    :param None|float seconds: The timeout. ``None`` or ``0`` leaves the timeout alone.
+    """
+
+    if not seconds:
+        yield
+        return
+
+    control = cursor.connection.cursor()
+    control.execute("set statement_timeout = %s", (max(int(seconds * 1000), 1),))
+
+    try:
+        yield
+    except psycopg2.extensions.QueryCanceledError as e:
+        raise BudgetExceededError("Statement cancelled after {} seconds: {}".format(seconds, e))
+    finally:
+        # nothing (the reset included) can run in an aborted transaction until it's rolled back
+        if cursor.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            cursor.connection.rollback()
+
+        control.execute("reset statement_timeout")
+        control.close()
+
+
+def sampled_source(table, fraction, seed=0):
+    """
+    A ``FROM`` expression for a block sample of a table. The seed is fixed so that several subqueries over the same sample see the same blocks.
+
+    :param pg_utils.table.Table table: The table.
+    :param float fraction: The fraction of the table to sample.
+    :param int seed: The ``REPEATABLE`` seed.
+    :rtype: str
+    """
+    return "{} tablesample system ({:.6f}) repeatable ({})".format(queries.relation(table), 100.0 * fraction, seed)
+
+
+def execute_within_budget(cursor, table, make_query, budget, allow_catalog=False):
+    """
+    Runs the statement built by ``make_query`` under a budget.
+
+    :param cursor: The cursor to execute with.
+    :param pg_utils.table.Table table: The table the statement reads.
+    :param make_query: A function from the source of the statement (the table itself, or a string holding the ``FROM`` expression for a sample of it) to the statement.
+    :param None|Budget budget: The budget. If ``None``, the statement is just executed.
+    :param bool allow_catalog: Whether the caller can answer from ``pg_stats`` instead. If so, and a sample would be too small, nothing is executed and the returned method is ``"catalog"``.
+    :return: A dictionary describing what was done, with the keys ``approximate``, ``method`` (one of ``"exact"``, ``"sample"``, or ``"catalog"``), ``sample_fraction``, and ``estimated_cost``.
+    :rtype: dict
+    """
+
+    if budget is None:
+        cursor.execute(make_query(table))
+        return {"approximate": False, "method": "exact", "sample_fraction": 1.0, "estimated_cost": None}
+
+    query = make_query(table)
+    cost = summarize_plan(explain(cursor, query))["total_cost"]
+    info = {"approximate": False, "method": "exact", "sample_fraction": 1.0, "estimated_cost": cost}
+
+    if cost > budget.max_cost:
+
+        if not budget.approximate:
+            raise BudgetExceededError("The estimated cost of {} exceeds the budget of {}".format(cost, budget.max_cost))
+
+        fraction = budget.max_cost / cost
+
+        if fraction < budget.min_sample_fraction:
+
+            if allow_catalog:
+                info.update(approximate=True, method="catalog", sample_fraction=None)
+                return info
+
+            fraction = budget.min_sample_fraction
+
+        query = make_query(sampled_source(table, fraction))
+        info.update(approximate=True, method="sample", sample_fraction=fraction)
+
+    with statement_timeout(cursor, budget.timeout):
+        cursor.execute(query)
+
+    return info
+
+
+def _catalog_column_summary(null_frac, values, freqs, bounds, reltuples, percentiles, points_per_bucket=10):
+
+    values = list(values or [])
+    weights = list(freqs or [])
+    bounds = list(bounds or [])
+
+    # the histogram covers what the most common values don't, with an equal share in each bucket
+    remainder = max(1.0 - (null_frac or 0.0) - sum(weights), 0.0)
+
+    if len(bounds) > 1:
+        share = remainder / ((len(bounds) - 1) * points_per_bucket)
+
+        for left, right in zip(bounds[:-1], bounds[1:]):
+            values.extend(np.linspace(left, right, points_per_bucket))
+            weights.extend([share] * points_per_bucket)
+
+    if not values or sum(weights) <= 0:
+        return [None] * (4 + len(percentiles) + 1)
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+
+    mean = np.average(values, weights=weights)
+    std_dev = np.sqrt(np.average((values - mean) ** 2, weights=weights))
+    cumulative = np.cumsum(weights) / weights.sum()
+
+    return [reltuples * (1.0 - (null_frac or 0.0)), float(mean), float(std_dev), float(values[0])] + \
+           [float(np.interp(p, cumulative, values)) for p in percentiles] + \
+           [float(values[-1])]
+
+
+def catalog_describe(table, columns, percentiles):
+    """
+    Approximates ``describe`` from the planner's statistics alone, without reading the table: counts come from ``pg_class.reltuples`` and ``pg_stats.null_frac``, and the distribution of each column is rebuilt from its most common values and histogram bounds.
+
+    :param pg_utils.table.Table table: The table.
+    :param list[str] columns: The (numeric) columns to describe.
+    :param list[float] percentiles: The percentiles to compute.
+    :return: A dictionary from column name to the values of the description (in the same order as ``describe``).
+    :rtype: dict
+    """
+
+    cur = table.conn.cursor()
+
+    cur.execute("select reltuples from pg_class where oid = %s::regclass", (str(queries.relation(table)),))
+    reltuples = max(float(cur.fetchone()[0]), 0.0)
+
+    cur.execute(
+        """
+        select attname, null_frac,
+            most_common_vals::text::float8[], most_common_freqs::float8[],
+            histogram_bounds::text::float8[]
+        from pg_stats
+        where schemaname = %s and tablename = %s and attname = any(%s)
+        """,
+        (table.schema, table.table_name, list(columns))
+    )
+
+    stats = {row[0]: row[1:] for row in cur.fetchall()}
+
+    missing = [c for c in columns if c not in stats]
+
+    if missing:
+        raise BudgetExceededError(
+            "No planner statistics for {} of {} (has it been analyzed?)".format(", ".join(missing), table))
+
+    return {
+        column: _catalog_column_summary(*(stats[column] + (reltuples, percentiles)))
+        for column in columns
+    }
@@ -0,0 +1,4 @@
+"""
+A local, memory-mapped cache of the values of columns, shared across processes and keyed by the version of each table.
+"""
+from .base import ColumnCache, coerce_cache, cached_values
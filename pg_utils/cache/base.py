@@ -0,0 +1,255 @@
+import errno
+import hashlib
+import os
+import tempfile
+
+from .._lazy import lazy_import
+from ..memory.base import _parse_size
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+__all__ = ["ColumnCache", "coerce_cache", "cached_values"]
+
+_values_suffix = ".npy"
+_mask_suffix = ".mask.npy"
+
+
+def _remove(path):
+    # another process may have evicted the file already
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class ColumnCache(object):
+    """
+    A cache of the values of columns in a local directory, shared by every process that uses the same directory. Each column is stored as an ``.npy`` file (with a second one for the mask of the nulls, if it's a nullable integer or boolean column), and is read back as a memory-mapped view of that file, so a hit copies nothing.
+
+    Entries are keyed by the table's exact :meth:`pg_utils.table.Table.version_token` (the number of rows and a sum of hashes of their ``ctid`` and ``xmin``), so a change to a table makes the entries for its old contents unreachable. They're left on disk until they're evicted, which happens (least recently used first) whenever the cache grows past ``max_bytes``. Taking the token costs a scan of the table on every lookup (though no rows are fetched), which is what makes the cache safe: the cheaper token from the cumulative statistics can miss changes.
+
+    Writers are safe to run concurrently: each entry is written to a temporary file that's renamed into place, so readers only ever see complete entries, and an entry that's evicted while it's being read stays readable (on POSIX systems) until its memory map is closed.
+
+    :param str directory: The directory of the cache (created if need be).
+    :param int|float|str max_bytes: The size cap of the cache, in bytes. Strings such as ``"10GB"`` are accepted too.
+    """
+
+    def __init__(self, directory, max_bytes="10GB"):
+
+        self.directory = directory
+        self.max_bytes = _parse_size(max_bytes)
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(*parts):
+        """
+        The key of an entry, hashed from any number of parts (eg the server, the table, the column, and the version token).
+
+        :rtype: str
+        """
+        return hashlib.sha1(u"\x00".join(str(p) for p in parts).encode("utf8")).hexdigest()
+
+    def _path(self, key, suffix=_values_suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        """
+        Looks up an entry, marking it as recently used.
+
+        :param str key: The key.
+        :return: The values (a ``numpy.memmap``, or a nullable pandas array backed by them), or ``None`` on a miss.
+        :rtype: None|numpy.ndarray|pandas.api.extensions.ExtensionArray
+        """
+
+        path = self._path(key)
+
+        try:
+            values = np.load(path, mmap_mode="r")
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+
+        if not os.path.exists(self._path(key, _mask_suffix)):
+            return values
+
+        try:
+            mask = np.load(self._path(key, _mask_suffix), mmap_mode="r")
+        except (IOError, OSError):
+            return None
+
+        if values.dtype.kind == "b":
+            return pd.arrays.BooleanArray(values, mask)
+
+        return pd.arrays.IntegerArray(values, mask)
+
+    def put(self, key, values):
+        """
+        Adds an entry (replacing any existing one), and then evicts entries until the cache is within its size cap.
+
+        :param str key: The key.
+        :param numpy.ndarray|pandas.api.extensions.ExtensionArray values: The values: a one-dimensional array of a fixed-width dtype, or a nullable integer or boolean pandas array.
+        """
+
+        if isinstance(values, np.ndarray):
+            mask = None
+        else:
+            mask = np.asarray(values.isna())
+            values = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=values.dtype.numpy_dtype.type(0))
+
+        # the mask goes first, since an entry exists as soon as its values do
+        if mask is not None:
+            self._write(self._path(key, _mask_suffix), mask)
+        else:
+            _remove(self._path(key, _mask_suffix))
+
+        self._write(self._path(key), values)
+
+        self.evict()
+
+    def _write(self, path, array):
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(handle, "wb") as f:
+                np.save(f, np.asarray(array))
+
+            os.replace(temporary, path)
+        except BaseException:
+            _remove(temporary)
+            raise
+
+    def entries(self):
+        """
+        The entries of the cache, least recently used first.
+
+        :return: For each entry, its key, its size in bytes, and when it was last used.
+        :rtype: list[tuple[str, int, float]]
+        """
+
+        entries = []
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(_values_suffix) or name.endswith(_mask_suffix):
+                continue
+
+            key = name[:-len(_values_suffix)]
+
+            try:
+                stat = os.stat(self._path(key))
+                size = stat.st_size
+
+                if os.path.exists(self._path(key, _mask_suffix)):
+                    size += os.stat(self._path(key, _mask_suffix)).st_size
+            except OSError:
+                continue
+
+            entries.append((key, size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self):
+        """
+        The total size of the entries, in bytes.
+
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def remove(self, key):
+        """
+        Removes an entry (if it exists).
+
+        :param str key: The key.
+        """
+
+        _remove(self._path(key))
+        _remove(self._path(key, _mask_suffix))
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is within its size cap.
+        """
+
+        entries = self.entries()
+        size = sum(s for _, s, _ in entries)
+
+        for key, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+
+            self.remove(key)
+            size -= entry_size
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+
+        for key, _, _ in self.entries():
+            self.remove(key)
+
+    def __repr__(self):
+        return "ColumnCache({!r}, max_bytes={})".format(self.directory, self.max_bytes)
+
+
+def coerce_cache(cache):
+    """
+    Turns the value of a ``column_cache`` parameter into a :class:`ColumnCache`: a string is taken to be the directory of the cache (with the default size cap).
+
+    :param None|str|ColumnCache cache: The value.
+    :rtype: None|ColumnCache
+    """
+
+    if cache is None or isinstance(cache, ColumnCache):
+        return cache
+
+    return ColumnCache(cache)
+
+
+def _cacheable(values):
+
+    if isinstance(values, np.ndarray):
+        return values.ndim == 1 and values.dtype.kind in "biufmM"
+
+    return isinstance(values, (pd.arrays.IntegerArray, pd.arrays.BooleanArray))
+
+
+def cached_values(column, fetch):
+    """
+    The values of a column, from the connection's :class:`ColumnCache` if it has them for the current version of the table, or else from ``fetch`` (whose result is then added to the cache, if it's of a dtype the cache can hold).
+
+    :param pg_utils.column.Column column: The column.
+    :param fetch: A function of no arguments that fetches the values.
+    :rtype: numpy.ndarray|pandas.api.extensions.ExtensionArray
+    """
+
+    table = column.parent_table
+    cache = getattr(table.conn, "column_cache", None)
+
+    if cache is None:
+        return fetch()
+
+    key = ColumnCache.key(table.conn.hostname, table.conn.database, table.schema, table.table_name,
+                          column.name, column.data_type, getattr(table.conn, "numeric_as_float", False),
+                          table.version_token(exact=True))
+
+    values = cache.get(key)
+
+    if values is not None:
+        return values
+
+    values = fetch()
+
+    if _cacheable(values):
+        cache.put(key, values)
+
+    return values
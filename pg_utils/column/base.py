@@ -1,12 +1,28 @@
-import numpy as np
-import pandas as pd
+import six
 from lazy_property import LazyProperty
 
-from . import _describe_template
 from .plot import Plotter
 from .. import bin_counts
 from .. import numeric_datatypes, _pretty_print
-from ..util import seaborn_required
+from .._lazy import lazy_import
+from ..cache import cached_values
+from ..budget import resolve_budget, execute_within_budget
+from ..dtypes import aggregate_type, fetch_array, fetch_matrix, to_array
+from ..memory import fetch_within_memory, whole_result_budget
+from ..sql import queries
+from ..summary import HyperLogLog
+from ..exception import NoSuchColumnError
+from ..view import View
+from ..instrumentation.base import instrumented, measure_frame, read_sql
+from ..util import seaborn_required, pyarrow_required
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def _is_array(result):
+    # as opposed to an iterator of chunks
+    return isinstance(result, (np.ndarray, pd.api.extensions.ExtensionArray))
 
 
 class Column(object):
@@ -27,7 +43,10 @@ class Column(object):
 
         self.parent_table = parent_table
         self.name = name
-        self.is_numeric = parent_table._all_column_data_types[name] in numeric_datatypes
+        self.data_type = parent_table._all_column_data_types[name]
+        self.is_numeric = self.data_type in numeric_datatypes
+        self.element_type = self.data_type[:-2] if self.data_type.endswith("[]") else None
+        self.is_numeric_array = self.element_type in numeric_datatypes
 
         self.plot = Plotter(self)
 
@@ -39,71 +58,279 @@ class Column(object):
         :rtype: str
         """
 
-        return "select {} from {}".format(self, self.parent_table)
+        return queries.select_columns(self.parent_table, [self.name])
 
-    def sort_values(self, ascending=True, limit=None, **sql_kwargs):
+    @instrumented
+    def sort_values(self, ascending=True, limit=None, memory_budget=None, **sql_kwargs):
         """
         Mimics the method `pandas.Series.sort_values <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.Series.sort_values.html#pandas.Series.sort_values>`_.
 
         :param int|None limit: Either a positive integer for the number of rows to take or ``None`` to take all.
         :param bool ascending: Sort ascending vs descending.
-        :param dict sql_kwargs: A dictionary of keyword arguments passed into `pandas.read_sql <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_.
-        :return: The resulting series.
+        :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The memory budget for the result (see :meth:`head`).
+        :param dict sql_kwargs: A dictionary of keyword arguments passed into `pandas.read_sql <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_. If there are any, the values are decoded by pandas rather than by :mod:`pg_utils.dtypes`.
+        :return: The resulting series (or, if it's over a memory budget with the ``"chunk"`` policy, an iterator of arrays).
         :rtype: pandas.Series
         """
 
         if limit is not None and (not isinstance(limit, int) or limit <= 0):
             raise ValueError("limit must be a positive integer or None (got {})".format(limit))
 
-        sql = self.select_all_query() + " order by 1"
+        sql = queries.select_columns(self.parent_table, [self.name], order_by=[(self.name, ascending)], limit=limit)
+
+        if sql_kwargs:
+            return read_sql(sql, self.parent_table.conn, **sql_kwargs)[self.name]
+
+        result = fetch_within_memory(self.parent_table, sql, [self.name], num_rows=limit,
+                                     memory_budget=memory_budget, single=True)
+
+        return pd.Series(result, name=self.name, copy=False) if _is_array(result) else result
+
+    @instrumented
+    def nlargest(self, n=5):
+        """
+        Mimics the method `pandas.Series.nlargest <https://pandas.pydata.org/docs/reference/api/pandas.Series.nlargest.html>`_: the ``n`` largest (non-null) values, in descending order. The server only has to keep the top values while sorting (or can read them off an index).
+
+        :param int n: The number of values.
+        :rtype: pandas.Series
+        """
+        return self._top(n, False)
+
+    @instrumented
+    def nsmallest(self, n=5):
+        """
+        Mimics the method `pandas.Series.nsmallest <https://pandas.pydata.org/docs/reference/api/pandas.Series.nsmallest.html>`_: the ``n`` smallest (non-null) values, in ascending order.
+
+        :param int n: The number of values.
+        :rtype: pandas.Series
+        """
+        return self._top(n, True)
+
+    def _top(self, n, ascending):
 
-        if not ascending:
-            sql += " desc"
+        if not isinstance(n, six.integer_types) or n <= 0:
+            raise ValueError("n must be a positive integer (got {})".format(n))
 
-        if limit is not None:
-            sql += " limit {}".format(limit)
+        sql = queries.select_columns(self.parent_table, [self.name], order_by=[(self.name, ascending)], limit=n,
+                                     not_null=[self.name])
 
-        return pd.read_sql(sql, self.parent_table.conn, **sql_kwargs)[self.name]
+        return pd.Series(fetch_array(self.parent_table.conn, sql, self.data_type), name=self.name, copy=False)
 
+    @instrumented
     def unique(self):
         """
-        Returns an array of unique values in this column. Includes ``null`` (represented as ``None``).
+        Returns an array of unique values in this column. Includes ``null`` (represented as a missing value of the array's dtype, see :func:`pg_utils.dtypes.to_array`).
         :return: The unique values.
         :rtype: np.array
         """
 
+        return fetch_array(self.parent_table.conn,
+                           queries.select_columns(self.parent_table, [self.name], distinct=True),
+                           self.data_type)
+
+    @instrumented
+    def value_counts(self, top=None, normalize=False, dropna=True):
+        """
+        Mimics the method `pandas.Series.value_counts <https://pandas.pydata.org/docs/reference/api/pandas.Series.value_counts.html>`_: the number of rows holding each distinct value, most common first. The values are counted by the server (with ``group by``), so only the ``top`` ones are sent over.
+
+        :param None|int top: The number of values to return (or ``None`` for all of them).
+        :param bool normalize: Whether to return the fraction of the (counted) rows holding each value, rather than their number.
+        :param bool dropna: Whether to leave nulls out.
+        :return: The counts (or fractions), indexed by value.
+        :rtype: pandas.Series
+        """
+
+        if top is not None and (not isinstance(top, six.integer_types) or top <= 0):
+            raise ValueError("top must be a positive integer or None (got {})".format(top))
+
+        conn = self.parent_table.conn
+        cur = conn.cursor()
+        cur.execute(queries.value_counts(self.parent_table, self.name, top=top, dropna=dropna))
+        rows = cur.fetchall()
+
+        with measure_frame(conn):
+            index = pd.Index(to_array([row[0] for row in rows], self.data_type,
+                                      getattr(conn, "numeric_as_float", False)), name=self.name)
+            counts = np.array([row[1] for row in rows], dtype="int64")
+
+            if normalize:
+                return pd.Series(counts / float(rows[0][2]) if rows else counts.astype("float64"), index=index,
+                                 name="proportion")
+
+            return pd.Series(counts, index=index, name="count")
+
+    @instrumented
+    def nunique(self, approx=True, dropna=True, method=None):
+        """
+        Mimics the method `pandas.Series.nunique <https://pandas.pydata.org/docs/reference/api/pandas.Series.nunique.html>`_: the number of distinct values in this column.
+
+        :param bool approx: Whether an estimate will do. If not, the distinct values are counted exactly (with ``count(distinct ...)``), which means sorting or hashing every one of them on the server.
+        :param bool dropna: Whether to leave nulls out (rather than counting them as one more value).
+        :param None|str method: How to estimate: ``"statistics"`` takes the planner's ``n_distinct`` (from ``pg_stats``, which costs nothing but is only as accurate, and as recent, as the last ``analyze``), while ``"hyperloglog"`` scans the column, with the server reducing it to the registers of a :class:`pg_utils.summary.HyperLogLog` sketch (so only those are sent over). By default, the statistics are used if there are any, and the sketch otherwise.
+        :rtype: int
+        """
+
+        if method not in (None, "statistics", "hyperloglog"):
+            raise ValueError("method must be one of None, 'statistics', or 'hyperloglog' (got {!r})".format(method))
+
+        table = self.parent_table
+        cur = table.conn.cursor()
+        statistics = self._distinct_statistics() if approx and method != "hyperloglog" else None
+
+        if not approx:
+            cur.execute(queries.count_distinct(table, self.name))
+            result, has_nulls = cur.fetchone()
+
+        elif statistics is not None:
+            result, has_nulls = statistics
+
+        elif method == "statistics":
+            raise ValueError("No planner statistics for {} (has it been analyzed?)".format(self))
+
+        else:
+            cur.execute(queries.hyperloglog_registers(table, self.name))
+            rows = cur.fetchall()
+
+            result = HyperLogLog.from_registers(rows).estimate()
+            has_nulls = any(register is None for register, _ in rows)
+
+        return int(result) + (0 if dropna or not has_nulls else 1)
+
+    def _distinct_statistics(self):
+
         cur = self.parent_table.conn.cursor()
-        cur.execute("select distinct {} from {}".format(self, self.parent_table))
-        return np.array([x[0] for x in cur.fetchall()])
+        cur.execute(queries.distinct_statistics(self.parent_table.schema, self.parent_table.table_name, self.name))
+        row = cur.fetchone()
+
+        if row is None:
+            return None
+
+        n_distinct, null_frac, reltuples = row
+
+        # a negative n_distinct is a fraction of the rows (for columns whose number of distinct values grows with them)
+        if n_distinct < 0:
+            n_distinct = -n_distinct * max(reltuples, 0)
+
+        return int(round(n_distinct)), null_frac > 0
 
     def hist(self, **kwargs):
 
         return self.plot.hist(**kwargs)
 
-    def head(self, num_rows=10):
+    @instrumented
+    def head(self, num_rows=10, memory_budget=None):
         """
         Fetches some values of this column.
 
         :param int|str num_rows: Either a positive integer number of values or the string `"all"` to fetch all values
-        :return: A NumPy array of the values
+        :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The memory budget for the result, overriding the connection's (if any). A plain number (or a string such as ``"4GB"``) is taken to be a number of bytes. See :mod:`pg_utils.memory`.
+        :return: A NumPy array of the values (or, if it's over a memory budget with the ``"chunk"`` policy, an iterator of arrays)
         :rtype: np.array
         """
 
-        if (isinstance(num_rows, int) and num_rows < 0) or \
+        if (not isinstance(num_rows, six.integer_types) or num_rows <= 0) and \
                         num_rows != "all":
             raise ValueError("num_rows must be a positive integer or the string 'all'")
 
-        query = self.select_all_query()
+        limit = None if num_rows == "all" else num_rows
 
-        if num_rows != "all":
-            query += " limit {}".format(num_rows)
+        return fetch_within_memory(self.parent_table,
+                                   queries.select_columns(self.parent_table, [self.name], limit=limit),
+                                   [self.name], num_rows=limit, memory_budget=memory_budget, single=True)
 
-        cur = self.parent_table.conn.cursor()
+    @instrumented
+    def resample(self, time_column, freq, how="mean", fill=False, origin="epoch", start=None, end=None, where=None):
+        """
+        Mimics ``pandas.Series.resample(freq).agg(how)`` for this column against a time column of its table, with the rows grouped into time buckets and aggregated by the database. See :meth:`pg_utils.table.Table.resample` for details on the arguments.
+
+        :param str time_column: The name of the time column.
+        :param str freq: The frequency (a pandas offset alias).
+        :param str how: The aggregate (eg ``"mean"``, ``"sum"``, or ``"count"``).
+        :return: The aggregate of each bucket, indexed by bucket.
+        :rtype: pandas.Series
+        """
+
+        return self.parent_table.resample(time_column, freq, agg={self.name: how}, fill=fill, origin=origin,
+                                          start=start, end=end, where=where)[self.name]
+
+    def cumsum(self, order_by):
+        """
+        Mimics ``pandas.Series.cumsum``, with the rows in order of some columns of the table: the running sum is computed by the database (with a window function), as a lazily evaluated :class:`pg_utils.view.View` of the ``order_by`` columns and the sum (named after this column), which can be filtered, aggregated, or streamed without fetching the rows of the table. The sum skips nulls, and is null where this column is.
+
+        The ``order_by`` columns should identify the rows uniquely: the order of rows that tie on them is up to the database.
+
+        :param str|list[str] order_by: The column(s) to order the rows by.
+        :rtype: pg_utils.view.View
+        """
+
+        order_by = self._window_order(order_by, numeric=True)
+
+        return self._window_view(queries.cumulative_sum(self.parent_table, self.name, order_by), order_by,
+                                 aggregate_type("sum", self.data_type))
 
-        cur.execute(query)
-        return np.array([x[0] for x in cur.fetchall()])
+    def rank(self, order_by=None, method="average", ascending=True, pct=False):
+        """
+        Mimics ``pandas.Series.rank``: the ranks of the values of this column are computed by the database (with window functions), as a lazily evaluated :class:`pg_utils.view.View` of the ``order_by`` columns (if any) and the ranks (named after this column). Null values have null ranks.
+
+        :param None|str|list[str] order_by: The column(s) to select along with the ranks, which the rows of the view are ordered by (and which order tied values, for ``method="first"``).
+        :param str method: How tied values are ranked: ``"average"``, ``"min"``, ``"max"``, ``"first"``, or ``"dense"``.
+        :param bool ascending: Whether the smallest value is ranked first.
+        :param bool pct: Whether to give the ranks as fractions of the highest rank.
+        :rtype: pg_utils.view.View
+        """
+
+        if method not in ["average", "min", "max", "first", "dense"]:
+            raise ValueError("method must be 'average', 'min', 'max', 'first', or 'dense' (got {})".format(method))
+
+        order_by = self._window_order(order_by or [])
+        data_type = "double precision" if method == "average" or pct else "bigint"
+
+        return self._window_view(queries.rank(self.parent_table, self.name, method=method, ascending=ascending,
+                                              pct=pct, order_by=order_by), order_by, data_type)
+
+    def diff(self, order_by, periods=1):
+        """
+        Mimics ``pandas.Series.diff``, with the rows in order of some columns of the table: the difference between each value and the one ``periods`` rows before it is computed by the database (with ``lag``, or with ``lead`` for a negative ``periods``), as a lazily evaluated :class:`pg_utils.view.View` of the ``order_by`` columns and the differences (named after this column).
+
+        :param str|list[str] order_by: The column(s) to order the rows by.
+        :param int periods: The number of rows back to take the difference with.
+        :rtype: pg_utils.view.View
+        """
+
+        if not isinstance(periods, six.integer_types):
+            raise ValueError("periods must be an integer (got {})".format(periods))
+
+        order_by = self._window_order(order_by, numeric=True)
+
+        return self._window_view(queries.difference(self.parent_table, self.name, order_by, periods=periods),
+                                 order_by, self.data_type)
+
+    def _window_order(self, order_by, numeric=False):
+
+        if numeric and not self.is_numeric:
+            raise ValueError("The column {} is not a numeric column of {}".format(self, self.parent_table))
+
+        if isinstance(order_by, six.string_types):
+            order_by = [order_by]
+
+        for name in order_by:
+            if name not in self.parent_table._all_column_data_types:
+                raise NoSuchColumnError("Column {} does not exist in table {}".format(name, self.parent_table))
+
+        if self.name in order_by:
+            raise ValueError("The column {} can't order its own rows".format(self))
+
+        return list(order_by)
+
+    def _window_view(self, query, order_by, data_type):
+
+        data_types = {name: self.parent_table._all_column_data_types[name] for name in order_by}
+        data_types[self.name] = data_type
+
+        return View(self.parent_table.conn, query, order_by + [self.name], data_types, order_by=order_by)
 
     @LazyProperty
+    @instrumented
     def is_unique(self):
         """
         Determines whether or not the values of this column are all unique (ie whether this column is a unique identifier for the table).
@@ -113,9 +340,7 @@ class Column(object):
 
         cur = self.parent_table.conn.cursor()
 
-        cur.execute("""select {}
-          from {}
-          group by 1 having count(1) > 1""".format(self, self.parent_table))
+        cur.execute(queries.duplicates(self.parent_table, self.name))
 
         return cur.fetchone() is None
 
@@ -130,14 +355,12 @@ class Column(object):
 
         return self.parent_table._all_column_data_types[self.name]
 
-    def _get_describe_query(self, percentiles=None, type_="continuous"):
+    @staticmethod
+    def _describe_percentiles(percentiles, type_):
 
         if type_.lower() not in ["continuous", "discrete"]:
             raise ValueError("The 'type_' parameter must be 'continuous' or 'discrete'")
 
-        if not self.is_numeric:
-            return None
-
         if percentiles is None:
             percentiles = [0.25, 0.5, 0.75]
         elif not bool(percentiles):
@@ -153,54 +376,149 @@ class Column(object):
 
         percentiles = sorted([float("{0:.2f}".format(p)) for p in percentiles if p > 0])
 
-        suffix = "cont" if type_.lower() == "continuous" else "desc"
+        return percentiles, "cont" if type_.lower() == "continuous" else "disc"
+
+    def _get_describe_query(self, percentiles=None, type_="continuous", source=None, by_position=False):
 
-        query = _describe_template.render(column=self, percentiles=percentiles,
-                                          suffix=suffix, table=self.parent_table)
+        percentiles, suffix = self._describe_percentiles(percentiles, type_)
+
+        if self.is_numeric_array:
+            # the elements are unnested by the server, and described like a column of the element type
+            elements = queries.array_elements(source or self.parent_table, self.name)
+
+            if by_position:
+                query = queries.describe_positions(elements, percentiles, suffix)
+            else:
+                query = queries.describe_column(elements, "value", self.element_type, percentiles, suffix)
+        elif self.is_numeric:
+            query = queries.describe_column(source or self.parent_table, self.name, self.dtype, percentiles, suffix)
+        else:
+            return None
 
         if self.parent_table.debug:
             _pretty_print(query)
 
         return query
 
-    def describe(self, percentiles=None, type_="continuous"):
+    @instrumented
+    def describe(self, percentiles=None, type_="continuous", budget=None):
         """
         This mocks the method `pandas.Series.describe`, and provides
         a series with the same data (just calculated by the database).
 
         :param None|list[float] percentiles: A list of percentiles to evaluate (with numbers between 0 and 1). If not specified, quartiles (0.25, 0.5, 0.75) are used.
         :param str type_: Specifies whether the percentiles are to be taken as discrete or continuous. Must be one of `"discrete"` or `"continuous"`.
+        :param None|float|pg_utils.budget.Budget budget: A budget for the query (defaulting to the connection's). If it would be exceeded, the description is approximated, and ``result.attrs["approximate"]`` is set. See :mod:`pg_utils.budget`.
         :return: A series returning the description of the column, in the same format as ``pandas.Series.describe``.
         :rtype: pandas.Series
         """
 
+        if self.is_numeric_array:
+            return self.describe_elements(percentiles=percentiles, type_=type_, budget=budget)
+
         if percentiles is None:
             percentiles = [0.25, 0.5, 0.75]
 
+        rows, info = self.parent_table._describe_rows([self.name], percentiles, type_, budget)
+
+        index = ["count", "mean", "std_dev", "minimum"] + \
+                ["{}%".format(int(100 * p)) for p in percentiles] + \
+                ["maximum"]
+
+        result = pd.Series(rows[self.name], index=index)
+        result.attrs.update(info)
+
+        return result
+
+    @instrumented
+    def describe_elements(self, percentiles=None, type_="continuous", by_position=False, budget=None):
+        """
+        Describes the elements of a numeric array column (eg ``double precision[]``). The arrays are ``unnest``\ ed by the database, so none of them are fetched. This is what :meth:`describe` does for such columns.
+
+        :param None|list[float] percentiles: See :meth:`describe`.
+        :param str type_: See :meth:`describe`.
+        :param bool by_position: Whether to describe the elements at each position of the arrays separately (eg each coordinate of fixed-length vectors), rather than all of them together.
+        :param None|float|pg_utils.budget.Budget budget: See :meth:`describe`. If it would be exceeded, the elements of a sample of the rows are described.
+        :return: A series like that of :meth:`describe`, whose ``count`` is the number of (non-null) elements, or with ``by_position``, a DataFrame with a row of such statistics for each (one-based) position.
+        :rtype: pandas.Series|pandas.DataFrame
+        """
+
+        if not self.is_numeric_array:
+            raise ValueError("The column {} is not a numeric array column of {}".format(self, self.parent_table))
+
+        percentiles, _ = self._describe_percentiles(percentiles, type_)
+
+        budget = resolve_budget(self.parent_table.conn, budget)
         cur = self.parent_table.conn.cursor()
 
-        cur.execute(self._get_describe_query(percentiles=percentiles, type_=type_))
+        info = execute_within_budget(
+            cur, self.parent_table,
+            lambda source: self._get_describe_query(percentiles, type_, source=source, by_position=by_position),
+            budget
+        )
+
+        rows = [list(row) for row in cur.fetchall()]
+
+        # counts over a sample are scaled back up to the size of the whole table
+        if info["method"] == "sample":
+            for row in rows:
+                row[1] = row[1] / info["sample_fraction"]
 
         index = ["count", "mean", "std_dev", "minimum"] + \
                 ["{}%".format(int(100 * p)) for p in percentiles] + \
                 ["maximum"]
 
-        return pd.Series(cur.fetchone()[1:], index=index)
+        if by_position:
+            result = pd.DataFrame([row[1:] for row in rows], columns=index,
+                                  index=pd.Index([row[0] for row in rows], name="position"))
+        else:
+            result = pd.Series(rows[0][1:], index=index)
+
+        result.attrs.update(info)
+
+        return result
+
+    @instrumented
+    def to_matrix(self, num_rows="all"):
+        """
+        Fetches the values of a numeric array column whose arrays all have the same length (eg embeddings or fixed-size vectors) as a 2-D NumPy array, with a row for each row of the table.
+
+        The arrays are fetched with a binary ``COPY`` and decoded straight into the matrix (see :func:`pg_utils.dtypes.fetch_matrix`), rather than into a Python list per row (as :meth:`head` does). ``numeric`` arrays are cast to ``double precision[]`` by the database.
+
+        :param int|str num_rows: Either a positive integer number of rows or the string `"all"` to fetch all of them.
+        :return: The matrix.
+        :rtype: numpy.ndarray
+        :raises ValueError: If the arrays differ in length, hold nulls (or are null), or are multidimensional.
+        """
+
+        if not self.is_numeric_array:
+            raise ValueError("The column {} is not a numeric array column of {}".format(self, self.parent_table))
+
+        if (not isinstance(num_rows, six.integer_types) or num_rows <= 0) and num_rows != "all":
+            raise ValueError("num_rows must be a positive integer or the string 'all'")
+
+        element_type = "double precision" if self.element_type in ["numeric", "decimal"] else None
+
+        return fetch_matrix(self.parent_table.conn,
+                            queries.array_values(self.parent_table, self.name, element_type,
+                                                 limit=None if num_rows == "all" else num_rows))
 
     @seaborn_required
-    def distplot(self, bins=None, **kwargs):
+    @instrumented
+    def distplot(self, bins=None, budget=None, **kwargs):
         """
         Produces a ``distplot``. See `the seaborn docs <http://stanford.edu/~mwaskom/software/seaborn/generated/seaborn.distplot.html>`_ on ``distplot`` for more information.
 
         Note that this requires Seaborn in order to function.
 
         :param int|None bins: The number of bins to use. If unspecified, the `Freedman-Diaconis rule <https://en.wikipedia.org/wiki/Freedman%E2%80%93Diaconis_rule>`_ will be used to determine the number of bins.
+        :param None|float|pg_utils.budget.Budget budget: A budget for the queries behind the plot (see :func:`pg_utils.bin_counts.counts`).
         :param dict kwargs: A dictionary of options to pass on to `seaborn.distplot <http://stanford.edu/~mwaskom/software/seaborn/generated/seaborn.distplot.html>`_.
         """
 
         import seaborn
 
-        bc = bin_counts.counts(self, bins=bins)
+        bc = bin_counts.counts(self, bins=bins, budget=budget)
 
         n = sum([entry[2] for entry in bc])
 
@@ -220,31 +538,76 @@ class Column(object):
         return seaborn.distplot((left + right) / 2.0, **kwargs)
 
     @LazyProperty
+    @instrumented
     def values(self):
         """
         Mocks the method `pandas.Series.values`, returning a simple NumPy array
         consisting of the values of this column.
 
+        The connection's memory budget (if any) applies, although since the values are cached, the ``"chunk"`` policy is taken to be ``"raise"`` (use :meth:`head` with ``"all"`` to stream them instead).
+
+        If the connection has a :class:`pg_utils.cache.ColumnCache`, the values are looked up there first (for the table's current :meth:`pg_utils.table.Table.version_token`), and on a hit they're a memory-mapped view of the cached file.
+
         :return: The NumPy array containing the values.
         :rtype: np.array
         """
 
-        cur = self.parent_table.conn.cursor()
+        return cached_values(self, lambda: fetch_within_memory(
+            self.parent_table, self.select_all_query(), [self.name],
+            memory_budget=whole_result_budget(self.parent_table.conn), single=True))
 
-        cur.execute(self.select_all_query())
+    def _as_table(self):
 
-        return np.array([x[0] for x in cur.fetchall()])
+        from ..table import Table
 
-    def _calculate_aggregate(self, aggregate):
+        return Table.from_table(self.parent_table, columns=[self.name])
 
-        query = "select {}({}) from (\n{}\n)a".format(
-            aggregate, self, self.select_all_query())
+    @pyarrow_required
+    @instrumented
+    def to_arrow(self, batch_size=65536, type_=None):
+        """
+        Fetches the values of this column as a pyarrow ``ChunkedArray`` (with one chunk per batch of rows streamed from the database).
+
+        Note that this requires pyarrow.
+
+        :param int batch_size: The number of rows fetched at a time.
+        :param None|pyarrow.DataType type_: The pyarrow datatype to use. If not specified, it's derived from the ``dtype`` of this column.
+        :return: The values.
+        :rtype: pyarrow.ChunkedArray
+        """
+
+        types = None if type_ is None else {self.name: type_}
+
+        return self._as_table().to_arrow(batch_size=batch_size, types=types).column(self.name)
+
+    @pyarrow_required
+    @instrumented
+    def to_parquet(self, path, row_group_size=65536, type_=None, **writer_kwargs):
+        """
+        Writes this column to a (single column) Parquet file, one row group at a time.
+
+        Note that this requires pyarrow.
+
+        :param str path: The path of the Parquet file.
+        :param int row_group_size: The number of rows in each row group.
+        :param None|pyarrow.DataType type_: The pyarrow datatype to use. If not specified, it's derived from the ``dtype`` of this column.
+        :param dict writer_kwargs: Other keyword arguments passed to ``pyarrow.parquet.ParquetWriter``.
+        :return: The number of rows written.
+        :rtype: int
+        """
+
+        types = None if type_ is None else {self.name: type_}
+
+        return self._as_table().to_parquet(path, row_group_size=row_group_size, types=types, **writer_kwargs)
+
+    def _calculate_aggregate(self, aggregate):
 
         cur = self.parent_table.conn.cursor()
-        cur.execute(query)
+        cur.execute(queries.aggregate(self.parent_table, aggregate, self.name))
         return cur.fetchone()[0]
 
     @LazyProperty
+    @instrumented
     def mean(self):
         """
         Mocks the ``pandas.Series.mean`` method to give the mean of the values in this column.
@@ -255,6 +618,7 @@ class Column(object):
         return self._calculate_aggregate("avg")
 
     @LazyProperty
+    @instrumented
     def max(self):
         """
         Mocks the ``pandas.Series.max`` method to give the maximum of the values in this column.
@@ -265,6 +629,7 @@ class Column(object):
         return self._calculate_aggregate("max")
 
     @LazyProperty
+    @instrumented
     def min(self):
         """
         Mocks the ``pandas.Series.min`` method to give the maximum of the values in this column.
@@ -1,6 +1,24 @@
 from functools import wraps
 
-import pandas as pd
+from ... import bin_counts
+from ..._lazy import lazy_import
+from ...budget import resolve_budget, execute_within_budget
+from ...sql import queries
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+plt = lazy_import("matplotlib.pyplot")
+
+__all__ = ["Plotter", "box_statistics", "kde_curve"]
+
+# the maximum number of outliers fetched for a box plot (along with the minimum and maximum)
+_max_fliers = 1000
+
+# the number of bins of the histogram that a KDE is built from
+_kde_bins = 1024
+
+# the default number of points a KDE is evaluated at (as for pandas)
+_kde_points = 1000
 
 
 def plot_dispatch(f):
@@ -14,7 +32,121 @@ def plot_dispatch(f):
     return wrapper
 
 
+def box_statistics(column, whis=1.5, max_fliers=_max_fliers, budget=None):
+    """
+    The statistics drawn by a box plot of a column (as taken by ``matplotlib.axes.Axes.bxp``), computed by the database: its quartiles and mean, the ends of its whiskers (the most extreme values within ``whis`` times the interquartile range of the quartiles), and its outliers.
+
+    Only up to ``max_fliers`` outliers are fetched (along with the minimum and maximum, if they're outliers), which is enough to draw them.
+
+    :param pg_utils.column.Column column: The (numeric) column.
+    :param float whis: The reach of the whiskers, as a multiple of the interquartile range.
+    :param int max_fliers: The maximum number of outliers to fetch.
+    :param None|float|pg_utils.budget.Budget budget: A budget for the queries (see :meth:`pg_utils.column.Column.describe`).
+    :return: A dictionary with the keys ``label``, ``mean``, ``med``, ``q1``, ``q3``, ``whislo``, ``whishi``, and ``fliers``.
+    :rtype: dict
+    """
+
+    if not column.is_numeric:
+        raise ValueError("The column {} is not a numeric column of {}".format(column, column.parent_table))
+
+    table = column.parent_table
+    budget = resolve_budget(table.conn, budget)
+
+    desc = column.describe(percentiles=[0.25, 0.5, 0.75], budget=budget)
+    q1, q3 = desc["25%"], desc["75%"]
+    low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+
+    stats = {"label": column.name, "mean": desc["mean"], "med": desc["50%"], "q1": q1, "q3": q3,
+             "whislo": desc["minimum"], "whishi": desc["maximum"], "fliers": np.array([], dtype="float64")}
+
+    # without outliers, the whiskers reach the minimum and maximum
+    if desc["minimum"] >= low and desc["maximum"] <= high:
+        return stats
+
+    cur = table.conn.cursor()
+
+    execute_within_budget(cur, table, lambda source: queries.box_whiskers(source, column.name, low, high), budget)
+    stats["whislo"], stats["whishi"], outliers = cur.fetchone()
+
+    execute_within_budget(
+        cur, table, lambda source: queries.values_outside(source, column.name, low, high, max_fliers), budget)
+    fliers = [row[0] for row in cur.fetchall()]
+
+    if outliers > len(fliers):
+        fliers += [v for v in [desc["minimum"], desc["maximum"]] if v < low or v > high]
+
+    stats["fliers"] = np.array(fliers, dtype="float64")
+
+    return stats
+
+
+def _bandwidth_factor(bw_method, n):
+
+    # as for scipy.stats.gaussian_kde
+    if bw_method is None or bw_method == "scott":
+        return n ** (-1.0 / 5)
+
+    if bw_method == "silverman":
+        return (n * 3.0 / 4) ** (-1.0 / 5)
+
+    if isinstance(bw_method, (int, float)) and not isinstance(bw_method, bool):
+        return float(bw_method)
+
+    raise ValueError("bw_method must be 'scott', 'silverman', or a number (got {})".format(bw_method))
+
+
+def kde_curve(column, bw_method=None, ind=None, bins=_kde_bins, budget=None):
+    """
+    A Gaussian kernel density estimate of a column, built from a fine-grained histogram computed by the database (see :func:`pg_utils.bin_counts.counts`): each bin contributes a kernel at its center, weighted by its count. The bandwidth is chosen as for ``scipy.stats.gaussian_kde`` (which pandas uses), from the count and standard deviation of the column.
+
+    :param pg_utils.column.Column column: The (numeric) column.
+    :param None|str|float bw_method: ``"scott"`` (the default), ``"silverman"``, or a number (the bandwidth as a multiple of the standard deviation).
+    :param None|int|numpy.ndarray ind: The points to evaluate the estimate at, or the number of points (by default, 1000 equally spaced points spanning the range of the column, widened by half of it on either side, as for pandas).
+    :param int bins: The number of bins of the histogram.
+    :param None|float|pg_utils.budget.Budget budget: A budget for the queries (see :func:`pg_utils.bin_counts.counts`).
+    :return: The points and the estimated density at each one.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+
+    if not column.is_numeric:
+        raise ValueError("The column {} is not a numeric column of {}".format(column, column.parent_table))
+
+    budget = resolve_budget(column.parent_table.conn, budget)
+
+    desc = column.describe(percentiles=[], budget=budget)
+    minimum, maximum = float(desc["minimum"]), float(desc["maximum"])
+
+    if not desc["count"] > 1 or not desc["std_dev"] > 0:
+        raise ValueError("Unable to estimate the density of {}, which has fewer than two distinct values".format(
+            column))
+
+    bandwidth = _bandwidth_factor(bw_method, desc["count"]) * float(desc["std_dev"])
+
+    if ind is None or isinstance(ind, int):
+        spread = 0.5 * (maximum - minimum)
+        ind = np.linspace(minimum - spread, maximum + spread, ind or _kde_points)
+    else:
+        ind = np.asarray(ind, dtype="float64")
+
+    counts = np.array(bin_counts.counts(column, bins=bins, budget=budget), dtype="float64")
+
+    # the maximum falls in a bin of its own, just past the last one
+    centers = np.clip((counts[:, 0] + counts[:, 1]) / 2.0, minimum, maximum)
+    weights = counts[:, 2] / counts[:, 2].sum()
+
+    z = (ind[:, None] - centers[None, :]) / bandwidth
+    density = np.exp(-0.5 * z ** 2).dot(weights) / (bandwidth * np.sqrt(2 * np.pi))
+
+    return ind, density
+
+
 class Plotter(object):
+    """
+    The plotting methods of a column (as ``column.plot``), which mirror those of ``pandas.Series.plot``.
+
+    Box plots, histograms, and density estimates are drawn from summaries computed by the database (see :func:`box_statistics`, :func:`pg_utils.bin_counts.counts`, and :func:`kde_curve`), and bar and pie charts from :meth:`pg_utils.column.Column.value_counts`, so that only as much data as is drawn is fetched. Box plots, histograms, and density estimates also take a ``budget`` (see :mod:`pg_utils.budget`), and bar and pie charts the number of (most common) values to draw, as ``top``. Line and area plots draw every value, and so fetch the whole column.
+    """
+
     def __init__(self, column):
         self.column = column
 
@@ -47,6 +179,56 @@ class Plotter(object):
 
     def __call__(self, kind="line", **kwargs):
 
+        if kind == "box":
+            return self._box(**kwargs)
+
+        if kind == "hist":
+            return self._hist(**kwargs)
+
+        if kind in ["kde", "density"]:
+            return self._kde(**kwargs)
+
+        if kind in ["bar", "barh", "pie"]:
+            # the bars (or wedges) are the distinct values, rather than the rows
+            counts = self.column.value_counts(top=kwargs.pop("top", None))
+
+            return counts.plot(kind=kind, **kwargs)
+
         data = pd.Series(self.column.head("all"))
 
         return data.plot(kind=kind, **kwargs)
+
+    def _box(self, ax=None, whis=1.5, budget=None, **kwargs):
+
+        ax = ax or plt.gca()
+        ax.bxp([box_statistics(self.column, whis=whis, budget=budget)], **kwargs)
+
+        return ax
+
+    def _hist(self, ax=None, bins=10, budget=None, **kwargs):
+
+        ax = ax or plt.gca()
+        counts = np.array(bin_counts.counts(self.column, bins=bins, budget=budget), dtype="float64")
+
+        # the empty bins are left out, and the maximum falls in a bin of its own (starting at the maximum), just past
+        # the last one: so the edges are recovered from the width of the bins, and the maximum counted in the last
+        lowest, highest = counts[0, 0], counts[-1, 0]
+        width = counts[0, 1] - counts[0, 0]
+        num_bins = max(int(round((highest - lowest) / width)), 1) if width > 0 else 1
+        edges = np.linspace(lowest, highest, num_bins + 1) if highest > lowest else [lowest - 0.5, lowest + 0.5]
+
+        # each bin is drawn from a single point, weighted by its count
+        centers = np.clip((counts[:, 0] + counts[:, 1]) / 2.0, edges[0], edges[-1])
+        ax.hist(centers, bins=edges, weights=counts[:, 2], **kwargs)
+
+        return ax
+
+    def _kde(self, ax=None, bw_method=None, ind=None, budget=None, **kwargs):
+
+        ax = ax or plt.gca()
+        ind, density = kde_curve(self.column, bw_method=bw_method, ind=ind, budget=budget)
+
+        ax.plot(ind, density, **kwargs)
+        ax.set_ylabel("Density")
+
+        return ax
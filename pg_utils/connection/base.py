@@ -1,5 +1,16 @@
 import os
-import psycopg2
+
+from lazy_property import LazyProperty
+
+from .pool import ConnectionPool
+from ..budget import Budget
+from ..cache import coerce_cache
+from ..dtypes import register_numeric_as_float
+from ..memory import MemoryBudget
+from .._lazy import lazy_import
+from ..instrumentation import InstrumentedCursor
+
+psycopg2 = lazy_import("psycopg2")
 
 __all__ = ["Connection"]
 
@@ -18,9 +29,15 @@ class Connection(object):
     :param str env_password: The name of the environment variable to use for your password.
     :param str env_hostname: The name of the environment variable to use for the hostname.
     :param str env_database: The name of the environment variable to use for the database.
+    :param None|pg_utils.instrumentation.Instrumentation instrumentation: If specified, every cursor created by this connection reports its timings to this object. See :mod:`pg_utils.instrumentation`.
+    :param None|float|pg_utils.budget.Budget budget: The default budget for methods that accept one (eg ``describe``). A plain number is taken to be a number of seconds. See :mod:`pg_utils.budget`.
+    :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The default memory budget for methods that fetch rows (eg ``head``). A plain number (or a string such as ``"4GB"``) is taken to be a number of bytes. See :mod:`pg_utils.memory`.
+    :param None|str|pg_utils.cache.ColumnCache column_cache: A local cache for the values of columns (see :attr:`pg_utils.column.Column.values`), shared by every process that uses the same directory. A string is taken to be the directory of the cache. Before each lookup, the table is scanned (without fetching its rows) for its number of rows and a sum of hashes of their ``ctid`` and ``xmin``, so that a change to it isn't missed. See :mod:`pg_utils.cache`.
+    :param bool numeric_as_float: Whether ``numeric`` values are decoded straight to floats (by a C-level typecaster), rather than to ``Decimal`` objects. This makes fetching them (and describing ``numeric`` columns) much faster, at the cost of any precision beyond that of a double. See :mod:`pg_utils.dtypes`.
     :param None|dict other_connection_kwargs: Other keyword arguments (if any) that you'd like to pass to the psycopg2 ``Connection`` object.
 
     :ivar psycopg2.extensions.connection connection: The resulting raw connection object.
+    :ivar ConnectionPool pool: A pool of extra connections (cloned from this one) used for work that's spread across several backends, eg parallel bulk loads.
 
     """
     def __init__(self, username=None, password=None,
@@ -29,14 +46,25 @@ class Connection(object):
                  env_password="pg_password",
                  env_hostname="pg_hostname",
                  env_database="pg_database",
+                 instrumentation=None,
+                 budget=None,
+                 memory_budget=None,
+                 column_cache=None,
+                 numeric_as_float=False,
                  **other_connection_kwargs):
 
         self.username = username or os.getenv(env_username)
         self.password = password or os.getenv(env_password)
         self.hostname = hostname or os.getenv(env_hostname)
         self.database = database or os.getenv(env_database)
+        self.instrumentation = instrumentation
+        self.budget = Budget.coerce(budget)
+        self.memory_budget = MemoryBudget.coerce(memory_budget)
+        self.column_cache = coerce_cache(column_cache)
+        self.numeric_as_float = numeric_as_float
 
         other_connection_kwargs = other_connection_kwargs or {}
+        self._connection_kwargs = dict(other_connection_kwargs)
 
         if not self.username or not self.password \
                 or not self.hostname or not self.database:
@@ -49,10 +77,39 @@ class Connection(object):
             password=self.password, host=self.hostname,
             **other_connection_kwargs)
 
+        if numeric_as_float:
+            register_numeric_as_float(self.connection)
+
+    def clone(self):
+        """
+        Opens a brand new connection to the same database with the same login information, instrumentation, budgets, column cache, decoding options, and extra ``psycopg2`` keyword arguments.
+
+        :return: The new connection.
+        :rtype: Connection
+        """
+        return Connection(username=self.username, password=self.password,
+                          hostname=self.hostname, database=self.database,
+                          instrumentation=self.instrumentation,
+                          budget=self.budget,
+                          memory_budget=self.memory_budget,
+                          column_cache=self.column_cache,
+                          numeric_as_float=self.numeric_as_float,
+                          **self._connection_kwargs)
+
+    @LazyProperty
+    def pool(self):
+        """
+        A :class:`ConnectionPool` of connections cloned from this one. Connections are only opened when they're first needed, and they're kept around for reuse afterwards.
+        """
+        return ConnectionPool(self)
+
     def close(self):
         """
-        A simple wrapper around the ``close`` method of the ``connection`` attribute.
+        A simple wrapper around the ``close`` method of the ``connection`` attribute. Any pooled connections are closed as well.
         """
+        if hasattr(self, "_pool"):
+            self._pool.closeall()
+
         self.connection.close()
 
     def rollback(self):
@@ -69,9 +126,14 @@ class Connection(object):
 
     def cursor(self, *args, **kwargs):
         """
-        A simple wrapper around the ``cursor`` factory method of the ``connection`` attribute.
+        A simple wrapper around the ``cursor`` factory method of the ``connection`` attribute. If this connection is instrumented, the cursor is wrapped in a :class:`pg_utils.instrumentation.InstrumentedCursor`.
         """
-        return self.connection.cursor(*args, **kwargs)
+        cursor = self.connection.cursor(*args, **kwargs)
+
+        if self.instrumentation is not None:
+            cursor = InstrumentedCursor(cursor, self.instrumentation)
+
+        return cursor
 
     def __del__(self):
         """
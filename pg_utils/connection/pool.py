@@ -0,0 +1,108 @@
+import threading
+from contextlib import contextmanager
+
+__all__ = ["ConnectionPool"]
+
+
+class ConnectionPool(object):
+    """
+    A simple, thread-safe pool of :class:`Connection` objects, each of which is cloned from a single parent connection.
+
+    Connections are opened lazily: a new one is only cloned when every existing connection is checked out (and the pool hasn't hit ``max_size``).
+
+    :param pg_utils.connection.Connection parent: The connection whose login information is used for every pooled connection.
+    :param None|int max_size: The maximum number of connections that may be open at once. If ``None``, the pool grows as needed.
+    """
+
+    def __init__(self, parent, max_size=None):
+
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size must be a positive integer or None (got {})".format(max_size))
+
+        self.parent = parent
+        self.max_size = max_size
+
+        self._idle = []
+        self._num_in_use = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        """
+        The number of connections currently held by the pool (idle or checked out).
+        """
+        return len(self._idle) + self._num_in_use
+
+    def getconn(self):
+        """
+        Checks out a connection, cloning a fresh one from the parent connection if none are idle. Blocks if the pool is at ``max_size``.
+
+        :return: A connection that must be handed back with :meth:`putconn`.
+        :rtype: pg_utils.connection.Connection
+        """
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    self._num_in_use += 1
+                    return self._idle.pop()
+
+                if self.max_size is None or self.size < self.max_size:
+                    self._num_in_use += 1
+                    break
+
+                self._condition.wait()
+
+        try:
+            return self.parent.clone()
+        except Exception:
+            with self._condition:
+                self._num_in_use -= 1
+                self._condition.notify()
+            raise
+
+    def putconn(self, conn, close=False):
+        """
+        Hands a connection back to the pool. Any transaction that's still open on it is rolled back.
+
+        :param pg_utils.connection.Connection conn: A connection obtained from :meth:`getconn`.
+        :param bool close: If enabled, the connection is closed rather than kept around for reuse.
+        """
+
+        if not close and not conn.connection.closed:
+            try:
+                conn.rollback()
+            except Exception:
+                close = True
+
+        with self._condition:
+            self._num_in_use -= 1
+
+            if close or conn.connection.closed:
+                conn.close()
+            else:
+                self._idle.append(conn)
+
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        A context manager that checks out a connection and hands it back (via :meth:`putconn`) afterwards.
+        """
+
+        conn = self.getconn()
+
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """
+        Closes every idle connection in the pool.
+        """
+
+        with self._condition:
+            while self._idle:
+                self._idle.pop().close()
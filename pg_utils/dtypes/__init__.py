@@ -0,0 +1,5 @@
+"""
+Typed decoding of query results: every fetch method of pg-utils builds its arrays and DataFrames with dtypes derived from the PostgreSQL data types of the columns involved.
+"""
+from .base import kind, numpy_dtype, aggregate_type, register_numeric_as_float, to_array, typed_frame, fetch_array, \
+    fetch_frame, fetch_matrix, decode_matrix
@@ -0,0 +1,337 @@
+import datetime
+import io
+import struct
+
+from .. import numeric_datatypes
+from .._lazy import lazy_import
+from ..instrumentation.base import measure_frame
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+extensions = lazy_import("psycopg2.extensions")
+
+__all__ = ["kind", "numpy_dtype", "aggregate_type", "register_numeric_as_float", "to_array", "typed_frame",
+           "fetch_array", "fetch_frame", "fetch_matrix", "decode_matrix"]
+
+# integer and serial columns are int64, as pandas has always inferred them (so that results still compare equal to
+# frames built from Python ints)
+_integer_dtypes = {
+    "smallint": ("int16", "Int16"),
+    "smallserial": ("int16", "Int16"),
+    "integer": ("int64", "Int64"),
+    "serial": ("int64", "Int64"),
+    "bigint": ("int64", "Int64"),
+    "bigserial": ("int64", "Int64"),
+}
+
+_float_dtypes = {
+    "real": "float32",
+    "double precision": "float64",
+    "float": "float64",
+}
+
+_decimal_types = ["numeric", "decimal"]
+
+_timestamp_types = ["timestamp without time zone", "timestamp"]
+
+_timestamptz_types = ["timestamp with time zone", "timestamptz"]
+
+_boolean_types = ["boolean"]
+
+_utc = datetime.timezone.utc
+
+_min_timestamp = datetime.datetime(1677, 9, 22)
+_max_timestamp = datetime.datetime(2262, 4, 11)
+
+_temporal_types = ["date", "time", "time without time zone", "time with time zone", "interval"] + \
+    _timestamp_types + _timestamptz_types
+
+# types whose values can be compared for equality and sorted (for counting distinct values and finding the most common),
+# and whose most common value is decoded to a string that can be compared with them again (unlike bytea's memoryviews)
+_text_types = ["text", "character varying", "varchar", "character", "char", "bpchar", "name", "citext", "uuid",
+               "inet", "cidr", "macaddr"]
+
+# the OID of numeric[] (psycopg2 doesn't expose a typecaster for it)
+_numeric_array_oid = 1231
+
+# the (big-endian) dtypes of the elements of arrays in binary COPY output, by the OID of the element type
+_binary_element_dtypes = {
+    21: ">i2",
+    23: ">i4",
+    20: ">i8",
+    700: ">f4",
+    701: ">f8",
+}
+
+_copy_signature = b"PGCOPY\n\xff\r\n\x00"
+
+
+def kind(data_type):
+    """
+    The kind of a PostgreSQL data type, which determines how columns of that type are described: ``"number"``, ``"text"``, ``"temporal"`` (dates, times, timestamps, and intervals), ``"boolean"``, ``"array"``, or ``"other"`` (eg ``json``, for which only the count is taken).
+
+    :param str data_type: The data type (as in :attr:`pg_utils.table.Table.column_data_types`).
+    :rtype: str
+    """
+
+    if data_type.endswith("[]"):
+        return "array"
+
+    if data_type in numeric_datatypes:
+        return "number"
+
+    if data_type in _boolean_types:
+        return "boolean"
+
+    if data_type in _temporal_types:
+        return "temporal"
+
+    if data_type in _text_types:
+        return "text"
+
+    return "other"
+
+
+def numpy_dtype(data_type, nullable=False, numeric_as_float=False):
+    """
+    The dtype used for values of a given PostgreSQL data type (or ``None`` for those kept as Python objects).
+
+    :param str data_type: The data type (as in :attr:`pg_utils.table.Table.column_data_types`).
+    :param bool nullable: Whether there are nulls. Integer and boolean columns with nulls use the pandas nullable dtypes (eg ``Int64``).
+    :param bool numeric_as_float: Whether ``numeric`` values are converted to ``float64``.
+    :rtype: None|str
+    """
+
+    if data_type in _integer_dtypes:
+        return _integer_dtypes[data_type][1 if nullable else 0]
+
+    if data_type in _float_dtypes:
+        return _float_dtypes[data_type]
+
+    if data_type in _decimal_types:
+        return "float64" if numeric_as_float else None
+
+    if data_type in _boolean_types:
+        return "boolean" if nullable else "bool"
+
+    if data_type in _timestamp_types:
+        return "datetime64[ns]"
+
+    if data_type in _timestamptz_types:
+        return "datetime64[ns, UTC]"
+
+    return None
+
+
+def aggregate_type(how, data_type):
+    """
+    The PostgreSQL data type of an aggregate of a column (as computed by :func:`pg_utils.sql.queries.resample` and :func:`pg_utils.sql.queries.rolling`).
+
+    :param str how: The aggregate (eg ``"mean"``, ``"sum"``, or ``"count"``).
+    :param str data_type: The data type of the column.
+    :rtype: str
+    """
+
+    if how in ["count", "nunique"]:
+        return "bigint"
+
+    if how in ["min", "max"]:
+        return data_type
+
+    if how == "sum":
+        return {"smallint": "bigint", "integer": "bigint", "bigint": "numeric"}.get(data_type, data_type)
+
+    return "double precision"
+
+
+def register_numeric_as_float(connection):
+    """
+    Registers (C-level) typecasters on a raw psycopg2 connection so that ``numeric`` values (and arrays of them) are decoded straight to floats, rather than to ``Decimal`` objects. This is lossy for values with more than about 15 significant digits.
+
+    :param psycopg2.extensions.connection connection: The raw connection.
+    """
+
+    numeric = extensions.new_type(extensions.DECIMAL.values, "PG_UTILS_NUMERIC_AS_FLOAT", extensions.FLOAT)
+    numeric_array = extensions.new_array_type((_numeric_array_oid,), "PG_UTILS_NUMERIC_AS_FLOAT[]", numeric)
+
+    extensions.register_type(numeric, connection)
+    extensions.register_type(numeric_array, connection)
+
+
+def to_array(values, data_type, numeric_as_float=False):
+    """
+    Builds a typed array out of a list of decoded values of the given data type (see :func:`numpy_dtype`). Nulls become ``NaN``, ``NaT``, or ``<NA>`` as appropriate. Values of other data types are handed to ``numpy.array`` as they are.
+
+    :param list values: The values.
+    :param str data_type: Their data type.
+    :param bool numeric_as_float: Whether ``numeric`` values are converted to ``float64``.
+    :rtype: numpy.ndarray|pandas.api.extensions.ExtensionArray
+    """
+
+    if data_type in _integer_dtypes or data_type in _boolean_types:
+        nullable = any(v is None for v in values)
+        dtype = numpy_dtype(data_type, nullable=nullable)
+
+        return pd.array(values, dtype=dtype) if nullable else np.array(values, dtype=dtype)
+
+    if data_type in _timestamp_types or data_type in _timestamptz_types:
+        return _timestamps(values, data_type in _timestamptz_types)
+
+    dtype = numpy_dtype(data_type, numeric_as_float=numeric_as_float)
+
+    if dtype is not None:
+        return np.array(values, dtype=dtype)
+
+    return np.array(values)
+
+
+def _timestamps(values, utc):
+
+    # PostgreSQL timestamps have a resolution of microseconds, and so always fit in datetime64[us]...
+    if utc:
+        values = [None if v is None else v.astimezone(_utc).replace(tzinfo=None) for v in values]
+
+    timestamps = np.array(values, dtype="datetime64[us]")
+    present = timestamps[~np.isnat(timestamps)]
+
+    # ...but not always in datetime64[ns], whose range is about 1677 - 2262: out of that range, they're left as they are
+    if len(present) and (present.min() < _min_timestamp or present.max() > _max_timestamp):
+        return np.array(values, dtype=object)
+
+    timestamps = timestamps.astype("datetime64[ns]")
+
+    return pd.DatetimeIndex(timestamps).tz_localize("UTC").array if utc else timestamps
+
+
+def typed_frame(rows, columns, data_types, numeric_as_float=False):
+    """
+    Builds a DataFrame out of fetched rows, typing each column with :func:`to_array`.
+
+    :param list[tuple] rows: The rows.
+    :param list[str] columns: The names of the columns.
+    :param dict data_types: The data type of each column, by name.
+    :param bool numeric_as_float: Whether ``numeric`` values are converted to ``float64``.
+    :rtype: pandas.DataFrame
+    """
+
+    values = list(zip(*rows)) if rows else [[] for _ in columns]
+
+    return pd.DataFrame(
+        {column: to_array(list(v), data_types.get(column), numeric_as_float)
+         for column, v in zip(columns, values)},
+        columns=list(columns)
+    )
+
+
+def fetch_array(conn, query, data_type):
+    """
+    Runs a query returning a single column, and fetches the result as a typed array (see :func:`to_array`).
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :param str data_type: The data type of the column.
+    :rtype: numpy.ndarray|pandas.api.extensions.ExtensionArray
+    """
+
+    cur = conn.cursor()
+    cur.execute(query)
+    rows = cur.fetchall()
+
+    with measure_frame(conn):
+        return to_array([row[0] for row in rows], data_type, getattr(conn, "numeric_as_float", False))
+
+
+def fetch_frame(conn, query, columns, data_types):
+    """
+    Runs a query and fetches the result as a DataFrame with typed columns (see :func:`typed_frame`).
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :param list[str] columns: The names of the columns of the result.
+    :param dict data_types: The data type of each column, by name.
+    :rtype: pandas.DataFrame
+    """
+
+    cur = conn.cursor()
+    cur.execute(query)
+    rows = cur.fetchall()
+
+    with measure_frame(conn):
+        return typed_frame(rows, columns, data_types, getattr(conn, "numeric_as_float", False))
+
+
+def fetch_matrix(conn, query):
+    """
+    Runs a query returning a single column of one-dimensional numeric arrays that all have the same length (eg embeddings), and fetches the result as a 2-D NumPy array with a row for each row of the result.
+
+    The result is fetched with ``COPY ... TO STDOUT`` in PostgreSQL's binary format, which is decoded straight into the array (see :func:`decode_matrix`), so that no Python objects are created for the rows or their elements. The arrays must hold ``smallint``, ``integer``, ``bigint``, ``real``, or ``double precision`` values (``numeric`` arrays should be cast to ``double precision[]`` by the query).
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :rtype: numpy.ndarray
+    :raises ValueError: If the arrays differ in length or dimensions, or hold nulls (or are null).
+    """
+
+    buf = io.BytesIO()
+    conn.cursor().copy_expert("copy ({}) to stdout with (format binary)".format(query), buf)
+
+    with measure_frame(conn):
+        return decode_matrix(buf.getvalue())
+
+
+def decode_matrix(data):
+    """
+    Decodes the output of a binary ``COPY`` of a single column of one-dimensional numeric arrays of the same length into a 2-D NumPy array (see :func:`fetch_matrix`).
+
+    Every row then has the same layout, so the rows are read in one go as a NumPy structured array, and checked against the layout of the first one.
+
+    :param bytes data: The output of the ``COPY``.
+    :rtype: numpy.ndarray
+    :raises ValueError: If the arrays differ in length or dimensions, or hold nulls (or are null), or aren't of a supported type.
+    """
+
+    if not data.startswith(_copy_signature):
+        raise ValueError("Not the output of a binary COPY")
+
+    extension_length, = struct.unpack_from(">i", data, len(_copy_signature) + 4)
+    start = len(_copy_signature) + 8 + extension_length
+
+    # the rows are followed by a trailer of -1 (as a 16 bit integer)
+    body = data[start:-2]
+
+    if not body:
+        return np.empty((0, 0))
+
+    fields, length = struct.unpack_from(">hi", body)
+
+    if fields != 1:
+        raise ValueError("Expected a single column, got {}".format(fields))
+
+    if length < 0:
+        raise ValueError("Unable to decode a null array into a matrix")
+
+    ndim, has_nulls, oid = struct.unpack_from(">iii", body, 6)
+
+    if ndim != 1:
+        raise ValueError("Only one-dimensional arrays can be decoded into a matrix (got {} dimensions)".format(ndim))
+
+    if oid not in _binary_element_dtypes:
+        raise ValueError("Unable to decode arrays of elements with the type OID {}".format(oid))
+
+    size, = struct.unpack_from(">i", body, 18)
+    element = np.dtype(_binary_element_dtypes[oid])
+
+    row = np.dtype([("fields", ">i2"), ("length", ">i4"), ("ndim", ">i4"), ("has_nulls", ">i4"), ("oid", ">i4"),
+                    ("size", ">i4"), ("lbound", ">i4"), ("values", [("length", ">i4"), ("value", element)], (size,))])
+
+    if len(body) % row.itemsize:
+        raise ValueError("The arrays don't all have the same length")
+
+    rows = np.frombuffer(body, dtype=row)
+
+    if not ((rows["fields"] == 1).all() and (rows["length"] == length).all() and (rows["ndim"] == 1).all() and
+            (rows["has_nulls"] == 0).all() and (rows["oid"] == oid).all() and (rows["size"] == size).all() and
+            (rows["values"]["length"] == element.itemsize).all()):
+        raise ValueError("The arrays don't all have the same length, or hold nulls")
+
+    return rows["values"]["value"].astype(element.newbyteorder("="))
@@ -8,3 +8,32 @@ class NoSuchColumnError(Exception):
     """
     Thrown when trying to specify a column that doesn't exist in a table.
     """
+
+class BulkLoadError(Exception):
+    """
+    Thrown when one or more chunks of a parallel bulk load fail.
+
+    :ivar pandas.DataFrame report: The per-chunk report of the load (including the error, if any, for each chunk).
+    """
+
+    def __init__(self, message, report=None):
+        super(BulkLoadError, self).__init__(message)
+        self.report = report
+
+class BudgetExceededError(Exception):
+    """
+    Thrown when a statement can't be run within its :class:`pg_utils.budget.Budget`: either its estimated cost is over the budget (and approximate results weren't allowed), or the server cancelled it at the budget's ``statement_timeout``.
+    """
+
+class MemoryBudgetExceededError(Exception):
+    """
+    Thrown when the estimated size of a result is over the :class:`pg_utils.memory.MemoryBudget` of the call, and the budget's policy is ``"raise"`` (or ``"spill"``, but some of the columns can't be spilled).
+
+    :ivar int estimated_rows: The estimated number of rows of the result.
+    :ivar int estimated_bytes: The estimated size of the result in memory, in bytes.
+    """
+
+    def __init__(self, message, estimated_rows=None, estimated_bytes=None):
+        super(MemoryBudgetExceededError, self).__init__(message)
+        self.estimated_rows = estimated_rows
+        self.estimated_bytes = estimated_bytes
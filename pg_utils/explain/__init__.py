@@ -0,0 +1,4 @@
+"""
+Helpers for running ``EXPLAIN`` on the statements that pg-utils generates, and for summarizing the resulting plans.
+"""
+from .base import explain, summarize_plan, explain_frame, is_read_only
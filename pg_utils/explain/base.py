@@ -0,0 +1,120 @@
+import json
+import re
+
+__all__ = ["explain", "summarize_plan", "explain_frame", "is_read_only"]
+
+_read_only = re.compile(r"^\s*(select|with|values|table)\b", re.IGNORECASE)
+_writes = re.compile(r"\b(insert|update|delete|merge|into|copy|create|drop|alter|truncate)\b", re.IGNORECASE)
+
+
+def is_read_only(sql):
+    """
+    A conservative check of whether a statement only reads data (and so is safe to run again under ``EXPLAIN ANALYZE``).
+
+    :param str sql: The statement.
+    :rtype: bool
+    """
+
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf8", "replace")
+
+    return bool(_read_only.match(sql)) and not _writes.search(sql)
+
+
+def explain(cursor, sql, params=None, analyze=False, buffers=False, verbose=False):
+    """
+    Runs ``EXPLAIN (FORMAT JSON)`` on a statement.
+
+    :param cursor: A cursor to run the ``EXPLAIN`` with.
+    :param str sql: The statement to explain.
+    :param None|tuple|dict params: Query parameters for the statement (if any).
+    :param bool analyze: Whether to actually run the statement (ie ``EXPLAIN ANALYZE``).
+    :param bool buffers: Whether to include buffer usage (only used if ``analyze`` is enabled).
+    :param bool verbose: Whether to include the details of ``EXPLAIN VERBOSE`` (eg the ``Schema`` of each scanned relation).
+    :return: The (parsed) JSON plan, ie a dictionary with a ``"Plan"`` key.
+    :rtype: dict
+    """
+
+    options = ["format json"]
+
+    if analyze:
+        options.append("analyze")
+
+        if buffers:
+            options.append("buffers")
+
+    if verbose:
+        options.append("verbose")
+
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf8")
+
+    cursor.execute("explain ({}) {}".format(", ".join(options), sql), params)
+
+    plan = cursor.fetchone()[0]
+
+    if not isinstance(plan, (list, dict)):
+        plan = json.loads(plan)
+
+    return plan[0] if isinstance(plan, list) else plan
+
+
+def _walk(node):
+
+    yield node
+
+    for child in node.get("Plans", []):
+        for descendant in _walk(child):
+            yield descendant
+
+
+def summarize_plan(plan):
+    """
+    Pulls the most useful estimates (and, for ``EXPLAIN ANALYZE``, actual measurements) out of a JSON plan.
+
+    :param dict plan: A plan as returned by :func:`explain`.
+    :return: A dictionary with the keys ``startup_cost``, ``total_cost``, ``plan_rows``, ``plan_width``, ``node_types``, ``sort_methods``, ``actual_rows``, and ``execution_time``.
+    :rtype: dict
+    """
+
+    root = plan["Plan"]
+    nodes = list(_walk(root))
+
+    return {
+        "startup_cost": root.get("Startup Cost"),
+        "total_cost": root.get("Total Cost"),
+        "plan_rows": root.get("Plan Rows"),
+        "plan_width": root.get("Plan Width"),
+        "node_types": [n["Node Type"] for n in nodes],
+        "sort_methods": [n["Sort Method"] for n in nodes if "Sort Method" in n],
+        "actual_rows": root.get("Actual Rows"),
+        "execution_time": plan.get("Execution Time")
+    }
+
+
+def explain_frame(conn, statements, analyze=False, buffers=False):
+    """
+    Explains several statements, returning a DataFrame with one row per statement (see :meth:`pg_utils.table.Table.explain`).
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param list[str] statements: The statements to explain.
+    :param bool analyze: Whether to actually run the statements.
+    :param bool buffers: Whether to include buffer usage (only used if ``analyze`` is enabled).
+    :rtype: pandas.DataFrame
+    """
+
+    import pandas as pd
+
+    cur = conn.cursor()
+    rows = []
+
+    for sql in statements:
+        plan = explain(cur, sql, analyze=analyze, buffers=buffers)
+        row = summarize_plan(plan)
+        row.update({"sql": sql, "plan": plan})
+        rows.append(row)
+
+    columns = ["sql", "startup_cost", "total_cost", "plan_rows", "plan_width",
+               "node_types", "sort_methods", "actual_rows", "execution_time", "plan"]
+
+    return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,19 @@
+"""
+This package records what pg-utils spends its time on: for each call of a ``Table``/``Column`` method, the queries it ran, how long the database took to execute them, how long fetching and decoding the results took, how long building the resulting DataFrames (or arrays) took, and how many rows and bytes were transferred.
+
+Instrumentation is enabled per connection:
+
+::
+
+    In [1]: from pg_utils import connection, instrumentation, table
+
+    In [2]: conn = connection.Connection(instrumentation=instrumentation.Instrumentation())
+
+    In [3]: t = table.Table("foo", conn=conn)
+
+    In [4]: t.describe()
+
+    In [5]: print(instrumentation.registry.to_prometheus())
+"""
+from .base import *
+from .registry import *
@@ -0,0 +1,516 @@
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from ..explain import explain, is_read_only
+from .registry import registry as default_registry
+
+__all__ = ["Instrumentation", "InstrumentedCursor", "CallRecord", "QueryRecord", "fingerprint"]
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?(?![\w.])", re.IGNORECASE)
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Normalizes a SQL statement by replacing literals with ``?`` and collapsing whitespace, so that statements differing only by their literals look the same.
+
+    :param str sql: The SQL statement.
+    :rtype: str
+    """
+
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf8", "replace")
+
+    sql = _string_literal.sub("?", str(sql))
+    sql = _number_literal.sub("?", sql)
+
+    return _whitespace.sub(" ", sql).strip().lower()
+
+
+def fingerprint(sql):
+    """
+    A short hash identifying the shape of a SQL statement (see :func:`normalize_sql`).
+
+    :param str sql: The SQL statement.
+    :rtype: str
+    """
+    return hashlib.md5(normalize_sql(sql).encode("utf8")).hexdigest()[:16]
+
+
+class QueryRecord(object):
+    """
+    Timings and sizes of a single statement executed by pg-utils.
+
+    :ivar str sql: The SQL of the statement (or ``None`` if SQL capture is disabled).
+    :ivar str fingerprint: See :func:`fingerprint`.
+    :ivar float execute_time: Seconds spent in ``execute`` (ie by the server, plus the transfer of the results for client-side cursors).
+    :ivar float fetch_time: Seconds spent fetching and decoding the results into Python objects.
+    :ivar None|int rows: The number of rows returned or affected.
+    :ivar int bytes: The number of bytes transferred by ``COPY`` statements.
+    :ivar None|dict plan: The ``EXPLAIN (ANALYZE, BUFFERS)`` plan of the statement, if it was captured as a slow query.
+    :ivar None|str plan_error: The error raised while capturing the plan (if any).
+    """
+
+    def __init__(self, sql, capture_sql=True):
+        self.sql = sql if capture_sql else None
+        self.fingerprint = fingerprint(sql)
+        self.execute_time = 0.0
+        self.fetch_time = 0.0
+        self.rows = None
+        self.bytes = 0
+        self.plan = None
+        self.plan_error = None
+
+    def to_dict(self):
+        return {
+            "sql": self.sql,
+            "fingerprint": self.fingerprint,
+            "execute_time": self.execute_time,
+            "fetch_time": self.fetch_time,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "plan": self.plan,
+            "plan_error": self.plan_error
+        }
+
+
+class CallRecord(object):
+    """
+    Everything recorded during a single call of a pg-utils method.
+
+    :ivar str method: The name of the method (eg ``"Table.describe"``).
+    :ivar list[QueryRecord] queries: The statements executed during the call.
+    :ivar float started: The time (as a UNIX timestamp) at which the call started.
+    :ivar None|float total_time: The number of seconds the call took (``None`` while it's still running).
+    :ivar float frame_time: Seconds spent building DataFrames and arrays out of the fetched rows.
+    :ivar int cache_hits: The number of lookups served from a local cache.
+    :ivar int cache_misses: The number of lookups that missed a local cache.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.queries = []
+        self.started = time.time()
+        self.total_time = None
+        self.frame_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def execute_time(self):
+        return sum(q.execute_time for q in self.queries)
+
+    @property
+    def fetch_time(self):
+        return sum(q.fetch_time for q in self.queries)
+
+    @property
+    def rows(self):
+        return sum(q.rows or 0 for q in self.queries)
+
+    @property
+    def bytes(self):
+        return sum(q.bytes for q in self.queries)
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "started": self.started,
+            "total_time": self.total_time,
+            "execute_time": self.execute_time,
+            "fetch_time": self.fetch_time,
+            "frame_time": self.frame_time,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "queries": [q.to_dict() for q in self.queries]
+        }
+
+    def __repr__(self):
+        return "<CallRecord '{}' ({} queries, {:.3f}s)>".format(
+            self.method, len(self.queries), self.total_time or 0.0)
+
+
+class Instrumentation(object):
+    """
+    Collects a :class:`CallRecord` for every (outermost) call of a pg-utils method made through a connection, and feeds them into a :class:`pg_utils.instrumentation.MetricsRegistry`. Pass an instance of this class as the ``instrumentation`` argument of :class:`pg_utils.connection.Connection`.
+
+    The following metrics are maintained (each labeled by ``method``):
+
+    * Histograms ``pg_utils_call_seconds``, ``pg_utils_call_execute_seconds``, ``pg_utils_call_fetch_seconds``, and ``pg_utils_call_frame_seconds``.
+    * Counters ``pg_utils_calls_total``, ``pg_utils_queries_total``, ``pg_utils_rows_total``, ``pg_utils_bytes_total``, ``pg_utils_cache_hits_total``, and ``pg_utils_cache_misses_total``.
+
+    Statements executed outside of any pg-utils method (eg via ``conn.cursor()`` directly) are counted with an empty ``method`` label, but no record is kept.
+
+    If ``slow_query_threshold`` is given, then every read-only statement whose execution takes longer than that many seconds is run again under ``EXPLAIN (ANALYZE, BUFFERS)`` (inside of a savepoint, so a failure doesn't abort the surrounding transaction), and the plan is stored as the ``plan`` of its :class:`QueryRecord`. The ``pg_utils_slow_queries_total`` counter is incremented for each such statement. Note that this doubles the cost of slow statements.
+
+    :param None|MetricsRegistry registry: The registry to use. If not specified, the module-level ``registry`` is used.
+    :param bool capture_sql: Whether to keep the SQL of each statement in the records (fingerprints are always kept).
+    :param int max_records: The number of most recent call records to keep in :attr:`records`.
+    :param None|list hooks: Callables that are passed each :class:`CallRecord` once its call finishes.
+    :param None|float slow_query_threshold: The number of seconds after which a statement's plan is captured (or ``None`` to never capture plans).
+
+    :ivar collections.deque records: The most recent call records.
+    """
+
+    def __init__(self, registry=None, capture_sql=True, max_records=1000, hooks=None,
+                 slow_query_threshold=None):
+        self.registry = registry or default_registry
+        self.slow_query_threshold = slow_query_threshold
+        self.capture_sql = capture_sql
+        self.records = deque(maxlen=max_records)
+        self.hooks = list(hooks or [])
+        self._local = threading.local()
+
+    def add_hook(self, hook):
+        """
+        Registers a callable to be passed each :class:`CallRecord` once its call finishes.
+        """
+        self.hooks.append(hook)
+
+    @property
+    def current(self):
+        """
+        The record of the pg-utils method call currently running in this thread (or ``None``).
+
+        :rtype: None|CallRecord
+        """
+        stack = getattr(self._local, "stack", None)
+        return stack[0] if stack else None
+
+    @contextmanager
+    def call(self, method):
+        """
+        A context manager wrapping a call of a pg-utils method. Nested calls are folded into the outermost one.
+
+        :param str method: The name of the method.
+        """
+
+        stack = getattr(self._local, "stack", None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        if stack:
+            stack.append(stack[0])
+            try:
+                yield stack[0]
+            finally:
+                stack.pop()
+            return
+
+        record = CallRecord(method)
+        stack.append(record)
+        began = time.time()
+
+        try:
+            yield record
+        finally:
+            record.total_time = time.time() - began
+            stack.pop()
+            self._finish(record)
+
+    def _finish(self, record):
+
+        labels = {"method": record.method}
+        r = self.registry
+
+        r.histogram("pg_utils_call_seconds", "Wall time of pg-utils method calls").observe(
+            record.total_time, **labels)
+        r.histogram("pg_utils_call_execute_seconds", "Time spent executing statements").observe(
+            record.execute_time, **labels)
+        r.histogram("pg_utils_call_fetch_seconds", "Time spent fetching and decoding results").observe(
+            record.fetch_time, **labels)
+        r.histogram("pg_utils_call_frame_seconds", "Time spent building DataFrames and arrays").observe(
+            record.frame_time, **labels)
+        r.counter("pg_utils_calls_total", "Number of pg-utils method calls").inc(**labels)
+        r.counter("pg_utils_cache_hits_total", "Number of local cache hits").inc(record.cache_hits, **labels)
+        r.counter("pg_utils_cache_misses_total", "Number of local cache misses").inc(record.cache_misses, **labels)
+
+        self.records.append(record)
+
+        for hook in self.hooks:
+            hook(record)
+
+    def _query_finished(self, query):
+
+        current = self.current
+        labels = {"method": current.method if current is not None else ""}
+
+        self.registry.counter("pg_utils_queries_total", "Number of statements executed").inc(**labels)
+        self.registry.counter("pg_utils_rows_total", "Number of rows returned or affected").inc(
+            max(query.rows or 0, 0), **labels)
+        self.registry.counter("pg_utils_bytes_total", "Number of bytes transferred by COPY").inc(
+            query.bytes, **labels)
+
+    def _query_started(self, sql):
+
+        query = QueryRecord(sql, capture_sql=self.capture_sql)
+        current = self.current
+
+        if current is not None:
+            current.queries.append(query)
+
+        return query
+
+    def _capture_plan(self, cursor, query, sql, params):
+
+        if self.slow_query_threshold is None or query.execute_time < self.slow_query_threshold:
+            return
+
+        if getattr(cursor, "name", None) or not is_read_only(sql):
+            return
+
+        self.registry.counter("pg_utils_slow_queries_total", "Number of statements over the slow query threshold").inc(
+            method=self.current.method if self.current is not None else "")
+
+        raw_conn = cursor.connection
+        use_savepoint = not raw_conn.autocommit
+        explain_cur = raw_conn.cursor()
+
+        try:
+            if use_savepoint:
+                explain_cur.execute("savepoint pg_utils_explain")
+
+            query.plan = explain(explain_cur, sql, params, analyze=True, buffers=True)
+
+            if use_savepoint:
+                explain_cur.execute("release savepoint pg_utils_explain")
+
+        except Exception as e:
+            query.plan_error = str(e)
+
+            if use_savepoint:
+                try:
+                    explain_cur.execute("rollback to savepoint pg_utils_explain")
+                except Exception:
+                    pass
+        finally:
+            explain_cur.close()
+
+    def record_cache(self, hit):
+        """
+        Counts a lookup in a local cache against the current call.
+
+        :param bool hit: Whether the lookup was a hit.
+        """
+
+        current = self.current
+
+        if current is None:
+            return
+
+        if hit:
+            current.cache_hits += 1
+        else:
+            current.cache_misses += 1
+
+    def to_dicts(self):
+        """
+        :return: The most recent call records, as dictionaries.
+        :rtype: list[dict]
+        """
+        return [r.to_dict() for r in list(self.records)]
+
+
+class _CountingFile(object):
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes = 0
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self.bytes += len(data)
+        return data
+
+    def readline(self, *args):
+        data = self._f.readline(*args)
+        self.bytes += len(data)
+        return data
+
+    def write(self, data):
+        self.bytes += len(data)
+        return self._f.write(data)
+
+
+class InstrumentedCursor(object):
+    """
+    A wrapper around a DB-API cursor that times ``execute``, the ``fetch*`` methods, and ``copy_expert``, reporting to an :class:`Instrumentation` object. Everything else is passed through to the wrapped cursor.
+    """
+
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+        self._query = None
+
+    def execute(self, query, *args, **kwargs):
+
+        record = self._query = self._instrumentation._query_started(query)
+        began = time.time()
+
+        try:
+            result = self._cursor.execute(query, *args, **kwargs)
+        finally:
+            record.execute_time += time.time() - began
+            record.rows = self._cursor.rowcount
+            self._instrumentation._query_finished(record)
+
+        self._instrumentation._capture_plan(self._cursor, record, query, args[0] if args else kwargs.get("vars"))
+
+        return result
+
+    def copy_expert(self, sql, file, *args, **kwargs):
+
+        record = self._query = self._instrumentation._query_started(sql)
+        counting_file = _CountingFile(file)
+        began = time.time()
+
+        try:
+            return self._cursor.copy_expert(sql, counting_file, *args, **kwargs)
+        finally:
+            record.execute_time += time.time() - began
+            record.rows = self._cursor.rowcount
+            record.bytes = counting_file.bytes
+            self._instrumentation._query_finished(record)
+
+    def _fetch(self, method, *args):
+
+        began = time.time()
+
+        try:
+            return getattr(self._cursor, method)(*args)
+        finally:
+            if self._query is not None:
+                self._query.fetch_time += time.time() - began
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchmany(self, *args):
+        return self._fetch("fetchmany", *args)
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def __iter__(self):
+
+        size = getattr(self._cursor, "itersize", None) or getattr(self._cursor, "arraysize", 1) or 1
+
+        while True:
+            rows = self.fetchmany(size)
+
+            if not rows:
+                return
+
+            for row in rows:
+                yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, item):
+        return getattr(self._cursor, item)
+
+    def __setattr__(self, key, value):
+
+        if key.startswith("_"):
+            object.__setattr__(self, key, value)
+        else:
+            setattr(self._cursor, key, value)
+
+
+def _connection_of(obj):
+
+    conn = getattr(obj, "conn", None)
+
+    if conn is None and hasattr(obj, "parent_table"):
+        conn = getattr(obj.parent_table, "conn", None)
+
+    return conn
+
+
+def _instrumentation_of(obj):
+    return getattr(_connection_of(obj), "instrumentation", None)
+
+
+def instrumented(f=None, name=None):
+    """
+    A decorator that records each call of a method (or of a function whose first argument is a ``Table`` or ``Column``) with the :class:`Instrumentation` of the connection involved (if any). The recorded name is ``"ClassName.method_name"`` unless ``name`` is given.
+    """
+
+    if f is None:
+        return lambda g: instrumented(g, name=name)
+
+    @wraps(f)
+    def decorator(obj, *args, **kwargs):
+
+        instrumentation = _instrumentation_of(obj)
+
+        if instrumentation is None:
+            return f(obj, *args, **kwargs)
+
+        with instrumentation.call(name or "{}.{}".format(obj.__class__.__name__, f.__name__)):
+            return f(obj, *args, **kwargs)
+
+    return decorator
+
+
+@contextmanager
+def measure_frame(conn):
+    """
+    A context manager that attributes the time spent inside of it (less any time spent executing and fetching, which is recorded separately) to building DataFrames and arrays.
+
+    :param pg_utils.connection.Connection conn: The connection whose instrumentation (if any) is used.
+    """
+
+    instrumentation = getattr(conn, "instrumentation", None)
+    current = instrumentation.current if instrumentation is not None else None
+
+    if current is None:
+        yield
+        return
+
+    began = time.time()
+    database_time = current.execute_time + current.fetch_time
+
+    try:
+        yield
+    finally:
+        elapsed = time.time() - began
+        current.frame_time += max(elapsed - (current.execute_time + current.fetch_time - database_time), 0.0)
+
+
+def record_cache(conn, hit):
+    """
+    Counts a local cache lookup against the current call (if the connection is instrumented).
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param bool hit: Whether the lookup was a hit.
+    """
+
+    instrumentation = getattr(conn, "instrumentation", None)
+
+    if instrumentation is not None:
+        instrumentation.record_cache(hit)
+
+
+def read_sql(query, conn, **read_sql_kwargs):
+    """
+    A wrapper around ``pandas.read_sql`` that records the time spent building the DataFrame (see :func:`measure_frame`).
+    """
+
+    import pandas as pd
+
+    with measure_frame(conn):
+        return pd.read_sql(query, conn, **read_sql_kwargs)
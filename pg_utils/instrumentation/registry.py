@@ -0,0 +1,255 @@
+import json
+import threading
+from collections import defaultdict
+
+__all__ = ["Counter", "Histogram", "MetricsRegistry", "registry"]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+
+    pairs = list(key) + list(extra or [])
+
+    if not pairs:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    return "{" + ",".join(["{}=\"{}\"".format(k, escape(v)) for k, v in pairs]) + "}"
+
+
+class Counter(object):
+    """
+    A monotonically increasing value (eg the total number of rows fetched), kept separately for each combination of labels.
+
+    :param str name: The name of the metric.
+    :param str documentation: A short description of the metric.
+    """
+
+    type_ = "counter"
+
+    def __init__(self, name, documentation=""):
+        self.name = name
+        self.documentation = documentation
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter for the given labels.
+        """
+
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts (got {})".format(amount))
+
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def value(self, **labels):
+        """
+        The current value of the counter for the given labels.
+        """
+        return self._values.get(_label_key(labels), 0.0)
+
+    def to_dict(self):
+
+        with self._lock:
+            return {
+                "type": self.type_,
+                "documentation": self.documentation,
+                "samples": [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+            }
+
+    def to_prometheus(self):
+
+        with self._lock:
+            return ["{}{} {}".format(self.name, _format_labels(key), repr(float(value)))
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram(object):
+    """
+    Counts observations (eg durations in seconds) in cumulative buckets, kept separately for each combination of labels.
+
+    :param str name: The name of the metric.
+    :param str documentation: A short description of the metric.
+    :param None|list[float] buckets: The upper bounds of the buckets. If not specified, :attr:`default_buckets` is used.
+    """
+
+    type_ = "histogram"
+
+    default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+    def __init__(self, name, documentation="", buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets or self.default_buckets))
+        self._counts = {}
+        self._sums = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records an observation for the given labels.
+        """
+
+        key = _label_key(labels)
+
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+            self._sums[key] += value
+
+    def count(self, **labels):
+        """
+        The number of observations for the given labels.
+        """
+        return sum(self._counts.get(_label_key(labels), []))
+
+    def sum(self, **labels):
+        """
+        The sum of the observations for the given labels.
+        """
+        return self._sums.get(_label_key(labels), 0.0)
+
+    def _cumulative(self, key):
+
+        total = 0
+        result = []
+
+        for bound, count in zip(list(self.buckets) + [float("inf")], self._counts[key]):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+    def to_dict(self):
+
+        with self._lock:
+            return {
+                "type": self.type_,
+                "documentation": self.documentation,
+                "samples": [
+                    {
+                        "labels": dict(key),
+                        "buckets": [["+Inf" if bound == float("inf") else bound, count]
+                                    for bound, count in self._cumulative(key)],
+                        "sum": self._sums[key],
+                        "count": sum(self._counts[key])
+                    }
+                    for key in self._counts
+                ]
+            }
+
+    def to_prometheus(self):
+
+        lines = []
+
+        with self._lock:
+            for key in sorted(self._counts):
+                for bound, count in self._cumulative(key):
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append("{}_bucket{} {}".format(self.name, _format_labels(key, [("le", le)]), count))
+
+                lines.append("{}_sum{} {}".format(self.name, _format_labels(key), repr(self._sums[key])))
+                lines.append("{}_count{} {}".format(self.name, _format_labels(key), sum(self._counts[key])))
+
+        return lines
+
+
+class MetricsRegistry(object):
+    """
+    An in-process collection of counters and histograms, which can be dumped as JSON or in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+
+        with self._lock:
+            metric = self._metrics.get(name)
+
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError("Metric '{}' is already registered as a {}".format(name, metric.type_))
+
+            return metric
+
+    def counter(self, name, documentation=""):
+        """
+        Fetches the counter with the given name, creating it if necessary.
+
+        :rtype: Counter
+        """
+        return self._get_or_create(Counter, name, documentation)
+
+    def histogram(self, name, documentation="", buckets=None):
+        """
+        Fetches the histogram with the given name, creating it if necessary.
+
+        :rtype: Histogram
+        """
+        return self._get_or_create(Histogram, name, documentation, buckets=buckets)
+
+    def reset(self):
+        """
+        Removes every metric from this registry.
+        """
+
+        with self._lock:
+            self._metrics = {}
+
+    def to_dict(self):
+        """
+        :return: A dictionary mapping the name of each metric to its type, documentation, and samples.
+        :rtype: dict
+        """
+
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        return {name: metric.to_dict() for name, metric in metrics}
+
+    def to_json(self, **json_kwargs):
+        """
+        :param dict json_kwargs: Keyword arguments passed to ``json.dumps``.
+        :return: The contents of :meth:`to_dict`, serialized as JSON.
+        :rtype: str
+        """
+        return json.dumps(self.to_dict(), **json_kwargs)
+
+    def to_prometheus(self):
+        """
+        :return: Every metric, in the Prometheus text exposition format.
+        :rtype: str
+        """
+
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+
+        for name, metric in metrics:
+            lines.append("# HELP {} {}".format(name, metric.documentation))
+            lines.append("# TYPE {} {}".format(name, metric.type_))
+            lines.extend(metric.to_prometheus())
+
+        return "\n".join(lines) + "\n"
+
+
+#: The registry used by :class:`pg_utils.instrumentation.Instrumentation` objects by default.
+registry = MetricsRegistry()
@@ -0,0 +1,5 @@
+"""
+Memory budgets that limit how much client memory a single fetch may take, either refusing, streaming, or spilling to disk results that would go over.
+"""
+from .base import MemoryBudget, resolve_memory_budget, whole_result_budget, estimate_result_size, fetch_within_memory, iter_frames, \
+    iter_arrays, spill_frame
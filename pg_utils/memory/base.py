@@ -0,0 +1,493 @@
+import os
+import re
+import tempfile
+import uuid
+
+import six
+
+from .._lazy import lazy_import
+from ..dtypes import numpy_dtype, to_array, typed_frame, fetch_array, fetch_frame
+from ..dtypes.base import _integer_dtypes, _boolean_types, _timestamp_types, _timestamptz_types, _utc
+from ..exception import MemoryBudgetExceededError
+from ..instrumentation.base import measure_frame
+from ..sql import queries
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+__all__ = ["MemoryBudget", "resolve_memory_budget", "whole_result_budget", "estimate_result_size", "fetch_within_memory",
+           "iter_frames", "iter_arrays", "spill_frame"]
+
+_units = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+_size = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*([kmgt]?)(?:i?b)?\s*$", re.IGNORECASE)
+
+_policies = ["raise", "chunk", "spill"]
+
+# the size of a page, and of the header of each row on it
+_page_bytes = 8192
+_row_header_bytes = 24
+
+# what a value costs on top of its own width when it's kept as a Python object in an object array
+_object_overhead = 57
+
+# the width assumed for columns that haven't been analyzed
+_default_width = 32
+
+# the types whose values are decoded to strings, which are spilled as UTF-8 bytes
+_string_types = ["text", "character varying", "varchar", "character", "char", "bpchar", "name", "citext"]
+
+
+class MemoryBudget(object):
+    """
+    A limit on how much client memory a single fetch (eg ``head("all")``, ``sort_values``, or ``Column.values``) is allowed to take.
+
+    Before such a fetch, the size of its result is estimated from the planner's statistics (``pg_class.reltuples`` and ``relpages``, and ``pg_stats.avg_width``), and from the dtype that each column is decoded to (see :mod:`pg_utils.dtypes`). If the estimate is over the budget, what happens depends on the policy:
+
+    * ``"raise"``: a :class:`pg_utils.exception.MemoryBudgetExceededError` is raised, without fetching anything.
+    * ``"chunk"``: the method returns an iterator of results (DataFrames, or arrays for a single column) instead, each of them within the budget, streamed through a server-side cursor.
+    * ``"spill"``: the rows are streamed, chunk by chunk, to files in ``spill_dir``, and the result is backed by memory-mapped views of those files, which the OS pages in (and out) as they're used. Integer, boolean, and floating point columns stay memory-mapped (see :mod:`pg_utils.dtypes` for their dtypes), ``numeric`` columns are spilled as ``float64``, and timestamps as ``datetime64[us]`` (which, unlike ``datetime64[ns]``, holds any of them). Text columns are spilled as UTF-8 bytes, and, if pyarrow is installed, read back as Arrow strings over the memory-mapped files (or else decoded into an object array of strings). Columns of any other type (eg ``date``, ``uuid``, ``json``, or arrays) can't be spilled without changing the type of their values, so a result with any of them raises a :class:`pg_utils.exception.MemoryBudgetExceededError` instead.
+
+    :param int|float|str max_bytes: The budget, in bytes. Strings such as ``"512MB"`` or ``"4 GiB"`` are accepted too (with binary units).
+    :param str policy: ``"raise"``, ``"chunk"``, or ``"spill"``.
+    :param None|str spill_dir: The directory in which each spilled result gets its own subdirectory. Defaults to the system's temporary directory. Spilled files aren't removed by pg-utils.
+    """
+
+    def __init__(self, max_bytes, policy="raise", spill_dir=None):
+
+        if policy not in _policies:
+            raise ValueError("'policy' must be one of {} (got {!r})".format(", ".join(_policies), policy))
+
+        self.max_bytes = _parse_size(max_bytes)
+        self.policy = policy
+        self.spill_dir = spill_dir
+
+        if self.max_bytes <= 0:
+            raise ValueError("'max_bytes' must be positive (got {})".format(max_bytes))
+
+    @classmethod
+    def coerce(cls, memory_budget):
+        """
+        Turns the value of a ``memory_budget`` parameter into a :class:`MemoryBudget`: a plain number (or a string such as ``"4GB"``) is taken to be a number of bytes, with the ``"raise"`` policy.
+
+        :param None|int|float|str|MemoryBudget memory_budget: The value.
+        :rtype: None|MemoryBudget
+        """
+
+        if memory_budget is None or isinstance(memory_budget, MemoryBudget):
+            return memory_budget
+
+        return cls(memory_budget)
+
+    def __repr__(self):
+        return "MemoryBudget(max_bytes={}, policy={!r})".format(self.max_bytes, self.policy)
+
+
+def _parse_size(size):
+
+    if isinstance(size, bool):
+        raise ValueError("A memory budget must be a number of bytes (got {!r})".format(size))
+
+    if isinstance(size, (six.integer_types, float)):
+        return int(size)
+
+    match = _size.match(size) if isinstance(size, six.string_types) else None
+
+    if match is None:
+        raise ValueError("A memory budget must be a number of bytes, or a string such as '4GB' (got {!r})".format(size))
+
+    return int(float(match.group(1)) * _units[match.group(2).lower()])
+
+
+def resolve_memory_budget(conn, memory_budget=None):
+    """
+    The memory budget that applies to a call: the one given to the call itself, or else the connection's.
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param None|int|float|str|MemoryBudget memory_budget: The memory budget given to the call (if any).
+    :rtype: None|MemoryBudget
+    """
+
+    if memory_budget is None:
+        memory_budget = getattr(conn, "memory_budget", None)
+
+    return MemoryBudget.coerce(memory_budget)
+
+
+def whole_result_budget(conn, memory_budget=None):
+    """
+    The memory budget for a call that needs the whole result at once (eg a plot, or a cached property): the same as :func:`resolve_memory_budget`, except that the ``"chunk"`` policy is replaced by ``"raise"``.
+
+    :rtype: None|MemoryBudget
+    """
+
+    memory_budget = resolve_memory_budget(conn, memory_budget)
+
+    if memory_budget is not None and memory_budget.policy == "chunk":
+        memory_budget = MemoryBudget(memory_budget.max_bytes, policy="raise")
+
+    return memory_budget
+
+
+def _bytes_per_value(data_type, width, numeric_as_float=False):
+
+    dtype = numpy_dtype(data_type, numeric_as_float=numeric_as_float)
+
+    if dtype is None:
+        return width + _object_overhead
+
+    if data_type in _timestamptz_types:
+        return 8
+
+    # the nullable dtypes keep a mask alongside the values
+    mask = 1 if data_type in _integer_dtypes or data_type in _boolean_types else 0
+
+    return np.dtype(dtype).itemsize + mask
+
+
+def estimate_result_size(table, columns, num_rows=None):
+    """
+    Estimates the number of rows and the size in memory of the result of fetching some columns of a table, from the planner's statistics alone. Tables that have never been analyzed are assumed to be as full as their pages allow.
+
+    :param pg_utils.table.Table table: The table.
+    :param list[str] columns: The columns being fetched.
+    :param None|int num_rows: The limit on the number of rows (if any).
+    :return: The estimated number of rows, and the estimated number of bytes.
+    :rtype: tuple[int, int]
+    """
+
+    cur = table.conn.cursor()
+
+    cur.execute(queries.relation_size(table))
+    reltuples, relpages = cur.fetchone()
+
+    cur.execute(queries.column_widths(table.schema, table.table_name))
+    widths = dict(cur.fetchall())
+
+    data_types = table.column_data_types
+
+    all_widths = [widths.get(column, _default_width) for column in table.column_names]
+
+    if reltuples is None or reltuples < 0:
+        # never analyzed (or vacuumed)
+        reltuples = relpages * _page_bytes / float(sum(all_widths) + _row_header_bytes)
+
+    rows = int(reltuples)
+
+    if num_rows is not None:
+        rows = min(rows, num_rows)
+
+    numeric_as_float = getattr(table.conn, "numeric_as_float", False)
+    per_row = sum(_bytes_per_value(data_types[column], widths.get(column, _default_width), numeric_as_float)
+                  for column in columns)
+
+    return rows, rows * per_row
+
+
+def fetch_within_memory(table, query, columns, num_rows=None, memory_budget=None, single=False):
+    """
+    Runs a query selecting some columns of a table, and fetches the result as a DataFrame (typed by :func:`pg_utils.dtypes.fetch_frame`), subject to a :class:`MemoryBudget`.
+
+    :param pg_utils.table.Table table: The table.
+    :param str query: The query.
+    :param list[str] columns: The names of the columns of the result (which are columns of the table).
+    :param None|int num_rows: The limit on the number of rows (if any).
+    :param None|int|float|str|MemoryBudget memory_budget: The memory budget, defaulting to the connection's.
+    :param bool single: Whether to return the values of the (single) column as an array (see :func:`pg_utils.dtypes.fetch_array`) rather than a DataFrame.
+    :return: The result, or, under the ``"chunk"`` policy, possibly an iterator of results.
+    :rtype: pandas.DataFrame|numpy.ndarray|collections.Iterator
+    """
+
+    conn = table.conn
+    memory_budget = resolve_memory_budget(conn, memory_budget)
+    data_types = table.column_data_types
+
+    if memory_budget is not None:
+        rows, size = estimate_result_size(table, columns, num_rows)
+
+    if memory_budget is None or size <= memory_budget.max_bytes:
+        if single:
+            return fetch_array(conn, query, data_types[columns[0]])
+
+        return fetch_frame(conn, query, columns, data_types)
+
+    if memory_budget.policy == "raise":
+        raise MemoryBudgetExceededError(
+            "Fetching {} from {} would take about {:.1f}MB ({} rows), which is over the memory budget of {:.1f}MB. "
+            "Fetch fewer rows or columns, or use a memory budget with the 'chunk' or 'spill' policy.".format(
+                ", ".join(columns), table, size / 1024.0 ** 2, rows, memory_budget.max_bytes / 1024.0 ** 2),
+            estimated_rows=rows, estimated_bytes=size
+        )
+
+    chunk_rows = max(1, int(memory_budget.max_bytes * rows // size))
+
+    if memory_budget.policy == "chunk":
+        if single:
+            return iter_arrays(conn, query, data_types[columns[0]], chunk_rows)
+
+        return iter_frames(conn, query, columns, data_types, chunk_rows)
+
+    unspillable = _unspillable(columns, data_types)
+
+    if unspillable:
+        raise MemoryBudgetExceededError(
+            "Fetching {} from {} would take about {:.1f}MB ({} rows), which is over the memory budget of {:.1f}MB, "
+            "and {} can't be spilled (see pg_utils.memory.MemoryBudget). Fetch fewer rows or columns, or use a memory "
+            "budget with the 'chunk' policy.".format(
+                ", ".join(columns), table, size / 1024.0 ** 2, rows, memory_budget.max_bytes / 1024.0 ** 2,
+                ", ".join(unspillable)),
+            estimated_rows=rows, estimated_bytes=size
+        )
+
+    if single:
+        _, arrays = _spill(conn, query, columns, data_types, chunk_rows, memory_budget.spill_dir)
+
+        return arrays[0] if arrays is not None else to_array([], data_types[columns[0]])
+
+    return spill_frame(conn, query, columns, data_types, chunk_rows, memory_budget.spill_dir)
+
+
+def _iter_rows(conn, query, chunk_rows):
+
+    cur = conn.cursor(name="pg_utils_fetch_{}".format(uuid.uuid4().hex))
+    cur.itersize = chunk_rows
+
+    try:
+        cur.execute(query)
+
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+
+            if not rows:
+                break
+
+            yield rows
+
+            del rows
+    finally:
+        cur.close()
+
+
+def iter_frames(conn, query, columns, data_types, chunk_rows):
+    """
+    Runs a query through a server-side cursor, and yields its result as typed DataFrames (see :func:`pg_utils.dtypes.typed_frame`) of at most ``chunk_rows`` rows each.
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :param list[str] columns: The names of the columns of the result.
+    :param dict data_types: The data type of each column, by name.
+    :param int chunk_rows: The (maximum) number of rows per chunk.
+    :rtype: collections.Iterator[pandas.DataFrame]
+    """
+
+    numeric_as_float = getattr(conn, "numeric_as_float", False)
+
+    for rows in _iter_rows(conn, query, chunk_rows):
+        with measure_frame(conn):
+            yield typed_frame(rows, columns, data_types, numeric_as_float)
+
+
+def iter_arrays(conn, query, data_type, chunk_rows):
+    """
+    Like :func:`iter_frames`, but for a query returning a single column, whose values are yielded as typed arrays (see :func:`pg_utils.dtypes.to_array`).
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :param str data_type: The data type of the column.
+    :param int chunk_rows: The (maximum) number of rows per chunk.
+    :rtype: collections.Iterator[numpy.ndarray|pandas.api.extensions.ExtensionArray]
+    """
+
+    numeric_as_float = getattr(conn, "numeric_as_float", False)
+
+    for rows in _iter_rows(conn, query, chunk_rows):
+        with measure_frame(conn):
+            yield to_array([row[0] for row in rows], data_type, numeric_as_float)
+
+
+class _SpilledColumn(object):
+    """
+    The files of one column of a spilled result: the values (as raw, fixed-width data, or, for strings, their UTF-8 bytes and the offsets at which each of them ends), and a mask of the nulls.
+    """
+
+    def __init__(self, directory, index, data_type):
+
+        self.data_type = data_type
+        self.values_path = os.path.join(directory, "{}.values".format(index))
+        self.offsets_path = os.path.join(directory, "{}.offsets".format(index))
+        self.mask_path = os.path.join(directory, "{}.mask".format(index))
+
+        self.dtype = None
+        self.has_nulls = False
+        self.length = 0
+        self.num_bytes = 0
+
+        self._values = open(self.values_path, "wb")
+        self._mask = open(self.mask_path, "wb")
+        self._offsets = None
+
+        if data_type in _string_types:
+            self._offsets = open(self.offsets_path, "wb")
+            self._offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def append(self, values):
+
+        mask = None
+
+        if self._offsets is not None:
+            mask = np.array([v is None for v in values], dtype=bool)
+            encoded = [b"" if v is None else v.encode("utf8") for v in values]
+            ends = self.num_bytes + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+            data = b"".join(encoded)
+
+            self._offsets.write(ends.tobytes())
+            self._values.write(data)
+            self.num_bytes += len(data)
+        elif self.data_type in _timestamp_types or self.data_type in _timestamptz_types:
+            # unlike datetime64[ns], datetime64[us] holds every PostgreSQL timestamp, so every chunk gets the same dtype
+            if self.data_type in _timestamptz_types:
+                values = [None if v is None else v.astimezone(_utc).replace(tzinfo=None) for v in values]
+
+            data = np.array(values, dtype="datetime64[us]")
+        else:
+            array = to_array(values, self.data_type, numeric_as_float=True)
+
+            if isinstance(array, np.ndarray):
+                data = array
+            else:
+                # a nullable array
+                dtype = numpy_dtype(self.data_type)
+                mask = np.asarray(array.isna())
+                data = array.to_numpy(dtype=dtype, na_value=np.zeros(1, dtype=dtype)[0])
+
+        if self._offsets is None:
+            self._values.write(data.tobytes())
+            self.dtype = data.dtype
+
+        if mask is None:
+            mask = np.zeros(len(values), dtype=bool)
+
+        self._mask.write(mask.tobytes())
+        self.has_nulls = self.has_nulls or bool(mask.any())
+        self.length += len(values)
+
+    def close(self):
+        self._values.close()
+        self._mask.close()
+
+        if self._offsets is not None:
+            self._offsets.close()
+
+    def finish(self):
+        """
+        Closes the files, and returns the column, backed by memory-mapped views of them.
+        """
+
+        self.close()
+
+        if self.has_nulls:
+            mask = np.memmap(self.mask_path, dtype=bool, mode="r", shape=(self.length,))
+        else:
+            mask = None
+            os.remove(self.mask_path)
+
+        if self._offsets is not None:
+            return self._strings(mask)
+
+        values = np.memmap(self.values_path, dtype=self.dtype, mode="r", shape=(self.length,))
+
+        if self.data_type in _integer_dtypes:
+            return pd.arrays.IntegerArray(values, mask) if mask is not None else values
+
+        if self.data_type in _boolean_types:
+            return pd.arrays.BooleanArray(values, mask) if mask is not None else values
+
+        if self.data_type in _timestamptz_types:
+            return pd.DatetimeIndex(values).tz_localize("UTC").array
+
+        return values
+
+    def _strings(self, mask):
+
+        offsets = np.memmap(self.offsets_path, dtype=np.int64, mode="r", shape=(self.length + 1,))
+        data = np.memmap(self.values_path, dtype=np.uint8, mode="r", shape=(self.num_bytes,)) if self.num_bytes \
+            else np.zeros(0, dtype=np.uint8)
+
+        try:
+            import pyarrow as pa
+        except ImportError:
+            # without pyarrow, the strings are decoded into an object array (as a fetch would have it) all at once
+            result = np.array([bytes(data[offsets[i]:offsets[i + 1]]).decode("utf8") for i in range(self.length)],
+                              dtype=object)
+
+            if mask is not None:
+                result[mask] = None
+
+            return result
+
+        # an Arrow array over the memory-mapped files, so that the strings are only paged in as they're used
+        validity = pa.py_buffer(np.packbits(~mask, bitorder="little")) if mask is not None else None
+        array = pa.LargeStringArray.from_buffers(self.length, pa.py_buffer(offsets), pa.py_buffer(data), validity)
+
+        return pd.arrays.ArrowExtensionArray(array)
+
+
+def _unspillable(columns, data_types):
+    """
+    The columns whose values can't be spilled without changing their type (eg ``date``, ``uuid``, or ``json``).
+    """
+
+    return [column for column in columns
+            if data_types.get(column) not in _string_types and
+            numpy_dtype(data_types.get(column), numeric_as_float=True) is None]
+
+
+def _spill(conn, query, columns, data_types, chunk_rows, spill_dir):
+
+    directory = tempfile.mkdtemp(prefix="pg_utils_spill_", dir=spill_dir)
+    spilled = [_SpilledColumn(directory, i, data_types.get(column)) for i, column in enumerate(columns)]
+
+    for rows in _iter_rows(conn, query, chunk_rows):
+        with measure_frame(conn):
+            for column, values in zip(spilled, zip(*rows)):
+                column.append(list(values))
+
+    if spilled and spilled[0].length == 0:
+        for column in spilled:
+            column.close()
+
+        return directory, None
+
+    return directory, [column.finish() for column in spilled]
+
+
+def spill_frame(conn, query, columns, data_types, chunk_rows, spill_dir=None):
+    """
+    Runs a query through a server-side cursor, spilling its result (``chunk_rows`` rows at a time) to a new subdirectory of ``spill_dir``, and returns a DataFrame backed by memory-mapped views of the spilled files (see :class:`MemoryBudget`). The directory is kept in the ``spill_dir`` entry of the result's ``attrs``.
+
+    :param pg_utils.connection.Connection conn: The connection.
+    :param str query: The query.
+    :param list[str] columns: The names of the columns of the result.
+    :param dict data_types: The data type of each column, by name.
+    :param int chunk_rows: The (maximum) number of rows per chunk.
+    :param None|str spill_dir: Where to spill to, defaulting to the system's temporary directory.
+    :rtype: pandas.DataFrame
+    :raises ValueError: If some of the columns can't be spilled.
+    """
+
+    unspillable = _unspillable(columns, data_types)
+
+    if unspillable:
+        raise ValueError("The values of {} can't be spilled (see pg_utils.memory.MemoryBudget)".format(
+            ", ".join(unspillable)))
+
+    directory, arrays = _spill(conn, query, columns, data_types, chunk_rows, spill_dir)
+
+    if arrays is None:
+        result = typed_frame([], columns, data_types)
+    else:
+        result = pd.DataFrame(dict(zip(columns, arrays)), columns=list(columns), copy=False)
+
+    result.attrs["spill_dir"] = directory
+
+    return result
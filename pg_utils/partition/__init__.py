@@ -0,0 +1,4 @@
+"""
+Statistics of declaratively partitioned tables, computed partition by partition and merged (see ``Table.describe(by_partition=True)``).
+"""
+from .base import Partition, list_partitions, prune_partitions, partition_summaries, count, describe, bin_counts
@@ -0,0 +1,277 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ..explain import explain
+from ..explain.base import _walk
+from ..sql import queries
+from ..summary import ColumnSummary, SummaryStore
+from ..summary.base import default_store
+
+__all__ = ["Partition", "list_partitions", "prune_partitions", "partition_summaries", "count", "describe",
+           "bin_counts"]
+
+
+class Partition(object):
+    """
+    A leaf partition of a partitioned table (ie one that holds rows).
+
+    :param str schema: The schema of the partition.
+    :param str table_name: The name of the partition.
+    :param None|str bound: Its partition bound, as SQL (eg ``FOR VALUES FROM ('2020-01-01') TO ('2020-02-01')``).
+    """
+
+    def __init__(self, schema, table_name, bound=None):
+        self.schema = schema
+        self.table_name = table_name
+        self.bound = bound
+
+    def __str__(self):
+        return str(queries.relation(self))
+
+    def __repr__(self):
+        return "Partition({!r}, {!r}, {!r})".format(self.schema, self.table_name, self.bound)
+
+    def __eq__(self, other):
+        return isinstance(other, Partition) and (self.schema, self.table_name) == (other.schema, other.table_name)
+
+    def __hash__(self):
+        return hash((self.schema, self.table_name))
+
+
+def list_partitions(table):
+    """
+    Finds the leaf partitions of a table through ``pg_inherits``, descending into partitions that are partitioned themselves.
+
+    :param pg_utils.table.Table table: The table.
+    :return: The leaf partitions (which is empty if the table isn't partitioned).
+    :rtype: list[Partition]
+    """
+
+    cur = table.conn.cursor()
+    result = []
+    parents = [table]
+
+    while parents:
+        parent = parents.pop(0)
+        cur.execute(queries.child_partitions(parent))
+
+        for schema, table_name, relkind, bound in cur.fetchall():
+            partition = Partition(schema, table_name, bound)
+
+            if relkind == "p":
+                parents.append(partition)
+            else:
+                result.append(partition)
+
+    return result
+
+
+def prune_partitions(table, partitions, where):
+    """
+    The partitions that may hold rows matching a condition, as the planner sees it: every partition that appears in the plan of a scan of ``table`` filtered by ``where`` (so partitions that the planner prunes are left out).
+
+    :param pg_utils.table.Table table: The partitioned table.
+    :param list[Partition] partitions: Its partitions (see :func:`list_partitions`).
+    :param str where: The condition (as raw SQL).
+    :rtype: list[Partition]
+    """
+
+    # (with verbose, scans name the schema of their relation too, so that partitions of the same name in different
+    # schemas aren't mixed up)
+    plan = explain(table.conn.cursor(), "select 1 from {} where {}".format(queries.relation(table), where),
+                   verbose=True)
+    scanned = set((node["Schema"], node["Relation Name"]) for node in _walk(plan["Plan"]) if "Relation Name" in node)
+
+    return [p for p in partitions if (p.schema, p.table_name) in scanned]
+
+
+def _version_token(conn, source):
+
+    # the exact token (see pg_utils.table.Table.version_token): the one from the cumulative statistics lags behind other
+    # sessions, and is cached for the rest of a transaction, so a changed partition could be taken for an unchanged one
+    cur = conn.cursor()
+    cur.execute(queries.rows_version(source))
+
+    return "-".join(str(x) for x in cur.fetchone())
+
+
+def _map_partitions(table, partitions, work, parallel):
+    """
+    Runs ``work(conn, partition)`` for each partition: either one after the other over the table's own connection, or (if ``parallel`` is more than one) at most ``parallel`` at a time, each over a connection from the table's pool.
+    """
+
+    if not parallel or parallel <= 1 or len(partitions) <= 1:
+        return [work(table.conn, partition) for partition in partitions]
+
+    def run(partition):
+        with table.conn.pool.connection() as conn:
+            return work(conn, partition)
+
+    with ThreadPoolExecutor(max_workers=min(parallel, len(partitions))) as executor:
+        return list(executor.map(run, partitions))
+
+
+def _partitions(table, where):
+
+    partitions = list_partitions(table)
+
+    if not partitions:
+        raise ValueError("{} isn't a partitioned table (or has no partitions)".format(table))
+
+    scanned = prune_partitions(table, partitions, where) if where is not None else partitions
+
+    return partitions, scanned
+
+
+def partition_summaries(table, columns, where=None, parallel=None, store=None, resolution=200):
+    """
+    The number of rows, and a mergeable :class:`pg_utils.summary.ColumnSummary` of each of some (numeric) columns, for each partition of a partitioned table.
+
+    Summaries are kept in ``store`` along with the partition's exact version token (see :meth:`pg_utils.table.Table.version_token`), so a partition is only summarized again once it's changed, and only for the columns that aren't already summarized. Taking the token still costs a scan of the partition (though no rows are fetched), which is much cheaper than summarizing it. Partitions that the planner rules out for ``where`` aren't scanned at all.
+
+    :param pg_utils.table.Table table: The partitioned table.
+    :param list[str] columns: The columns to summarize.
+    :param None|str where: A condition on the rows (as raw SQL).
+    :param None|int parallel: How many partitions to scan at once (over connections from the table's pool).
+    :param None|SummaryStore store: Where to keep the summaries (defaulting to memory, for the life of the process).
+    :param int resolution: The resolution of the quantile sketches.
+    :return: For each partition that wasn't pruned, the partition, its number of rows (matching ``where``), the summary of each column (by name), and whether it was scanned.
+    :rtype: list[tuple[Partition, int, dict, bool]]
+    """
+    return _summaries(table, columns, where, parallel, store, resolution)[0]
+
+
+def _summaries(table, columns, where, parallel, store, resolution=200):
+
+    store = store if store is not None else default_store
+    columns = list(columns)
+    partitions, scanned = _partitions(table, where)
+
+    def key(partition, column):
+        return SummaryStore.key(table.conn.hostname, table.conn.database, partition.schema, partition.table_name,
+                                column, where, resolution)
+
+    def work(conn, partition):
+
+        version = _version_token(conn, partition)
+        states = {column: store.load(key(partition, column)) for column in [None] + columns}
+        stale = [column for column, state in states.items() if state is None or state["version"] != version]
+
+        if stale:
+            stale_columns = [column for column in columns if column in stale]
+
+            cur = conn.cursor()
+            cur.execute(queries.summarize_columns(partition, stale_columns, resolution=resolution, where=where))
+            row = cur.fetchone()
+
+            states[None] = {"version": version, "value": row[-2]}
+
+            for i, column in enumerate(stale_columns):
+                states[column] = {"version": version,
+                                  "value": ColumnSummary.from_aggregates(*row[6 * i:6 * i + 6])}
+
+            for column in [None] + stale_columns:
+                store.save(key(partition, column), states[column])
+
+        return (partition, states[None]["value"], {column: states[column]["value"] for column in columns},
+                bool(stale))
+
+    summaries = _map_partitions(table, scanned, work, parallel)
+
+    info = {"approximate": False, "method": "partitions", "partitions": len(partitions),
+            "partitions_scanned": sum(1 for s in summaries if s[3]),
+            "partitions_pruned": len(partitions) - len(scanned)}
+
+    return summaries, info
+
+
+def count(table, where=None, parallel=None, store=None):
+    """
+    Counts the rows of a partitioned table (matching ``where``) partition by partition, reusing the counts of partitions that haven't changed (see :func:`partition_summaries`).
+
+    :param pg_utils.table.Table table: The partitioned table.
+    :param None|str where: A condition on the rows (as raw SQL).
+    :param None|int parallel: How many partitions to scan at once.
+    :param None|SummaryStore store: Where to keep the counts.
+    :return: The count, and information about the call: the number of ``partitions``, how many were scanned (``partitions_scanned``), and how many were pruned by ``where`` (``partitions_pruned``).
+    :rtype: tuple[int, dict]
+    """
+
+    summaries, info = _summaries(table, [], where, parallel, store)
+
+    return sum(rows for _, rows, _, _ in summaries), info
+
+
+def describe(table, columns, percentiles, where=None, parallel=None, store=None):
+    """
+    Describes some numeric columns of a partitioned table by merging the summaries of its partitions (see :func:`partition_summaries`). The percentiles are estimated from quantile sketches.
+
+    :param pg_utils.table.Table table: The partitioned table.
+    :param list[str] columns: The (numeric) columns to describe.
+    :param list[float] percentiles: The percentiles.
+    :param None|str where: A condition on the rows (as raw SQL).
+    :param None|int parallel: How many partitions to scan at once.
+    :param None|SummaryStore store: Where to keep the summaries.
+    :return: A dictionary from column name to the values of the description (in the same order as ``describe``), and information about the call (as for :func:`count`).
+    :rtype: tuple[dict, dict]
+    """
+
+    summaries, info = _summaries(table, columns, where, parallel, store)
+    result = {}
+
+    for column in columns:
+        merged = ColumnSummary()
+
+        for _, _, column_summaries, _ in summaries:
+            merged.merge(column_summaries[column])
+
+        result[column] = merged.describe(percentiles)
+
+    info["approximate"] = bool(percentiles)
+
+    return result, info
+
+
+def bin_counts(column, bins, minimum, maximum, where=None, parallel=None, store=None):
+    """
+    Bin counts of a column of a partitioned table (see :func:`pg_utils.bin_counts.counts`), computed partition by partition and added up. The counts of each partition are kept in ``store`` for its exact version token and the given bins, so they're reused as long as neither changes.
+
+    :param pg_utils.column.Column column: The column.
+    :param int bins: The number of bins.
+    :param float minimum: The left endpoint of the first bin.
+    :param float maximum: The right endpoint of the last bin.
+    :param None|str where: A condition on the rows (as raw SQL).
+    :param None|int parallel: How many partitions to scan at once.
+    :param None|SummaryStore store: Where to keep the counts.
+    :return: A list of ``[left_endpoint, right_endpoint, bin_count]``.
+    :rtype: list[list]
+    """
+
+    table = column.parent_table
+    store = store if store is not None else default_store
+    _, partitions = _partitions(table, where)
+
+    def work(conn, partition):
+
+        version = _version_token(conn, partition)
+        key = SummaryStore.key(table.conn.hostname, table.conn.database, partition.schema, partition.table_name,
+                               column.name, where, "bin_counts", bins, minimum, maximum)
+        state = store.load(key)
+
+        if state is None or state["version"] != version:
+            cur = conn.cursor()
+            cur.execute(queries.bin_counts(partition, column.name, bins, minimum, maximum, where=where))
+            state = {"version": version, "value": cur.fetchall()}
+            store.save(key, state)
+
+        return state["value"]
+
+    merged = {}
+
+    for rows in _map_partitions(table, partitions, work, parallel):
+        for bucket, left, right, num_points in rows:
+            if bucket in merged:
+                merged[bucket][2] += num_points
+            else:
+                merged[bucket] = [left, right, num_points]
+
+    return [merged[bucket] for bucket in sorted(merged)]
@@ -0,0 +1,5 @@
+"""
+A small SQL builder: statements are built as trees of nodes (identifiers, literals, function calls, and clauses), with identifiers quoted as need be, and compiled once per shape to templates that only need their identifiers and literals filled in.
+"""
+from .base import *
+from . import queries
@@ -0,0 +1,518 @@
+import decimal
+import math
+import numbers
+import re
+import threading
+
+import six
+
+__all__ = ["quote_identifier", "quote_literal", "Node", "Raw", "Identifier", "Slot", "Literal", "Func",
+           "WithinGroup", "Window", "Case", "Cast", "Alias", "Op", "Row", "FunctionScan", "From", "Join",
+           "Select", "Subquery", "Statement", "shape"]
+
+_plain_identifier = re.compile(r"^[a-z_][a-z0-9_$]*$")
+
+# the keywords that PostgreSQL reserves (and so can't be used as unquoted identifiers)
+_reserved = frozenset("""
+all analyse analyze and any array as asc asymmetric authorization binary both case cast check collate collation
+column concurrently constraint create cross current_catalog current_date current_role current_schema current_time
+current_timestamp current_user default deferrable desc distinct do else end except false fetch for foreign freeze
+from full grant group having ilike in initially inner intersect into is isnull join lateral leading left like limit
+localtime localtimestamp natural not notnull null offset on only or order outer overlaps placing primary references
+returning right select session_user similar some symmetric system_user table tablesample then to trailing true union
+unique user using variadic verbose when where window with
+""".split())
+
+
+def quote_identifier(name):
+    """
+    Quotes an identifier (eg a column name) if need be: names that PostgreSQL would fold to themselves are left alone, and everything else (eg names with upper case letters, spaces, or that are keywords) is double-quoted.
+
+    :param str name: The identifier.
+    :rtype: str
+    """
+
+    name = six.text_type(name)
+
+    if _plain_identifier.match(name) and name not in _reserved:
+        return name
+
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def quote_literal(value):
+    """
+    Renders a Python value as a SQL literal. Floats and Decimals that aren't finite (which have no literal of their own) are rendered as casts of ``'NaN'``, ``'Infinity'``, or ``'-Infinity'`` (to ``float8`` and ``numeric`` respectively).
+
+    :param None|bool|numbers.Number|str value: The value.
+    :rtype: str
+    """
+
+    if value is None:
+        return "null"
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            return "'{}'::numeric".format(_special_value(value.is_nan(), value.is_signed()))
+
+        return str(value)
+
+    if isinstance(value, numbers.Real):
+        value = float(value)
+
+        if math.isnan(value) or math.isinf(value):
+            return "'{}'::float8".format(_special_value(math.isnan(value), value < 0))
+
+        return repr(value)
+
+    return "'{}'".format(six.text_type(value).replace("'", "''"))
+
+
+def _special_value(nan, negative):
+    if nan:
+        return "NaN"
+
+    return "-Infinity" if negative else "Infinity"
+
+
+def _escape(text):
+    # statements are compiled to ``str.format`` templates, so literal braces are doubled
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _node(value):
+    """
+    Coerces a value into a node: nodes are left alone, strings are taken as raw SQL, and anything else as a literal.
+    """
+
+    if isinstance(value, Node):
+        return value
+
+    if isinstance(value, six.string_types):
+        return Raw(value)
+
+    return Literal(value)
+
+
+class Node(object):
+    """
+    A node of a SQL statement. Nodes are compiled (via :meth:`compile`) to a :class:`Statement`, ie a template in which any :class:`Slot` nodes are left to be bound later.
+    """
+
+    def template(self):
+        """
+        The SQL of this node, as a ``str.format`` template.
+
+        :rtype: str
+        """
+        raise NotImplementedError
+
+    def compile(self):
+        """
+        :rtype: Statement
+        """
+        return Statement(self.template())
+
+    def __str__(self):
+        return self.compile().bind()
+
+
+class Raw(Node):
+    """
+    A fragment of raw SQL.
+
+    :param str sql: The SQL.
+    """
+
+    def __init__(self, sql):
+        self.sql = sql
+
+    def template(self):
+        return _escape(self.sql)
+
+    def __str__(self):
+        return self.sql
+
+
+class Identifier(Node):
+    """
+    A (possibly qualified) identifier, eg ``Identifier("schema", "table")``. Each part is quoted if need be.
+
+    :param str parts: The parts of the identifier.
+    """
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def template(self):
+        return _escape(str(self))
+
+    def __str__(self):
+        return ".".join(quote_identifier(part) for part in self.parts)
+
+
+class Slot(Node):
+    """
+    A placeholder that's filled in when a compiled statement is bound (see :meth:`Statement.bind`).
+
+    :param str name: The name of the placeholder.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def template(self):
+        return "{" + self.name + "}"
+
+
+class Literal(Node):
+    """
+    A literal value (see :func:`quote_literal`).
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def template(self):
+        return _escape(str(self))
+
+    def __str__(self):
+        return quote_literal(self.value)
+
+
+class Func(Node):
+    """
+    A function call, eg ``Func("count", Literal(1))``.
+
+    :param str name: The name of the function.
+    :param args: The arguments.
+    :param bool distinct: Whether to aggregate distinct values only.
+    :param None|Node filter_: A condition on the rows to aggregate (as in ``count(1) filter (where x > 0)``).
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+        self.args = [_node(a) for a in args]
+        self.distinct = kwargs.get("distinct", False)
+        self.filter_ = _node(kwargs["filter_"]) if kwargs.get("filter_") is not None else None
+
+    def template(self):
+
+        sql = "{}({}{})".format(self.name, "distinct " if self.distinct else "",
+                                ", ".join(a.template() for a in self.args))
+
+        if self.filter_ is not None:
+            sql += " filter (where {})".format(self.filter_.template())
+
+        return sql
+
+
+class WithinGroup(Node):
+    """
+    An ordered-set aggregate, eg ``percentile_cont(0.5) within group (order by x)``.
+    """
+
+    def __init__(self, func, order_by):
+        self.func = func
+        self.order_by = _node(order_by)
+
+    def template(self):
+        return "{} within group (order by {})".format(self.func.template(), self.order_by.template())
+
+
+class Window(Node):
+    """
+    A window function call, eg ``avg(x) over (order by t rows between 4 preceding and current row)``.
+
+    :param Func func: The function call.
+    :param None|list partition_by: Expressions to partition the rows by.
+    :param None|list order_by: Expressions to order the rows of each partition by. Each is either an expression, or a pair ``(expression, ascending)``.
+    :param None|tuple frame: A frame ending at the current row, as a pair of ``"rows"`` or ``"range"`` and the offset of its start (or ``None``, for ``unbounded preceding``).
+    """
+
+    def __init__(self, func, partition_by=None, order_by=None, frame=None):
+        self.func = func
+        self.partition_by = [_node(p) for p in partition_by or []]
+        self.order_by = [(_node(o[0]), o[1]) if isinstance(o, tuple) else (_node(o), True)
+                         for o in order_by or []]
+        self.frame = (frame[0], _node(frame[1]) if frame[1] is not None else None) if frame is not None else None
+
+    def template(self):
+
+        clauses = []
+
+        if self.partition_by:
+            clauses.append("partition by " + ", ".join(p.template() for p in self.partition_by))
+
+        if self.order_by:
+            clauses.append("order by " + ", ".join(
+                expression.template() + ("" if ascending else " desc") for expression, ascending in self.order_by))
+
+        if self.frame is not None:
+            units, start = self.frame
+            clauses.append("{} between {} preceding and current row".format(
+                units, "unbounded" if start is None else start.template()))
+
+        return "{} over ({})".format(self.func.template(), " ".join(clauses))
+
+
+class Case(Node):
+    """
+    A conditional expression, eg ``case when x > 0 then x end``.
+
+    :param list whens: Pairs ``(condition, result)``, in order.
+    :param None|Node else_: The result when no condition holds (null by default).
+    """
+
+    def __init__(self, whens, else_=None):
+        self.whens = [(_node(condition), _node(result)) for condition, result in whens]
+        self.else_ = _node(else_) if else_ is not None else None
+
+    def template(self):
+
+        sql = "case " + " ".join("when {} then {}".format(condition.template(), result.template())
+                                 for condition, result in self.whens)
+
+        if self.else_ is not None:
+            sql += " else " + self.else_.template()
+
+        return sql + " end"
+
+
+class Cast(Node):
+    """
+    A cast, eg ``x::double precision``.
+    """
+
+    def __init__(self, expression, type_):
+        self.expression = _node(expression)
+        self.type_ = type_
+
+    def template(self):
+
+        expression = self.expression.template()
+
+        if isinstance(self.expression, Op):
+            expression = "({})".format(expression)
+
+        return "{}::{}".format(expression, _escape(self.type_))
+
+
+class Alias(Node):
+    """
+    An expression with an alias, eg ``count(1) as n``. The alias is either a name, or a :class:`Slot` (to be bound to an :class:`Identifier`).
+    """
+
+    def __init__(self, expression, alias):
+        self.expression = _node(expression)
+        self.alias = alias
+
+    def template(self):
+
+        alias = self.alias.template() if isinstance(self.alias, Node) else _escape(quote_identifier(self.alias))
+
+        return "{} as {}".format(self.expression.template(), alias)
+
+
+class Op(Node):
+    """
+    A binary operator, eg ``Op(Identifier("x"), ">", Literal(1))``.
+    """
+
+    def __init__(self, left, operator, right):
+        self.left = _node(left)
+        self.operator = operator
+        self.right = _node(right)
+
+    def template(self):
+        return "{} {} {}".format(self.left.template(), self.operator, self.right.template())
+
+
+class Row(Node):
+    """
+    A parenthesized, comma-separated list of expressions: a row constructor (eg for comparing several columns at once, as in ``(a, b) > (1, 2)``), or, with a single expression, just that expression in parentheses.
+    """
+
+    def __init__(self, *expressions):
+        self.expressions = [_node(e) for e in expressions]
+
+    def template(self):
+        return "({})".format(", ".join(e.template() for e in self.expressions))
+
+
+class FunctionScan(Node):
+    """
+    A set-returning function used as a relation, eg ``unnest(x) with ordinality as e(value, position)``.
+
+    :param Func func: The function call.
+    :param str alias: The alias of the relation.
+    :param list[str] columns: The names of its columns.
+    :param bool ordinality: Whether to add a column numbering the rows (as the last one).
+    """
+
+    def __init__(self, func, alias, columns, ordinality=False):
+        self.func = func
+        self.alias = alias
+        self.columns = list(columns)
+        self.ordinality = ordinality
+
+    def template(self):
+        return "{}{} as {}({})".format(self.func.template(), " with ordinality" if self.ordinality else "",
+                                       _escape(quote_identifier(self.alias)),
+                                       ", ".join(_escape(quote_identifier(c)) for c in self.columns))
+
+
+class From(Node):
+    """
+    Several relations in a ``FROM`` clause, separated by commas (so that a function scan can refer to the columns of the relations before it).
+    """
+
+    def __init__(self, *relations):
+        self.relations = [_node(r) for r in relations]
+
+    def template(self):
+        return ", ".join(r.template() for r in self.relations)
+
+
+class Join(Node):
+    """
+    A join of two relations, eg ``a left join b on a.x = b.x``.
+
+    :param left: The left relation.
+    :param right: The right relation.
+    :param on: The join condition.
+    :param str how: ``"inner"``, ``"left"``, ``"right"``, or ``"full"``.
+    """
+
+    def __init__(self, left, right, on, how="inner"):
+        self.left = _node(left)
+        self.right = _node(right)
+        self.on = _node(on)
+        self.how = how
+
+    def template(self):
+        return "{} {} join {} on {}".format(self.left.template(), self.how, self.right.template(), self.on.template())
+
+
+class Select(Node):
+    """
+    A ``SELECT`` statement.
+
+    :param list columns: The expressions to select.
+    :param None|Node|str from_: The relation to select from.
+    :param None|list where: Conditions, which are combined with ``and``.
+    :param None|list group_by: Expressions to group by.
+    :param None|list having: Conditions on the groups, which are combined with ``and``.
+    :param None|list order_by: Expressions to order by. Each is either an expression, or a pair ``(expression, ascending)``.
+    :param None|int|Node limit: The maximum number of rows.
+    :param bool distinct: Whether to select distinct rows only.
+    """
+
+    def __init__(self, columns, from_=None, where=None, group_by=None, having=None, order_by=None,
+                 limit=None, distinct=False):
+        self.columns = [_node(c) for c in columns]
+        self.from_ = _node(from_) if from_ is not None else None
+        self.where = [_node(c) for c in where or []]
+        self.group_by = [_node(c) for c in group_by or []]
+        self.having = [_node(c) for c in having or []]
+        self.order_by = [(_node(o[0]), o[1]) if isinstance(o, tuple) else (_node(o), True)
+                         for o in order_by or []]
+        self.limit = _node(limit) if limit is not None else None
+        self.distinct = distinct
+
+    def template(self):
+
+        sql = "select {}{}".format("distinct " if self.distinct else "",
+                                   ", ".join(c.template() for c in self.columns))
+
+        if self.from_ is not None:
+            sql += " from " + self.from_.template()
+
+        if self.where:
+            sql += " where " + " and ".join(c.template() for c in self.where)
+
+        if self.group_by:
+            sql += " group by " + ", ".join(c.template() for c in self.group_by)
+
+        if self.having:
+            sql += " having " + " and ".join(c.template() for c in self.having)
+
+        if self.order_by:
+            sql += " order by " + ", ".join(
+                expression.template() + ("" if ascending else " desc") for expression, ascending in self.order_by)
+
+        if self.limit is not None:
+            sql += " limit " + self.limit.template()
+
+        return sql
+
+
+class Subquery(Node):
+    """
+    A parenthesized statement with an alias, for use in a ``FROM`` clause.
+    """
+
+    def __init__(self, select, alias):
+        self.select = select
+        self.alias = alias
+
+    def template(self):
+        return "(\n{}\n){}".format(self.select.template(), _escape(quote_identifier(self.alias)))
+
+
+class Statement(object):
+    """
+    A compiled statement: a ``str.format`` template, in which the :class:`Slot` nodes are still to be filled in.
+
+    :param str template: The template.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def bind(self, **values):
+        """
+        Fills in the slots of this statement.
+
+        :param values: The value of each slot, by name. Nodes are rendered as SQL, and anything else is converted with ``str`` (and so is taken to be raw SQL).
+        :return: The SQL.
+        :rtype: str
+        """
+        return self.template.format(**{name: str(value) for name, value in values.items()})
+
+    def __repr__(self):
+        return "Statement({!r})".format(self.template)
+
+
+_shapes = {}
+_shapes_lock = threading.Lock()
+_max_shapes = 1024
+
+
+def shape(key, build):
+    """
+    Returns the compiled statement for a given shape, building and compiling it (with ``build``) only the first time that shape is seen.
+
+    :param tuple key: A (hashable) description of the shape, eg the operation along with any options that change the statement beyond the slots.
+    :param build: A function of no arguments returning the :class:`Node` of the statement.
+    :rtype: Statement
+    """
+
+    statement = _shapes.get(key)
+
+    if statement is None:
+        statement = build().compile()
+
+        with _shapes_lock:
+            if len(_shapes) >= _max_shapes:
+                _shapes.clear()
+
+            _shapes[key] = statement
+
+    return statement
@@ -0,0 +1,1100 @@
+"""
+The statements that :class:`pg_utils.table.Table` and :class:`pg_utils.column.Column` run. Each is compiled once per shape (see :func:`pg_utils.sql.shape`) and then only has its identifiers (and literals) bound on each call.
+"""
+import six
+
+from .base import Identifier, Slot, Literal, Raw, Func, WithinGroup, Window, Case, Cast, Alias, Row, FunctionScan, From, Join, Op, Select, Subquery, shape
+
+__all__ = ["relation", "select_columns", "count_rows", "aggregate", "duplicates", "describe_column",
+           "bin_counts", "table_exists", "column_metadata", "relation_size", "column_widths",
+           "relation_version", "rows_version", "current_snapshot", "count_range", "summarize_columns", "child_partitions", "value_counts", "count_distinct",
+           "distinct_statistics", "hyperloglog_registers", "profile_columns", "count_equal", "array_elements",
+           "describe_positions", "array_values", "box_whiskers", "values_outside", "column_ranges",
+           "pairwise_bin_counts", "resample", "resample_range", "aggregate_columns", "rolling",
+           "cumulative_sum", "rank", "difference"]
+
+
+def relation(source):
+    """
+    The ``FROM`` expression for a source: a table (whose name is quoted as need be), or a string of raw SQL (eg a ``TABLESAMPLE`` of a table).
+
+    :param pg_utils.table.Table|str source: The source.
+    :rtype: pg_utils.sql.Node
+    """
+
+    if isinstance(source, six.string_types):
+        return Raw(source)
+
+    return Identifier(source.schema, source.table_name)
+
+
+def _slots(prefix, n):
+    return [Slot("{}{}".format(prefix, i)) for i in range(n)]
+
+
+def _bind_names(prefix, names):
+    return {"{}{}".format(prefix, i): Identifier(name) for i, name in enumerate(names)}
+
+
+def select_columns(source, columns, order_by=None, limit=None, distinct=False, not_null=None, after=None, where=None,
+                   after_types=None, keys_as_text=False):
+    """
+    ``select <columns> from <source>``, optionally ``distinct``, filtered, ordered, and/or limited.
+
+    :param pg_utils.table.Table|str source: See :func:`relation`.
+    :param list[str] columns: The names of the columns.
+    :param None|list[tuple] order_by: Pairs ``(column_name, ascending)``.
+    :param None|int limit: The maximum number of rows.
+    :param bool distinct: Whether to select distinct rows.
+    :param None|list[str] not_null: The names of columns whose values must not be null.
+    :param None|list after: Values of the ``order_by`` columns: only the rows that come after them in that order are selected (ie keyset pagination). If every column is sorted the same way, this is a single row comparison, which an index on the columns can serve.
+    :param None|str where: An extra condition on the rows (as raw SQL).
+    :param None|list[str] after_types: The data types the values of ``after`` are cast to (so that they compare as values of their columns, eg a ``real`` rather than a ``numeric``). ``None`` leaves a value as it is.
+    :param bool keys_as_text: Whether to also select the ``order_by`` columns cast to ``text``, after ``columns`` (eg to page through the rows with ``after``, since the text of a value casts back to exactly that value).
+    :rtype: str
+    """
+
+    columns = list(columns)
+    order_by = list(order_by or [])
+    not_null = list(not_null or [])
+    directions = tuple(ascending for _, ascending in order_by)
+
+    def build():
+
+        keys = _slots("o", len(order_by))
+        conditions = [Op(slot, "is not", Raw("null")) for slot in _slots("n", len(not_null))]
+
+        if after is not None:
+            conditions.append(_keyset_condition(keys, _slots("a", len(order_by)), directions))
+
+        if where is not None:
+            conditions.append(Slot("where"))
+
+        selected = _slots("c", len(columns)) + ([Cast(key, "text") for key in keys] if keys_as_text else [])
+
+        return Select(selected, from_=Slot("source"), where=conditions,
+                      order_by=list(zip(keys, directions)),
+                      limit=Slot("limit") if limit is not None else None,
+                      distinct=distinct)
+
+    statement = shape(("select", len(columns), directions, limit is not None, distinct, len(not_null),
+                       after is not None, where is not None, keys_as_text), build)
+
+    values = _bind_names("c", columns)
+    values.update(_bind_names("o", [name for name, _ in order_by]))
+    values.update(_bind_names("n", not_null))
+    values.update({"a{}".format(i): Cast(Literal(value), type_) if type_ is not None else Literal(value)
+                   for i, (value, type_) in enumerate(zip(after or [], after_types or [None] * len(after or [])))})
+
+    return statement.bind(source=relation(source), limit=Literal(limit), where="({})".format(where), **values)
+
+
+def _keyset_condition(keys, values, directions):
+
+    def compare(key, value, ascending):
+        return Op(key, ">" if ascending else "<", value)
+
+    if len(set(directions)) == 1:
+        return compare(Row(*keys), Row(*values), directions[0])
+
+    # with mixed directions, a row comparison won't do: (k0 > v0) or (k0 = v0 and k1 < v1) or ...
+    terms = []
+
+    for i, ascending in enumerate(directions):
+        term = compare(keys[i], values[i], ascending)
+
+        for key, value in reversed(list(zip(keys[:i], values[:i]))):
+            term = Op(Op(key, "=", value), "and", term)
+
+        terms.append(Row(term))
+
+    condition = terms[0]
+
+    for term in terms[1:]:
+        condition = Op(condition, "or", term)
+
+    return Row(condition)
+
+
+def count_rows(source):
+    """
+    ``select count(1) from <source>``
+
+    :rtype: str
+    """
+    return shape(("count",), lambda: Select([Func("count", Literal(1))], from_=Slot("source"))) \
+        .bind(source=relation(source))
+
+
+def aggregate(source, function, column):
+    """
+    ``select <function>(<column>) from <source>``
+
+    :param str function: The name of the aggregate function (eg ``"avg"``).
+    :rtype: str
+    """
+    return shape(("aggregate", function), lambda: Select([Func(function, Slot("column"))], from_=Slot("source"))) \
+        .bind(source=relation(source), column=Identifier(column))
+
+
+def duplicates(source, column):
+    """
+    The values of a column that appear more than once.
+
+    :rtype: str
+    """
+
+    statement = shape(("duplicates",), lambda: Select(
+        [Slot("column")], from_=Slot("source"), group_by=[Literal(1)],
+        having=[Op(Func("count", Literal(1)), ">", Literal(1))]
+    ))
+
+    return statement.bind(source=relation(source), column=Identifier(column))
+
+
+def _percentile_alias(percentile):
+    return "pct_" + str(percentile).replace("0.", "")
+
+
+def describe_column(source, column, data_type, percentiles, suffix="cont"):
+    """
+    The description of a (numeric) column: its name, count, mean, standard deviation, minimum, percentiles, and maximum.
+
+    :param str column: The name of the column.
+    :param str data_type: The data type of the column.
+    :param list[float] percentiles: The percentiles.
+    :param str suffix: ``"cont"`` or ``"disc"``, for continuous or discrete percentiles.
+    :rtype: str
+    """
+
+    percentiles = tuple(percentiles)
+
+    def build():
+        column_ = Slot("column")
+
+        return Select(
+            [Alias(Slot("name"), "column_name"),
+             Alias(Func("count", column_), "count"),
+             Alias(Func("avg", column_), "mean"),
+             Alias(Func("stddev_samp", column_), "std_dev"),
+             Alias(Func("min", column_), "minimum")] +
+            [Alias(WithinGroup(Func("percentile_" + suffix, Literal(p)), column_), _percentile_alias(p))
+             for p in percentiles] +
+            [Alias(Func("max", column_), "maximum")],
+            from_=Slot("source")
+        )
+
+    return shape(("describe", data_type, percentiles, suffix), build) \
+        .bind(source=relation(source), column=Identifier(column), name=Literal(column))
+
+
+def bin_counts(source, column, bins, minimum, maximum, where=None):
+    """
+    The counts of the (non-null) values of a column in ``bins`` equal-width bins between ``minimum`` and ``maximum``, with the endpoints of each bin.
+
+    :param None|str where: An extra condition on the rows (as raw SQL).
+    :rtype: str
+    """
+
+    def build():
+        bucket = Identifier("bucket")
+        bin_width = Slot("bin_width")
+
+        buckets = Select(
+            [Alias(Func("width_bucket", Cast(Slot("column"), "numeric"), Slot("minimum"), Slot("maximum"),
+                        Cast(Slot("bins"), "int")), "bucket")],
+            from_=Slot("source"),
+            where=[Op(Slot("column"), "is not", Raw("null"))] + ([Slot("where")] if where is not None else [])
+        )
+
+        return Select(
+            [bucket,
+             Alias(Cast(Op(Slot("minimum"), "+", Op(Raw("(bucket - 1)"), "*", bin_width)), "double precision"),
+                   "left_endpoint"),
+             Alias(Cast(Op(Slot("minimum"), "+", Op(bucket, "*", bin_width)), "double precision"),
+                   "right_endpoint"),
+             Alias(Func("count", Literal(1)), "num_points")],
+            from_=Subquery(buckets, "hist"),
+            group_by=[Literal(1), Literal(2), Literal(3)],
+            order_by=[Literal(1)]
+        )
+
+    # the bounds of numeric columns are Decimals, which don't mix with floats
+    minimum, maximum = float(minimum), float(maximum)
+
+    return shape(("bin_counts", where is not None), build).bind(
+        source=relation(source), column=Identifier(column), bins=Literal(bins), where="({})".format(where),
+        minimum=Literal(minimum), maximum=Literal(maximum),
+        bin_width=Literal((maximum - minimum) / float(bins))
+    )
+
+
+def table_exists(schema, table_name):
+    """
+    Counts the tables with the given schema and name (ie ``1`` if the table exists, and ``0`` otherwise).
+
+    :rtype: str
+    """
+
+    statement = shape(("table_exists",), lambda: Select(
+        [Func("count", Literal(1))], from_=Identifier("information_schema", "tables"),
+        where=[Op(Identifier("table_schema"), "=", Slot("schema")),
+               Op(Identifier("table_name"), "=", Slot("table_name"))]
+    ))
+
+    return statement.bind(schema=Literal(schema), table_name=Literal(table_name))
+
+
+def column_metadata(schema, table_name):
+    """
+    The name and data type of each column of a table, in order. Array types are given as the element type followed by ``[]`` (eg ``float[]``), and ``citext`` (which ``information_schema`` reports as ``USER-DEFINED``, like every type from an extension) by its own name.
+
+    :rtype: str
+    """
+
+    def build():
+        columns = Select(
+            [Identifier("column_name"), Identifier("data_type"),
+             Alias(Func("translate", Identifier("udt_name"), Literal("0123456789_"), Literal("")), "column_alias"),
+             Identifier("ordinal_position")],
+            from_=Identifier("information_schema", "columns"),
+            where=[Op(Identifier("table_schema"), "=", Slot("schema")),
+                   Op(Identifier("table_name"), "=", Slot("table_name"))]
+        )
+
+        return Select(
+            [Identifier("column_name"),
+             Alias(Raw("case when lower(data_type) = 'array' then column_alias||'[]' "
+                       "when data_type = 'USER-DEFINED' and column_alias = 'citext' then column_alias "
+                       "else data_type end"),
+                   "data_type")],
+            from_=Subquery(columns, "a"),
+            order_by=[Identifier("ordinal_position")]
+        )
+
+    return shape(("column_metadata",), build).bind(schema=Literal(schema), table_name=Literal(table_name))
+
+
+def relation_size(source):
+    """
+    The planner's estimate of the number of rows of a table (``reltuples``, which is ``-1`` if it's never been analyzed), along with its number of pages.
+
+    :param pg_utils.table.Table source: The table.
+    :rtype: str
+    """
+
+    statement = shape(("relation_size",), lambda: Select(
+        [Identifier("reltuples"), Identifier("relpages")], from_=Identifier("pg_class"),
+        where=[Op(Identifier("oid"), "=", Cast(Slot("relation"), "regclass"))]
+    ))
+
+    return statement.bind(relation=Literal(str(relation(source))))
+
+
+def column_widths(schema, table_name):
+    """
+    The average width (in bytes) of the values of each analyzed column of a table, from ``pg_stats``.
+
+    :rtype: str
+    """
+
+    statement = shape(("column_widths",), lambda: Select(
+        [Identifier("attname"), Identifier("avg_width")], from_=Identifier("pg_stats"),
+        where=[Op(Identifier("schemaname"), "=", Slot("schema")),
+               Op(Identifier("tablename"), "=", Slot("table_name"))]
+    ))
+
+    return statement.bind(schema=Literal(schema), table_name=Literal(table_name))
+
+
+def relation_version(source):
+    """
+    What changes when the contents of a table do: its ``relfilenode`` (which changes when it's rewritten, eg by ``truncate``), and the cumulative numbers of rows inserted, updated, and deleted, from ``pg_stat_all_tables`` and (for the current transaction) the ``pg_stat_get_xact_*`` functions.
+
+    :param pg_utils.table.Table source: The table.
+    :rtype: str
+    """
+
+    def build():
+        stat = lambda name: Func("coalesce", Identifier("s", name), Literal(0))
+
+        return Select(
+            [Identifier("c", "oid"), Identifier("c", "relfilenode"),
+             stat("n_tup_ins"), stat("n_tup_upd"), stat("n_tup_del")] +
+            [Func("pg_stat_get_xact_tuples_" + name, Identifier("c", "oid"))
+             for name in ["inserted", "updated", "deleted"]],
+            from_=Raw("pg_class c left join pg_stat_all_tables s on s.relid = c.oid"),
+            where=[Op(Identifier("c", "oid"), "=", Cast(Slot("relation"), "regclass"))]
+        )
+
+    return shape(("relation_version",), build).bind(relation=Literal(str(relation(source))))
+
+
+def rows_version(source):
+    """
+    What changes when the contents of a table do, taken from the rows themselves (in a scan, but with nothing but one row fetched): the number of rows, and the sum of a hash of each row version's ``ctid`` and ``xmin``. Every insert, update, or delete adds or removes a row version, and so changes the sum (barring a hash collision), whatever order the transactions involved commit in. Unlike :func:`relation_version`, which relies on the cumulative statistics, every committed change, and every change of the current transaction, shows up.
+
+    :param pg_utils.table.Table|str source: See :func:`relation`.
+    :rtype: str
+    """
+
+    statement = shape(("rows_version",), lambda: Select(
+        [Func("count", Literal(1)),
+         Func("coalesce", Func("sum", Func("hashtext", Op(Cast(Identifier("ctid"), "text"), "||",
+                                                          Cast(Identifier("xmin"), "text")))), Literal(0))],
+        from_=Slot("source")
+    ))
+
+    return statement.bind(source=relation(source))
+
+
+def current_snapshot():
+    """
+    The oldest transaction that's still running (``xmin``), and the first transaction that hasn't been assigned yet (``xmax``), as of the statement's snapshot. Once ``xmin`` reaches the ``xmax`` of an earlier snapshot, every transaction that was running then has finished.
+
+    :rtype: str
+    """
+
+    return shape(("current_snapshot",), lambda: Select(
+        [Func("txid_snapshot_" + bound, Func("txid_current_snapshot")) for bound in ["xmin", "xmax"]]
+    )).bind()
+
+
+def count_range(source, column, after=None, until=None):
+    """
+    ``select count(1) from <source> where <column> > <after> and <column> <= <until>``, leaving out either bound that's ``None``.
+
+    :param pg_utils.table.Table|str source: See :func:`relation`.
+    :param str column: The name of the column.
+    :rtype: str
+    """
+
+    def build():
+        conditions = []
+
+        if after is not None:
+            conditions.append(Op(Slot("column"), ">", Slot("after")))
+
+        if until is not None:
+            conditions.append(Op(Slot("column"), "<=", Slot("until")))
+
+        return Select([Func("count", Literal(1))], from_=Slot("source"), where=conditions)
+
+    return shape(("count_range", after is not None, until is not None), build) \
+        .bind(source=relation(source), column=Identifier(column), after=Literal(after), until=Literal(until))
+
+
+def summarize_columns(source, columns, watermark=None, after=None, resolution=200, where=None, until=None):
+    """
+    Mergeable summaries of some (numeric) columns over the rows whose watermark is past ``after`` (and at most ``until``), or over every row, if both are ``None``: for each column, its count, sum, population variance, minimum, maximum, and ``resolution + 1`` evenly spaced quantiles (as an array), followed by the number of rows, and the greatest watermark. Everything is computed in ``double precision``.
+
+    :param pg_utils.table.Table|str source: See :func:`relation`.
+    :param list[str] columns: The names of the columns.
+    :param None|str watermark: The name of the watermark column. If ``None``, every row is summarized (and the greatest watermark is ``null``).
+    :param after: The last watermark already summarized (if any).
+    :param until: The greatest watermark to summarize (if any).
+    :param None|str where: An extra condition on the rows (as raw SQL).
+    :param int resolution: The number of intervals between the quantiles.
+    :rtype: str
+    """
+
+    columns = list(columns)
+
+    def build():
+        positions = Raw("array[{}]::float8[]".format(", ".join(repr(i / float(resolution))
+                                                                for i in range(resolution + 1))))
+        expressions = []
+
+        for slot in _slots("c", len(columns)):
+            value = Cast(slot, "float8")
+
+            expressions += [Func("count", slot), Func("sum", value), Func("var_pop", value),
+                            Func("min", value), Func("max", value),
+                            WithinGroup(Func("percentile_cont", positions), value)]
+
+        conditions = [Slot("where")] if where is not None else []
+
+        if after is not None:
+            conditions.append(Op(Slot("watermark"), ">", Slot("after")))
+
+        if until is not None:
+            conditions.append(Op(Slot("watermark"), "<=", Slot("until")))
+
+        latest = Func("max", Slot("watermark")) if watermark is not None else Literal(None)
+
+        return Select(expressions + [Func("count", Literal(1)), latest], from_=Slot("source"), where=conditions)
+
+    statement = shape(("summarize", len(columns), watermark is not None, after is not None, resolution,
+                       where is not None, until is not None), build)
+
+    return statement.bind(source=relation(source), watermark=Identifier(watermark or ""), after=Literal(after),
+                          until=Literal(until), where="({})".format(where), **_bind_names("c", columns))
+
+
+def child_partitions(source):
+    """
+    The direct partitions of a (partitioned) table, from ``pg_inherits``: the schema and name of each, its ``relkind`` (``"p"`` for a partition that's itself partitioned), and its partition bound (as SQL).
+
+    :param pg_utils.table.Table source: The table.
+    :rtype: str
+    """
+
+    statement = shape(("child_partitions",), lambda: Select(
+        [Identifier("n", "nspname"), Identifier("c", "relname"), Identifier("c", "relkind"),
+         Func("pg_get_expr", Identifier("c", "relpartbound"), Identifier("c", "oid"))],
+        from_=Raw("pg_inherits i join pg_class c on c.oid = i.inhrelid "
+                  "join pg_namespace n on n.oid = c.relnamespace"),
+        where=[Op(Identifier("i", "inhparent"), "=", Cast(Slot("relation"), "regclass"))],
+        order_by=[Literal(1), Literal(2)]
+    ))
+
+    return statement.bind(relation=Literal(str(relation(source))))
+
+
+def value_counts(source, column, top=None, dropna=True):
+    """
+    The distinct values of a column with the number of rows holding each, most common first (with ties broken by value), along with the total number of rows that were counted (ie over every value, not only the ``top`` ones).
+
+    :param str column: The name of the column.
+    :param None|int top: The number of values to return (or ``None`` for all of them).
+    :param bool dropna: Whether to leave nulls out.
+    :rtype: str
+    """
+
+    statement = shape(("value_counts", top is not None, dropna), lambda: Select(
+        [Slot("column"), Alias(Func("count", Literal(1)), "count"),
+         Alias(Raw("sum(count(1)) over ()"), "total")],
+        from_=Slot("source"),
+        where=[Op(Slot("column"), "is not", Raw("null"))] if dropna else None,
+        group_by=[Literal(1)],
+        order_by=[(Literal(2), False), Literal(1)],
+        limit=Slot("top") if top is not None else None
+    ))
+
+    return statement.bind(source=relation(source), column=Identifier(column), top=Literal(top))
+
+
+def count_distinct(source, column):
+    """
+    The exact number of distinct (non-null) values of a column, and whether it holds any nulls.
+
+    :rtype: str
+    """
+
+    statement = shape(("count_distinct",), lambda: Select(
+        [Func("count", Slot("column"), distinct=True),
+         Func("coalesce", Func("bool_or", Op(Slot("column"), "is", Raw("null"))), Raw("false"))],
+        from_=Slot("source")
+    ))
+
+    return statement.bind(source=relation(source), column=Identifier(column))
+
+
+def distinct_statistics(schema, table_name, column):
+    """
+    The planner's statistics on the distinct values of a column, from ``pg_stats``: ``n_distinct`` (which, if negative, is minus the fraction of rows that are distinct), and ``null_frac``, along with the table's ``reltuples``. There are no rows if the column has never been analyzed (and, for a table with children, the statistics of the whole tree come first).
+
+    :rtype: str
+    """
+
+    statement = shape(("distinct_statistics",), lambda: Select(
+        [Identifier("s", "n_distinct"), Identifier("s", "null_frac"), Identifier("c", "reltuples")],
+        from_=Raw("pg_stats s join pg_namespace n on n.nspname = s.schemaname "
+                  "join pg_class c on c.relnamespace = n.oid and c.relname = s.tablename"),
+        where=[Op(Identifier("s", "schemaname"), "=", Slot("schema")),
+               Op(Identifier("s", "tablename"), "=", Slot("table_name")),
+               Op(Identifier("s", "attname"), "=", Slot("column"))],
+        order_by=[(Identifier("s", "inherited"), False)]
+    ))
+
+    return statement.bind(schema=Literal(schema), table_name=Literal(table_name), column=Literal(column))
+
+
+def hyperloglog_registers(source, column, precision=14):
+    """
+    The registers of a HyperLogLog sketch of the values of a column, computed by the server: each value's text is hashed (with ``hashtext``) to 32 bits, the low ``precision`` bits of which pick a register, and the rest of which give the value's rank (one more than their number of leading zeros). Only the registers that are set are returned, as pairs ``(register, greatest_rank)``, along with a pair of nulls if the column holds any nulls.
+
+    :param str column: The name of the column.
+    :param int precision: The number of bits that pick a register (so there are ``2 ** precision`` of them).
+    :rtype: str
+    """
+
+    def build():
+
+        hashed = Select(
+            [Alias(Op(Cast(Func("hashtext", Cast(Slot("column"), "text")), "bigint"), "&", Literal(2 ** 32 - 1)),
+                   "h")],
+            from_=Slot("source")
+        )
+
+        # the rank is found from the bit length of what's left of the hash once the register bits are shifted out
+        rest = Cast(Op(Identifier("h"), ">>", Slot("precision")), "bit(32)")
+        bit_length = Func("length", Func("ltrim", Cast(rest, "text"), Literal("0")))
+
+        ranks = Select(
+            [Alias(Op(Identifier("h"), "&", Slot("mask")), "register"),
+             Alias(Op(Op(Slot("bits"), "-", bit_length), "+", Literal(1)), "rank")],
+            from_=Subquery(hashed, "hashed")
+        )
+
+        return Select([Identifier("register"), Func("max", Identifier("rank"))], from_=Subquery(ranks, "ranks"),
+                      group_by=[Literal(1)])
+
+    return shape(("hyperloglog_registers",), build).bind(
+        source=relation(source), column=Identifier(column), precision=Literal(precision),
+        mask=Literal(2 ** precision - 1), bits=Literal(32 - precision)
+    )
+
+
+# there's no ``timetz - timetz`` operator
+_timetz_types = ["time with time zone", "timetz"]
+
+
+def profile_columns(source, columns, percentiles, suffix="cont", data_types=None):
+    """
+    Summaries of columns of any kind (see :func:`pg_utils.dtypes.kind`), all in one scan, as a single row. For each column, in order, there's its count, followed by:
+
+    * for numbers: the mean, standard deviation, minimum, percentiles, and maximum;
+    * for text: the number of distinct values and the most common one;
+    * for temporal values: the minimum, maximum, and the range between them (which is null for ``time with time zone`` values, since they can't be subtracted);
+    * for booleans: the fraction that are true;
+    * for arrays: the minimum, mean, median, and maximum number of elements;
+    * for anything else: nothing more.
+
+    :param list[tuple[str, str]] columns: Pairs ``(column_name, kind)``.
+    :param list[float] percentiles: The percentiles (of numbers).
+    :param str suffix: ``"cont"`` or ``"disc"``, for continuous or discrete percentiles.
+    :param None|list[str] data_types: The data type of each column, in the same order (needed to tell ``time with time zone`` columns apart from other temporal ones).
+    :rtype: str
+    """
+
+    kinds = tuple(k for _, k in columns)
+    percentiles = tuple(percentiles)
+    no_range = tuple(data_type in _timetz_types for data_type in data_types or [None] * len(kinds))
+
+    def summaries(column, kind, no_range):
+
+        if kind == "number":
+            return [Func("avg", column), Func("stddev_samp", column), Func("min", column)] + \
+                   [WithinGroup(Func("percentile_" + suffix, Literal(p)), column) for p in percentiles] + \
+                   [Func("max", column)]
+
+        if kind == "text":
+            return [Func("count", column, distinct=True), WithinGroup(Func("mode"), column)]
+
+        if kind == "temporal":
+            return [Func("min", column), Func("max", column),
+                    Raw("null::interval") if no_range else Op(Func("max", column), "-", Func("min", column))]
+
+        if kind == "boolean":
+            return [Func("avg", Cast(column, "int"))]
+
+        if kind == "array":
+            length = Func("cardinality", column)
+
+            return [Func("min", length), Func("avg", length),
+                    WithinGroup(Func("percentile_cont", Literal(0.5)), length), Func("max", length)]
+
+        return []
+
+    def build():
+
+        expressions = []
+
+        for column, kind, without_range in zip(_slots("c", len(kinds)), kinds, no_range):
+            expressions += [Func("count", column)] + summaries(column, kind, without_range)
+
+        return Select(expressions, from_=Slot("source"))
+
+    return shape(("profile", kinds, percentiles, suffix, no_range), build) \
+        .bind(source=relation(source), **_bind_names("c", [name for name, _ in columns]))
+
+
+def count_equal(source, columns):
+    """
+    For each of some columns, the number of rows in which it's equal to a given value (all in one scan).
+
+    :param list[tuple[str, object]] columns: Pairs ``(column_name, value)``.
+    :rtype: str
+    """
+
+    statement = shape(("count_equal", len(columns)), lambda: Select(
+        [Func("count", Func("nullif", Op(column, "=", value), Raw("false")))
+         for column, value in zip(_slots("c", len(columns)), _slots("v", len(columns)))],
+        from_=Slot("source")
+    ))
+
+    values = _bind_names("c", [name for name, _ in columns])
+    values.update({"v{}".format(i): Literal(value) for i, (_, value) in enumerate(columns)})
+
+    return statement.bind(source=relation(source), **values)
+
+
+def array_elements(source, column):
+    """
+    A ``FROM`` expression for the elements of an array column, unnested by the server: a relation with a row for each element of each array, holding the element (``value``) and its (one-based) ``position`` within its array. Elements of multidimensional arrays are taken in storage order.
+
+    :param pg_utils.table.Table|str source: See :func:`relation`.
+    :param str column: The name of the (array) column.
+    :rtype: str
+    """
+
+    statement = shape(("array_elements",), lambda: Subquery(
+        Select([Identifier("e", "value"), Identifier("e", "position")],
+               from_=From(Slot("source"), FunctionScan(Func("unnest", Slot("column")), "e", ["value", "position"],
+                                                       ordinality=True))),
+        "elements"
+    ))
+
+    return statement.bind(source=relation(source), column=Identifier(column))
+
+
+def describe_positions(source, percentiles, suffix="cont"):
+    """
+    The description of the elements at each position of an array column, from its :func:`array_elements`: for each position, the count, mean, standard deviation, minimum, percentiles, and maximum of its elements.
+
+    :param str source: The ``FROM`` expression of the elements (see :func:`array_elements`).
+    :param list[float] percentiles: The percentiles.
+    :param str suffix: ``"cont"`` or ``"disc"``, for continuous or discrete percentiles.
+    :rtype: str
+    """
+
+    percentiles = tuple(percentiles)
+
+    def build():
+        value = Identifier("value")
+
+        return Select(
+            [Identifier("position"), Func("count", value), Func("avg", value), Func("stddev_samp", value),
+             Func("min", value)] +
+            [WithinGroup(Func("percentile_" + suffix, Literal(p)), value) for p in percentiles] +
+            [Func("max", value)],
+            from_=Slot("source"),
+            group_by=[Literal(1)],
+            order_by=[Literal(1)]
+        )
+
+    return shape(("describe_positions", percentiles, suffix), build).bind(source=relation(source))
+
+
+def array_values(source, column, element_type=None, limit=None):
+    """
+    ``select <column> from <source>``, with the arrays cast to arrays of another element type (if any).
+
+    :param str column: The name of the (array) column.
+    :param None|str element_type: The element type to cast to (eg ``"double precision"``).
+    :param None|int limit: The maximum number of rows.
+    :rtype: str
+    """
+
+    statement = shape(("array_values", element_type, limit is not None), lambda: Select(
+        [Cast(Slot("column"), element_type + "[]") if element_type is not None else Slot("column")],
+        from_=Slot("source"),
+        limit=Slot("limit") if limit is not None else None
+    ))
+
+    return statement.bind(source=relation(source), column=Identifier(column), limit=Literal(limit))
+
+
+def box_whiskers(source, column, low, high):
+    """
+    The ends of the whiskers of a box plot of a column: the smallest value that is at least ``low``, the largest that is at most ``high``, and the number of values outside of ``[low, high]``.
+
+    :param float low: The lowest value the lower whisker can reach.
+    :param float high: The highest value the upper whisker can reach.
+    :rtype: str
+    """
+
+    def build():
+        column_ = Slot("column")
+        outside = Op(Op(column_, "<", Slot("low")), "or", Op(column_, ">", Slot("high")))
+
+        return Select([Func("min", column_, filter_=Op(column_, ">=", Slot("low"))),
+                       Func("max", column_, filter_=Op(column_, "<=", Slot("high"))),
+                       Func("count", column_, filter_=outside)],
+                      from_=Slot("source"))
+
+    return shape(("box_whiskers",), build).bind(source=relation(source), column=Identifier(column),
+                                                 low=Literal(low), high=Literal(high))
+
+
+def values_outside(source, column, low, high, limit):
+    """
+    ``select <column> from <source> where <column> < low or <column> > high limit <limit>`` (eg the outliers of a box plot).
+
+    :param int limit: The maximum number of values.
+    :rtype: str
+    """
+
+    def build():
+        column_ = Slot("column")
+
+        return Select([column_], from_=Slot("source"),
+                      where=[Row(Op(Op(column_, "<", Slot("low")), "or", Op(column_, ">", Slot("high"))))],
+                      limit=Slot("limit"))
+
+    return shape(("values_outside",), build).bind(source=relation(source), column=Identifier(column),
+                                                   low=Literal(low), high=Literal(high), limit=Literal(limit))
+
+
+def column_ranges(source, columns):
+    """
+    ``select count(1), min(<column 1>), max(<column 1>), ... from <source>``: the number of rows, and the minimum and maximum of each column, in a single scan.
+
+    :param list[str] columns: The names of the columns.
+    :rtype: str
+    """
+
+    columns = list(columns)
+
+    def build():
+        selected = [Func("count", Literal(1))]
+
+        for i in range(len(columns)):
+            selected += [Func("min", Slot("c{}".format(i))), Func("max", Slot("c{}".format(i)))]
+
+        return Select(selected, from_=Slot("source"))
+
+    return shape(("column_ranges", len(columns)), build).bind(
+        source=relation(source), **{"c{}".format(i): Identifier(c) for i, c in enumerate(columns)})
+
+
+def pairwise_bin_counts(source, columns, bins, minimums, maximums):
+    """
+    The 1-D bin counts of each of several columns, and the 2-D bin counts of each pair of them, in a single scan (with ``grouping sets``). Each column is split into ``bins`` equal-width bins between its minimum and maximum, numbered from 0. Values outside of that range are counted in the first or last bin.
+
+    Each row of the result holds ``grouping(b<i>)`` for each column (0 for the columns whose bins it counts, and 1 for the others), then the bin of each column (``b<i>``, or null if it isn't counted, or for null values), and the count.
+
+    :param list[str] columns: The names of the (numeric) columns.
+    :param int bins: The number of bins of each column.
+    :param list[float] minimums: The minimum of each column.
+    :param list[float] maximums: The maximum of each column.
+    :rtype: str
+    """
+
+    columns = list(columns)
+    k = len(columns)
+
+    def build():
+        buckets = [Identifier("b{}".format(i)) for i in range(k)]
+
+        # with an array of the inner edges, width_bucket gives the number of edges below a value (and so clamps it)
+        binned = Select(
+            [Alias(Func("width_bucket", Cast(Slot("c{}".format(i)), "double precision"), Slot("edges{}".format(i))),
+                   "b{}".format(i)) for i in range(k)],
+            from_=Slot("source")
+        )
+
+        sets = ["(b{})".format(i) for i in range(k)] + \
+               ["(b{}, b{})".format(i, j) for i in range(k) for j in range(i + 1, k)]
+
+        return Select(
+            [Func("grouping", b) for b in buckets] + buckets + [Func("count", Literal(1))],
+            from_=Subquery(binned, "buckets"),
+            group_by=[Raw("grouping sets ({})".format(", ".join(sets)))]
+        )
+
+    values = {}
+
+    for i, (column, minimum, maximum) in enumerate(zip(columns, minimums, maximums)):
+        width = (maximum - minimum) / float(bins)
+        edges = [str(Literal(float(minimum + b * width))) for b in range(1, bins)]
+
+        values.update({"c{}".format(i): Identifier(column),
+                       "edges{}".format(i): Raw("array[{}]::double precision[]".format(", ".join(edges)))})
+
+    return shape(("pairwise_bin_counts", k), build).bind(source=relation(source), **values)
+
+
+# the aggregates of resample (and of views, see aggregate_columns), by name
+resample_aggregates = {
+    "mean": lambda column: Cast(Func("avg", column), "double precision"),
+    "sum": lambda column: Func("sum", column),
+    "min": lambda column: Func("min", column),
+    "max": lambda column: Func("max", column),
+    "count": lambda column: Func("count", column),
+    "nunique": lambda column: Func("count", column, distinct=True),
+    "std": lambda column: Cast(Func("stddev_samp", column), "double precision"),
+    "var": lambda column: Cast(Func("var_samp", column), "double precision"),
+    "median": lambda column: Cast(WithinGroup(Func("percentile_cont", Literal(0.5)), column), "double precision"),
+}
+
+# the aggregates that are 0 (rather than null) for buckets without any rows
+_additive_aggregates = ["sum", "count", "nunique"]
+
+
+def _time_bucket(time, function, width, origin, time_type):
+
+    if function == "date_trunc":
+        return Func("date_trunc", width, Cast(time, time_type))
+
+    return Func("date_bin", Cast(width, "interval"), Cast(time, time_type), Cast(origin, time_type))
+
+
+def resample(source, time_column, aggregates, bucket, time_type="timestamp", start=None, end=None, where=None,
+             fill=False, first=None, last=None):
+    """
+    The aggregates of columns over time buckets (as for ``pandas.DataFrame.resample``): the rows are grouped by the bucket that their time falls in, and each row of the result holds a bucket (the start of it, as ``bucket``) and the aggregates (as ``a0``, ``a1``, ...), in order of time.
+
+    :param str time_column: The name of the time column.
+    :param list[(str, str)] aggregates: The aggregates, as pairs of a column and one of ``"mean"``, ``"sum"``, ``"min"``, ``"max"``, ``"count"``, ``"nunique"``, ``"std"``, ``"var"``, and ``"median"``.
+    :param tuple bucket: The buckets: either ``("date_trunc", <unit>, None)`` (eg ``"hour"``), or ``("date_bin", <interval>, <origin>)`` (eg ``"15 minutes"``, and the timestamp the buckets are aligned to).
+    :param str time_type: The type the times are cast to (``"timestamp"`` or ``"timestamptz"``).
+    :param None|datetime.datetime start: The earliest time of the rows to aggregate.
+    :param None|datetime.datetime end: The time before which the rows are aggregated.
+    :param None|str where: An extra condition on the rows (as raw SQL).
+    :param bool fill: Whether to fill the gaps between buckets: each bucket between ``first`` and ``last`` is then in the result (via ``generate_series``), with null aggregates (or 0 for sums and counts) if it has no rows.
+    :param None|datetime.datetime first: With ``fill``, the first bucket (defaulting to the first with any rows).
+    :param None|datetime.datetime last: With ``fill``, the last bucket (defaulting to the last with any rows). Buckets from ``end`` on are left out.
+    :rtype: str
+    """
+
+    hows = tuple(how for _, how in aggregates)
+    function = bucket[0]
+
+    def build():
+        time = Slot("time")
+        conditions = [Op(time, "is not", Raw("null"))] + \
+            ([Op(time, ">=", Slot("start"))] if start is not None else []) + \
+            ([Op(time, "<", Slot("end"))] if end is not None else []) + \
+            ([Slot("where")] if where is not None else [])
+
+        return Select(
+            [Alias(_time_bucket(time, function, Slot("width"), Slot("origin"), time_type), "bucket")] +
+            [Alias(resample_aggregates[how](Slot("c{}".format(i))), "a{}".format(i)) for i, how in enumerate(hows)],
+            from_=Slot("source"),
+            where=conditions,
+            group_by=[Literal(1)],
+            order_by=[Literal(1)]
+        )
+
+    values = dict(source=relation(source), time=Identifier(time_column), width=Literal(bucket[1]),
+                  origin=Literal(bucket[2]), start=Literal(start), end=Literal(end), where="({})".format(where),
+                  **{"c{}".format(i): Identifier(column) for i, (column, _) in enumerate(aggregates)})
+
+    statement = shape(("resample", hows, function, time_type, start is not None, end is not None,
+                       where is not None), build)
+    query = statement.bind(**values)
+
+    if not fill:
+        return query
+
+    def build_filled():
+        buckets = Identifier("s", "bucket")
+        step = Cast(Slot("step"), "interval")
+        series = FunctionScan(Func("generate_series", Slot("first"), Slot("last"), step), "s", ["bucket"])
+
+        columns = [buckets]
+
+        for i, how in enumerate(hows):
+            column = Identifier("r", "a{}".format(i))
+            columns.append(Alias(Func("coalesce", column, Literal(0)) if how in _additive_aggregates else column,
+                                 "a{}".format(i)))
+
+        return Select(
+            columns,
+            from_=Join(series, Raw("resampled r"), Op(Identifier("r", "bucket"), "=", buckets), how="left"),
+            where=[Op(buckets, "<", Slot("end"))] if end is not None else None,
+            order_by=[Literal(1)]
+        )
+
+    filled = shape(("resample_filled", hows, end is not None), build_filled).bind(
+        step=Literal(bucket[1] if function == "date_bin" else "1 " + bucket[1]),
+        first=Cast(Literal(first), time_type) if first is not None else Raw("(select min(bucket) from resampled)"),
+        last=Cast(Literal(last), time_type) if last is not None else Raw("(select max(bucket) from resampled)"),
+        end=Cast(Literal(end), time_type)
+    )
+
+    return "with resampled as (\n{}\n)\n{}".format(query, filled)
+
+
+def resample_range(source, time_column, bucket, time_type="timestamp", where=None):
+    """
+    The first time bucket of a column (see :func:`resample`), and its latest time: ``select <bucket of min(time)>, max(time) from <source>``.
+
+    :param None|str where: An extra condition on the rows (as raw SQL).
+    :rtype: str
+    """
+
+    function = bucket[0]
+
+    def build():
+        time = Slot("time")
+
+        return Select([_time_bucket(Func("min", time), function, Slot("width"), Slot("origin"), time_type),
+                       Func("max", time)],
+                      from_=Slot("source"),
+                      where=[Slot("where")] if where is not None else None)
+
+    return shape(("resample_range", function, time_type, where is not None), build).bind(
+        source=relation(source), time=Identifier(time_column), width=Literal(bucket[1]), origin=Literal(bucket[2]),
+        where="({})".format(where)
+    )
+
+
+def aggregate_columns(source, aggregates):
+    """
+    ``select <aggregate>(<column>), ... from <source>``: several aggregates (see ``resample_aggregates``), in a single scan.
+
+    :param list[(str, str)] aggregates: The aggregates, as pairs of a column and the name of an aggregate (eg ``"mean"``).
+    :rtype: str
+    """
+
+    hows = tuple(how for _, how in aggregates)
+
+    statement = shape(("aggregate_columns", hows), lambda: Select(
+        [resample_aggregates[how](Slot("c{}".format(i))) for i, how in enumerate(hows)], from_=Slot("source")
+    ))
+
+    return statement.bind(source=relation(source), **_bind_names("c", [column for column, _ in aggregates]))
+
+
+# the aggregates of rolling, by name: the function of each, and the type its argument is cast to (if any)
+window_aggregates = {
+    "mean": ("avg", "double precision"),
+    "sum": ("sum", None),
+    "min": ("min", None),
+    "max": ("max", None),
+    "count": ("count", None),
+    "std": ("stddev_samp", "double precision"),
+    "var": ("var_samp", "double precision"),
+}
+
+
+def rolling(source, on, aggregates, names, units, size, min_periods=1):
+    """
+    Aggregates of columns over a moving window (as for ``pandas.DataFrame.rolling``), computed with window functions: for each row, in order of ``on``, the aggregates of the rows in a window ending at it. Each row of the result holds ``on``, and then each aggregate, which is null if fewer than ``min_periods`` of the values in the window are not null. Rows whose ``on`` is null are left out.
+
+    :param str on: The name of the column that orders the rows.
+    :param list[(str, str)] aggregates: The aggregates, as pairs of a column and one of ``"mean"``, ``"sum"``, ``"min"``, ``"max"``, ``"count"``, ``"std"``, and ``"var"``.
+    :param list[str] names: The name of each aggregate in the result.
+    :param str units: ``"rows"``, for windows of the ``size`` rows before the current one (and it), or ``"range"``, for windows of the rows whose ``on`` is at most ``size`` before the current one's.
+    :param int|str size: The number of rows, or the offset (eg ``"3599999999 microseconds"``, as an interval).
+    :param int min_periods: The minimum number of values in a window for its aggregates not to be null.
+    :rtype: str
+    """
+
+    hows = tuple(how for _, how in aggregates)
+
+    def build():
+        on_ = Slot("on")
+        columns = [on_]
+
+        def over(func):
+            return Window(func, order_by=[on_], frame=(units, Slot("size")))
+
+        for i, how in enumerate(hows):
+            column = Slot("c{}".format(i))
+            function, type_ = window_aggregates[how]
+            value = over(Func(function, Cast(column, type_) if type_ is not None else column))
+
+            columns.append(Alias(Case([(Op(over(Func("count", column)), ">=", Slot("min_periods")), value)]),
+                                 Slot("n{}".format(i))))
+
+        return Select(columns, from_=Slot("source"), where=[Op(on_, "is not", Raw("null"))])
+
+    values = _bind_names("c", [column for column, _ in aggregates])
+    values.update(_bind_names("n", names))
+
+    return shape(("rolling", hows, units), build).bind(
+        source=relation(source), on=Identifier(on), min_periods=Literal(min_periods),
+        size=Literal(size) if units == "rows" else Cast(Literal(size), "interval"), **values
+    )
+
+
+def cumulative_sum(source, column, order_by):
+    """
+    The running sum of a column (as for ``pandas.Series.cumsum``), in order of some columns: ``select <order_by>, sum(<column>) over (order by <order_by> ...) as <column> from <source>``. The sum skips nulls, and is null where the column is.
+
+    :param str column: The name of the column.
+    :param list[str] order_by: The names of the columns that order the rows.
+    :rtype: str
+    """
+
+    order_by = list(order_by)
+
+    def build():
+        column_ = Slot("column")
+        keys = _slots("o", len(order_by))
+        total = Window(Func("sum", column_), order_by=keys, frame=("rows", None))
+
+        return Select(keys + [Alias(Case([(Op(column_, "is not", Raw("null")), total)]), column_)],
+                      from_=Slot("source"))
+
+    return shape(("cumulative_sum", len(order_by)), build).bind(
+        source=relation(source), column=Identifier(column), **_bind_names("o", order_by))
+
+
+def rank(source, column, method="average", ascending=True, pct=False, order_by=None):
+    """
+    The ranks of the values of a column (as for ``pandas.Series.rank``), computed with window functions: ``select <order_by>, <rank> as <column> from <source>``. Ranks start at 1, and are null for null values.
+
+    :param str column: The name of the column.
+    :param str method: How tied values are ranked: ``"average"``, ``"min"``, ``"max"``, ``"first"`` (in order of ``order_by``), or ``"dense"``.
+    :param bool ascending: Whether the smallest value is ranked first.
+    :param bool pct: Whether to give the ranks as fractions of the highest rank.
+    :param None|list[str] order_by: The names of columns to select along with the ranks, which also order the tied values for ``"first"``.
+    :rtype: str
+    """
+
+    order_by = list(order_by or [])
+
+    def build():
+        column_ = Slot("column")
+        keys = _slots("o", len(order_by))
+
+        # the nulls are ranked apart, so as not to come before the other values when ranking in descending order
+        def ranked(function, ascending_, tiebreak=()):
+            return Window(Func(function), partition_by=[Op(column_, "is", Raw("null"))],
+                          order_by=[(column_, ascending_)] + list(tiebreak))
+
+        ties = Window(Func("count", Literal(1)), partition_by=[column_])
+
+        if method == "average":
+            value = Cast(Op(ranked("rank", ascending), "+", Op(Row(Op(ties, "-", Literal(1))), "/", Literal(2.0))),
+                         "double precision")
+        elif method == "min":
+            value = ranked("rank", ascending)
+        elif method == "max":
+            value = Op(Op(ranked("rank", ascending), "+", ties), "-", Literal(1))
+        elif method == "first":
+            value = ranked("row_number", ascending, keys)
+        else:
+            value = ranked("dense_rank", ascending)
+
+        if pct:
+            # the highest dense rank is the number of distinct values, ie a value's dense rank in either order, less 1
+            highest = Row(Op(Op(ranked("dense_rank", True), "+", ranked("dense_rank", False)), "-", Literal(1))) \
+                if method == "dense" else Window(Func("count", column_))
+            value = Op(Cast(value, "double precision"), "/", highest)
+
+        return Select(keys + [Alias(Case([(Op(column_, "is not", Raw("null")), value)]), column_)],
+                      from_=Slot("source"))
+
+    return shape(("rank", method, ascending, pct, len(order_by)), build).bind(
+        source=relation(source), column=Identifier(column), **_bind_names("o", order_by))
+
+
+def difference(source, column, order_by, periods=1):
+    """
+    The difference between each value of a column and the one ``periods`` rows before it (as for ``pandas.Series.diff``), in order of some columns: ``select <order_by>, <column> - lag(<column>, <periods>) over (order by <order_by>) as <column> from <source>``. With a negative ``periods``, it's the difference with the one ``-periods`` rows after it (with ``lead``).
+
+    :param str column: The name of the (numeric) column.
+    :param list[str] order_by: The names of the columns that order the rows.
+    :param int periods: The number of rows back.
+    :rtype: str
+    """
+
+    order_by = list(order_by)
+    function = "lag" if periods >= 0 else "lead"
+
+    def build():
+        column_ = Slot("column")
+        keys = _slots("o", len(order_by))
+        previous = Window(Func(function, column_, Slot("periods")), order_by=keys)
+
+        return Select(keys + [Alias(Op(column_, "-", previous), column_)], from_=Slot("source"))
+
+    return shape(("difference", function, len(order_by)), build).bind(
+        source=relation(source), column=Identifier(column), periods=Literal(abs(periods)),
+        **_bind_names("o", order_by))
@@ -0,0 +1,4 @@
+"""
+Mergeable summaries of columns, for describing append-only tables incrementally (see ``Table.describe(incremental_on=...)``), and for estimating numbers of distinct values (see ``Column.nunique``).
+"""
+from .base import QuantileSketch, HyperLogLog, ColumnSummary, SummaryStore, incremental_describe
@@ -0,0 +1,468 @@
+import bisect
+import copy
+import errno
+import hashlib
+import math
+import os
+import pickle
+import tempfile
+import threading
+
+from ..sql import queries
+
+__all__ = ["QuantileSketch", "HyperLogLog", "ColumnSummary", "SummaryStore", "default_store", "incremental_describe"]
+
+
+class QuantileSketch(object):
+    """
+    A mergeable sketch of a distribution: a sorted list of weighted points (centroids), from which quantiles are interpolated. A batch of ``n`` values is summarized by its ``resolution + 1`` evenly spaced quantiles, with weights of ``n / resolution`` (halved at the ends). Merging two sketches pools their centroids, which are then compressed back to ``resolution + 1`` points, so the sketch stays the same size however many batches it's seen. The error of a quantile is of the order of ``1 / resolution``.
+
+    :param int resolution: The number of intervals between the centroids.
+    """
+
+    def __init__(self, resolution=200):
+        self.resolution = resolution
+        self.centroids = []
+
+    @classmethod
+    def from_quantiles(cls, quantiles, count):
+        """
+        The sketch of a batch of values, from its evenly spaced quantiles (eg as computed by ``percentile_cont``).
+
+        :param list[float] quantiles: The ``resolution + 1`` quantiles, from the minimum to the maximum.
+        :param int count: The number of values in the batch.
+        :rtype: QuantileSketch
+        """
+
+        resolution = len(quantiles) - 1
+        sketch = cls(resolution)
+
+        if count and resolution > 0:
+            weight = count / float(resolution)
+            sketch.centroids = [(float(q), weight / 2.0 if i in (0, resolution) else weight)
+                                for i, q in enumerate(quantiles)]
+
+        return sketch
+
+    @property
+    def count(self):
+        return sum(weight for _, weight in self.centroids)
+
+    def quantile(self, p):
+        """
+        Estimates a quantile. Each centroid sits at the middle of its own weight, and quantiles in between are interpolated linearly.
+
+        :param float p: The quantile, between 0 and 1.
+        :rtype: float
+        """
+
+        if not self.centroids:
+            return float("nan")
+
+        total = self.count
+        positions = []
+        cumulative = 0.0
+
+        for _, weight in self.centroids:
+            positions.append((cumulative + weight / 2.0) / total)
+            cumulative += weight
+
+        if p <= positions[0]:
+            return self.centroids[0][0]
+
+        if p >= positions[-1]:
+            return self.centroids[-1][0]
+
+        i = bisect.bisect_right(positions, p)
+        left, right = positions[i - 1], positions[i]
+        fraction = (p - left) / (right - left) if right > left else 0.0
+
+        return self.centroids[i - 1][0] + fraction * (self.centroids[i][0] - self.centroids[i - 1][0])
+
+    def merge(self, other):
+        """
+        Merges another sketch into this one.
+
+        :param QuantileSketch other: The other sketch.
+        """
+
+        if not other.centroids:
+            return
+
+        if not self.centroids:
+            self.centroids = list(other.centroids)
+            return
+
+        pooled = sorted(self.centroids + other.centroids)
+
+        merged = QuantileSketch(self.resolution)
+        merged.centroids = pooled
+
+        self.centroids = QuantileSketch.from_quantiles(
+            [merged.quantile(i / float(self.resolution)) for i in range(self.resolution + 1)],
+            merged.count
+        ).centroids
+
+
+class HyperLogLog(object):
+    """
+    A mergeable sketch of the number of distinct values in a batch (Flajolet et al): the values are hashed to 32 bits, the low ``precision`` bits of which pick one of ``2 ** precision`` registers, and each register keeps the greatest rank (ie one more than the number of leading zeros) of the rest of the bits of the hashes that it's seen. The relative error of the estimate is about ``1.04 / sqrt(2 ** precision)`` (ie 0.8% for the default precision). Merging two sketches takes the greatest value of each register, so the sketch of a union is exact.
+
+    :param int precision: The number of bits that pick a register.
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = [0] * (2 ** precision)
+
+    @classmethod
+    def from_registers(cls, rows, precision=14):
+        """
+        The sketch with the given registers set (eg as computed by :func:`pg_utils.sql.queries.hyperloglog_registers`).
+
+        :param list[tuple[int, int]] rows: Pairs ``(register, rank)`` (where pairs of nulls are skipped).
+        :param int precision: The precision.
+        :rtype: HyperLogLog
+        """
+
+        sketch = cls(precision)
+
+        for register, rank in rows:
+            if register is None:
+                continue
+
+            sketch.registers[register] = max(sketch.registers[register], rank)
+
+        return sketch
+
+    def merge(self, other):
+        """
+        Merges another sketch (of the same precision) into this one.
+
+        :param HyperLogLog other: The other sketch.
+        """
+
+        if other.precision != self.precision:
+            raise ValueError("Can't merge sketches of different precisions ({} and {})".format(
+                self.precision, other.precision))
+
+        self.registers = [max(a, b) for a, b in zip(self.registers, other.registers)]
+
+    def estimate(self):
+        """
+        Estimates the number of distinct values, with the corrections for small and (for 32 bit hashes) large numbers.
+
+        :rtype: int
+        """
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+
+        if estimate <= 2.5 * m and zeros:
+            # linear counting
+            estimate = m * math.log(m / float(zeros))
+        elif estimate > 2 ** 32 / 30.0:
+            estimate = -2 ** 32 * math.log(1 - estimate / 2 ** 32)
+
+        return int(round(estimate))
+
+
+class ColumnSummary(object):
+    """
+    A mergeable summary of the values of a column: their count, sum, sum of squared differences from the mean (``m2``, as in Welford's algorithm), minimum, maximum, and a :class:`QuantileSketch`. Summaries of disjoint batches of rows merge into the summary of all of them (with the pairwise update of Chan et al for ``m2``).
+
+    :param int resolution: The resolution of the quantile sketch.
+    """
+
+    def __init__(self, resolution=200):
+        self.count = 0
+        self.sum = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = QuantileSketch(resolution)
+
+    @classmethod
+    def from_aggregates(cls, count, sum_, var_pop, minimum, maximum, quantiles):
+        """
+        The summary of a batch of rows, from the aggregates computed by :func:`pg_utils.sql.queries.summarize_columns`.
+
+        :rtype: ColumnSummary
+        """
+
+        summary = cls(len(quantiles) - 1 if quantiles else 200)
+
+        if count:
+            summary.count = int(count)
+            summary.sum = float(sum_)
+            summary.m2 = float(var_pop) * summary.count
+            summary.minimum = float(minimum)
+            summary.maximum = float(maximum)
+            summary.sketch = QuantileSketch.from_quantiles(quantiles, summary.count)
+
+        return summary
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else float("nan")
+
+    @property
+    def std_dev(self):
+        """
+        The sample standard deviation (as ``stddev_samp`` computes it).
+        """
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+    def merge(self, other):
+        """
+        Merges the summary of another (disjoint) batch of rows into this one.
+
+        :param ColumnSummary other: The other summary.
+        """
+
+        if not other.count:
+            return
+
+        # (a copy, since the sketch is merged into in place later on)
+        if not self.count:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+
+        self.m2 += other.m2 + delta * delta * self.count * other.count / float(count)
+        self.count = count
+        self.sum += other.sum
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+
+    def describe(self, percentiles):
+        """
+        The values of a description of the column, in the same order as :meth:`pg_utils.table.Table.describe`. The percentiles come from the sketch.
+
+        :param list[float] percentiles: The percentiles.
+        :rtype: list
+        """
+        return [self.count, self.mean, self.std_dev, self.minimum] + \
+               [self.sketch.quantile(p) for p in percentiles] + [self.maximum]
+
+
+class SummaryStore(object):
+    """
+    Where the state of incremental descriptions is kept between calls: the :class:`ColumnSummary` of each column, along with the watermark up to which it's been computed.
+
+    :param None|str directory: A directory in which each state is pickled to its own file, so that it's shared with other processes (and kept across them). If ``None``, states are only kept in memory, for the life of the store.
+    """
+
+    def __init__(self, directory=None):
+
+        self.directory = directory
+        self._states = {}
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    @staticmethod
+    def key(*parts):
+        """
+        The key of a state, hashed from any number of parts.
+
+        :rtype: str
+        """
+        return hashlib.sha1(u"\x00".join(str(p) for p in parts).encode("utf8")).hexdigest()
+
+    def load(self, key):
+        """
+        :param str key: The key.
+        :return: The state, or ``None`` if there's none.
+        """
+
+        if self.directory is None:
+            with self._lock:
+                return self._states.get(key)
+
+        try:
+            with open(os.path.join(self.directory, key + ".pickle"), "rb") as f:
+                return pickle.load(f)
+        except (IOError, OSError):
+            return None
+
+    def save(self, key, state):
+        """
+        Saves a state (replacing any existing one). On disk, the state is written to a temporary file that's renamed into place, so concurrent readers never see half of it.
+
+        :param str key: The key.
+        :param state: The state (which must be picklable).
+        """
+
+        if self.directory is None:
+            with self._lock:
+                self._states[key] = state
+            return
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(handle, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(temporary, os.path.join(self.directory, key + ".pickle"))
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def __repr__(self):
+        return "SummaryStore({!r})".format(self.directory)
+
+
+default_store = SummaryStore()
+
+
+def incremental_describe(table, columns, percentiles, watermark, store=None, resolution=200):
+    """
+    Describes some numeric columns of an append-only table incrementally: the summary of each column is kept in ``store`` along with the greatest value of the ``watermark`` column summarized so far, and each call only scans the rows past that watermark, merging their summary into the stored one.
+
+    Concurrent inserts don't commit in the order of their watermarks (eg a transaction may take a ``serial`` id, and commit after another one that took a greater id), so a row may show up with a watermark below one that's been seen already. So the rows past the stored watermark are only *pending* at first: they're summarized for the result, but kept apart (with their number) until every transaction that was running when they were scanned has finished (see :func:`pg_utils.sql.queries.current_snapshot`). Until then, each call counts the pending rows again, and summarizes them again if any have been added; after that, they're merged into the stored summary, and the stored watermark moves past them. Rows can still be missed if their watermark was taken before their transaction wrote anything (eg ``now()``, which is the time the transaction started, or a sequence value fetched by an earlier statement), so the watermark should be assigned by the statement that inserts the row, eg a ``serial`` or ``identity`` default, or ``clock_timestamp()``.
+
+    The stored summaries are thrown away (and the whole table is scanned again) if the table has been rewritten (eg truncated) or has had rows updated or deleted since they were computed, as far as PostgreSQL's cumulative statistics tell.
+
+    :param pg_utils.table.Table table: The table.
+    :param list[str] columns: The (numeric) columns to describe.
+    :param list[float] percentiles: The percentiles, which are estimated from each column's :class:`QuantileSketch`.
+    :param str watermark: The name of the watermark column.
+    :param None|SummaryStore store: Where to keep the summaries (defaulting to a store kept in memory for the life of the process).
+    :param int resolution: The resolution of the quantile sketches.
+    :return: A dictionary from column name to the values of the description (in the same order as ``describe``), and information about the call: the ``method`` (``"incremental"``), whether the result is ``approximate`` (the percentiles are), the greatest ``watermark`` summarized, the number of ``rows_scanned``, and the number of ``pending_rows``.
+    :rtype: tuple[dict, dict]
+    """
+
+    store = store if store is not None else default_store
+    cur = table.conn.cursor()
+
+    cur.execute(queries.relation_version(table))
+    oid, relfilenode, _, updated, deleted = cur.fetchone()[:5]
+
+    identity = (oid, relfilenode)
+    modified = updated + deleted
+
+    keys = {
+        column: SummaryStore.key(table.conn.hostname, table.conn.database, table.schema, table.table_name,
+                                 column, watermark, resolution)
+        for column in columns
+    }
+
+    states = {}
+
+    for column in columns:
+        state = store.load(keys[column])
+
+        # a rewritten table, or any update or delete since the state was saved, means starting over
+        if state is None or state["identity"] != identity or state["modified"] != modified:
+            state = {"identity": identity, "modified": modified, "watermark": None,
+                     "summary": ColumnSummary(resolution)}
+
+        state.setdefault("pending", None)
+        states[column] = state
+
+    if any(state["pending"] is not None for state in states.values()):
+        cur.execute(queries.current_snapshot())
+        oldest_running = cur.fetchone()[0]
+
+    # columns that are summarized up to the same watermark (with the same pending rows) are brought up to date together
+    groups = {}
+
+    for column in columns:
+        pending = states[column]["pending"]
+        group_key = (states[column]["watermark"],) + \
+            ((pending["until"], pending["rows"], pending["xmax"]) if pending is not None else ())
+        groups.setdefault(group_key, []).append(column)
+
+    rows_scanned = 0
+    scanned = []
+
+    for group in groups.values():
+        first = states[group[0]]
+        pending = first["pending"]
+
+        if pending is not None:
+            # pending rows that have been added since they were summarized mean summarizing them again
+            cur.execute(queries.count_range(table, watermark, after=first["watermark"], until=pending["until"]))
+            rows = cur.fetchone()[0]
+
+            if rows != pending["rows"]:
+                cur.execute(queries.summarize_columns(table, group, watermark, after=first["watermark"],
+                                                      until=pending["until"], resolution=resolution))
+                row = cur.fetchone()
+
+                for i, column in enumerate(group):
+                    states[column]["pending"] = dict(states[column]["pending"], rows=row[-2],
+                                                     summary=ColumnSummary.from_aggregates(*row[6 * i:6 * i + 6]))
+
+                rows_scanned += row[-2]
+
+            # once every transaction that was running when they were scanned has finished, they're settled
+            if oldest_running >= pending["xmax"]:
+                for column in group:
+                    states[column]["summary"].merge(states[column]["pending"]["summary"])
+                    states[column]["watermark"] = pending["until"]
+                    states[column]["pending"] = None
+
+        pending = first["pending"]
+        after = pending["until"] if pending is not None else first["watermark"]
+
+        cur.execute(queries.summarize_columns(table, group, watermark, after=after, resolution=resolution))
+        row = cur.fetchone()
+
+        if row[-2]:
+            scanned.append((group, row))
+
+        rows_scanned += row[-2]
+
+    # what's been added is pending until every transaction that's running now (or was, during the scans) has finished
+    if scanned:
+        cur.execute(queries.current_snapshot())
+        next_transaction = cur.fetchone()[1]
+
+    for group, row in scanned:
+        for i, column in enumerate(group):
+            batch = ColumnSummary.from_aggregates(*row[6 * i:6 * i + 6])
+            pending = states[column]["pending"]
+
+            if pending is None:
+                states[column]["pending"] = {"until": row[-1], "rows": row[-2], "xmax": next_transaction,
+                                             "summary": batch}
+            else:
+                pending["summary"].merge(batch)
+                pending.update(until=row[-1], rows=pending["rows"] + row[-2], xmax=next_transaction)
+
+    for column in columns:
+        store.save(keys[column], states[column])
+
+    result = {}
+
+    for column in columns:
+        summary = states[column]["summary"]
+        pending = states[column]["pending"]
+
+        if pending is not None:
+            summary = copy.deepcopy(summary)
+            summary.merge(pending["summary"])
+
+        result[column] = summary.describe(percentiles)
+
+    pending = [states[column]["pending"] for column in columns if states[column]["pending"] is not None]
+    watermarks = [p["until"] for p in pending] + \
+        [states[column]["watermark"] for column in columns if states[column]["watermark"] is not None]
+
+    return result, {"approximate": True, "method": "incremental", "watermark": max(watermarks) if watermarks else None,
+                    "rows_scanned": rows_scanned, "pending_rows": max([p["rows"] for p in pending] or [0])}
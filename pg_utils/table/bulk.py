@@ -0,0 +1,689 @@
+"""
+Machinery for splitting bulk loads across several connections. The methods of :class:`pg_utils.table.Table` are the intended interface.
+"""
+import decimal
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from six.moves import queue
+
+from .._lazy import lazy_import
+from ..exception import BulkLoadError
+from ..sql import quote_literal
+
+pd = lazy_import("pandas")
+
+__all__ = []
+
+
+def copy_csv_cmd(relation, columns=None, sep=",", null="", header=True):
+    """
+    Builds a ``COPY ... FROM STDIN`` statement for CSV data.
+
+    :param str relation: The (qualified) name of the table to copy into.
+    :param None|list[str]|tuple[str] columns: The columns being loaded (or ``None`` for all of them).
+    :param str sep: The separator character.
+    :param str null: The string used to indicate null values.
+    :param bool header: Whether or not the data begins with a header.
+    :rtype: str
+    """
+
+    column_str = "" if columns is None else " ({})".format(",".join([str(x) for x in columns]))
+
+    cmd = "copy {}{} from stdin delimiter '{}' null '{}' csv".format(relation, column_str, sep, null)
+
+    if header:
+        cmd += " header"
+
+    return cmd
+
+
+def index_definitions(conn, relation):
+    """
+    Fetches the definitions of every index on a table. Indexes that back a primary key, unique, or exclusion constraint also come with the definition of that constraint.
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A list of ``(index_name, index_def, constraint_name, constraint_def)`` tuples, where the last two entries are ``None`` for secondary indexes.
+    :rtype: list[tuple]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select i.relname, pg_get_indexdef(i.oid), c.conname, pg_get_constraintdef(c.oid)
+        from pg_index x
+        join pg_class i on i.oid = x.indexrelid
+        left join pg_constraint c on c.conindid = x.indexrelid and c.contype in ('p', 'u', 'x')
+        where x.indrelid = %s::regclass
+        order by 1""", (relation,))
+
+    return cur.fetchall()
+
+
+def owned_sequences(conn, relation):
+    """
+    Fetches the sequences owned by the columns of a table (eg those backing ``serial`` columns).
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A list of ``(qualified_sequence_name, column_name)`` tuples.
+    :rtype: list[tuple[str]]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select n.nspname || '.' || s.relname, a.attname
+        from pg_depend d
+        join pg_class s on s.oid = d.objid and s.relkind = 'S'
+        join pg_namespace n on n.oid = s.relnamespace
+        join pg_attribute a on a.attrelid = d.refobjid and a.attnum = d.refobjsubid
+        where d.refobjid = %s::regclass
+        and d.classid = 'pg_class'::regclass
+        and d.deptype = 'a'""", (relation,))
+
+    return cur.fetchall()
+
+
+def identity_sequences(conn, relation):
+    """
+    Fetches the state of the sequences behind the identity columns of a table (which ``create table ... (like ... including all)`` gives sequences of their own, starting over).
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A list of ``(column_name, last_value, is_called)`` tuples.
+    :rtype: list[tuple]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select a.attname, pg_get_serial_sequence(%s, a.attname)
+        from pg_attribute a
+        where a.attrelid = %s::regclass and a.attidentity <> '' and not a.attisdropped
+        order by a.attnum""", (relation, relation))
+
+    result = []
+
+    for column, sequence in cur.fetchall():
+        cur.execute("select last_value, is_called from {}".format(sequence))
+        result.append((column,) + tuple(cur.fetchone()))
+
+    return result
+
+
+def foreign_key_definitions(conn, relation):
+    """
+    Fetches the definitions of the foreign keys of a table (ie those referencing other tables, or itself).
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A list of ``(constraint_name, constraint_def)`` tuples.
+    :rtype: list[tuple[str]]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select quote_ident(conname), pg_get_constraintdef(oid)
+        from pg_constraint
+        where conrelid = %s::regclass and contype = 'f'
+        order by 1""", (relation,))
+
+    return cur.fetchall()
+
+
+def trigger_definitions(conn, relation):
+    """
+    Fetches the definitions of the (user-defined) triggers on a table, and whether each is disabled.
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A list of ``(trigger_name, trigger_def, disabled)`` tuples.
+    :rtype: list[tuple]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select quote_ident(tgname), pg_get_triggerdef(oid), tgenabled = 'D'
+        from pg_trigger
+        where tgrelid = %s::regclass and not tgisinternal
+        order by 1""", (relation,))
+
+    return cur.fetchall()
+
+
+def privilege_statements(conn, relation, target):
+    """
+    Builds the statements that give another table the owner of a table and the privileges granted on it.
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :param str target: The (qualified) name of the table to give them to.
+    :rtype: list[str]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select quote_ident(pg_get_userbyid(c.relowner)), pg_get_userbyid(c.relowner) = current_user
+        from pg_class c
+        where c.oid = %s::regclass""", (relation,))
+    owner, owned = cur.fetchone()
+
+    cur.execute("""
+        select case when a.grantee = 0 then 'public' else quote_ident(pg_get_userbyid(a.grantee)) end,
+            a.privilege_type, a.is_grantable
+        from pg_class c, aclexplode(c.relacl) a
+        where c.oid = %s::regclass and a.grantee <> c.relowner
+        order by 1, 2""", (relation,))
+
+    statements = [] if owned else ["alter table {} owner to {}".format(target, owner)]
+
+    for grantee, privilege, grantable in cur.fetchall():
+        statements.append("grant {} on {} to {}{}".format(privilege, target, grantee,
+                                                          " with grant option" if grantable else ""))
+
+    return statements
+
+
+def replace_blockers(conn, relation):
+    """
+    Describes what a table has that can't be carried over when it's replaced by a new one: foreign keys of other tables referencing it (which would keep it from being dropped), row-level security, and privileges on its columns.
+
+    :param pg_utils.connection.Connection conn: The connection to use.
+    :param str relation: The (qualified) name of the table.
+    :return: A (possibly empty) list of descriptions.
+    :rtype: list[str]
+    """
+
+    cur = conn.cursor()
+    cur.execute("""
+        select 'foreign key ' || conname || ' of ' || conrelid::regclass::text
+        from pg_constraint
+        where confrelid = %s::regclass and conrelid <> confrelid and contype = 'f'
+        union all
+        select 'row-level security'
+        from pg_class
+        where oid = %s::regclass and (relrowsecurity or exists (select 1 from pg_policy where polrelid = oid))
+        union all
+        select 'privileges on column ' || attname
+        from pg_attribute
+        where attrelid = %s::regclass and attacl is not null and not attisdropped""",
+                (relation, relation, relation))
+
+    return [row[0] for row in cur.fetchall()]
+
+
+def staging_name(table):
+    """
+    Generates a (qualified) name for a throwaway staging table that lives alongside the given table.
+
+    :param pg_utils.table.Table table: The table being loaded.
+    :rtype: str
+    """
+
+    suffix = "_pgu_stage_{}".format(uuid.uuid4().hex[:8])
+
+    return "{}.{}{}".format(table.schema, table.table_name[:63 - len(suffix)], suffix)
+
+
+def csv_chunk_offsets(file_name, num_chunks, quote_char='"', block_size=1 << 20):
+    """
+    Splits a CSV file into (at most) ``num_chunks`` byte ranges of roughly equal size. Every range begins and ends on a row boundary, and newlines inside of quoted fields are not mistaken for row boundaries.
+
+    :param str file_name: The name of the CSV file.
+    :param int num_chunks: The desired number of chunks.
+    :param str quote_char: The quote character used by the file.
+    :param int block_size: The number of bytes read from the file at a time.
+    :return: A list of ``(start, end)`` byte offsets.
+    :rtype: list[tuple[int]]
+    """
+
+    size = os.path.getsize(file_name)
+    quote = quote_char.encode("ascii")
+
+    targets = [size * i // num_chunks for i in range(1, num_chunks)]
+    boundaries = [0]
+    in_quotes = False
+    position = 0
+
+    with open(file_name, "rb") as f:
+        while targets:
+            block = f.read(block_size)
+
+            if not block:
+                break
+
+            start = 0
+
+            while targets:
+                search_from = max(targets[0] - position, start)
+
+                if search_from >= len(block):
+                    break
+
+                idx = block.find(b"\n", search_from)
+
+                if idx == -1:
+                    break
+
+                in_quotes ^= block.count(quote, start, idx) % 2 == 1
+                start = idx + 1
+
+                if not in_quotes:
+                    boundaries.append(position + start)
+                    targets = [t for t in targets if t >= position + start]
+
+            in_quotes ^= block.count(quote, start) % 2 == 1
+            position += len(block)
+
+    boundaries.append(size)
+
+    return [(b, e) for b, e in zip(boundaries[:-1], boundaries[1:]) if e > b]
+
+
+class FileSlice(object):
+    """
+    A read-only, file-like view of the byte range ``[start, end)`` of an open (binary) file. This is what's handed to ``copy_expert``.
+    """
+
+    def __init__(self, f, start, end):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+
+        if self._remaining <= 0:
+            return b""
+
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        self.bytes_read += len(data)
+
+        return data
+
+
+def _report_row(chunk, rows, num_bytes, seconds, error=None):
+
+    return {
+        "chunk": chunk,
+        "rows": rows,
+        "bytes": num_bytes,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds and rows is not None else None,
+        "megabytes_per_second": num_bytes / seconds / 1e6 if seconds else None,
+        "error": None if error is None else str(error)
+    }
+
+
+def report_frame(rows):
+    """
+    Builds the per-chunk throughput report returned by the parallel bulk loaders.
+
+    :param list[dict] rows: One dictionary per chunk.
+    :rtype: pandas.DataFrame
+    """
+
+    columns = ["chunk", "rows", "bytes", "seconds", "rows_per_second", "megabytes_per_second", "error"]
+
+    return pd.DataFrame(sorted(rows, key=lambda r: r["chunk"]), columns=columns).set_index("chunk")
+
+
+def parallel_copy_csv(table, file_name, make_copy_cmd, header, parallel, atomic=True, size=8192):
+    """
+    Loads a CSV file into a table by splitting it into ``parallel`` chunks and running one ``COPY`` per chunk, each over its own pooled connection.
+
+    :param pg_utils.table.Table table: The table into which the file is loaded.
+    :param str file_name: The name of the CSV file.
+    :param make_copy_cmd: A function taking a boolean (whether or not the chunk has a header) and returning the ``COPY`` statement for that chunk.
+    :param bool header: Whether or not the file has a header (which only the first chunk will contain).
+    :param int parallel: The number of chunks (and connections) to use.
+    :param bool atomic: If enabled, the chunks are committed together via a two-phase commit, so that either all of them or none of them are loaded. This requires ``max_prepared_transactions`` to be positive on the server. Otherwise, each chunk is committed on its own.
+    :param int size: The size of the buffer that ``copy_expert`` uses.
+    :return: The per-chunk throughput report.
+    :rtype: pandas.DataFrame
+    :raises pg_utils.exception.BulkLoadError: if any chunk fails.
+    """
+
+    ranges = csv_chunk_offsets(file_name, parallel)
+
+    # an empty file has no chunks (and there's nothing to load)
+    if not ranges:
+        return report_frame([])
+
+    pool = table.conn.pool
+    group_id = "pg_utils_{}".format(uuid.uuid4().hex)
+
+    def load_chunk(chunk):
+        start, end = ranges[chunk]
+        conn = pool.getconn()
+        raw = conn.connection
+        began = time.time()
+        in_tpc = False
+
+        try:
+            if atomic:
+                raw.tpc_begin("{}_{}".format(group_id, chunk))
+                in_tpc = True
+
+            with open(file_name, "rb") as f:
+                data = FileSlice(f, start, end)
+                cur = conn.cursor()
+                cur.copy_expert(sql=make_copy_cmd(header and chunk == 0), file=data, size=size)
+                rows = cur.rowcount
+                cur.close()
+
+            if atomic:
+                raw.tpc_prepare()
+            else:
+                conn.commit()
+
+        except Exception as e:
+            try:
+                if in_tpc:
+                    raw.tpc_rollback()
+                else:
+                    conn.rollback()
+            finally:
+                pool.putconn(conn)
+
+            return _report_row(chunk, None, end - start, time.time() - began, error=e), None
+
+        return _report_row(chunk, rows, data.bytes_read, time.time() - began), conn
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        results = list(executor.map(load_chunk, range(len(ranges))))
+
+    report = [row for row, _ in results]
+    prepared = [conn for _, conn in results if conn is not None]
+    failed = any(row["error"] is not None for row in report)
+
+    try:
+        if atomic:
+            for conn in prepared:
+                if failed:
+                    conn.connection.tpc_rollback()
+                else:
+                    conn.connection.tpc_commit()
+    finally:
+        for conn in prepared:
+            pool.putconn(conn)
+
+    report = report_frame(report)
+
+    if failed:
+        raise BulkLoadError(
+            "{} of {} chunks failed to load into {}{}".format(
+                report.error.notnull().sum(), len(report), table,
+                " (nothing was committed)" if atomic else ""),
+            report=report)
+
+    return report
+
+
+class CopyPipe(object):
+    """
+    A bounded buffer connecting a ``COPY ... TO STDOUT`` (which writes into it) to a ``COPY ... FROM STDIN`` (which reads from it). The data is passed through as raw bytes and is never decoded.
+
+    :param int max_chunks: The maximum number of chunks held in the buffer at once. The writer blocks when the buffer is full.
+    :param int chunk_size: Writes are batched into chunks of (at least) this many bytes.
+    """
+
+    def __init__(self, max_chunks=16, chunk_size=1 << 16):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._chunk_size = chunk_size
+        self._write_buffer = bytearray()
+        self._read_buffer = bytearray()
+        self._finished = False
+        self._aborted = threading.Event()
+        self.bytes_written = 0
+
+    def _put(self, item):
+
+        while True:
+            if self._aborted.is_set():
+                raise IOError("The reading end of the pipe has been closed")
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def write(self, data):
+
+        if not isinstance(data, (bytes, bytearray)):
+            data = data.encode("utf8")
+
+        self._write_buffer += data
+        self.bytes_written += len(data)
+
+        if len(self._write_buffer) >= self._chunk_size:
+            self._put(bytes(self._write_buffer))
+            self._write_buffer = bytearray()
+
+        return len(data)
+
+    def close_writer(self, error=None):
+        """
+        Signals that the writer is done (flushing whatever is left). If ``error`` is given, the reader raises it instead of reaching the end of the data.
+        """
+
+        if error is None and self._write_buffer:
+            self._put(bytes(self._write_buffer))
+
+        self._write_buffer = bytearray()
+        self._put(error)
+        self._put(None)
+
+    def close_reader(self):
+        """
+        Signals that the reader has given up, so that a blocked writer raises instead of waiting forever.
+        """
+        self._aborted.set()
+
+    def read(self, size=-1):
+
+        while not self._finished and (size is None or size < 0 or len(self._read_buffer) < size):
+            chunk = self._queue.get()
+
+            if chunk is None:
+                self._finished = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                self._read_buffer += chunk
+
+        if size is None or size < 0:
+            size = len(self._read_buffer)
+
+        data = bytes(self._read_buffer[:size])
+        del self._read_buffer[:size]
+
+        return data
+
+
+def pipe_copy(source_conn, source_sql, target_conn, target_sql, max_chunks=16, size=8192):
+    """
+    Streams the output of a ``COPY ... TO STDOUT`` on one connection straight into a ``COPY ... FROM STDIN`` on another one (via a :class:`CopyPipe`). The target connection is committed afterwards. On failure, both connections are rolled back (since an interrupted ``COPY`` leaves the source's transaction aborted too).
+
+    :param pg_utils.connection.Connection source_conn: The connection to copy from.
+    :param str source_sql: The ``COPY ... TO STDOUT`` statement.
+    :param pg_utils.connection.Connection target_conn: The connection to copy into. It must not be ``source_conn``.
+    :param str target_sql: The ``COPY ... FROM STDIN`` statement.
+    :param int max_chunks: The size of the buffer between the two connections (in chunks of 64kB).
+    :param int size: The size of the buffer that ``copy_expert`` uses.
+    :return: The number of rows and the number of bytes copied.
+    :rtype: tuple[int]
+    """
+
+    pipe = CopyPipe(max_chunks=max_chunks)
+
+    def produce():
+        try:
+            source_cur = source_conn.cursor()
+            source_cur.copy_expert(sql=source_sql, file=pipe, size=size)
+            source_cur.close()
+        except Exception as e:
+            try:
+                pipe.close_writer(error=e)
+            except IOError:
+                pass
+        else:
+            try:
+                pipe.close_writer()
+            except IOError:
+                pass
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+
+    try:
+        target_cur = target_conn.cursor()
+        target_cur.copy_expert(sql=target_sql, file=pipe, size=size)
+        rows = target_cur.rowcount
+        target_cur.close()
+        target_conn.commit()
+    except Exception:
+        pipe.close_reader()
+        producer.join()
+        target_conn.rollback()
+        source_conn.rollback()
+        raise
+
+    producer.join()
+
+    return rows, pipe.bytes_written
+
+
+def _split_conditions(conn, table, parallel, split_on, where):
+
+    cur = conn.cursor()
+
+    if split_on is None:
+        cur.execute("select pg_relation_size(%s::regclass) / current_setting('block_size')::bigint",
+                    (table.name,))
+        num_pages = cur.fetchone()[0]
+        step = max(num_pages // parallel, 1)
+        starts = [i * step for i in range(parallel) if i * step < max(num_pages, 1)]
+
+        return [
+            "ctid >= '({},0)'::tid{}".format(
+                start, "" if i == len(starts) - 1 else " and ctid < '({},0)'::tid".format(starts[i + 1]))
+            for i, start in enumerate(starts)
+        ]
+
+    cur.execute("select min({0}), max({0}) from {1}{2}".format(
+        split_on, table, "" if where is None else " where {}".format(where)))
+    minimum, maximum = cur.fetchone()
+
+    if minimum is None:
+        return ["{} is null".format(split_on)]
+
+    # numeric columns come back as Decimals, which don't mix with floats; the bounds needn't be exact
+    if isinstance(minimum, decimal.Decimal):
+        minimum, maximum = float(minimum), float(maximum)
+
+    width = (maximum - minimum) / float(parallel)
+    bounds = [minimum + i * width for i in range(1, parallel)]
+
+    if not width:
+        bounds = []
+
+    lower = [None] + bounds
+    upper = bounds + [None]
+
+    conditions = []
+    for i, (lo, hi) in enumerate(zip(lower, upper)):
+        parts = []
+        if lo is not None:
+            parts.append("{} >= {}".format(split_on, quote_literal(lo)))
+        if hi is not None:
+            parts.append("{} < {}".format(split_on, quote_literal(hi)))
+
+        condition = " and ".join(parts) or "true"
+
+        if i == 0:
+            condition = "({} or {} is null)".format(condition, split_on)
+
+        conditions.append(condition)
+
+    return conditions
+
+
+def copy_table(source, target, columns=None, where=None, parallel=None, split_on=None,
+               binary=True, max_chunks=16, size=8192):
+    """
+    Copies rows from one table into another (possibly on another server) by piping ``COPY ... TO STDOUT`` into ``COPY ... FROM STDIN``. See :meth:`pg_utils.table.Table.copy_to`.
+
+    :return: The per-split report.
+    :rtype: pandas.DataFrame
+    """
+
+    column_str = ", ".join([str(c) for c in columns])
+    copy_format = " (format binary)" if binary else ""
+    target_sql = "copy {} ({}) from stdin{}".format(target, column_str, copy_format)
+
+    def source_sql(condition):
+        conditions = [c for c in [where, condition] if c is not None]
+
+        return "copy (select {} from {}{}) to stdout{}".format(
+            column_str, source,
+            " where {}".format(" and ".join(["({})".format(c) for c in conditions])) if conditions else "",
+            copy_format)
+
+    if parallel is None:
+        began = time.time()
+
+        if target.conn is source.conn:
+            with source.conn.pool.connection() as target_conn:
+                rows, num_bytes = pipe_copy(source.conn, source_sql(None), target_conn, target_sql,
+                                            max_chunks=max_chunks, size=size)
+        else:
+            rows, num_bytes = pipe_copy(source.conn, source_sql(None), target.conn, target_sql,
+                                        max_chunks=max_chunks, size=size)
+
+        return report_frame([_report_row(0, rows, num_bytes, time.time() - began)])
+
+    # Every split reads from the same snapshot, which is exported by an extra connection
+    # that stays open (in a repeatable read transaction) until every split is done.
+    with source.conn.pool.connection() as snapshot_conn:
+        cur = snapshot_conn.cursor()
+        cur.execute("set transaction isolation level repeatable read")
+        cur.execute("select pg_export_snapshot()")
+        snapshot = cur.fetchone()[0]
+
+        conditions = _split_conditions(snapshot_conn, source, parallel, split_on, where)
+
+        def copy_split(split):
+            began = time.time()
+
+            with source.conn.pool.connection() as source_conn, target.conn.pool.connection() as target_conn:
+                source_cur = source_conn.cursor()
+                source_cur.execute("set transaction isolation level repeatable read")
+                source_cur.execute("set transaction snapshot %s", (snapshot,))
+
+                try:
+                    rows, num_bytes = pipe_copy(source_conn, source_sql(conditions[split]),
+                                                target_conn, target_sql, max_chunks=max_chunks, size=size)
+                    source_conn.rollback()
+                except Exception as e:
+                    return _report_row(split, None, 0, time.time() - began, error=e)
+
+            return _report_row(split, rows, num_bytes, time.time() - began)
+
+        with ThreadPoolExecutor(max_workers=len(conditions)) as executor:
+            report = report_frame(list(executor.map(copy_split, range(len(conditions)))))
+
+        snapshot_conn.rollback()
+
+    if report.error.notnull().any():
+        raise BulkLoadError("{} of {} splits failed to copy from {} into {}".format(
+            report.error.notnull().sum(), len(report), source, target), report=report)
+
+    return report
@@ -1,15 +1,46 @@
+import re
 import tempfile
+import uuid
 from collections import defaultdict
 
-import pandas as pd
 import six
 from lazy_property import LazyProperty
 
+from . import bulk
+from .. import arrow
+from .. import bin_counts
+from ..budget import resolve_budget, execute_within_budget, catalog_describe
+from ..budget.base import sampled_source
+from .. import explain
 from .. import numeric_datatypes, _pretty_print
 from ..column.base import Column
 from ..connection import Connection
+from .. import dtypes
+from ..dtypes import typed_frame
+from ..instrumentation.base import instrumented, measure_frame, read_sql
 from ..exception import TableDoesNotExistError, NoSuchColumnError
-from ..util import process_schema_and_conn, seaborn_required
+from ..util import process_schema_and_conn, seaborn_required, pyarrow_required
+from .._lazy import lazy_import
+from ..memory import fetch_within_memory, whole_result_budget
+from .. import partition
+from ..sql import queries, quote_identifier
+from ..summary import incremental_describe
+from ..view import Rolling
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+plt = lazy_import("matplotlib.pyplot")
+
+# the units of date_trunc, by the pandas offsets (with n = 1) that are one of them
+_date_trunc_units = {"Micro": "microseconds", "Milli": "milliseconds", "Second": "second", "Minute": "minute",
+                     "Hour": "hour", "Day": "day", "MonthBegin": "month", "QuarterBegin": "quarter",
+                     "YearBegin": "year"}
+
+_profile_kinds = ["number", "text", "temporal", "boolean", "array", "other"]
+
+# the rows of a description of columns of every kind, in order (with the percentiles after the minimum)
+_profile_rows = ["count", "unique", "top", "freq", "mean", "std_dev", "minimum",
+                 "maximum", "range", "true_ratio", "min_length", "mean_length", "median_length", "max_length"]
 
 
 class Table(object):
@@ -70,29 +101,50 @@ class Table(object):
         .. note::
 
             The statement ``drop table if exists schema.table_name;`` is
-            executed **before** the SQL in ``create_stmt`` is executed.
+            executed **before** the SQL in ``create_stmt`` is executed. Both are run (and committed) in a single transaction.
 
         :param None|pg_utils.connection.Connection conn: A ``Connection`` object to use for creating the table. If not specified, a new connection will be created with no arguments. Look at the docs for the Connection object for more information.
         :param None|str schema: A specified schema (optional).
 
         :param args: Other positional arguments to pass to the initializer.
-        :param kwargs: Other keyword arguments to pass to the initializer.
+        :param kwargs: Other keyword arguments to pass to the initializer. Additionally, the following keyword arguments are accepted:
+
+            * ``unlogged`` (``bool``, default ``False``): Creates the table as ``UNLOGGED``. If ``create_stmt`` begins with ``create table``, then it's rewritten as ``create unlogged table``; otherwise, the table is altered with ``set unlogged`` after it's created.
+            * ``analyze`` (``bool``, default ``False``): Runs ``ANALYZE`` on the table once it's created, so that the planner statistics are fresh.
+
         :return: The corresponding ``Table`` object *after* the ``create_stmt`` is executed.
         """
 
+        unlogged = kwargs.pop("unlogged", False)
+        analyze = kwargs.pop("analyze", False)
+
         update_kwargs = {"check_existence": False, "conn": conn, "schema": schema}
 
         cur = conn.cursor()
 
-        drop_stmt = "drop table if exists {} cascade;".format(table_name)
+        name = table_name if schema is None else "{}.{}".format(schema, table_name)
+
+        drop_stmt = "drop table if exists {} cascade;".format(name)
+
+        if unlogged:
+            create_stmt, num_subs = re.subn(r"^(\s*create)\s+(table)\b", r"\1 unlogged \2",
+                                            create_stmt, count=1, flags=re.IGNORECASE)
+
+        try:
+            cur.execute(drop_stmt)
+            cur.execute(create_stmt)
+
+            if unlogged and not num_subs:
+                cur.execute("alter table {} set unlogged".format(name))
 
-        if schema is not None:
-            drop_stmt = "drop table if exists {}.{} cascade;".format(schema, table_name)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-        cur.execute(drop_stmt)
-        conn.commit()
-        cur.execute(create_stmt)
-        conn.commit()
+        if analyze:
+            cur.execute("analyze {}".format(name))
+            conn.commit()
 
         kwargs.update(update_kwargs)
 
@@ -132,24 +184,63 @@ class Table(object):
 
     def select_all_query(self):
 
-        return "select {} from {}".format(",".join(self.column_names), self)
+        return queries.select_columns(self, self.column_names)
+
+    @instrumented
+    def version_token(self, exact=False):
+        """
+        A token that changes whenever the contents of this table do, eg for keying caches of its data.
+
+        By default, it's taken from the catalog and PostgreSQL's cumulative statistics (see :func:`pg_utils.sql.queries.relation_version`), which is cheap, but not exact: other sessions' committed changes reach the statistics within about a second (or not at all, if ``track_counts`` is off), they're cached for the rest of a transaction, and they go back to zero after ``pg_stat_reset()``, so the token may miss a change, or even go back to one that it had before.
+
+        :param bool exact: Whether to take the token from the rows themselves instead (see :func:`pg_utils.sql.queries.rows_version`), which costs a scan of the table, but changes with every insert, update, or delete (barring a hash collision), whatever order they commit in.
+        :rtype: str
+        """
+
+        cur = self.conn.cursor()
+        cur.execute(queries.rows_version(self) if exact else queries.relation_version(self))
+
+        return "-".join(str(x) for x in cur.fetchone())
 
     @LazyProperty
+    @instrumented
     def count(self):
         """Returns the number of rows in the corresponding database table."""
         cur = self.conn.cursor()
 
-        cur.execute("select count(1) from {}".format(self))
+        cur.execute(queries.count_rows(self))
 
         return cur.fetchone()[0]
 
-    def head(self, num_rows=10, **read_sql_kwargs):
+    def partitions(self):
+        """
+        The leaf partitions of this table, if it's declaratively partitioned (see :func:`pg_utils.partition.list_partitions`).
+
+        :rtype: list[pg_utils.partition.Partition]
+        """
+        return partition.list_partitions(self)
+
+    @instrumented
+    def partitioned_count(self, where=None, parallel=None, store=None):
+        """
+        Counts the rows of this (partitioned) table partition by partition, only counting again the partitions that have changed since the last call, and skipping those that the planner prunes for ``where``. See :func:`pg_utils.partition.count`.
+
+        :param None|str where: A condition on the rows (as raw SQL).
+        :param None|int parallel: How many partitions to count at once (over connections from the pool).
+        :param None|pg_utils.summary.SummaryStore store: Where the counts of the partitions are kept (defaulting to memory, for the life of the process).
+        :rtype: int
+        """
+        return partition.count(self, where=where, parallel=parallel, store=store)[0]
+
+    @instrumented
+    def head(self, num_rows=10, memory_budget=None, **read_sql_kwargs):
         """
         Returns some of the rows, returning a corresponding Pandas DataFrame.
 
         :param int|str num_rows: The number of rows to fetch, or ``"all"`` to fetch all of the rows.
-        :param dict read_sql_kwargs: Any other keyword arguments that you'd like to pass into ``pandas.read_sql`` (as documented `here <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_).
-        :return: The resulting data frame.
+        :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The memory budget for the result, overriding the connection's (if any). A plain number (or a string such as ``"4GB"``) is taken to be a number of bytes. See :mod:`pg_utils.memory`.
+        :param dict read_sql_kwargs: Any other keyword arguments that you'd like to pass into ``pandas.read_sql`` (as documented `here <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_). If there are any, the values are decoded by pandas rather than by :mod:`pg_utils.dtypes`.
+        :return: The resulting data frame (or, if it's over a memory budget with the ``"chunk"`` policy, an iterator of data frames).
         :rtype: pandas.core.frame.DataFrame
         """
 
@@ -158,18 +249,81 @@ class Table(object):
             raise ValueError(
                 "'num_rows': Expected a positive integer or 'all'")
 
-        query = self.select_all_query()
-
-        if num_rows != "all":
-            query += " limit {}".format(num_rows)
+        result = self._fetch_frame(self._head_query(num_rows), num_rows=None if num_rows == "all" else num_rows,
+                                   memory_budget=memory_budget, **read_sql_kwargs)
 
-        result = pd.read_sql(query, self.conn, **read_sql_kwargs)
-
-        if len(self.column_names) == 1:
+        if len(self.column_names) == 1 and isinstance(result, pd.DataFrame):
             result = result[self.column_names[0]]
 
         return result
 
+    def _fetch_frame(self, query, num_rows=None, memory_budget=None, **read_sql_kwargs):
+        """
+        Runs a query selecting all of this table's columns, and fetches the result as a DataFrame, typed by :func:`pg_utils.dtypes.fetch_frame` and subject to the memory budget (see :func:`pg_utils.memory.fetch_within_memory`), or by ``pandas.read_sql``, if it's given any keyword arguments.
+        """
+
+        if read_sql_kwargs:
+            return read_sql(query, self.conn, **read_sql_kwargs)
+
+        return fetch_within_memory(self, query, list(self.column_names), num_rows=num_rows,
+                                   memory_budget=memory_budget)
+
+    def _head_query(self, num_rows):
+
+        return queries.select_columns(self, self.column_names, limit=None if num_rows == "all" else num_rows)
+
+    @pyarrow_required
+    def iter_record_batches(self, batch_size=65536, types=None):
+        """
+        Streams the rows of this table (via a server-side cursor) as pyarrow ``RecordBatch`` objects. The datatype of each column is derived from :attr:`column_data_types` (see :func:`pg_utils.arrow.arrow_type`).
+
+        Note that this requires pyarrow.
+
+        :param int batch_size: The (maximum) number of rows in each batch.
+        :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding the defaults.
+        :return: A generator of record batches.
+        :rtype: collections.Iterable[pyarrow.RecordBatch]
+        """
+
+        return arrow.record_batches(self, batch_size=batch_size, types=types)
+
+    @pyarrow_required
+    @instrumented
+    def to_arrow(self, batch_size=65536, types=None):
+        """
+        Fetches this table as a pyarrow ``Table``. The rows are streamed in batches (see :meth:`iter_record_batches`), so they're never all held as Python objects at once.
+
+        Note that this requires pyarrow.
+
+        :param int batch_size: The number of rows fetched at a time.
+        :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding the defaults.
+        :return: The Arrow table.
+        :rtype: pyarrow.Table
+        """
+
+        import pyarrow as pa
+
+        return pa.Table.from_batches(list(self.iter_record_batches(batch_size=batch_size, types=types)),
+                                     schema=arrow.arrow_schema(self, types=types))
+
+    @pyarrow_required
+    @instrumented
+    def to_parquet(self, path, row_group_size=65536, types=None, **writer_kwargs):
+        """
+        Writes this table to a Parquet file. The rows are streamed from the database and written one row group at a time, so memory use is bounded by the size of a single row group.
+
+        Note that this requires pyarrow.
+
+        :param str path: The path of the Parquet file.
+        :param int row_group_size: The number of rows in each row group.
+        :param None|dict types: A dictionary mapping column names to pyarrow datatypes, overriding the defaults.
+        :param dict writer_kwargs: Other keyword arguments passed to ``pyarrow.parquet.ParquetWriter`` (eg ``compression="zstd"``).
+        :return: The number of rows written.
+        :rtype: int
+        """
+
+        return arrow.write_parquet(self, path, row_group_size=row_group_size, types=types, **writer_kwargs)
+
     @LazyProperty
     def shape(self):
         """
@@ -202,6 +356,7 @@ class Table(object):
             index=sorted(list(counts.keys()))
         )
 
+    @instrumented
     def insert(self, row, columns=None):
         """
         Inserts a single tuple into the table.
@@ -237,7 +392,7 @@ class Table(object):
                     len(row), len(columns)))
 
         stmt = """insert into {} ({}) values ({});""".format(
-            self, ", ".join(columns), ", ".join(["%s"] * len(columns))
+            queries.relation(self), ", ".join(quote_identifier(c) for c in columns), ", ".join(["%s"] * len(columns))
         )
 
         cur = self.conn.cursor()
@@ -246,7 +401,9 @@ class Table(object):
 
         return bool(cur.rowcount)
 
-    def insert_csv(self, file_name, columns=None, header=True, sep=",", null="", size=8192):
+    @instrumented
+    def insert_csv(self, file_name, columns=None, header=True, sep=",", null="", size=8192,
+                   parallel=None, atomic=True):
         """
         A wrapper around the `copy_expert <http://initd.org/psycopg/docs/cursor.html#cursor.copy_expert>`_ method of the psycopg2 cursor class to do a bulk insert into the table.
 
@@ -256,54 +413,487 @@ class Table(object):
         :param str sep: The separator character.
         :param str null: The string used to indicate null values.
         :param int size: The size of the buffer that ``psycopg2.cursor.copy_expert`` uses.
+        :param None|int parallel: If specified, the file is split (on row boundaries) into this many chunks, each of which is loaded by its own ``COPY`` over a separate pooled connection (see :attr:`pg_utils.connection.Connection.pool`). The raw bytes of the file are sent, so the file must be in the connection's client encoding.
+        :param bool atomic: Only used if ``parallel`` is specified. If enabled, the chunks are committed together with a two-phase commit (which requires ``max_prepared_transactions`` to be positive on the server), so either every chunk is loaded or none of them are. Otherwise, each chunk is committed independently.
+        :return: If ``parallel`` is specified, a DataFrame (indexed by chunk) reporting the rows, bytes, elapsed seconds, and throughput of each chunk. Otherwise, ``None``.
+        :rtype: None|pandas.DataFrame
+        :raises pg_utils.exception.BulkLoadError: if ``parallel`` is specified and any chunk fails to load. The per-chunk report is attached as the ``report`` attribute of the exception.
         """
 
-        column_str = "" if columns is None else " ({})".format(",".join([str(x) for x in columns]))
+        def copy_cmd(has_header):
+            return bulk.copy_csv_cmd(self, columns=columns, sep=sep, null=null, header=has_header)
 
-        cmd = "copy {}{} from stdin delimiter '{}' null '{}' csv".format(self,
-                                                                         column_str,
-                                                                         sep, null)
-        if header:
-            cmd += " header"
-        else:
-            cmd += " no header"
+        if parallel is not None:
+            if not isinstance(parallel, six.integer_types) or parallel <= 0:
+                raise ValueError("'parallel' must be a positive integer or None (got {})".format(parallel))
+
+            return bulk.parallel_copy_csv(self, file_name, copy_cmd, header=header,
+                                          parallel=parallel, atomic=atomic, size=size)
 
         with open(file_name) as f:
             cur = self.conn.cursor()
-            cur.copy_expert(sql=cmd, file=f, size=size)
+            cur.copy_expert(sql=copy_cmd(header), file=f, size=size)
             self.conn.commit()
             cur.close()
 
-    def insert_dataframe(self, data_frame, encoding="utf8", **csv_kwargs):
+    @instrumented
+    def insert_dataframe(self, data_frame, encoding="utf8", parallel=None, atomic=True, **csv_kwargs):
         """
         Does a bulk insert of a given pandas DataFrame, writing it to a (temp) CSV file, and then importing it.
 
         :param pd.DataFrame data_frame: The DataFrame that is to be inserted into this table.
         :param str encoding: The encoding of the CSV file.
+        :param None|int parallel: The number of chunks (and connections) to use when loading the data. See :meth:`insert_csv`.
+        :param bool atomic: Whether or not a parallel load is all-or-nothing. See :meth:`insert_csv`.
         :param csv_kwargs: Other keyword arguments that are passed to the ``insert_csv`` method.
+        :return: The per-chunk report from :meth:`insert_csv` if ``parallel`` is specified, and ``None`` otherwise.
+        :rtype: None|pandas.DataFrame
         """
 
         with tempfile.NamedTemporaryFile(mode="w", encoding=encoding) as f:
             data_frame.to_csv(f, index=False, **csv_kwargs)
+            f.flush()
             f.seek(0)
             kwargs = {"columns": csv_kwargs.get("columns"),
                       "header": csv_kwargs.get("header", True),
                       "sep": csv_kwargs.get("sep", ","),
-                      "null": csv_kwargs.get("na_rep", "")}
-            self.insert_csv(f.name, **kwargs)
+                      "null": csv_kwargs.get("na_rep", ""),
+                      "parallel": parallel,
+                      "atomic": atomic}
+            return self.insert_csv(f.name, **kwargs)
+
+    @instrumented
+    def bulk_load(self, data, columns=None, replace=False, unlogged=True, defer_indexes=True,
+                  maintenance_work_mem=None, analyze=True, parallel=None,
+                  header=True, sep=",", null="", encoding="utf8", size=8192):
+        """
+        Loads a large amount of data into this table as quickly as possible. The data is first copied into a staging table that lives alongside this one (and is dropped afterwards), and then it is moved into place in a single transaction:
+
+        * If ``replace`` is disabled, the staged rows are appended to this table. Secondary indexes (ie those that don't back a primary key, unique, or exclusion constraint) can be dropped beforehand and rebuilt afterwards.
+        * If ``replace`` is enabled, the staging table is swapped in for this table: this table is dropped, and the staging table is renamed and given its indexes, constraints (including foreign keys), triggers, owner, and privileges. Readers see either the old contents or the new contents, and nothing in between. Sequences owned by the columns of this table (eg of ``serial`` columns) are handed over to the new table, and the sequences of its identity columns carry on from where this table's left off. Tables that can't be swapped this way are refused before anything is loaded: those referenced by foreign keys of other tables, with row-level security, or with privileges on particular columns. Since this table is dropped *without* ``cascade``, the load also fails (leaving everything as it was) if any views depend on it.
+
+        If anything goes wrong, the transaction is rolled back and the staging table is dropped.
+
+        :param str|pandas.DataFrame data: Either the name of a CSV file or a DataFrame (which is written to a temporary CSV file first).
+        :param None|list[str]|tuple[str] columns: The columns being loaded. If not specified, this is taken to be the columns of ``data`` (if it's a DataFrame) or all of the columns of this table (if it's a file name).
+        :param bool replace: Whether to replace the contents of this table (rather than appending to it).
+        :param bool unlogged: If enabled, the staging table is created as ``UNLOGGED`` (so loading it generates no WAL). When replacing, the staging table is switched back to ``LOGGED`` before it's swapped in.
+        :param bool defer_indexes: When appending, whether to drop the secondary indexes of this table during the load and rebuild them afterwards. When replacing, indexes are always built after the load.
+        :param None|str|int maintenance_work_mem: If specified, ``maintenance_work_mem`` is set to this value (eg ``"2GB"``) for the transaction that builds the indexes.
+        :param bool analyze: Whether to run ``ANALYZE`` on this table after the load, so that the planner statistics are fresh.
+        :param None|int parallel: If specified, the staging table is loaded in this many chunks over separate pooled connections (see :meth:`insert_csv`).
+        :param bool header: Indicates whether or not the CSV data has a header.
+        :param str sep: The separator character.
+        :param str null: The string used to indicate null values.
+        :param str encoding: The encoding used when writing a DataFrame to CSV.
+        :param int size: The size of the buffer that ``psycopg2.cursor.copy_expert`` uses.
+        :return: If ``parallel`` is specified, the per-chunk report of loading the staging table. Otherwise, ``None``.
+        :rtype: None|pandas.DataFrame
+        """
+
+        if isinstance(data, pd.DataFrame):
+            if columns is None:
+                columns = list(data.columns)
+
+            with tempfile.NamedTemporaryFile(mode="w", encoding=encoding) as f:
+                data.to_csv(f, index=False, columns=columns, sep=sep, na_rep=null, header=header)
+                f.flush()
+
+                return self._bulk_load_csv(f.name, columns, replace, unlogged, defer_indexes,
+                                           maintenance_work_mem, analyze, parallel,
+                                           header, sep, null, size)
+
+        return self._bulk_load_csv(data, columns, replace, unlogged, defer_indexes,
+                                   maintenance_work_mem, analyze, parallel,
+                                   header, sep, null, size)
+
+    def _bulk_load_csv(self, file_name, columns, replace, unlogged, defer_indexes,
+                       maintenance_work_mem, analyze, parallel, header, sep, null, size):
+
+        stage = bulk.staging_name(self)
+
+        def copy_cmd(has_header):
+            return bulk.copy_csv_cmd(stage, columns=columns, sep=sep, null=null, header=has_header)
+
+        cur = self.conn.cursor()
+
+        if replace:
+            blockers = bulk.replace_blockers(self.conn, self.name)
+            self.conn.commit()
+
+            if blockers:
+                raise ValueError("Unable to replace {}, since these wouldn't carry over to the new table: {}".format(
+                    self, ", ".join(blockers)))
+
+        cur.execute("create {}table {} (like {} {})".format(
+            "unlogged " if unlogged else "", stage, self,
+            "including all excluding indexes" if replace else "including defaults"))
+        self.conn.commit()
+
+        try:
+            if parallel is None:
+                report = None
+
+                with open(file_name) as f:
+                    cur.copy_expert(sql=copy_cmd(header), file=f, size=size)
+            else:
+                report = bulk.parallel_copy_csv(self, file_name, copy_cmd, header=header,
+                                                parallel=parallel, atomic=False, size=size)
+
+            if replace and unlogged:
+                cur.execute("alter table {} set logged".format(stage))
+
+            self.conn.commit()
+
+            if maintenance_work_mem is not None:
+                cur.execute("set local maintenance_work_mem = %s", (maintenance_work_mem,))
+
+            if replace:
+                definitions = bulk.index_definitions(self.conn, self.name)
+                foreign_keys = bulk.foreign_key_definitions(self.conn, self.name)
+                triggers = bulk.trigger_definitions(self.conn, self.name)
+                privileges = bulk.privilege_statements(self.conn, self.name, str(self))
+
+                for sequence, column in bulk.owned_sequences(self.conn, self.name):
+                    cur.execute("alter sequence {} owned by {}.{}".format(sequence, stage, column))
 
-    def sort_values(self, by, ascending=True, **sql_kwargs):
+                for column, last_value, is_called in bulk.identity_sequences(self.conn, self.name):
+                    cur.execute("select setval(pg_get_serial_sequence(%s, %s), %s, %s)",
+                                (stage, column, last_value, is_called))
+
+                cur.execute("drop table {}".format(self))
+                cur.execute("alter table {} rename to {}".format(stage, self.table_name))
+
+                for _, index_def, constraint_name, constraint_def in definitions:
+                    if constraint_name is None:
+                        cur.execute(index_def)
+                    else:
+                        cur.execute("alter table {} add constraint {} {}".format(
+                            self, constraint_name, constraint_def))
+
+                for constraint_name, constraint_def in foreign_keys:
+                    cur.execute("alter table {} add constraint {} {}".format(self, constraint_name, constraint_def))
+
+                for trigger_name, trigger_def, disabled in triggers:
+                    cur.execute(trigger_def)
+
+                    if disabled:
+                        cur.execute("alter table {} disable trigger {}".format(self, trigger_name))
+
+                for statement in privileges:
+                    cur.execute(statement)
+            else:
+                secondary = [d for d in bulk.index_definitions(self.conn, self.name) if d[2] is None] \
+                    if defer_indexes else []
+
+                for index_name, _, _, _ in secondary:
+                    cur.execute("drop index {}.{}".format(self.schema, index_name))
+
+                column_str = "*" if columns is None else ", ".join([str(x) for x in columns])
+
+                cur.execute("insert into {}{} select {} from {}".format(
+                    self, "" if columns is None else " ({})".format(column_str), column_str, stage))
+
+                for _, index_def, _, _ in secondary:
+                    cur.execute(index_def)
+
+                cur.execute("drop table {}".format(stage))
+
+            self.conn.commit()
+
+        except Exception:
+            self.conn.rollback()
+            cur.execute("drop table if exists {}".format(stage))
+            self.conn.commit()
+            raise
+
+        for attr in ["_count", "_shape"]:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
+        if analyze:
+            cur.execute("analyze {}".format(self))
+            self.conn.commit()
+
+        return report
+
+    @instrumented
+    def upsert_dataframe(self, data_frame, key_columns, update_columns=None, method="on_conflict",
+                         encoding="utf8", size=8192):
+        """
+        Inserts the rows of a DataFrame, updating any existing rows that have the same key instead. The DataFrame is copied into a temporary table, and then everything is done by a single set-based statement:
+
+        * ``method="on_conflict"`` uses ``INSERT ... ON CONFLICT (key_columns) DO UPDATE``. This requires a unique index or constraint on ``key_columns``.
+        * ``method="merge"`` uses ``MERGE`` (PostgreSQL 15 or later), which needs no such index. Before PostgreSQL 17 (where ``MERGE`` can't return the actions it took), the table is locked against other writers until the statement commits, so that the new rows can be counted beforehand.
+
+        In both cases, each key may only appear once in ``data_frame``.
+
+        :param pandas.DataFrame data_frame: The rows to upsert. Its columns must be columns of this table.
+        :param str|list[str] key_columns: The column(s) identifying a row.
+        :param None|list[str] update_columns: The columns to overwrite when a row already exists. If not specified, every column of ``data_frame`` that isn't a key column is used. If empty, existing rows are left alone.
+        :param str method: Either ``"on_conflict"`` or ``"merge"``.
+        :param str encoding: The encoding of the temporary CSV file.
+        :param int size: The size of the buffer that ``psycopg2.cursor.copy_expert`` uses.
+        :return: A Series with the number of rows ``inserted`` and ``updated``.
+        :rtype: pandas.Series
+        """
+
+        if method not in ["on_conflict", "merge"]:
+            raise ValueError("'method' must be 'on_conflict' or 'merge' (got {})".format(method))
+
+        if method == "merge" and self.conn.connection.server_version < 150000:
+            raise ValueError("MERGE requires PostgreSQL 15 or later")
+
+        if isinstance(key_columns, six.string_types):
+            key_columns = [key_columns]
+
+        columns = [str(c) for c in data_frame.columns]
+
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in key_columns]
+
+        if not key_columns:
+            raise ValueError("At least one key column must be given")
+
+        unknown = [c for c in columns if c not in self._all_column_names]
+        if unknown:
+            raise NoSuchColumnError(", ".join(unknown))
+
+        missing = [c for c in list(key_columns) + list(update_columns) if c not in columns]
+        if missing:
+            raise ValueError("The following columns are not in the DataFrame: {}".format(", ".join(missing)))
+
+        # the names of the columns can be anything that pandas allows, so they're all quoted as need be
+        stage = quote_identifier("pg_utils_upsert_{}".format(uuid.uuid4().hex[:8]))
+        relation = queries.relation(self)
+        quoted = [quote_identifier(c) for c in columns]
+        keys = [quote_identifier(c) for c in key_columns]
+        updates = [quote_identifier(c) for c in update_columns]
+        column_str = ", ".join(quoted)
+        cur = self.conn.cursor()
+
+        try:
+            cur.execute("create temp table {} on commit drop as select {} from {} with no data".format(
+                stage, column_str, relation))
+
+            with tempfile.NamedTemporaryFile(mode="w", encoding=encoding) as f:
+                data_frame.to_csv(f, index=False)
+                f.flush()
+
+                with open(f.name) as csv_file:
+                    cur.copy_expert(sql=bulk.copy_csv_cmd(stage, columns=quoted), file=csv_file, size=size)
+
+            if method == "on_conflict":
+                if updates:
+                    action = "do update set {}".format(", ".join(["{0} = excluded.{0}".format(c) for c in updates]))
+                else:
+                    action = "do nothing"
+
+                cur.execute("""
+                    with upserted as (
+                        insert into {table} ({columns})
+                        select {columns} from {stage}
+                        on conflict ({keys}) {action}
+                        returning (xmax = 0) as inserted
+                    )
+                    select count(1) filter (where inserted), count(1) filter (where not inserted)
+                    from upserted""".format(table=relation, columns=column_str, stage=stage,
+                                            keys=", ".join(keys), action=action))
+
+                inserted, updated = cur.fetchone()
+
+            else:
+                condition = " and ".join(["t.{0} = s.{0}".format(c) for c in keys])
+
+                matched = ""
+                if updates:
+                    matched = "when matched then update set {}".format(
+                        ", ".join(["{0} = s.{0}".format(c) for c in updates]))
+
+                merge = """
+                    merge into {table} t
+                    using {stage} s on {condition}
+                    {matched}
+                    when not matched then insert ({columns}) values ({values})""".format(
+                    table=relation, stage=stage, condition=condition, matched=matched, columns=column_str,
+                    values=", ".join(["s.{}".format(c) for c in quoted]))
+
+                if self.conn.connection.server_version >= 170000:
+                    cur.execute("""
+                        with merged as ({} returning merge_action() as action)
+                        select count(1) filter (where action = 'INSERT'), count(1) filter (where action = 'UPDATE')
+                        from merged""".format(merge))
+
+                    inserted, updated = cur.fetchone()
+                else:
+                    # without RETURNING, the new rows have to be counted beforehand, so other writers are kept out
+                    # until the transaction ends (readers aren't blocked)
+                    cur.execute("lock table {} in share row exclusive mode".format(relation))
+                    cur.execute("select count(1) from {} s where not exists (select 1 from {} t where {})".format(
+                        stage, relation, condition))
+
+                    inserted = cur.fetchone()[0]
+
+                    cur.execute(merge)
+                    updated = cur.rowcount - inserted
+
+            self.conn.commit()
+
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        for attr in ["_count", "_shape"]:
+            if hasattr(self, attr):
+                delattr(self, attr)
+
+        return pd.Series([inserted, updated], index=["inserted", "updated"])
+
+    @instrumented
+    def copy_to(self, target, columns=None, where=None, parallel=None, split_on=None, binary=True,
+                max_chunks=16, size=8192):
+        """
+        Copies the rows of this table into another table, which may live in another schema or on another server. The output of ``COPY ... TO STDOUT`` on this table's connection is piped straight into ``COPY ... FROM STDIN`` on the target's connection through a bounded buffer, so the rows are never decoded (or held in memory all at once) in Python.
+
+        :param Table|pg_utils.connection.Connection|str target: The table to copy into. If it's a connection, then the target is the table with the same (qualified) name as this one on that connection. If it's a string, then it's the name of a table reachable via this table's connection. The target table must already exist.
+        :param None|list[str] columns: The columns to copy (which must exist in both tables). If not specified, the columns of this object are used.
+        :param None|str where: An optional SQL condition restricting the rows that are copied.
+        :param None|int parallel: If specified, the rows are split into this many ranges, each of which is copied over its own pair of pooled connections. Every range reads from the same (exported) snapshot of this table. Each range is committed on its own.
+        :param None|str split_on: The numeric column whose range is split when ``parallel`` is specified. If not specified, the table is split by ranges of physical pages (via ``ctid``), which is efficient on PostgreSQL 14 and later.
+        :param bool binary: Whether to use the binary ``COPY`` format. This is the fastest option, but it requires the column types of both tables to match exactly. Otherwise, the text format is used.
+        :param int max_chunks: The number of 64kB chunks that may be buffered between the two connections.
+        :param int size: The size of the buffer that ``psycopg2.cursor.copy_expert`` uses.
+        :return: A DataFrame (indexed by split) reporting the rows, bytes, elapsed seconds, and throughput of each split.
+        :rtype: pandas.DataFrame
+        :raises pg_utils.exception.BulkLoadError: if ``parallel`` is specified and any split fails to copy. The per-split report is attached as the ``report`` attribute of the exception.
+        """
+
+        if isinstance(target, Table):
+            target_table = target
+        elif isinstance(target, Connection):
+            target_table = Table(self.table_name, schema=self.schema, conn=target)
+        else:
+            target_table = Table(target, conn=self.conn)
+
+        if columns is None:
+            columns = self.column_names
+
+        if [c for c in columns if c not in self._all_column_names]:
+            raise NoSuchColumnError(", ".join([str(c) for c in columns if c not in self._all_column_names]))
+
+        if parallel is not None and (not isinstance(parallel, six.integer_types) or parallel <= 0):
+            raise ValueError("'parallel' must be a positive integer or None (got {})".format(parallel))
+
+        if split_on is not None and split_on not in self._all_numeric_columns:
+            raise ValueError("'split_on' must be a numeric column of {} (got {})".format(self, split_on))
+
+        report = bulk.copy_table(self, target_table, columns=columns, where=where, parallel=parallel,
+                                 split_on=split_on, binary=binary, max_chunks=max_chunks, size=size)
+
+        for attr in ["_count", "_shape"]:
+            if hasattr(target_table, attr):
+                delattr(target_table, attr)
+
+        return report
+
+    @instrumented
+    def sort_values(self, by, ascending=True, limit=None, memory_budget=None, **sql_kwargs):
         """
         Mimicks the `pandas.DataFrame.sort_values method <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.sort_values.html#pandas.DataFrame.sort_values>`_.
 
         :param str|list[str] by: A string or list of strings representing one or more column names by which to sort.
         :param bool|list[bool] ascending: Whether to sort ascending or descending. This must match the number of columns by which we're sorting, although if it's just a single value, it'll be used for all columns.
-        :param dict sql_kwargs: A dictionary of keyword arguments passed into `pandas.read_sql <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_.
-        :return: Values of the sorted DataFrame.
+        :param int|None limit: Either a positive integer for the number of rows to take or ``None`` to take all. The limit is applied by the server, which only has to keep the top rows while sorting (or can read them off an index).
+        :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The memory budget for the result (see :meth:`head`).
+        :param dict sql_kwargs: A dictionary of keyword arguments passed into `pandas.read_sql <http://pandas.pydata.org/pandas-docs/stable/generated/pandas.read_sql.html>`_. If there are any, the values are decoded by pandas rather than by :mod:`pg_utils.dtypes`.
+        :return: Values of the sorted DataFrame (or, if it's over a memory budget with the ``"chunk"`` policy, an iterator of data frames).
         :rtype: pandas.DataFrame
         """
 
-        sql = self.select_all_query()
+        if limit is not None and (not isinstance(limit, six.integer_types) or limit <= 0):
+            raise ValueError("limit must be a positive integer or None (got {})".format(limit))
+
+        return self._fetch_frame(self._sort_values_query(by, ascending, limit=limit), num_rows=limit,
+                                 memory_budget=memory_budget, **sql_kwargs)
+
+    @instrumented
+    def nlargest(self, n, columns):
+        """
+        Mimics the method `pandas.DataFrame.nlargest <https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.nlargest.html>`_: the first ``n`` rows, ordered by some columns in descending order. Rows with nulls in those columns are left out.
+
+        :param int n: The number of rows.
+        :param str|list[str] columns: The column(s) to order by.
+        :rtype: pandas.DataFrame
+        """
+        return self._top(n, columns, False)
+
+    @instrumented
+    def nsmallest(self, n, columns):
+        """
+        Mimics the method `pandas.DataFrame.nsmallest <https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.nsmallest.html>`_: the first ``n`` rows, ordered by some columns in ascending order. Rows with nulls in those columns are left out.
+
+        :param int n: The number of rows.
+        :param str|list[str] columns: The column(s) to order by.
+        :rtype: pandas.DataFrame
+        """
+        return self._top(n, columns, True)
+
+    def _top(self, n, columns, ascending):
+
+        if not isinstance(n, six.integer_types) or n <= 0:
+            raise ValueError("n must be a positive integer (got {})".format(n))
+
+        if isinstance(columns, str):
+            columns = [columns]
+
+        return self._fetch_frame(self._sort_values_query(columns, ascending, limit=n, not_null=True), num_rows=n)
+
+    def iter_sorted(self, by, page_size=10000, ascending=True):
+        """
+        Iterates over the rows of this table in order, a page at a time, by keyset pagination: each page is selected as the rows that come after the last row of the previous page (rather than with an ``OFFSET``, which would have the server read and throw away every earlier row), so walking the whole table costs about as much as one ordered scan, and a page only ever holds ``page_size`` rows in memory. With an index on ``by``, each page is a short index scan.
+
+        The columns in ``by`` must identify rows uniquely (eg include the primary key), or rows that tie with the last one of a page are skipped. Rows with nulls in those columns are left out.
+
+        :param str|list[str] by: The column(s) to order by.
+        :param int page_size: The number of rows in each page.
+        :param bool|list[bool] ascending: Whether to sort ascending or descending (as for :meth:`sort_values`).
+        :return: An iterator of data frames.
+        :rtype: collections.Iterator[pandas.DataFrame]
+        """
+
+        if not isinstance(page_size, six.integer_types) or page_size <= 0:
+            raise ValueError("page_size must be a positive integer (got {})".format(page_size))
+
+        if isinstance(by, str):
+            by = [by]
+
+        data_types = self.column_data_types
+        num_columns = len(self.column_names)
+        cur = self.conn.cursor()
+        after = None
+
+        while True:
+            cur.execute(self._sort_values_query(by, ascending, limit=page_size, not_null=True, after=after,
+                                                keys_as_text=True))
+            rows = cur.fetchall()
+
+            if not rows:
+                return
+
+            with measure_frame(self.conn):
+                page = typed_frame([row[:num_columns] for row in rows], self.column_names, data_types,
+                                   getattr(self.conn, "numeric_as_float", False))
+
+            yield page
+
+            if len(rows) < page_size:
+                return
+
+            # the keys of the last row are taken as text (rather than as they were decoded, which may have rounded
+            # them, eg numeric_as_float), and cast back to their types, so they compare exactly as the server sees them
+            after = list(rows[-1][num_columns:])
+
+    def _sort_values_query(self, by, ascending=True, limit=None, not_null=False, after=None, keys_as_text=False):
 
         if isinstance(by, str):
             by = [by]
@@ -319,25 +909,197 @@ class Table(object):
         if len(by) != len(ascending):
             raise ValueError("Mismatch between columns to sort by ({}), and ascending list ({})".format(by, ascending))
 
-        pairs = [[by[i], "" if ascending[i] else " desc"] for i in list(range(len(by)))]
+        # the data types of arrays, domains, and enums aren't given by name, and their keys are left as untyped literals
+        after_types = [None if self.column_data_types[name] in ("ARRAY", "USER-DEFINED") else
+                       self.column_data_types[name] for name in by]
+
+        return queries.select_columns(self, self.column_names, order_by=list(zip(by, ascending)), limit=limit,
+                                      not_null=by if not_null else None, after=after, after_types=after_types,
+                                      keys_as_text=keys_as_text)
 
-        sql += " order by " + ", ".join(["".join(p) for p in pairs])
+    @instrumented
+    def resample(self, time_column, freq, agg=None, fill=False, origin="epoch", start=None, end=None, where=None):
+        """
+        Mimics ``pandas.DataFrame.resample(freq, on=time_column).agg(agg)``, with the rows grouped into time buckets and aggregated by the database (with ``date_trunc``, or ``date_bin`` for frequencies that aren't a single unit), so that only a row per bucket is fetched.
+
+        :param str time_column: The name of the time column (of type ``timestamp``, ``timestamp with time zone``, or ``date``).
+        :param str freq: The frequency, as a pandas offset alias: either a fixed one (eg ``"15min"``, ``"h"``, or ``"2D"``), or a single calendar unit (``"MS"``, ``"QS"``, or ``"YS"``, for buckets starting at the start of each month, quarter, or year). Buckets are labelled by their start.
+        :param None|str|dict agg: The aggregates: ``"mean"``, ``"sum"``, ``"min"``, ``"max"``, ``"count"``, ``"nunique"``, ``"std"``, ``"var"``, or ``"median"`` of every numeric column, or a dictionary from column names to one of those, or a list of them. Defaults to the mean of every numeric column.
+        :param bool fill: Whether to fill the gaps between the first and last buckets with empty buckets (via ``generate_series``), whose counts and sums are 0 and other aggregates null (as pandas does).
+        :param str|datetime.datetime origin: The time that fixed frequencies are aligned to: ``"epoch"`` (ie 1970-01-01, which aligns frequencies that divide a day to midnight, as pandas does by default) or a timestamp. Calendar units are aligned to themselves.
+        :param None|datetime.datetime start: The earliest time of the rows to aggregate.
+        :param None|datetime.datetime end: The time before which the rows are aggregated.
+        :param None|str where: A condition on the rows (as raw SQL).
+        :return: The aggregates, indexed by bucket (with a column for each aggregate, or with lists of aggregates, a column for each pair of column and aggregate).
+        :rtype: pandas.DataFrame
+        """
+
+        bucket, _, time_type = self._time_buckets(time_column, freq, origin)
+        aggregates, labels, data_types = self._resample_aggregates(time_column, agg)
+
+        cur = self.conn.cursor()
+        cur.execute(queries.resample(self, time_column, aggregates, bucket, time_type, start=start, end=end,
+                                     where=where, fill=fill))
 
-        return pd.read_sql(sql, self.conn, **sql_kwargs)
+        return self._resampled_frame(cur.fetchall(), time_column, time_type, labels, data_types)
 
-    def describe(self, columns=None, percentiles=None, type_="continuous"):
+    def iter_resample(self, time_column, freq, agg=None, fill=False, origin="epoch", buckets_per_query=10000,
+                      where=None):
         """
-        Mimics the ``pandas.DataFrame.describe`` method, getting basic statistics of each numeric column.
+        Streams the result of :meth:`resample` over a long range of time, a window of ``buckets_per_query`` buckets at a time: each window is aggregated by a query of its own, restricted to the times within it (so that, with an index on the time column, or on a table partitioned by time, each one only reads its own rows), and so only one window's result is held at a time.
+
+        :param int buckets_per_query: The number of buckets in each window.
+        :return: An iterator of data frames (one for each window with any rows, or with ``fill``, for each window).
+        :rtype: collections.Iterator[pandas.DataFrame]
+        """
+
+        if not isinstance(buckets_per_query, six.integer_types) or buckets_per_query <= 0:
+            raise ValueError("buckets_per_query must be a positive integer (got {})".format(buckets_per_query))
+
+        bucket, offset, time_type = self._time_buckets(time_column, freq, origin)
+        aggregates, labels, data_types = self._resample_aggregates(time_column, agg)
+
+        cur = self.conn.cursor()
+        cur.execute(queries.resample_range(self, time_column, bucket, time_type, where=where))
+        first, latest = cur.fetchone()
+
+        if first is None:
+            return
+
+        # the latest time is a datetime.date for date columns, which doesn't compare with timestamps
+        start, latest = pd.Timestamp(first), pd.Timestamp(latest)
+
+        while start <= latest:
+            end = start + offset * buckets_per_query
+
+            # the gaps of the last window are only filled up to its last bucket
+            cur.execute(queries.resample(self, time_column, aggregates, bucket, time_type, start=start, end=end,
+                                         where=where, fill=fill, first=start, last=end if end <= latest else None))
+            rows = cur.fetchall()
+
+            if rows:
+                yield self._resampled_frame(rows, time_column, time_type, labels, data_types)
+
+            start = end
+
+    def rolling(self, window, on, min_periods=None):
+        """
+        Mimics ``pandas.DataFrame.rolling(window, on=on)``: a moving window over the rows of this table, in order of ``on``, whose aggregates (eg ``t.rolling(10, on="id").mean()``, or ``.agg({"x": ["mean", "max"]})``) are computed by the database with window functions, as a lazily evaluated :class:`pg_utils.view.View`. The view can be filtered, aggregated, or streamed without fetching the rows of this table. See :class:`pg_utils.view.Rolling`.
+
+        The column ``on`` should identify the rows uniquely: the order of rows that tie on it is up to the database.
+
+        :param int|str|datetime.timedelta window: The number of rows in each window, or, for a timestamp or date column ``on``, the span of time of each window (eg ``"1h"``).
+        :param str on: The name of the column that orders the rows.
+        :param None|int min_periods: The minimum number of values in a window for its aggregates not to be null (defaulting to the number of rows in the window, or to 1, for spans of time).
+        :rtype: pg_utils.view.Rolling
+        """
+        return Rolling(self, window, on, min_periods=min_periods)
+
+    def _time_buckets(self, time_column, freq, origin="epoch"):
+        """
+        The buckets of :func:`pg_utils.sql.queries.resample` for a pandas frequency, the offset of one bucket, and the type that the times are cast to.
+        """
+
+        if time_column not in self._all_column_data_types:
+            raise NoSuchColumnError("Column {} does not exist in table {}".format(time_column, self))
 
-        :param None|list[str] columns: A list of column names to which the description should be restricted. If not specified, then all numeric columns will be included.
+        data_type = self._all_column_data_types[time_column]
+        dtype = dtypes.numpy_dtype(data_type)
+
+        if data_type != "date" and (dtype is None or not dtype.startswith("datetime64")):
+            raise ValueError("The column {} of {} is not a timestamp or date column".format(time_column, self))
+
+        time_type = "timestamptz" if dtype == "datetime64[ns, UTC]" else "timestamp"
+
+        offset = pd.tseries.frequencies.to_offset(freq)
+        name = type(offset).__name__
+
+        if offset.n == 1 and name in _date_trunc_units and getattr(offset, "startingMonth", 1) == 1 and \
+                getattr(offset, "month", 1) == 1:
+            return ("date_trunc", _date_trunc_units[name], None), offset, time_type
+
+        origin = pd.Timestamp(0) if origin == "epoch" else pd.Timestamp(origin)
+
+        if name == "Day":
+            return ("date_bin", "{} days".format(offset.n), str(origin)), offset, time_type
+
+        if isinstance(offset, pd.offsets.Tick) and offset.nanos % 1000 == 0:
+            return ("date_bin", "{} microseconds".format(offset.nanos // 1000), str(origin)), offset, time_type
+
+        raise ValueError("Unable to resample by '{}': the frequency must be fixed (eg '15min'), or a single calendar "
+                         "unit ('MS', 'QS', or 'YS')".format(freq))
+
+    def _resample_aggregates(self, time_column, agg=None):
+        """
+        The (column, aggregate) pairs of :func:`pg_utils.sql.queries.resample`, along with the label and data type of each aggregate.
+        """
+
+        if agg is None:
+            agg = "mean"
+
+        if isinstance(agg, six.string_types):
+            agg = {column: agg for column in self.numeric_columns if column != time_column}
+
+        multiple = any(isinstance(how, (list, tuple)) for how in agg.values())
+        aggregates, labels, data_types = [], [], []
+
+        for column, hows in agg.items():
+            if column not in self._all_column_data_types:
+                raise NoSuchColumnError("Column {} does not exist in table {}".format(column, self))
+
+            for how in ([hows] if isinstance(hows, six.string_types) else hows):
+                if how not in queries.resample_aggregates:
+                    raise ValueError("Unknown aggregate '{}' (must be one of {})".format(
+                        how, ", ".join(sorted(queries.resample_aggregates))))
+
+                aggregates.append((column, how))
+                labels.append((column, how) if multiple else column)
+                data_types.append(dtypes.aggregate_type(how, self._all_column_data_types[column]))
+
+        if not aggregates:
+            raise ValueError("There are no columns to aggregate")
+
+        return aggregates, labels, data_types
+
+    def _resampled_frame(self, rows, time_column, time_type, labels, data_types):
+
+        numeric_as_float = getattr(self.conn, "numeric_as_float", False)
+
+        with measure_frame(self.conn):
+            values = list(zip(*rows)) if rows else [[] for _ in range(len(labels) + 1)]
+            index = pd.Index(dtypes.to_array(list(values[0]), time_type), name=time_column)
+
+            columns = pd.MultiIndex.from_tuples(labels) if labels and isinstance(labels[0], tuple) else labels
+            frame = pd.DataFrame({i: dtypes.to_array(list(v), data_type, numeric_as_float)
+                                  for i, (v, data_type) in enumerate(zip(values[1:], data_types))}, index=index)
+            frame.columns = columns
+
+            return frame
+
+    @instrumented
+    def describe(self, columns=None, percentiles=None, type_="continuous", budget=None, incremental_on=None,
+                 store=None, by_partition=False, where=None, parallel=None, include=None):
+        """
+        Mimics the ``pandas.DataFrame.describe`` method, getting basic statistics of each numeric column (or, with ``include``, of columns of other kinds).
+
+        :param None|list[str] columns: A list of column names to which the description should be restricted. If not specified, then all numeric columns will be included (or all the columns of the kinds in ``include``).
         :param list[float]|None percentiles: A list of percentiles (given as numbers between 0 and 1) to compute. If not specified, quartiles will be used (ie 0.25, 0.5, 0.75).
         :param str type_: Specifies whether the percentiles are to be taken as discrete or continuous. Must be one of `"discrete"` or `"continuous"`.
+        :param None|float|pg_utils.budget.Budget budget: A budget for the query (defaulting to the connection's). If it would be exceeded, the description is computed from a sample of the table (or from the planner's statistics), and ``result.attrs["approximate"]`` is set. See :mod:`pg_utils.budget`.
+        :param None|str incremental_on: The name of a watermark column of an append-only table (eg a ``serial`` id). If given, the description is computed incrementally: mergeable summaries of the columns are kept in ``store`` along with the greatest watermark seen, and only the rows past it are scanned. Since watermarks can commit out of order, rows past the stored watermark are kept pending (and recounted on each call) until every transaction that was running when they were seen has finished. The percentiles are then estimated from quantile sketches (so ``type_`` and ``budget`` don't apply), and ``result.attrs`` holds the ``watermark``, the number of ``rows_scanned`` and the number of ``pending_rows``. See :func:`pg_utils.summary.incremental_describe`.
+        :param None|pg_utils.summary.SummaryStore store: Where incremental (or per-partition) summaries are kept (defaulting to memory, for the life of the process).
+        :param bool by_partition: Whether to describe a declaratively partitioned table partition by partition: a mergeable summary of each partition is kept in ``store`` with the partition's exact version token, so only the partitions that have changed are summarized again, and the summaries are merged into the description. As for ``incremental_on``, the percentiles are estimated (and ``type_`` and ``budget`` don't apply). ``result.attrs`` holds the number of ``partitions``, and how many were scanned (``partitions_scanned``) and pruned (``partitions_pruned``). See :func:`pg_utils.partition.describe`.
+        :param None|str where: With ``by_partition``, a condition on the rows (as raw SQL). Partitions that the planner rules out for it aren't scanned.
+        :param None|int parallel: With ``by_partition``, how many partitions to scan at once (over connections from the pool).
+        :param None|str|list[str] include: The kinds of columns to describe (see :func:`pg_utils.dtypes.kind`): ``"all"``, or a list of ``"number"``, ``"text"``, ``"temporal"``, ``"boolean"``, ``"array"``, and ``"other"``. If given (or if ``columns`` holds any columns that aren't numeric), every column is summarized according to its kind, in a single scan of the table: text columns get the number of ``unique`` values and the most common (``top``) one, whose frequency (``freq``) is counted in one more scan; temporal columns get their ``minimum``, ``maximum``, and ``range``; boolean columns get their ``true_ratio``; and array columns get the ``min_length``, ``mean_length``, ``median_length``, and ``max_length`` of their values. The result then has a row for each statistic that applies to any of the columns (as with ``pandas.DataFrame.describe(include="all")``). This doesn't combine with ``incremental_on`` or ``by_partition``, and the planner's statistics aren't used to stay within ``budget`` (only a sample is).
         :return: A series representing the statistical description for each column. The format is the same as the output of ``pandas.DataFrame.describe``.
         :rtype: pd.DataFrame
         """
 
-        if columns is None:
-            columns = self.numeric_columns
+        columns, profile = self._describe_columns(columns, include)
+
+        if profile and (incremental_on is not None or by_partition):
+            raise ValueError("Only numeric columns can be described incrementally or by partition")
 
         # TODO: Make these manipulations of percentiles a bit more DRY (this is also in column.base)
         if percentiles is None:
@@ -348,10 +1110,152 @@ class Table(object):
         if not isinstance(percentiles, (list, tuple)):
             percentiles = [percentiles]
 
+        if where is not None and not by_partition:
+            raise ValueError("'where' is only supported with 'by_partition'")
+
+        if profile:
+            return self._profile(columns, percentiles, type_, budget)
+
+        if incremental_on is not None:
+            result, info = incremental_describe(self, columns, percentiles, incremental_on, store=store)
+        elif by_partition:
+            result, info = partition.describe(self, columns, percentiles, where=where, parallel=parallel, store=store)
+        else:
+            result, info = self._describe_rows(columns, percentiles, type_, budget)
+
+        index = ["count", "mean", "std_dev", "minimum"] + \
+                ["{}%".format(int(100 * p)) for p in percentiles] + \
+                ["maximum"]
+
+        with measure_frame(self.conn):
+            result = pd.DataFrame(result, columns=columns, index=index)
+
+        result.attrs.update(info)
+
+        return result
+
+    def _describe_columns(self, columns, include):
+        """
+        The columns to describe, and whether they need describing according to their kinds (rather than as numbers).
+        """
+
+        if include is not None and include != "all":
+            include = [include] if isinstance(include, str) else list(include)
+            unknown = set(include) - set(_profile_kinds)
+
+            if unknown:
+                raise ValueError("Unknown kinds of columns to include: {}".format(", ".join(sorted(unknown))))
+
+        if columns is None:
+            if include is None:
+                columns = self.numeric_columns
+            else:
+                columns = [c for c in self.column_names
+                           if include == "all" or dtypes.kind(self.column_data_types[c]) in include]
+
+        return columns, include is not None or any(c not in self.numeric_columns for c in columns)
+
+    def _profile_query(self, columns, percentiles, type_="continuous", source=None):
+
+        kinds = [(column, dtypes.kind(self.column_data_types[column])) for column in columns]
+
+        return queries.profile_columns(source or self, kinds, percentiles,
+                                       "cont" if type_.lower() == "continuous" else "disc",
+                                       data_types=[self.column_data_types[column] for column in columns])
+
+    def _profile(self, columns, percentiles, type_="continuous", budget=None):
+
+        if type_.lower() not in ["continuous", "discrete"]:
+            raise ValueError("The 'type_' parameter must be 'continuous' or 'discrete'")
+
+        kinds = [(column, dtypes.kind(self.column_data_types[column])) for column in columns]
+        percentile_labels = ["{}%".format(int(100 * p)) for p in percentiles]
+
+        budget = resolve_budget(self.conn, budget)
+        cur = self.conn.cursor()
+
+        info = execute_within_budget(cur, self,
+                                     lambda source: self._profile_query(columns, percentiles, type_, source=source),
+                                     budget)
+
+        values = list(cur.fetchone())
+        result = {}
+
+        for column, kind in kinds:
+            labels = ["count"] + {
+                "number": ["mean", "std_dev", "minimum"] + percentile_labels + ["maximum"],
+                "text": ["unique", "top"],
+                "temporal": ["minimum", "maximum", "range"],
+                "boolean": ["true_ratio"],
+                "array": ["min_length", "mean_length", "median_length", "max_length"],
+            }.get(kind, [])
+
+            result[column] = dict(zip(labels, values[:len(labels)]))
+            del values[:len(labels)]
+
+        # the frequency of the most common value can only be counted once it's known
+        tops = [(column, result[column]["top"]) for column, kind in kinds
+                if kind == "text" and result[column]["top"] is not None]
+
+        if tops:
+            source = sampled_source(self, info["sample_fraction"]) if info["method"] == "sample" else self
+            cur.execute(queries.count_equal(source, tops))
+
+            for (column, _), freq in zip(tops, cur.fetchone()):
+                result[column]["freq"] = freq
+
+        # counts over a sample are scaled back up to the size of the whole table
+        if info["method"] == "sample":
+            for summary in result.values():
+                for label in ["count", "freq"]:
+                    if summary.get(label) is not None:
+                        summary[label] = summary[label] / info["sample_fraction"]
+
+        labels = set(label for summary in result.values() for label in summary)
+        index = [label for label in _profile_rows[:7] + percentile_labels + _profile_rows[7:] if label in labels]
+
+        with measure_frame(self.conn):
+            result = pd.DataFrame({column: pd.Series(result[column], dtype=object) for column in columns},
+                                  index=index, columns=list(columns))
+
+        result.attrs.update(info)
+
+        return result
+
+    def _describe_rows(self, columns, percentiles, type_="continuous", budget=None):
+
+        budget = resolve_budget(self.conn, budget)
+        cur = self.conn.cursor()
+
+        info = execute_within_budget(
+            cur, self,
+            lambda source: self._describe_query(columns, percentiles, type_, source=source),
+            budget, allow_catalog=True
+        )
+
+        if info["method"] == "catalog":
+            return catalog_describe(self, [c for c in columns if self._get_column_by_name(c).is_numeric],
+                                    percentiles), info
+
+        result = {}
+
+        for row in cur.fetchall():
+            values = list(row[1:])
+
+            # counts over a sample are scaled back up to the size of the whole table
+            if info["method"] == "sample" and values[0] is not None:
+                values[0] = values[0] / info["sample_fraction"]
+
+            result[row[0]] = values
+
+        return result, info
+
+    def _describe_query(self, columns, percentiles, type_="continuous", source=None):
+
         column_subqueries = [
             q for q in
             [
-                col._get_describe_query(percentiles=percentiles, type_=type_)
+                col._get_describe_query(percentiles=percentiles, type_=type_, source=source)
                 for col in [self._get_column_by_name(col) for col in columns]
                 ]
             if q
@@ -362,52 +1266,157 @@ class Table(object):
         if self.debug:
             _pretty_print(query)
 
-        cur = self.conn.cursor()
-        cur.execute(query)
+        return query
 
-        result = {}
+    def explain(self, method, analyze=False, buffers=False, **kwargs):
+        """
+        Previews the cost of a method of this table without running it: the SQL that the method would execute is rendered and passed to ``EXPLAIN (FORMAT JSON)``.
+
+        The following methods are supported (keyword arguments are those of the method itself):
+
+        * ``"count"``
+        * ``"head"`` (``num_rows``)
+        * ``"sort_values"`` (``by``, ``ascending``, ``limit``)
+        * ``"nlargest"`` and ``"nsmallest"`` (``n``, ``columns``)
+        * ``"describe"`` (``columns``, ``percentiles``, ``type_``, ``include``): with ``include``, this only explains the first of the two scans (see :meth:`describe`).
+        * ``"bin_counts"`` (``column``, ``bins``): this runs two statements. The histogram statement depends on the minimum and maximum found by the first one, so it's explained with placeholder bounds (which don't change the shape of its plan).
+
+        :param str method: The name of the method.
+        :param bool analyze: Whether to actually run the statements (via ``EXPLAIN ANALYZE``) to get actual timings and sort methods.
+        :param bool buffers: Whether to include buffer usage (only used if ``analyze`` is enabled).
+        :param dict kwargs: Keyword arguments of the method.
+        :return: A DataFrame with one row per statement, holding the SQL, the planner's estimates (``startup_cost``, ``total_cost``, ``plan_rows``, ``plan_width``), the ``node_types`` and ``sort_methods`` found in the plan, the actual ``execution_time`` (in milliseconds, if ``analyze`` is enabled), and the full ``plan``.
+        :rtype: pandas.DataFrame
+        """
 
-        index = ["count", "mean", "std_dev", "minimum"] + \
-                ["{}%".format(int(100 * p)) for p in percentiles] + \
-                ["maximum"]
+        statements = self._explainable_queries(method, **kwargs)
 
-        for row in cur.fetchall():
-            result[row[0]] = row[1:]
+        return explain.explain_frame(self.conn, statements, analyze=analyze, buffers=buffers)
 
-        result = pd.DataFrame(result, columns=columns, index=index)
+    def _explainable_queries(self, method, **kwargs):
 
-        return result
+        if method == "count":
+            return [queries.count_rows(self)]
 
-    @seaborn_required
-    def pairplot(self, **kwargs):
+        if method == "head":
+            return [self._head_query(kwargs.get("num_rows", 10))]
+
+        if method == "sort_values":
+            return [self._sort_values_query(kwargs["by"], kwargs.get("ascending", True), limit=kwargs.get("limit"))]
+
+        if method in ("nlargest", "nsmallest"):
+            return [self._sort_values_query(kwargs["columns"], method == "nsmallest", limit=kwargs["n"], not_null=True)]
+
+        if method == "describe":
+            columns, profile = self._describe_columns(kwargs.get("columns"), kwargs.get("include"))
+            percentiles = kwargs.get("percentiles")
+
+            if percentiles is None:
+                percentiles = [0.25, 0.5, 0.75]
+            elif not isinstance(percentiles, (list, tuple)):
+                percentiles = [percentiles]
+
+            if profile:
+                return [self._profile_query(columns, percentiles, kwargs.get("type_", "continuous"))]
+
+            return [self._describe_query(columns, percentiles, kwargs.get("type_", "continuous"))]
+
+        if method == "bin_counts":
+            column = kwargs["column"]
+
+            if not isinstance(column, Column):
+                column = self._get_column_by_name(column)
+
+            return [
+                column._get_describe_query(percentiles=[0.25, 0.75]),
+                bin_counts.counts_query(column, bins=kwargs.get("bins") or 50, minimum=0, maximum=1)
+            ]
+
+        raise ValueError("Unable to explain method '{}'".format(method))
+
+    @instrumented
+    def pairplot(self, memory_budget=None, binned=False, bins=50, kind="heatmap", sample=None, budget=None,
+                 **kwargs):
         """Yields a Seaborn pairplot for all of the columns of this table that are of a numeric datatype.
 
-        :param dict kwargs: Optional keyword arguments to pass into `seaborn.pairplot <https://stanford.edu/~mwaskom/software/seaborn/generated/seaborn.pairplot.html#seaborn.pairplot>`_.
-        :return: The grid of plots.
+        With ``binned``, the plot is drawn with matplotlib from bin counts computed by the database instead (see :func:`pg_utils.bin_counts.pairwise_counts`), so that no rows are fetched: each column's histogram is on the diagonal, and the 2-D histogram of each pair of columns is drawn off of it, as a heatmap or with hexagonal bins. It takes two scans of the table whatever the number of columns, and fetches ``O(columns ** 2 * bins ** 2)`` counts. A sample of the rows can be scattered over the 2-D histograms.
+
+        :param None|int|float|str|pg_utils.memory.MemoryBudget memory_budget: The memory budget for fetching the columns (see :meth:`head`). Since the plot needs all of the rows at once, the ``"chunk"`` policy is taken to be ``"raise"``.
+        :param bool binned: Whether to draw the plot from bin counts.
+        :param int bins: With ``binned``, the number of bins of each column.
+        :param str kind: With ``binned``, how the 2-D histograms are drawn: ``"heatmap"`` (with ``pcolormesh``) or ``"hexbin"``.
+        :param None|int sample: With ``binned``, the (approximate) number of rows to scatter over the 2-D histograms, if any. They're taken from a block sample of the table.
+        :param None|float|pg_utils.budget.Budget budget: With ``binned``, a budget for the queries (see :func:`pg_utils.bin_counts.pairwise_counts`).
+        :param dict kwargs: Optional keyword arguments to pass into `seaborn.pairplot <https://stanford.edu/~mwaskom/software/seaborn/generated/seaborn.pairplot.html#seaborn.pairplot>`_ (or with ``binned``, into ``pcolormesh`` or ``hexbin``).
+        :return: The grid of plots (with ``binned``, a 2-D array of the axes, as for ``pandas.plotting.scatter_matrix``).
         """
 
+        if binned:
+            return self._binned_pairplot(bins, kind, sample, budget, **kwargs)
+
+        return self._seaborn_pairplot(memory_budget, **kwargs)
+
+    @seaborn_required
+    def _seaborn_pairplot(self, memory_budget=None, **kwargs):
+
         import seaborn
-        return seaborn.pairplot(self[self.numeric_columns].head("all"), **kwargs)
+        return seaborn.pairplot(self[self.numeric_columns].head("all", memory_budget=whole_result_budget(
+            self.conn, memory_budget)), **kwargs)
+
+    def _binned_pairplot(self, bins=50, kind="heatmap", sample=None, budget=None, **kwargs):
+
+        if kind not in ["heatmap", "hexbin"]:
+            raise ValueError("The 'kind' parameter must be 'heatmap' or 'hexbin'")
+
+        columns = list(self.numeric_columns)
+        edges, counts, pair_counts = bin_counts.pairwise_counts(self, columns, bins=bins, budget=budget)
+        centers = {column: (e[:-1] + e[1:]) / 2.0 for column, e in edges.items()}
+
+        points = None
+
+        if sample:
+            # the number of rows is estimated from the counts already at hand, rather than counted
+            fraction = float(sample) / max(max(c.sum() for c in counts.values()), 1)
+            source = self if fraction >= 1 else sampled_source(self, fraction)
+            points = dtypes.fetch_frame(self.conn, queries.select_columns(source, columns, limit=sample), columns,
+                                        self.column_data_types)
+
+        k = len(columns)
+        _, axes = plt.subplots(k, k, figsize=(2.5 * k, 2.5 * k), squeeze=False)
+
+        for i, y in enumerate(columns):
+            for j, x in enumerate(columns):
+                ax = axes[i, j]
+
+                if i == j:
+                    ax.hist(centers[x], bins=edges[x], weights=counts[x])
+                else:
+                    # the counts of the pair, with a row for each bin of y
+                    grid = pair_counts[(x, y)].T if j < i else pair_counts[(y, x)]
+
+                    if kind == "heatmap":
+                        ax.pcolormesh(edges[x], edges[y], np.ma.masked_equal(grid, 0), **kwargs)
+                    else:
+                        xx, yy = np.meshgrid(centers[x], centers[y])
+                        present = grid > 0
+                        kwargs.setdefault("gridsize", min(bins, 30))
+                        ax.hexbin(xx[present], yy[present], C=grid[present], reduce_C_function=np.sum, **kwargs)
+
+                    if points is not None:
+                        ax.scatter(points[x], points[y], s=2, color="black", alpha=0.3)
+
+                if i == k - 1:
+                    ax.set_xlabel(x)
+
+                if j == 0:
+                    ax.set_ylabel(y)
+
+        return axes
 
     @LazyProperty
+    @instrumented
     def _all_column_metadata(self):
-        return pd.read_sql("""
-        select column_name,
-            case
-                when lower(data_type) = 'array' then column_alias||'[]'
-                else data_type
-            end as data_type
-        from(
-            select
-            column_name,
-            data_type,
-            translate(udt_name, '0123456789_', '') as column_alias,
-            ordinal_position
-            from information_schema.columns
-            where table_schema = '{}'
-            and table_name = '{}'
-        )a
-        order by ordinal_position;""".format(self.schema, self.table_name), self.conn)
+        return read_sql(queries.column_metadata(self.schema, self.table_name), self.conn)
 
     def _process_columns(self):
 
@@ -498,12 +1507,13 @@ class Table(object):
         """
         return ".".join([self.schema, self.table_name])
 
+    @instrumented
     def drop(self):
         """
         Drops the table and deletes this object (by calling ``del`` on it).
         """
         cur = self.conn.cursor()
-        cur.execute("drop table {} cascade".format(self))
+        cur.execute("drop table {} cascade".format(queries.relation(self)))
         self.conn.commit()
         del self
 
@@ -525,11 +1535,7 @@ class Table(object):
         conn = conn or Connection()
 
         cur = conn.cursor()
-        query = """
-          select count(1) from information_schema.tables
-          where table_schema='{}' and table_name='{}'
-          """.format(schema, table_name)
-        cur.execute(query)
+        cur.execute(queries.table_exists(schema, table_name))
 
         return bool(cur.fetchone()[0])
 
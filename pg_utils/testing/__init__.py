@@ -0,0 +1,4 @@
+"""
+Test doubles for pg-utils: a :class:`FakeConnection` that answers statements in-process (by matching them against registered results, and emulating plain ``select``\\ s of synthetic tables), and a :class:`RecordingConnection` that records a real workload for it to replay. They're meant for tests and client-side benchmarks, and aren't imported by :mod:`pg_utils.connection`.
+"""
+from .base import *
@@ -0,0 +1,704 @@
+import datetime
+import decimal
+import pickle
+import re
+import threading
+
+import six
+
+from ..connection import Connection
+from .._lazy import lazy_import
+
+psycopg2 = lazy_import("psycopg2")
+
+__all__ = ["FakeConnection", "FakeCursor", "RecordingConnection"]
+
+_whitespace = re.compile(r"\s+")
+
+_identifier = r'(?:"(?:[^"]|"")+"|[\w$]+)'
+_relation = r"(?P<relation>{0}(?:\.{0})?)".format(_identifier)
+_identifiers = r"({0}(?:, {0})*)".format(_identifier)
+
+# selected columns, which may be cast to text (eg the keys of keyset pagination)
+_selected = r"({0}(?:::text)?(?:, {0}(?:::text)?)*)".format(_identifier)
+
+_exists = re.compile(
+    r"^select count\(1\) from information_schema\.tables "
+    r"where table_schema = '((?:[^']|'')*)' and table_name = '((?:[^']|'')*)'$", re.IGNORECASE)
+
+_column_metadata = re.compile(
+    r"from information_schema\.columns "
+    r"where table_schema = '((?:[^']|'')*)' and table_name = '((?:[^']|'')*)'", re.IGNORECASE)
+
+_select = re.compile(
+    r"^select (?P<distinct>distinct )?(?P<select_list>count\(1\)|{}) from {}(?: where (?P<where>.+?))?"
+    r"(?: order by (?P<order_by>.+?))?(?: limit (?P<limit>\d+))?;?$".format(_selected, _relation),
+    re.IGNORECASE)
+
+# a literal, possibly cast to a type (eg ``'0.1'::real``)
+_literal = r"(?:'(?:[^']|'')*'|[^,()\s':]+)(?:::[a-z][a-z0-9 ]*(?:\[\])?)?"
+_cast_literal = re.compile(r"^('(?:[^']|'')*'|[^:]+)(?:::(.+))?$")
+
+_integer_types = ["smallint", "integer", "bigint", "int"]
+_float_types = ["real", "double precision", "numeric", "float", "float8"]
+
+# the conditions of the ``where`` clauses that are understood: ``x is not null``, and (row) comparisons with literals
+_not_null = re.compile(r"^({}) is not null$".format(_identifier), re.IGNORECASE)
+_comparison = re.compile(r"^\(?{}\)? (<|>) \(?((?:{})(?:, (?:{}))*)\)?$".format(_identifiers, _literal, _literal))
+_and = re.compile(r" and (?=(?:[^']*'[^']*')*[^']*$)", re.IGNORECASE)
+
+_order_by = re.compile(r"({})( desc)?(?:, |$)".format(_identifier))
+
+_aggregate = re.compile(r"^select (avg|max|min)\(({})\) from {}$".format(_identifier, _relation), re.IGNORECASE)
+
+_duplicates = re.compile(
+    r"^select ({}) from {} group by 1 having count\(1\) > 1$".format(_identifier, _relation), re.IGNORECASE)
+
+_commands = re.compile(r"^(set|reset|analyze|begin|commit|rollback|savepoint|release)\b", re.IGNORECASE)
+
+
+def _collapse(sql):
+    return _whitespace.sub(" ", sql).strip()
+
+
+def _unquote(identifier):
+
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+
+    return identifier
+
+
+def _unquote_literal(literal):
+    return literal.replace("''", "'")
+
+
+def _quote(value):
+    """
+    Renders a query parameter as a SQL literal, roughly as psycopg2 would.
+    """
+
+    if value is None:
+        return "NULL"
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, six.integer_types + (float, decimal.Decimal)):
+        return repr(value) if isinstance(value, float) else str(value)
+
+    if isinstance(value, (list, tuple)):
+        items = ", ".join(_quote(x) for x in value)
+        return "ARRAY[{}]".format(items) if isinstance(value, list) else "({})".format(items)
+
+    if isinstance(value, datetime.datetime):
+        return "'{}'::timestamp".format(value.isoformat())
+
+    if isinstance(value, datetime.date):
+        return "'{}'::date".format(value.isoformat())
+
+    if isinstance(value, bytes):
+        value = value.decode("utf8")
+
+    return "'{}'".format(six.text_type(value).replace("'", "''"))
+
+
+def _dtype_to_data_type(dtype):
+
+    kind = getattr(dtype, "kind", "O")
+
+    if kind == "f":
+        return "double precision"
+
+    if kind in "iu":
+        return "integer" if dtype.itemsize <= 4 else "bigint"
+
+    if kind == "b":
+        return "boolean"
+
+    if kind == "M":
+        return "timestamp without time zone"
+
+    return "text"
+
+
+def _parse_literal(literal):
+
+    literal, type_ = _cast_literal.match(literal).groups()
+
+    if type_ is not None and literal.startswith("'"):
+        value = _unquote_literal(literal[1:-1])
+
+        if type_ in _integer_types:
+            return int(value)
+
+        if type_ in _float_types:
+            return float(value)
+
+        if type_ == "boolean":
+            return value in ("t", "true")
+
+        return value
+
+    if literal.startswith("'"):
+        return _unquote_literal(literal[1:-1])
+
+    if literal.lower() == "null":
+        return None
+
+    if literal.lower() in ("true", "false"):
+        return literal.lower() == "true"
+
+    return float(literal) if re.search(r"[.e]", literal, re.IGNORECASE) else int(literal)
+
+
+def _compare(value, literal):
+    # timestamps are compared with their (ISO) literals as PostgreSQL would, by parsing the literal
+    if isinstance(value, datetime.datetime) and isinstance(literal, six.string_types):
+        literal = datetime.datetime.fromisoformat(literal)
+
+    return (value > literal) - (value < literal)
+
+
+def _condition(condition):
+    """
+    Parses a condition of a ``where`` clause into the columns it reads and a predicate on their values (or returns ``None``).
+    """
+
+    match = _not_null.match(condition)
+
+    if match:
+        return [_unquote(match.group(1))], lambda values: values[0] is not None
+
+    match = _comparison.match(condition)
+
+    if match:
+        columns = [_unquote(c) for c in re.findall(_identifier, match.group(1))]
+        sign = 1 if match.group(2) == ">" else -1
+        literals = [_parse_literal(x) for x in re.findall(_literal, match.group(3))]
+
+        def predicate(values):
+            if any(v is None for v in values):
+                return False
+
+            for value, literal in zip(values, literals):
+                order = _compare(value, literal)
+
+                if order:
+                    return order == sign
+
+            return False
+
+        return columns, predicate
+
+    return None
+
+
+def _text(value):
+    # roughly as PostgreSQL casts values to text
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, float):
+        return repr(value)
+
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+
+    return six.text_type(value)
+
+
+def _sort_key(value):
+    # nulls sort last, as they do in PostgreSQL
+    return (value is None or value != value, value if value is not None and value == value else 0)
+
+
+class _Result(object):
+
+    def __init__(self, columns=None, rows=None, rowcount=None):
+        self.columns = columns
+        self.rows = list(rows or [])
+        self.rowcount = rowcount if rowcount is not None else (len(self.rows) if columns is not None else -1)
+
+    @property
+    def description(self):
+        if self.columns is None:
+            return None
+
+        return tuple((name, None, None, None, None, None, None) for name in self.columns)
+
+
+class _SyntheticTable(object):
+
+    def __init__(self, data_frame, data_types=None):
+
+        data_types = data_types or {}
+
+        self.column_names = [str(c) for c in data_frame.columns]
+        self.data_types = [
+            data_types.get(name, _dtype_to_data_type(dtype))
+            for name, dtype in zip(self.column_names, data_frame.dtypes)
+        ]
+
+        frame = data_frame.astype(object).where(data_frame.notnull(), None)
+        self.values = {name: frame[column].tolist() for name, column in zip(self.column_names, frame.columns)}
+        self.num_rows = len(data_frame)
+        self._projections = {}
+
+    def project(self, names):
+
+        names = tuple(names)
+
+        if names not in self._projections:
+            missing = [name for name in names if name not in self.values]
+
+            if missing:
+                raise psycopg2.ProgrammingError("column {} does not exist".format(", ".join(missing)))
+
+            self._projections[names] = list(zip(*[self.values[name] for name in names])) \
+                if names else [()] * self.num_rows
+
+        return self._projections[names]
+
+
+class FakeCursor(object):
+    """
+    An in-process stand-in for a psycopg2 cursor, returned by :meth:`FakeConnection.cursor`. It supports ``execute``, ``executemany``, ``mogrify``, the ``fetch*`` methods, iteration, and ``copy_expert``, along with the ``description``, ``rowcount``, ``query``, and ``connection`` attributes.
+    """
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.arraysize = 1
+        self.itersize = 2000
+        self.description = None
+        self.rowcount = -1
+        self.query = None
+        self.closed = False
+        self._rows = []
+        self._position = 0
+
+    def mogrify(self, sql, params=None):
+
+        if params is not None:
+            if isinstance(params, dict):
+                sql = sql % {key: _quote(value) for key, value in params.items()}
+            else:
+                sql = sql % tuple(_quote(value) for value in params)
+
+        return sql.encode("utf8")
+
+    def execute(self, sql, params=None):
+
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf8")
+
+        sql = self.mogrify(sql, params).decode("utf8")
+        result = self.connection.owner.respond(sql)
+
+        self.query = sql.encode("utf8")
+        self.description = result.description
+        self.rowcount = result.rowcount
+        self._rows = result.rows
+
+        if self.connection.owner.numeric_as_float:
+            # as the typecaster registered by a real connection would
+            self._rows = [tuple(float(v) if isinstance(v, decimal.Decimal) else v for v in row)
+                          for row in self._rows]
+        self._position = 0
+
+    def executemany(self, sql, params_seq):
+
+        rowcount = 0
+
+        for params in params_seq:
+            self.execute(sql, params)
+            rowcount += max(self.rowcount, 0)
+
+        self.rowcount = rowcount
+
+    def _check_results(self):
+        if self.description is None:
+            raise psycopg2.ProgrammingError("no results to fetch")
+
+    def fetchone(self):
+        self._check_results()
+
+        if self._position >= len(self._rows):
+            return None
+
+        self._position += 1
+
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=None):
+        self._check_results()
+
+        size = self.arraysize if size is None else size
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+
+        return rows
+
+    def fetchall(self):
+        self._check_results()
+
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+
+            if row is None:
+                return
+
+            yield row
+
+    def copy_expert(self, sql, file, size=8192):
+        """
+        ``COPY ... FROM STDIN`` consumes ``file`` (whose contents are kept in :attr:`FakeConnection.copied`), and ``COPY ... TO STDOUT`` writes the first column of the matching result (which should be bytes or text) to ``file``.
+        """
+
+        owner = self.connection.owner
+
+        if re.search(r"\bfrom\s+stdin\b", sql, re.IGNORECASE):
+            data = file.read()
+            owner.copied.append((_collapse(sql), data))
+            owner.queries.append(_collapse(sql))
+            self.rowcount = -1
+            return
+
+        result = owner.respond(sql)
+
+        for row in result.rows:
+            file.write(row[0])
+
+        self.rowcount = len(result.rows)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _FakeRawConnection(object):
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.closed = 0
+        self.autocommit = False
+        self.server_version = 160000
+        self.encoding = "UTF8"
+
+    def cursor(self, name=None, *args, **kwargs):
+        return FakeCursor(self, name=name)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeConnection(Connection):
+    """
+    A :class:`Connection` that never touches a database: its cursors answer every statement in-process, from results that were registered up front. It's meant for profiling and microbenchmarking the client side of pg-utils (eg building ``Table`` objects and decoding results) with no server time at all.
+
+    Results come from three places, in order:
+
+    1. Exact statements, as recorded by a :class:`RecordingConnection` (see :meth:`load`).
+    2. Patterns registered with :meth:`add_result`.
+    3. Synthetic tables registered with :meth:`add_table`. For these, the catalog queries that pg-utils makes (existence and column metadata) are answered, as are plain ``select``\\ s of columns (with ``distinct``, ``order by``, ``limit``, and ``where`` clauses made of ``is not null`` checks and (row) comparisons with literals), ``count(1)``, ``avg``/``min``/``max``, and the uniqueness check.
+
+    Any other statement raises ``psycopg2.ProgrammingError``, except for commands such as ``set`` and ``analyze``, which do nothing.
+
+    :param dict kwargs: Any keyword arguments of :class:`Connection` that don't concern logging in (eg ``instrumentation``).
+
+    :ivar list[str] queries: Every statement executed so far (with its whitespace collapsed).
+    :ivar list[tuple] copied: The statement and data of every ``COPY ... FROM STDIN``.
+    """
+
+    def __init__(self, instrumentation=None, budget=None, memory_budget=None, column_cache=None,
+                 numeric_as_float=False, **kwargs):
+
+        self.username = self.password = self.hostname = self.database = "fake"
+        self.instrumentation = instrumentation
+        self.budget = budget
+        self.memory_budget = memory_budget
+        self.column_cache = column_cache
+        self.numeric_as_float = numeric_as_float
+        self._connection_kwargs = {}
+
+        self.queries = []
+        self.copied = []
+
+        self._recorded = {}
+        self._patterns = []
+        self._tables = {}
+        self._lock = threading.Lock()
+
+        self.connection = _FakeRawConnection(self)
+
+    def clone(self):
+        """
+        Returns a new :class:`FakeConnection` sharing all of this one's results (but with its own record of queries).
+
+        :rtype: FakeConnection
+        """
+
+        result = FakeConnection(instrumentation=self.instrumentation, budget=self.budget,
+                                memory_budget=self.memory_budget, column_cache=self.column_cache,
+                                numeric_as_float=self.numeric_as_float)
+        result._recorded = self._recorded
+        result._patterns = self._patterns
+        result._tables = self._tables
+
+        return result
+
+    def add_result(self, pattern, rows=None, columns=None, rowcount=None):
+        """
+        Registers a result for the statements matching a pattern.
+
+        :param str|callable pattern: Either a regular expression (searched for in the statement, with its whitespace collapsed), or a function from the statement to a boolean.
+        :param list[tuple]|callable rows: The rows of the result, or a function from the statement to the rows.
+        :param None|list[str] columns: The names of the columns of the result. If ``None``, the statement doesn't return rows.
+        :param None|int rowcount: The ``rowcount`` to report (defaulting to the number of rows).
+        """
+
+        if isinstance(pattern, six.string_types):
+            pattern = re.compile(pattern, re.IGNORECASE).search
+
+        self._patterns.append((pattern, rows, columns, rowcount))
+
+    def add_table(self, table_name, data_frame, schema="public", data_types=None):
+        """
+        Registers a synthetic table whose contents are the given DataFrame.
+
+        :param str table_name: The name of the table.
+        :param pandas.DataFrame data_frame: The rows of the table.
+        :param str schema: The schema of the table.
+        :param None|dict data_types: The (PostgreSQL) data types of any columns, by name. Other data types are derived from the dtypes of ``data_frame``.
+        """
+
+        self._tables[(schema, table_name)] = _SyntheticTable(data_frame, data_types)
+
+    def load(self, path):
+        """
+        Registers the results recorded by :meth:`RecordingConnection.save`.
+
+        :param str path: The file.
+        """
+
+        with open(path, "rb") as f:
+            for sql, columns, rows, rowcount in pickle.load(f):
+                self._recorded[sql] = _Result(columns, rows, rowcount)
+
+    def respond(self, sql):
+        """
+        Finds the result of a statement.
+
+        :param str sql: The statement.
+        :rtype: object
+        """
+
+        sql = _collapse(sql)
+
+        with self._lock:
+            self.queries.append(sql)
+
+        if sql in self._recorded:
+            return self._recorded[sql]
+
+        for matches, rows, columns, rowcount in self._patterns:
+            if matches(sql):
+                return _Result(columns, rows(sql) if callable(rows) else rows, rowcount)
+
+        result = self._synthetic_result(sql)
+
+        if result is not None:
+            return result
+
+        if _commands.match(sql):
+            return _Result()
+
+        raise psycopg2.ProgrammingError("FakeConnection has no result for: {}".format(sql))
+
+    def _table(self, name):
+
+        parts = [_unquote(part) for part in re.findall(_identifier, name)]
+        schema, table_name = parts if len(parts) == 2 else ["public"] + parts
+
+        table = self._tables.get((schema, table_name))
+
+        if table is None:
+            raise psycopg2.ProgrammingError('relation "{}" does not exist'.format(name))
+
+        return table
+
+    def _synthetic_result(self, sql):
+
+        match = _exists.match(sql)
+
+        if match:
+            key = tuple(_unquote_literal(x) for x in match.groups())
+            return _Result(["count"], [(int(key in self._tables),)])
+
+        match = _column_metadata.search(sql)
+
+        if match:
+            table = self._tables.get(tuple(_unquote_literal(x) for x in match.groups()))
+            rows = list(zip(table.column_names, table.data_types)) if table is not None else []
+
+            return _Result(["column_name", "data_type"], rows)
+
+        match = _aggregate.match(sql)
+
+        if match:
+            function, column, name = match.groups()
+            values = [x for x in self._table(name).values.get(_unquote(column), []) if x is not None]
+
+            if not values:
+                return _Result([function], [(None,)])
+
+            value = {"avg": lambda v: sum(v) / float(len(v)), "max": max, "min": min}[function.lower()](values)
+
+            return _Result([function], [(value,)])
+
+        match = _duplicates.match(sql)
+
+        if match:
+            column, name = match.groups()
+            seen = set()
+            duplicates = []
+
+            for row in self._table(name).project([_unquote(column)]):
+                if row in seen:
+                    duplicates.append(row)
+                seen.add(row)
+
+            return _Result([_unquote(column)], duplicates)
+
+        match = _select.match(sql)
+
+        if match:
+            distinct, select_list, where, order_by, limit = match.group("distinct", "select_list", "where",
+                                                                        "order_by", "limit")
+            table = self._table(match.group("relation"))
+
+            conditions = [_condition(c) for c in _and.split(where)] if where else []
+
+            if any(c is None for c in conditions):
+                return None
+
+            if select_list.lower() == "count(1)" and not conditions:
+                return _Result(["count"], [(table.num_rows,)])
+
+            selected = [] if select_list.lower() == "count(1)" else \
+                [(_unquote(c), bool(cast)) for c, cast in re.findall(r"({})(::text)?".format(_identifier), select_list)]
+            columns = [name for name, _ in selected]
+            rows = table.project(columns)
+
+            if conditions:
+                # each condition reads its own slice of the projected row, after the selected columns
+                read, slices = list(columns), []
+
+                for names, predicate in conditions:
+                    slices.append((len(read), len(read) + len(names), predicate))
+                    read += names
+
+                rows = [row[:len(columns)] for row in table.project(read)
+                        if all(predicate(row[start:end]) for start, end, predicate in slices)]
+
+                if select_list.lower() == "count(1)":
+                    return _Result(["count"], [(len(rows),)])
+
+            if distinct:
+                rows = list(dict.fromkeys(rows))
+
+            if order_by:
+                # a stable sort on each key, from the last to the first
+                for column, descending in reversed(_order_by.findall(order_by)):
+                    index = columns.index(_unquote(column))
+                    rows = sorted(rows, key=lambda row: _sort_key(row[index]), reverse=bool(descending))
+
+            if limit is not None:
+                rows = rows[:int(limit)]
+
+            if any(cast for _, cast in selected):
+                rows = [tuple(_text(v) if cast and v is not None else v for v, (_, cast) in zip(row, selected))
+                        for row in rows]
+
+            return _Result(columns, rows)
+
+        return None
+
+
+class _RecordingCursor(object):
+
+    def __init__(self, cursor, recording):
+        self._cursor = cursor
+        self._recording = recording
+
+    def execute(self, sql, params=None):
+
+        self._cursor.execute(sql, params)
+
+        query = self._cursor.query.decode("utf8") if isinstance(self._cursor.query, bytes) else self._cursor.query
+
+        if self._cursor.description is None:
+            rows, columns = [], None
+        else:
+            rows, columns = self._cursor.fetchall(), [c[0] for c in self._cursor.description]
+            self._cursor.scroll(0, mode="absolute")
+
+        self._recording.append((_collapse(query), columns, rows, self._cursor.rowcount))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, item):
+        return getattr(self._cursor, item)
+
+
+class RecordingConnection(Connection):
+    """
+    A :class:`Connection` to a real database that records the result of every statement, so that the same workload can be replayed later (without the database) by a :class:`FakeConnection`. It takes the same arguments as :class:`Connection`. Server-side (named) cursors aren't recorded.
+
+    :ivar list[tuple] recording: The recorded statements and their results.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingConnection, self).__init__(*args, **kwargs)
+        self.recording = []
+
+    def cursor(self, *args, **kwargs):
+
+        cursor = super(RecordingConnection, self).cursor(*args, **kwargs)
+
+        if args or kwargs.get("name"):
+            return cursor
+
+        return _RecordingCursor(cursor, self.recording)
+
+    def save(self, path):
+        """
+        Writes the recording to a file, to be loaded by :meth:`FakeConnection.load`.
+
+        :param str path: The file.
+        """
+
+        with open(path, "wb") as f:
+            pickle.dump(self.recording, f, protocol=2)
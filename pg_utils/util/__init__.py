@@ -79,7 +79,8 @@ def process_schema_and_conn(f):
 
         args = list(args)  # args is given as a tuple, and we may need to alter it...
 
-        kwargs.setdefault("conn", Connection())
+        if kwargs.get("conn") is None:
+            kwargs["conn"] = Connection()
 
         schema = kwargs.get("schema")
 
@@ -126,3 +127,21 @@ def seaborn_required(f):
         return f(*args, **kwargs)
 
     return decorator
+
+
+def pyarrow_required(f):
+    """
+    This decorator makes sure that pyarrow is imported before the function is run.
+    """
+
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(
+                "You do not have pyarrow installed (or there was an issue importing it). Please install pyarrow (or pg-utils[arrow])")
+
+        return f(*args, **kwargs)
+
+    return decorator
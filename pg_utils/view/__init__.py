@@ -0,0 +1,4 @@
+"""
+Lazily evaluated views of tables: statements (eg of window functions, as made by ``Table.rolling``, and by ``Column.cumsum``, ``Column.rank``, and ``Column.diff``) that are only run as part of the statements that filter, aggregate, or fetch their rows.
+"""
+from .base import View, Rolling
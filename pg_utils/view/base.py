@@ -0,0 +1,289 @@
+import six
+from lazy_property import LazyProperty
+
+from .. import numeric_datatypes
+from .._lazy import lazy_import
+from ..dtypes import aggregate_type, fetch_frame, numpy_dtype
+from ..exception import NoSuchColumnError
+from ..instrumentation.base import instrumented
+from ..memory import iter_frames
+from ..sql import queries
+
+pd = lazy_import("pandas")
+
+__all__ = ["View", "Rolling"]
+
+
+class View(object):
+    """
+    A lazily evaluated relation: a ``SELECT`` statement (eg of window functions, see :meth:`pg_utils.table.Table.rolling` and :meth:`pg_utils.column.Column.cumsum`) that isn't run by itself, but as a subquery of the statements that filter, aggregate, or fetch its rows. So a view of a large table can be narrowed down and summarized by the database, and only what's asked for is fetched.
+
+    :ivar pg_utils.connection.Connection conn: The connection.
+    :ivar str query: The statement.
+    :ivar tuple[str] column_names: The names of its columns.
+    :ivar dict column_data_types: The data type of each column, by name.
+    :ivar tuple[str] order_by: The names of the columns whose order its rows are fetched in.
+    """
+
+    def __init__(self, conn, query, column_names, column_data_types, order_by=None):
+        """
+        :param pg_utils.connection.Connection conn: The connection.
+        :param str query: The statement.
+        :param list[str] column_names: The names of its columns.
+        :param dict column_data_types: The (PostgreSQL) data type of each column, by name.
+        :param None|list[str] order_by: The names of the columns whose order its rows are fetched in.
+        """
+
+        self.conn = conn
+        self.query = query
+        self.column_names = tuple(column_names)
+        self.column_data_types = {name: column_data_types[name] for name in self.column_names}
+        self.order_by = tuple(order_by or [])
+
+    @property
+    def source(self):
+        """
+        The ``FROM`` expression of this view: its statement as a subquery (see :func:`pg_utils.sql.queries.relation`).
+
+        :rtype: str
+        """
+        return "(\n{}\n)view".format(self.query)
+
+    def where(self, condition):
+        """
+        The rows of this view that satisfy a condition, as a view. The condition is applied after the columns of this view are computed, so it can refer to them (eg to the result of a window function).
+
+        :param str condition: The condition (as raw SQL).
+        :rtype: View
+        """
+
+        return View(self.conn, queries.select_columns(self.source, self.column_names, where=condition),
+                    self.column_names, self.column_data_types, self.order_by)
+
+    @LazyProperty
+    @instrumented
+    def count(self):
+        """The number of rows of this view."""
+
+        cur = self.conn.cursor()
+        cur.execute(queries.count_rows(self.source))
+
+        return cur.fetchone()[0]
+
+    @instrumented
+    def agg(self, agg="mean"):
+        """
+        Mimics ``pandas.DataFrame.agg``: aggregates of the columns of this view, computed by the database in a single statement, so that only the aggregates are fetched.
+
+        :param str|dict agg: An aggregate (``"mean"``, ``"sum"``, ``"min"``, ``"max"``, ``"count"``, ``"nunique"``, ``"std"``, ``"var"``, or ``"median"``) of every numeric column that doesn't order the rows, or a dictionary from column names to one of those, or a list of them.
+        :return: The aggregates: indexed by column, or with lists of aggregates, with a row for each aggregate and a column for each column (as for pandas).
+        :rtype: pandas.Series|pandas.DataFrame
+        """
+
+        if isinstance(agg, six.string_types):
+            agg = {column: agg for column in self.column_names
+                   if column not in self.order_by and self.column_data_types[column] in numeric_datatypes}
+
+        aggregates = []
+
+        for column, hows in agg.items():
+            if column not in self.column_data_types:
+                raise NoSuchColumnError("Column {} does not exist in view {}".format(column, self))
+
+            for how in ([hows] if isinstance(hows, six.string_types) else hows):
+                if how not in queries.resample_aggregates:
+                    raise ValueError("Unknown aggregate '{}' (must be one of {})".format(
+                        how, ", ".join(sorted(queries.resample_aggregates))))
+
+                aggregates.append((column, how))
+
+        if not aggregates:
+            raise ValueError("There are no columns to aggregate")
+
+        cur = self.conn.cursor()
+        cur.execute(queries.aggregate_columns(self.source, aggregates))
+        row = cur.fetchone()
+
+        if all(isinstance(hows, six.string_types) for hows in agg.values()):
+            return pd.Series(list(row), index=[column for column, _ in aggregates])
+
+        values = {}
+
+        for (column, how), value in zip(aggregates, row):
+            values.setdefault(column, {})[how] = value
+
+        hows = []
+
+        for _, how in aggregates:
+            if how not in hows:
+                hows.append(how)
+
+        return pd.DataFrame(values, index=hows, columns=list(agg))
+
+    def _select_query(self, limit=None):
+
+        return queries.select_columns(self.source, self.column_names,
+                                      order_by=[(name, True) for name in self.order_by], limit=limit)
+
+    @instrumented
+    def head(self, num_rows=10):
+        """
+        Fetches the first rows of this view (in order of :attr:`order_by`).
+
+        :param int|str num_rows: The number of rows to fetch, or ``"all"`` to fetch all of the rows.
+        :rtype: pandas.DataFrame
+        """
+
+        if (not isinstance(num_rows, six.integer_types) or num_rows <= 0) and num_rows != "all":
+            raise ValueError("'num_rows': Expected a positive integer or 'all'")
+
+        return fetch_frame(self.conn, self._select_query(None if num_rows == "all" else num_rows),
+                           list(self.column_names), self.column_data_types)
+
+    def iter_frames(self, chunk_rows=10000):
+        """
+        Streams the rows of this view (in order of :attr:`order_by`) through a server-side cursor, as data frames of at most ``chunk_rows`` rows each (see :func:`pg_utils.memory.iter_frames`), so that only a chunk is held at a time.
+
+        :param int chunk_rows: The (maximum) number of rows in each data frame.
+        :rtype: collections.Iterator[pandas.DataFrame]
+        """
+
+        if not isinstance(chunk_rows, six.integer_types) or chunk_rows <= 0:
+            raise ValueError("chunk_rows must be a positive integer (got {})".format(chunk_rows))
+
+        return iter_frames(self.conn, self._select_query(), list(self.column_names), self.column_data_types,
+                           chunk_rows)
+
+    def __str__(self):
+        return "view of ({})".format(", ".join(self.column_names))
+
+    def __repr__(self):
+        return "<{} '{}'>".format(self.__class__, ", ".join(self.column_names))
+
+
+def _window_frame(window, data_type):
+    """
+    The frame of :func:`pg_utils.sql.queries.rolling` for a window (as taken by ``pandas.DataFrame.rolling``), along with its default ``min_periods``.
+    """
+
+    if isinstance(window, six.integer_types) and not isinstance(window, bool):
+        if window <= 0:
+            raise ValueError("window must be a positive number of rows (got {})".format(window))
+
+        return "rows", window - 1, window
+
+    dtype = numpy_dtype(data_type)
+
+    if data_type != "date" and (dtype is None or not dtype.startswith("datetime64")):
+        raise ValueError("A window of time ({}) needs a timestamp or date column to order the rows".format(window))
+
+    try:
+        span = pd.Timedelta(window)
+    except (TypeError, ValueError):
+        raise ValueError("window must be a number of rows or a fixed span of time (eg '1h'), got {}".format(window))
+
+    if span.value <= 0 or span.value % 1000 != 0:
+        raise ValueError("window must be a positive number of microseconds (got {})".format(window))
+
+    # pandas' windows of time leave out their start (ie they're (t - window, t]), and a range frame doesn't, so it's
+    # one microsecond (the resolution of timestamps) shorter
+    return "range", "{} microseconds".format(span.value // 1000 - 1), 1
+
+
+class Rolling(object):
+    """
+    A moving window over the rows of a table, in order of one of its columns (as for ``pandas.DataFrame.rolling(window, on=on)``). Its aggregates are computed by the database, with window functions, as a :class:`View` (see :meth:`agg`), so the rows of the table are never fetched.
+
+    :ivar pg_utils.table.Table table: The table.
+    :ivar str on: The name of the column that orders the rows.
+    """
+
+    def __init__(self, table, window, on, min_periods=None):
+        """
+        :param pg_utils.table.Table table: The table.
+        :param int|str|datetime.timedelta window: The number of rows in each window, or, for a timestamp or date ``on``, the span of time of each window (eg ``"1h"``), which holds the rows within that span of the current one (excluding its start, as for pandas).
+        :param str on: The name of the column that orders the rows. Rows where it's null are left out.
+        :param None|int min_periods: The minimum number of (non-null) values in a window for its aggregate not to be null, defaulting to the number of rows in the window (or to 1, for spans of time).
+        """
+
+        if on not in table._all_column_data_types:
+            raise NoSuchColumnError("Column {} does not exist in table {}".format(on, table))
+
+        self.table = table
+        self.on = on
+        self.units, self.size, default_min_periods = _window_frame(window, table._all_column_data_types[on])
+        self.min_periods = default_min_periods if min_periods is None else min_periods
+
+        if not isinstance(self.min_periods, six.integer_types) or self.min_periods < 0:
+            raise ValueError("min_periods must be a non-negative integer (got {})".format(min_periods))
+
+    def agg(self, agg):
+        """
+        The aggregates of each window, as a :class:`View` holding the ``on`` column and a column for each aggregate (named after its column, or with lists of aggregates, as ``<column>_<aggregate>``).
+
+        :param str|dict agg: An aggregate (``"mean"``, ``"sum"``, ``"min"``, ``"max"``, ``"count"``, ``"std"``, or ``"var"``) of every numeric column other than ``on``, or a dictionary from column names to one of those, or a list of them.
+        :rtype: View
+        """
+
+        data_types = self.table._all_column_data_types
+
+        if isinstance(agg, six.string_types):
+            agg = {column: agg for column in self.table.numeric_columns if column != self.on}
+
+        aggregates, names = [], []
+        result_types = {self.on: data_types[self.on]}
+
+        for column, hows in agg.items():
+            if column not in data_types:
+                raise NoSuchColumnError("Column {} does not exist in table {}".format(column, self.table))
+
+            multiple = not isinstance(hows, six.string_types)
+
+            for how in (hows if multiple else [hows]):
+                if how not in queries.window_aggregates:
+                    raise ValueError("Unknown aggregate '{}' (must be one of {})".format(
+                        how, ", ".join(sorted(queries.window_aggregates))))
+
+                name = "{}_{}".format(column, how) if multiple else column
+
+                aggregates.append((column, how))
+                names.append(name)
+                result_types[name] = aggregate_type(how, data_types[column])
+
+        if not aggregates:
+            raise ValueError("There are no columns to aggregate")
+
+        if self.on in names:
+            raise ValueError("The column {} orders the rows, and so can't be aggregated".format(self.on))
+
+        query = queries.rolling(self.table, self.on, aggregates, names, self.units, self.size, self.min_periods)
+
+        return View(self.table.conn, query, [self.on] + names, result_types, order_by=[self.on])
+
+    def mean(self):
+        """The mean of each window (see :meth:`agg`)."""
+        return self.agg("mean")
+
+    def sum(self):
+        """The sum of each window (see :meth:`agg`)."""
+        return self.agg("sum")
+
+    def min(self):
+        """The minimum of each window (see :meth:`agg`)."""
+        return self.agg("min")
+
+    def max(self):
+        """The maximum of each window (see :meth:`agg`)."""
+        return self.agg("max")
+
+    def count(self):
+        """The number of non-null values in each window (see :meth:`agg`)."""
+        return self.agg("count")
+
+    def std(self):
+        """The (sample) standard deviation of each window (see :meth:`agg`)."""
+        return self.agg("std")
+
+    def var(self):
+        """The (sample) variance of each window (see :meth:`agg`)."""
+        return self.agg("var")
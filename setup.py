@@ -20,7 +20,8 @@ setuptools.setup(
     version=__version__,
     install_requires=requirements,
     extras_require={
-        "graphics": ["seaborn"]
+        "graphics": ["seaborn"],
+        "arrow": ["pyarrow"]
     },
     packages=setuptools.find_packages(),
     url="https://github.com/jackmaney/pg-utils",
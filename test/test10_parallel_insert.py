@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import table
+from pg_utils.table import bulk
+import pandas as pd
+
+t = table.Table.create("pg_utils_parallel_insert_test",
+                       """create table pg_utils_parallel_insert_test
+(x int, y text)
+distributed randomly;""")
+
+
+class TestParallelInsert(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def setUp(self):
+        cur = t.conn.cursor()
+        cur.execute("truncate table {}".format(t))
+        t.conn.commit()
+
+        if hasattr(t, "_count"):
+            delattr(t, "_count")
+
+    def test_chunk_offsets(self):
+        with tempfile.NamedTemporaryFile(mode="w", delete=False) as f:
+            f.write('x,y\n1,"a\nb"\n2,c\n3,"d,\ne"\n4,f\n')
+
+        try:
+            ranges = bulk.csv_chunk_offsets(f.name, 3, block_size=4)
+
+            with open(f.name, "rb") as f2:
+                data = f2.read()
+
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], len(data))
+
+            for start, end in ranges:
+                self.assertEqual(data[start - 1:start] if start else b"\n", b"\n")
+                self.assertEqual(data[start:end].count(b'"') % 2, 0)
+        finally:
+            os.remove(f.name)
+
+    def test_parallel_insert_empty(self):
+        with tempfile.NamedTemporaryFile(mode="w", delete=False) as f:
+            pass
+
+        try:
+            self.assertEqual(bulk.csv_chunk_offsets(f.name, 4), [])
+
+            report = t.insert_csv(f.name, header=False, parallel=4)
+
+            self.assertEqual(len(report), 0)
+            self.assertEqual(t.count, 0)
+        finally:
+            os.remove(f.name)
+
+    def test_parallel_insert_dataframe(self):
+        df = pd.DataFrame({"x": list(range(1000)), "y": ["row\n{}".format(i) for i in range(1000)]},
+                          columns=["x", "y"])
+
+        report = t.insert_dataframe(df, parallel=4, atomic=False)
+
+        self.assertEqual(report.rows.sum(), 1000)
+        self.assertTrue(report.error.isnull().all())
+        self.assertEqual(t.count, 1000)
+        self.assertEqual(set(t.y.unique()), set(df.y))
+
+    def test_parallel_insert_atomic(self):
+        df = pd.DataFrame({"x": list(range(100)), "y": ["a"] * 100}, columns=["x", "y"])
+
+        report = t.insert_dataframe(df, parallel=2, atomic=True)
+
+        self.assertEqual(report.rows.sum(), 100)
+        self.assertEqual(t.count, 100)
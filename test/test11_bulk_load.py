@@ -0,0 +1,93 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import table
+import pandas as pd
+
+table_name = "pg_utils_bulk_load_test"
+
+t = table.Table.create(table_name,
+                       """create table {} (x int primary key, y text)""".format(table_name),
+                       unlogged=True, analyze=True)
+
+cur = t.conn.cursor()
+cur.execute("create index {0}_y_idx on {1} (y)".format(table_name, t))
+t.conn.commit()
+
+
+def index_names():
+    cur = t.conn.cursor()
+    cur.execute("select indexname from pg_indexes where schemaname = %s and tablename = %s order by 1",
+                (t.schema, t.table_name))
+    return [row[0] for row in cur.fetchall()]
+
+
+class TestBulkLoad(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_append_and_replace(self):
+        indexes = index_names()
+
+        t.bulk_load(pd.DataFrame({"x": [1, 2, 3], "y": ["a", "b", "c"]}, columns=["x", "y"]),
+                    maintenance_work_mem="64MB")
+        self.assertEqual(t.count, 3)
+        self.assertEqual(index_names(), indexes)
+
+        t.bulk_load(pd.DataFrame({"x": [4, 5], "y": ["d", "e"]}, columns=["x", "y"]), replace=True)
+        self.assertEqual(t.count, 2)
+        self.assertEqual(set(t.x.unique()), {4, 5})
+        self.assertEqual(index_names(), indexes)
+
+    def test_failed_load_leaves_table_alone(self):
+        t.bulk_load(pd.DataFrame({"x": [10], "y": ["z"]}, columns=["x", "y"]), replace=True)
+
+        with self.assertRaises(Exception):
+            t.bulk_load(pd.DataFrame({"x": [10], "y": ["dupe"]}, columns=["x", "y"]))
+
+        self.assertEqual(t.count, 1)
+        self.assertEqual(list(t.y.unique()), ["z"])
+
+    def test_replace_keeps_identity_keys_triggers_and_grants(self):
+        name = "pg_utils_bulk_load_identity_test"
+        cur = t.conn.cursor()
+        cur.execute("create table {0}.{1}_parent (y text primary key)".format(t.schema, name))
+        cur.execute("insert into {0}.{1}_parent values ('a'), ('b')".format(t.schema, name))
+        cur.execute("create table {0}.{1} (id int generated by default as identity primary key, "
+                    "y text references {0}.{1}_parent (y))".format(t.schema, name))
+        cur.execute("create function {0}.{1}_lower() returns trigger language plpgsql as "
+                    "$$ begin new.y := lower(new.y); return new; end $$".format(t.schema, name))
+        cur.execute("create trigger {1}_lower before insert on {0}.{1} for each row "
+                    "execute function {0}.{1}_lower()".format(t.schema, name))
+        cur.execute("grant select on {0}.{1} to public".format(t.schema, name))
+        t.conn.commit()
+
+        identity = table.Table(name, schema=t.schema, conn=t.conn)
+
+        try:
+            identity.bulk_load(pd.DataFrame({"y": ["a", "b", "a"]}), columns=["y"], replace=True)
+
+            cur.execute("insert into {} (y) values ('B') returning id, y".format(identity))
+            self.assertEqual(cur.fetchone(), (4, "b"))
+
+            with self.assertRaises(Exception):
+                cur.execute("insert into {} (y) values ('c')".format(identity))
+
+            t.conn.rollback()
+
+            cur.execute("select has_table_privilege('public', %s, 'select')", (identity.name,))
+            self.assertTrue(cur.fetchone()[0])
+
+            # the parent is referenced by a foreign key, and so can't be swapped out
+            with self.assertRaises(ValueError):
+                table.Table(name + "_parent", schema=t.schema, conn=t.conn).bulk_load(
+                    pd.DataFrame({"y": ["a"]}), replace=True)
+        finally:
+            t.conn.rollback()
+            cur.execute("drop table {0}.{1}".format(t.schema, name))
+            cur.execute("drop table {0}.{1}_parent".format(t.schema, name))
+            cur.execute("drop function {0}.{1}_lower()".format(t.schema, name))
+            t.conn.commit()
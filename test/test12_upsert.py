@@ -0,0 +1,77 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import table
+import pandas as pd
+
+table_name = "pg_utils_upsert_test"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select generate_series(1, 5) as x, 'old'::text as y""".format(table_name))
+
+cur = t.conn.cursor()
+cur.execute("alter table {} add primary key (x)".format(t))
+t.conn.commit()
+
+
+class TestUpsert(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_upsert_on_conflict(self):
+        df = pd.DataFrame({"x": [4, 5, 6, 7], "y": ["new"] * 4}, columns=["x", "y"])
+
+        counts = t.upsert_dataframe(df, "x")
+
+        self.assertEqual(counts["inserted"], 2)
+        self.assertEqual(counts["updated"], 2)
+
+        result = t.sort_values("x")
+        self.assertEqual(list(result[result.x.isin([2, 3])].y), ["old"] * 2)
+        self.assertEqual(list(result[result.x.isin([4, 5, 6, 7])].y), ["new"] * 4)
+
+    def test_upsert_quoted_names(self):
+        quoted = table.Table.create("{}_quoted".format(table_name),
+                                    """create table {}_quoted ("Key" int primary key, "some value" text, "order" int)
+                                    """.format(table_name))
+
+        try:
+            df = pd.DataFrame({"Key": [1, 2], "some value": ["a", "b"], "order": [1, 2]},
+                              columns=["Key", "some value", "order"])
+            self.assertEqual(quoted.upsert_dataframe(df, "Key")["inserted"], 2)
+
+            df["order"] = [3, 4]
+            self.assertEqual(quoted.upsert_dataframe(df, "Key")["updated"], 2)
+
+            expected = [3, 4]
+
+            if quoted.conn.connection.server_version >= 150000:
+                df["order"] = expected = [5, 6]
+                self.assertEqual(quoted.upsert_dataframe(df, "Key", method="merge")["updated"], 2)
+
+            self.assertEqual(quoted.sort_values("Key")["order"].tolist(), expected)
+        finally:
+            quoted.drop()
+
+    def test_upsert_merge(self):
+        if t.conn.connection.server_version < 150000:
+            self.skipTest("MERGE requires PostgreSQL 15 or later")
+
+        df = pd.DataFrame({"x": [1, 100], "y": ["merged"] * 2}, columns=["x", "y"])
+
+        counts = t.upsert_dataframe(df, ["x"], method="merge")
+
+        self.assertEqual(counts["inserted"], 1)
+        self.assertEqual(counts["updated"], 1)
+
+        # matched rows that aren't updated aren't counted
+        df = pd.DataFrame({"x": [1, 101], "y": ["ignored"] * 2}, columns=["x", "y"])
+
+        counts = t.upsert_dataframe(df, ["x"], update_columns=[], method="merge")
+
+        self.assertEqual(counts["inserted"], 1)
+        self.assertEqual(counts["updated"], 0)
@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import table
+
+table_name = "pg_utils_copy_to_test"
+
+source = table.Table.create("{}_source".format(table_name),
+                            """create table {}_source as
+                            select x, md5(x::text) as y, x::numeric / 3 as z
+                            from generate_series(1, 1000) x""".format(table_name))
+
+target = table.Table.create("{}_target".format(table_name),
+                            """create table {}_target (x int, y text, z numeric)""".format(table_name))
+
+
+class TestCopyTo(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        source.drop()
+        target.drop()
+
+    def setUp(self):
+        cur = target.conn.cursor()
+        cur.execute("truncate table {}".format(target))
+        target.conn.commit()
+
+    def test_copy_to(self):
+        report = source.copy_to(target)
+
+        self.assertEqual(report.rows.sum(), 1000)
+        self.assertEqual(target.count, 1000)
+
+    def test_copy_to_failure(self):
+        # the source's COPY fails halfway through, on x = 500
+        with self.assertRaises(Exception):
+            source.copy_to(target, where="1 / (x - 500) > -10")
+
+        # nothing was copied, and both connections are usable again
+        for t, count in [(target, 0), (source, 1000)]:
+            cur = t.conn.cursor()
+            cur.execute("select count(1) from {}".format(t))
+            self.assertEqual(cur.fetchone()[0], count)
+
+    def test_copy_to_parallel(self):
+        report = source.copy_to(target.name, where="x <= 500", parallel=3, split_on="x")
+
+        self.assertEqual(len(report), 3)
+        self.assertEqual(report.rows.sum(), 500)
+        self.assertEqual(set(target.x.unique()), set(range(1, 501)))
+
+    def test_copy_to_parallel_numeric(self):
+        # the bounds of a numeric column come back as Decimals
+        report = source.copy_to(target.name, parallel=4, split_on="z")
+
+        self.assertEqual(len(report), 4)
+        self.assertEqual(report.rows.sum(), 1000)
+        self.assertEqual(target.count, 1000)
+
+    def test_copy_to_parallel_pages(self):
+        report = source.copy_to(target, columns=["x"], parallel=2, binary=False)
+
+        self.assertEqual(report.rows.sum(), 1000)
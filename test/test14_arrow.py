@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import table
+
+_has_pyarrow = True
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    _has_pyarrow = False
+
+table_name = "pg_utils_test_arrow"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select x, x::numeric / 4 as y, 'row ' || x as z, now() as w,
+                           int4range(x, x + 1) as r, current_time as tz
+                       from generate_series(1, 1000) x""".format(table_name))
+
+
+@unittest.skipIf(not _has_pyarrow, "pyarrow not found, or there was an issue importing it.")
+class TestArrow(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_to_arrow(self):
+        result = t.to_arrow(batch_size=100)
+
+        self.assertEqual(result.num_rows, 1000)
+        self.assertEqual(result.schema.field("x").type, pyarrow.int32())
+        self.assertEqual(result.schema.field("y").type, pyarrow.float64())
+        self.assertEqual(result.schema.field("z").type, pyarrow.string())
+
+        # types without a pyarrow counterpart are exported as their text
+        self.assertEqual(result.schema.field("r").type, pyarrow.string())
+        self.assertEqual(result.column("r")[0].as_py(), "[1,2)")
+        self.assertEqual(result.schema.field("tz").type, pyarrow.string())
+
+        self.assertEqual(t.x.to_arrow().to_pylist(), list(range(1, 1001)))
+
+    def test_to_parquet(self):
+        path = tempfile.mktemp(suffix=".parquet")
+
+        try:
+            self.assertEqual(t.to_parquet(path, row_group_size=300), 1000)
+
+            f = pyarrow.parquet.ParquetFile(path)
+            self.assertEqual(f.metadata.num_row_groups, 4)
+            self.assertEqual(f.metadata.num_rows, 1000)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
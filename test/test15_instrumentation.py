@@ -0,0 +1,55 @@
+import json
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import connection, instrumentation, table
+
+registry = instrumentation.MetricsRegistry()
+inst = instrumentation.Instrumentation(registry=registry)
+conn = connection.Connection(instrumentation=inst)
+
+table_name = "pg_utils_test_instrumentation"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select random() as x from generate_series(1, 100)""".format(table_name),
+                       conn=conn)
+
+
+class TestInstrumentation(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_describe_is_recorded(self):
+        records = []
+        inst.add_hook(records.append)
+
+        t.describe()
+
+        self.assertEqual([r.method for r in records], ["Table.describe"])
+        record = records[0]
+        self.assertEqual(len(record.queries), 1)
+        self.assertGreater(record.execute_time, 0)
+        self.assertGreaterEqual(record.total_time, record.execute_time + record.fetch_time)
+        self.assertEqual(record.queries[0].rows, 1)
+
+        self.assertGreaterEqual(registry.counter("pg_utils_calls_total").value(method="Table.describe"), 1)
+        self.assertIn('pg_utils_call_seconds_count{method="Table.describe"}', registry.to_prometheus())
+        self.assertIn("pg_utils_call_seconds", json.loads(registry.to_json()))
+
+    def test_head_records_frame_time(self):
+        t.head("all")
+
+        record = inst.records[-1]
+        self.assertEqual(record.method, "Table.head")
+        self.assertEqual(record.rows, 100)
+        self.assertGreater(record.frame_time, 0)
+
+    def test_fingerprint(self):
+        self.assertEqual(instrumentation.fingerprint("select x from t where y = 1"),
+                         instrumentation.fingerprint("select x  from t\nwhere y = 27"))
+        self.assertNotEqual(instrumentation.fingerprint("select x from t"),
+                            instrumentation.fingerprint("select y from t"))
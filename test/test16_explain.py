@@ -0,0 +1,51 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import connection, instrumentation, table
+
+inst = instrumentation.Instrumentation(registry=instrumentation.MetricsRegistry(), slow_query_threshold=0)
+conn = connection.Connection(instrumentation=inst)
+
+table_name = "pg_utils_test_explain"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select random() as x, random() as y from generate_series(1, 1000)""".format(table_name),
+                       conn=conn)
+
+
+class TestExplain(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_explain_describe(self):
+        result = t.explain("describe", percentiles=[0.5])
+
+        self.assertEqual(len(result), 1)
+        self.assertIn("percentile_cont", result.sql[0])
+        self.assertGreater(result.total_cost[0], 0)
+        self.assertIsNone(result.execution_time[0])
+
+    def test_explain_sort_values_analyze(self):
+        result = t.explain("sort_values", by="x", analyze=True)
+
+        self.assertIn("Sort", result.node_types[0])
+        self.assertTrue(result.sort_methods[0])
+        self.assertIsNotNone(result.execution_time[0])
+
+    def test_explain_bin_counts(self):
+        self.assertEqual(len(t.explain("bin_counts", column="y", bins=10)), 2)
+
+    def test_explain_unknown_method(self):
+        with self.assertRaises(ValueError):
+            t.explain("pairplot")
+
+    def test_slow_query_plan_capture(self):
+        t.x.describe()
+
+        query = inst.records[-1].queries[-1]
+        self.assertIsNotNone(query.plan)
+        self.assertIn("Plan", query.plan)
@@ -0,0 +1,107 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import psycopg2
+
+from pg_utils import budget, connection, exception, table
+
+conn = connection.Connection()
+
+table_name = "pg_utils_test_budget"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select random() as x, (random() * 10)::int as y from generate_series(1, 100000)""".format(table_name),
+                       conn=conn)
+
+
+class TestBudget(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+
+    def test_within_budget_is_exact(self):
+        result = t.describe(budget=budget.Budget(cost=1e12))
+
+        self.assertFalse(result.attrs["approximate"])
+        self.assertEqual(result.x["count"], 100000)
+
+    def test_seconds_budget(self):
+        # a budget in seconds also sets statement_timeout, which mustn't get in the way of fetching the results
+        result = t.describe(budget=60)
+
+        self.assertFalse(result.attrs["approximate"])
+        self.assertEqual(result.x["count"], 100000)
+
+        counts = t.y.describe(budget=budget.Budget(seconds=60))
+        self.assertEqual(counts["count"], 100000)
+
+    def test_sampled(self):
+        result = t.describe(budget=budget.Budget(cost=100, min_sample_fraction=0.001))
+
+        self.assertTrue(result.attrs["approximate"])
+        self.assertEqual(result.attrs["method"], "sample")
+        self.assertTrue(0 <= result.x["minimum"] <= result.x["maximum"] <= 1)
+
+    def test_catalog(self):
+        result = t.x.describe(budget=budget.Budget(cost=1e-6))
+
+        self.assertEqual(result.attrs["method"], "catalog")
+        self.assertAlmostEqual(result["count"], 100000, delta=10000)
+        self.assertAlmostEqual(result["50%"], 0.5, delta=0.1)
+
+    def test_not_approximate(self):
+        with self.assertRaises(exception.BudgetExceededError):
+            t.describe(budget=budget.Budget(cost=1e-6, approximate=False))
+
+    def test_timeout(self):
+        cur = conn.cursor()
+
+        with self.assertRaises(exception.BudgetExceededError):
+            with budget.statement_timeout(cur, 0.01):
+                cur.execute("select pg_sleep(1)")
+
+    def test_timeout_reset(self):
+        cur = conn.cursor()
+        cur.execute("show statement_timeout")
+        default = cur.fetchone()[0]
+
+        # an error other than a cancellation still resets the timeout, after rolling back the aborted transaction
+        with self.assertRaises(psycopg2.DataError):
+            with budget.statement_timeout(cur, 5):
+                cur.execute("select 1 / 0")
+
+        cur.execute("show statement_timeout")
+        self.assertEqual(cur.fetchone()[0], default)
+
+    def test_timeout_autocommit(self):
+        autocommit = connection.Connection()
+        autocommit.connection.autocommit = True
+
+        try:
+            cur = autocommit.cursor()
+            cur.execute("show statement_timeout")
+            default = cur.fetchone()[0]
+
+            with self.assertRaises(exception.BudgetExceededError):
+                with budget.statement_timeout(cur, 0.01):
+                    cur.execute("select pg_sleep(1)")
+
+            with self.assertRaises(ValueError):
+                with budget.statement_timeout(cur, 5):
+                    raise ValueError("not a database error")
+
+            cur.execute("show statement_timeout")
+            self.assertEqual(cur.fetchone()[0], default)
+        finally:
+            autocommit.close()
+
+    def test_bin_counts_sampled(self):
+        counts = t.y.describe(budget=budget.Budget(cost=100, min_sample_fraction=0.001))
+        self.assertTrue(counts.attrs["approximate"])
+
+        from pg_utils import bin_counts
+        result = bin_counts.counts(t.y, bins=5, budget=budget.Budget(cost=100, min_sample_fraction=0.001))
+        self.assertAlmostEqual(sum(row[2] for row in result), 100000, delta=30000)
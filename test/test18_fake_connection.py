@@ -0,0 +1,70 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from pg_utils import budget, table, testing
+
+conn = testing.FakeConnection()
+
+conn.add_table("pg_utils_test_fake", pd.DataFrame({
+    "x": [3.0, 1.0, np.nan, 2.0],
+    "y": [1, 2, 2, 4],
+    "z": ["a", "b", "c", "d"]
+}))
+
+t = table.Table("public.pg_utils_test_fake", conn=conn)
+
+
+class TestFakeConnection(unittest.TestCase):
+    def test_metadata(self):
+        self.assertEqual(t.column_names, ("x", "y", "z"))
+        self.assertEqual(t.numeric_columns, ("x", "y"))
+        self.assertTrue(table.Table.exists("pg_utils_test_fake", schema="public", conn=conn))
+        self.assertFalse(table.Table.exists("nope", schema="public", conn=conn))
+
+    def test_values(self):
+        self.assertEqual(t.count, 4)
+        self.assertEqual(list(t.z.values), ["a", "b", "c", "d"])
+        self.assertEqual(t.head(2).shape, (2, 3))
+        self.assertEqual(list(t.x.sort_values(limit=2)), [1.0, 2.0])
+
+    def test_aggregates(self):
+        self.assertEqual(t.x.mean, 2.0)
+        self.assertEqual(t.y.max, 4)
+        self.assertFalse(t.y.is_unique)
+        self.assertTrue(t.z.is_unique)
+
+    def test_projection(self):
+        projected = t[["x", "z"]]
+        self.assertEqual(projected.head("all").columns.tolist(), ["x", "z"])
+
+    def test_registered_result(self):
+        conn.add_result(r"^select 42$", rows=[(42,)], columns=["answer"])
+
+        cur = conn.cursor()
+        cur.execute("select %s", (42,))
+        self.assertEqual(cur.fetchall(), [(42,)])
+        self.assertEqual(cur.description[0][0], "answer")
+
+    def test_statement_timeout(self):
+        cur = conn.cursor()
+
+        # the results of the block can still be fetched after the timeout is reset
+        with budget.statement_timeout(cur, 5):
+            cur.execute("select y from public.pg_utils_test_fake")
+
+        self.assertEqual(cur.fetchall(), [(1,), (2,), (2,), (4,)])
+        self.assertEqual(conn.queries[-1], "reset statement_timeout")
+
+    def test_unknown_statement(self):
+        with self.assertRaises(psycopg2.ProgrammingError):
+            conn.cursor().execute("select something_else()")
+
+    def test_no_connection_when_given(self):
+        table.Table("pg_utils_test_fake", schema="public", conn=conn)
+        self.assertIn("pg_utils_test_fake", conn.queries[-1])
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+# The time (in seconds) that importing pg-utils may add to the start of a fresh interpreter
+IMPORT_BUDGET = float(os.environ.get("PG_UTILS_IMPORT_BUDGET", 0.25))
+
+HEAVY_MODULES = ["numpy", "pandas", "psycopg2"]
+
+# the test doubles aren't imported along with pg_utils.connection either
+TEST_MODULES = ["pg_utils.testing"]
+
+_script = """
+import sys, time
+sys.path = ['..'] + sys.path
+began = time.time()
+from pg_utils import connection, table
+print(time.time() - began)
+print(",".join(m for m in {} if m in sys.modules))
+""".format(HEAVY_MODULES + TEST_MODULES)
+
+
+def _run():
+    output = subprocess.check_output([sys.executable, "-c", _script],
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, modules = output.decode().split("\n")[:2]
+    return float(seconds), [m for m in modules.split(",") if m]
+
+
+class TestImportTime(unittest.TestCase):
+    def test_heavy_modules_are_lazy(self):
+        self.assertEqual(_run()[1], [])
+
+    def test_import_budget(self):
+        # the best of a few runs, to keep a busy machine from failing the test
+        self.assertLess(min(_run()[0] for _ in range(3)), IMPORT_BUDGET)
+
+    def test_lazy_attributes(self):
+        import pg_utils
+        from pg_utils import _lazy
+
+        self.assertEqual(pg_utils.budget.__name__, "pg_utils.budget")
+
+        with self.assertRaises(AttributeError):
+            pg_utils.nonexistent
+
+        json = _lazy.lazy_import("json")
+        self.assertEqual(json.dumps([1]), "[1]")
+        self.assertIn("dumps", json.__dict__)
@@ -0,0 +1,67 @@
+import decimal
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+from pg_utils import sql
+from pg_utils.sql import queries
+
+
+class FakeTable(object):
+    schema = "public"
+    table_name = "Mixed Case"
+
+
+class TestSql(unittest.TestCase):
+    def test_quote_identifier(self):
+        self.assertEqual(sql.quote_identifier("x_1"), "x_1")
+        self.assertEqual(sql.quote_identifier("X"), '"X"')
+        self.assertEqual(sql.quote_identifier("order"), '"order"')
+        self.assertEqual(sql.quote_identifier('a"b'), '"a""b"')
+
+    def test_quote_literal(self):
+        self.assertEqual(sql.quote_literal(None), "null")
+        self.assertEqual(sql.quote_literal(True), "true")
+        self.assertEqual(sql.quote_literal(3), "3")
+        self.assertEqual(sql.quote_literal(0.5), "0.5")
+        self.assertEqual(sql.quote_literal(float("nan")), "'NaN'::float8")
+        self.assertEqual(sql.quote_literal(float("inf")), "'Infinity'::float8")
+        self.assertEqual(sql.quote_literal(float("-inf")), "'-Infinity'::float8")
+        self.assertEqual(sql.quote_literal(decimal.Decimal("NaN")), "'NaN'::numeric")
+        self.assertEqual(sql.quote_literal(decimal.Decimal("-Infinity")), "'-Infinity'::numeric")
+        self.assertEqual(sql.quote_literal(decimal.Decimal("1.50")), "1.50")
+        self.assertEqual(sql.quote_literal("it's"), "'it''s'")
+
+    def test_select_columns(self):
+        self.assertEqual(
+            queries.select_columns(FakeTable(), ["a", "B"], order_by=[("a", True), ("B", False)], limit=5),
+            'select a, "B" from public."Mixed Case" order by a, "B" desc limit 5')
+
+        self.assertEqual(queries.select_columns("t tablesample system (1)", ["a"], distinct=True),
+                         "select distinct a from t tablesample system (1)")
+
+    def test_column_metadata(self):
+        # citext is reported as USER-DEFINED by information_schema, so it's recognized by its udt_name
+        self.assertIn("when data_type = 'USER-DEFINED' and column_alias = 'citext' then column_alias",
+                      queries.column_metadata("public", "t"))
+
+    def test_braces_survive_compilation(self):
+        self.assertEqual(str(sql.Select([sql.Literal("{x}")], from_=sql.Identifier("t{1}"))),
+                         'select \'{x}\' from "t{1}"')
+
+    def test_shapes_are_cached(self):
+        queries.describe_column(FakeTable(), "x", "integer", [0.5])
+        before = len(sql.base._shapes)
+
+        query = queries.describe_column(FakeTable(), "Y", "integer", [0.5])
+
+        self.assertEqual(len(sql.base._shapes), before)
+        self.assertIn('percentile_cont(0.5) within group (order by "Y")', query)
+        self.assertIn("'Y' as column_name", query)
+
+    def test_slots(self):
+        statement = sql.Select([sql.Slot("column")], from_=sql.Slot("source")).compile()
+
+        self.assertEqual(statement.bind(column=sql.Identifier("x"), source=sql.Identifier("s", "T")),
+                         'select x from s."T"')
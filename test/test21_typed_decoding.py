@@ -0,0 +1,61 @@
+import datetime
+import decimal
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import dtypes, table, testing
+
+conn = testing.FakeConnection(numeric_as_float=True)
+
+conn.add_table("pg_utils_test_typed", pd.DataFrame({
+    "i": [3, None, 1],
+    "j": [1, 2, 3],
+    "n": [decimal.Decimal("1.5"), None, decimal.Decimal("2")],
+    "t": [datetime.datetime(2020, 1, 1), None, datetime.datetime(2021, 1, 1)],
+    "w": ["a", "b", "c"]
+}), data_types={"i": "bigint", "j": "integer", "n": "numeric", "t": "timestamp without time zone", "w": "text"})
+
+t = table.Table("pg_utils_test_typed", schema="public", conn=conn)
+
+
+class TestTypedDecoding(unittest.TestCase):
+    def test_head(self):
+        result = t.head("all")
+
+        self.assertEqual([str(dtype) for dtype in result.dtypes[:4]],
+                         ["Int64", "int64", "float64", "datetime64[ns]"])
+        self.assertTrue(result["i"].isna()[1])
+        self.assertTrue(np.isnan(result["n"][1]))
+
+    def test_column(self):
+        self.assertEqual(str(t.i.values.dtype), "Int64")
+        self.assertEqual(t.j.head(2).tolist(), [1, 2])
+        self.assertEqual(t.j.unique().dtype, np.int64)
+        self.assertEqual(str(t.t.sort_values().dtype), "datetime64[ns]")
+
+    def test_sort_values(self):
+        self.assertEqual(t.sort_values("i")["i"].tolist()[:2], [1, 3])
+
+    def test_head_num_rows(self):
+        self.assertEqual(len(t.w.head(2)), 2)
+
+        with self.assertRaises(ValueError):
+            t.w.head(0)
+
+    def test_to_array(self):
+        self.assertEqual(dtypes.to_array([decimal.Decimal("1.5")], "numeric").dtype, object)
+        self.assertEqual(dtypes.to_array([decimal.Decimal("1.5")], "numeric", numeric_as_float=True).dtype,
+                         np.float64)
+        self.assertEqual(dtypes.to_array([True, None], "boolean").dtype, "boolean")
+
+        # out of the range of datetime64[ns]
+        self.assertEqual(dtypes.to_array([datetime.datetime(9999, 1, 1)], "timestamp").dtype, object)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import datetime
+import os
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import exception, memory, table, testing
+
+num_rows = 1000
+
+conn = testing.FakeConnection()
+
+data = pd.DataFrame({
+    "x": np.arange(num_rows, dtype=float),
+    "i": [None if k % 7 == 0 else k for k in range(num_rows)],
+    "s": [None if k % 5 == 0 else u"v\u00e9{}".format(k) for k in range(num_rows)],
+    # the last timestamp doesn't fit in datetime64[ns]
+    "ts": [datetime.datetime(2020, 1, 1) + datetime.timedelta(hours=k) for k in range(num_rows - 1)] +
+          [datetime.datetime(3000, 1, 1)]
+}, columns=["x", "i", "s", "ts"])
+
+conn.add_table("pg_utils_test_memory", data, data_types={"i": "bigint", "ts": "timestamp without time zone"})
+
+conn.add_table("pg_utils_test_memory_dates", pd.DataFrame({
+    "x": np.arange(num_rows, dtype=float),
+    "d": [datetime.date(2020, 1, 1) + datetime.timedelta(days=k) for k in range(num_rows)]
+}), data_types={"d": "date"})
+
+# the planner's statistics for the synthetic table
+conn.add_result(r"from pg_class", rows=[(float(num_rows), 10)], columns=["reltuples", "relpages"])
+conn.add_result(r"from pg_stats", rows=[("s", 4)], columns=["attname", "avg_width"])
+
+t = table.Table("pg_utils_test_memory", schema="public", conn=conn)
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_sizes(self):
+        self.assertEqual(memory.MemoryBudget("2KB").max_bytes, 2048)
+        self.assertEqual(memory.MemoryBudget("1.5 GiB").max_bytes, int(1.5 * 1024 ** 3))
+
+        with self.assertRaises(ValueError):
+            memory.MemoryBudget("lots")
+
+        with self.assertRaises(ValueError):
+            memory.MemoryBudget(1024, policy="ignore")
+
+    def test_estimate(self):
+        rows, size = memory.estimate_result_size(t, ["x", "i"])
+        self.assertEqual(rows, num_rows)
+        self.assertEqual(size, num_rows * (8 + 9))
+
+        self.assertEqual(memory.estimate_result_size(t, ["x"], num_rows=10), (10, 80))
+
+    def test_within_budget(self):
+        self.assertEqual(len(t.head("all", memory_budget="1MB")), num_rows)
+        self.assertEqual(len(t.head(5, memory_budget=1000)), 5)
+
+    def test_raise(self):
+        with self.assertRaises(exception.MemoryBudgetExceededError) as context:
+            t.head("all", memory_budget=10000)
+
+        self.assertEqual(context.exception.estimated_rows, num_rows)
+
+    def test_chunk(self):
+        chunks = list(t.head("all", memory_budget=memory.MemoryBudget(10000, policy="chunk")))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), num_rows)
+
+        chunks = list(t.x.head("all", memory_budget=memory.MemoryBudget(1000, policy="chunk")))
+        self.assertEqual(np.concatenate(chunks).tolist(), list(range(num_rows)))
+
+    def test_spill(self):
+        result = t.sort_values("x", ascending=False, memory_budget=memory.MemoryBudget(10000, policy="spill"))
+
+        self.assertIsInstance(result["x"].values, np.memmap)
+        self.assertEqual(result["x"].tolist(), list(range(num_rows))[::-1])
+        self.assertEqual(str(result["i"].dtype), "Int64")
+        self.assertEqual(result["i"].isna().sum(), len(range(0, num_rows, 7)))
+        self.assertEqual(result["s"].iloc[0], u"v\u00e9999")
+        self.assertEqual(result["s"].isna().sum(), len(range(0, num_rows, 5)))
+        self.assertEqual(result["s"].dropna().tolist()[::-1], data["s"].dropna().tolist())
+        self.assertTrue(os.path.isdir(result.attrs["spill_dir"]))
+
+        # every timestamp is spilled as datetime64[us], including those out of the range of datetime64[ns]
+        self.assertEqual(result["ts"].dtype, np.dtype("datetime64[us]"))
+        self.assertEqual(result["ts"].iloc[0], pd.Timestamp("3000-01-01"))
+        self.assertEqual(result["ts"].iloc[-1], pd.Timestamp("2020-01-01"))
+
+    def test_spill_unspillable(self):
+        dates = table.Table("pg_utils_test_memory_dates", schema="public", conn=conn)
+
+        # dates can't be spilled without turning them into something else
+        with self.assertRaises(exception.MemoryBudgetExceededError):
+            dates.sort_values("x", memory_budget=memory.MemoryBudget(10000, policy="spill"))
+
+    def test_cached_values(self):
+        conn.memory_budget = memory.MemoryBudget(1000, policy="chunk")
+
+        try:
+            with self.assertRaises(exception.MemoryBudgetExceededError):
+                t.x.values
+        finally:
+            conn.memory_budget = None
+
+
+if __name__ == "__main__":
+    unittest.main()
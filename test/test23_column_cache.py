@@ -0,0 +1,104 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import cache, table, testing
+from pg_utils.sql import queries
+
+conn = testing.FakeConnection()
+
+conn.add_table("pg_utils_test_cache", pd.DataFrame({
+    "x": np.arange(100, dtype=float),
+    "i": [None] + list(range(99)),
+    "s": ["a"] * 100
+}), data_types={"i": "bigint"})
+
+version = [1]
+
+# the number of rows, and the sum of the hashes of their versions
+conn.add_result(r"^select count\(1\), coalesce\(sum\(hashtext\(ctid::text \|\| xmin::text\)\), 0\) from",
+                rows=lambda sql: [(100, version[0])], columns=["count", "coalesce"])
+
+
+def fresh_table():
+    return table.Table("pg_utils_test_cache", schema="public", conn=conn)
+
+
+class TestColumnCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        conn.column_cache = cache.ColumnCache(self.directory)
+
+    def tearDown(self):
+        conn.column_cache = None
+        shutil.rmtree(self.directory)
+
+    def test_hit(self):
+        expected = fresh_table().x.values
+
+        values = fresh_table().x.values
+        self.assertIsInstance(values, np.memmap)
+        self.assertEqual(values.tolist(), expected.tolist())
+
+    def test_nullable(self):
+        fresh_table().i.values
+
+        values = fresh_table().i.values
+        self.assertEqual(str(values.dtype), "Int64")
+        self.assertIsInstance(values._data, np.memmap)
+        self.assertTrue(values.isna()[0])
+
+    def test_not_cached(self):
+        fresh_table().s.values
+        self.assertEqual(conn.column_cache.entries(), [])
+
+    def test_new_version(self):
+        fresh_table().x.values
+        version[0] += 1
+
+        self.assertNotIsInstance(fresh_table().x.values, np.memmap)
+        self.assertEqual(len(conn.column_cache.entries()), 2)
+
+    def test_exact_version(self):
+        # the version is taken from the rows, rather than from the statistics (which can lag, or be reset)
+        self.assertEqual(fresh_table().version_token(exact=True), "100-{}".format(version[0]))
+        self.assertEqual(queries.rows_version("t"), "select count(1), coalesce(sum(hashtext(ctid::text || xmin::text)), 0) from t")
+
+    def test_eviction(self):
+        column_cache = cache.ColumnCache(self.directory, max_bytes=5000)
+        one = np.arange(250, dtype=float)
+
+        column_cache.put("a", one)
+        column_cache.put("b", one)
+        os.utime(column_cache._path("a"), (0, 0))
+        column_cache.put("c", one)
+
+        self.assertIsNone(column_cache.get("a"))
+        self.assertEqual(sorted(key for key, _, _ in column_cache.entries()), ["b", "c"])
+
+    def test_concurrent_writers(self):
+        column_cache = conn.column_cache
+        values = np.arange(10000, dtype=np.int64)
+
+        threads = [threading.Thread(target=column_cache.put, args=("same", values)) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(column_cache.get("same").tolist(), values.tolist())
+        self.assertEqual(os.listdir(self.directory), ["same.npy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
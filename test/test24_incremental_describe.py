@@ -0,0 +1,169 @@
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import summary, table, testing
+
+rng = np.random.RandomState(0)
+events = pd.DataFrame({"event_id": np.arange(1, 20001), "x": rng.normal(size=20000)})
+
+# the rows of the table so far, the rows of transactions that haven't committed yet, and the (cumulative) numbers of
+# updated and deleted rows
+visible = [10000]
+uncommitted = set()
+modified = [0]
+
+# the next transaction id, and the ids of the transactions that are running
+next_xid = [100]
+running = []
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_events", events)
+
+conn.add_result(r"from pg_class c left join pg_stat_all_tables",
+                rows=lambda sql: [(1, 1, visible[0], modified[0], 0, 0, 0, 0)],
+                columns=["oid", "relfilenode", "ins", "upd", "del", "xact_ins", "xact_upd", "xact_del"])
+
+
+def snapshot(sql):
+    next_xid[0] += 1
+    return [(min(running) if running else next_xid[0], next_xid[0])]
+
+
+conn.add_result(r"txid_current_snapshot", rows=snapshot, columns=["xmin", "xmax"])
+
+
+def committed_rows(sql):
+    rows = events[:visible[0]]
+    rows = rows[~rows.event_id.isin(uncommitted)]
+    after = re.search(r"where event_id > (\d+)", sql)
+    until = re.search(r"event_id <= (\d+)", sql)
+
+    if after:
+        rows = rows[rows.event_id > int(after.group(1))]
+
+    if until:
+        rows = rows[rows.event_id <= int(until.group(1))]
+
+    return rows
+
+
+conn.add_result(r"^select count\(1\) from public.pg_utils_test_events where",
+                rows=lambda sql: [(len(committed_rows(sql)),)], columns=["count"])
+
+
+def summarize(sql):
+    # what the server would compute for summarize_columns over (x)
+    rows = committed_rows(sql)
+    x = rows.x.values
+    resolution = len(re.search(r"array\[(.*?)\]", sql).group(1).split(","))
+
+    if not len(x):
+        return [(0, None, None, None, None, None, 0, None)]
+
+    return [(len(x), x.sum(), x.var(), x.min(), x.max(), list(np.quantile(x, np.linspace(0, 1, resolution))),
+             len(x), int(rows.event_id.max()))]
+
+
+conn.add_result(r"percentile_cont\(array", rows=summarize, columns=["c"] * 8)
+
+t = table.Table("pg_utils_test_events", schema="public", conn=conn)
+
+
+class TestIncrementalDescribe(unittest.TestCase):
+    def setUp(self):
+        visible[0] = 10000
+        uncommitted.clear()
+        modified[0] = 0
+        del running[:]
+        self.store = summary.SummaryStore()
+
+    def describe(self):
+        return t.describe(columns=["x"], incremental_on="event_id", store=self.store)
+
+    def test_incremental(self):
+        first = self.describe()
+        self.assertEqual(first.attrs["rows_scanned"], 10000)
+        self.assertEqual(first.attrs["watermark"], 10000)
+
+        visible[0] = 20000
+        second = self.describe()
+        self.assertEqual(second.attrs["rows_scanned"], 10000)
+        self.assertEqual(second.attrs["watermark"], 20000)
+
+        x = events.x
+        self.assertEqual(second["x"]["count"], 20000)
+        self.assertAlmostEqual(second["x"]["mean"], x.mean())
+        self.assertAlmostEqual(second["x"]["std_dev"], x.std())
+        self.assertAlmostEqual(second["x"]["minimum"], x.min())
+        self.assertAlmostEqual(second["x"]["50%"], x.median(), places=2)
+
+        self.assertEqual(self.describe().attrs["rows_scanned"], 0)
+
+    def test_out_of_order_commits(self):
+        # a transaction took the id 9990, but commits after the ones that took greater ids
+        uncommitted.add(9990)
+        running.append(next_xid[0])
+
+        first = self.describe()
+        self.assertEqual(first["x"]["count"], 9999)
+        self.assertEqual(first.attrs["pending_rows"], 9999)
+
+        # while it's running, the rows past the stored watermark stay pending, but aren't scanned again
+        self.assertEqual(self.describe().attrs["rows_scanned"], 0)
+
+        uncommitted.clear()
+        del running[:]
+
+        third = self.describe()
+        self.assertEqual(third["x"]["count"], 10000)
+        self.assertAlmostEqual(third["x"]["mean"], events.x[:10000].mean())
+        self.assertEqual(third.attrs["rows_scanned"], 10000)
+
+        fourth = self.describe()
+        self.assertEqual(fourth["x"]["count"], 10000)
+        self.assertEqual(fourth.attrs["pending_rows"], 0)
+        self.assertEqual(fourth.attrs["rows_scanned"], 0)
+
+    def test_modified(self):
+        self.describe()
+
+        modified[0] = 1
+        self.assertEqual(self.describe().attrs["rows_scanned"], 10000)
+
+    def test_persistent_store(self):
+        import shutil
+        import tempfile
+
+        directory = tempfile.mkdtemp()
+
+        try:
+            t.describe(columns=["x"], incremental_on="event_id", store=summary.SummaryStore(directory))
+
+            result = t.describe(columns=["x"], incremental_on="event_id", store=summary.SummaryStore(directory))
+            self.assertEqual(result.attrs["rows_scanned"], 0)
+            self.assertEqual(result["x"]["count"], 10000)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_merge(self):
+        x = events.x.values
+
+        merged = summary.ColumnSummary()
+
+        for chunk in np.array_split(x, 7):
+            merged.merge(summary.ColumnSummary.from_aggregates(
+                len(chunk), chunk.sum(), chunk.var(), chunk.min(), chunk.max(),
+                list(np.quantile(chunk, np.linspace(0, 1, 201)))))
+
+        self.assertAlmostEqual(merged.std_dev, x.std(ddof=1))
+        self.assertAlmostEqual(merged.sketch.quantile(0.9), np.quantile(x, 0.9), places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
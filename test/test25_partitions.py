@@ -0,0 +1,159 @@
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import bin_counts, partition, summary, table, testing
+
+rng = np.random.RandomState(0)
+
+# measurements is partitioned by month into m1 and m2, and m3, which is itself partitioned into m3a and m3b
+data = {name: pd.DataFrame({"month": month, "x": rng.normal(loc=month, size=size)})
+        for name, month, size in [("m1", 1, 3000), ("m2", 2, 4000), ("m3a", 3, 2000), ("m3b", 3, 1000)]}
+
+children = {
+    "measurements": [("public", "m1", "r", "FOR VALUES FROM (1) TO (2)"),
+                     ("public", "m2", "r", "FOR VALUES FROM (2) TO (3)"),
+                     ("public", "m3", "p", "FOR VALUES FROM (3) TO (4)")],
+    "m3": [("public", "m3a", "r", "FOR VALUES IN (1)"),
+           ("public", "m3b", "r", "FOR VALUES IN (2)")],
+}
+
+versions = {name: 0 for name in data}
+
+conn = testing.FakeConnection()
+conn.add_table("measurements", pd.concat(list(data.values()), ignore_index=True))
+
+
+def relation_name(sql):
+    return re.search(r"'public\.(\w+)'::regclass", sql).group(1)
+
+
+def rows_of(sql):
+    rows = data[re.search(r"from public\.(\w+)", sql).group(1)]
+    where = re.search(r"\(month (=|>) (\d+)\)", sql)
+
+    if where:
+        month = int(where.group(2))
+        rows = rows[rows.month == month] if where.group(1) == "=" else rows[rows.month > month]
+
+    return rows
+
+
+def summarize(sql):
+    x = rows_of(sql).x.values
+
+    if "percentile_cont" not in sql:
+        return [(len(x), None)]
+
+    resolution = len(re.search(r"array\[(.*?)\]", sql).group(1).split(","))
+
+    if not len(x):
+        return [(0, None, None, None, None, None, 0, None)]
+
+    return [(len(x), x.sum(), x.var(), x.min(), x.max(), list(np.quantile(x, np.linspace(0, 1, resolution))),
+             len(x), None)]
+
+
+def count_bins(sql):
+    minimum, maximum, bins = [float(v) for v in re.search(r"::numeric, (\S+), (\S+), (\d+)::int", sql).groups()]
+    x = rows_of(sql).x.values
+    width = (maximum - minimum) / bins
+    buckets = np.clip(np.floor((x - minimum) / width).astype(int) + 1, 0, int(bins) + 1)
+
+    return [(b, minimum + (b - 1) * width, minimum + b * width, int((buckets == b).sum()))
+            for b in sorted(set(buckets))]
+
+
+def plan(sql):
+    operator, month = re.search(r"where month (=|>) (\d+)", sql).groups()
+    names = [name for name, rows in sorted(data.items())
+             if (rows.month == int(month) if operator == "=" else rows.month > int(month)).any()]
+
+    # (a table of another schema, with the name of a partition that's pruned, is scanned too)
+    scans = [{"Node Type": "Seq Scan", "Schema": "public", "Relation Name": name} for name in names] + \
+        [{"Node Type": "Seq Scan", "Schema": "archive", "Relation Name": "m1"}]
+
+    return [([{"Plan": {"Node Type": "Append", "Plans": scans}}],)]
+
+
+conn.add_result(r"from pg_inherits", rows=lambda sql: children.get(relation_name(sql), []),
+                columns=["nspname", "relname", "relkind", "pg_get_expr"])
+conn.add_result(r"^select count\(1\), coalesce\(sum\(hashtext",
+                rows=lambda sql: [(len(rows_of(sql)), versions[re.search(r"from public\.(\w+)", sql).group(1)])],
+                columns=["count", "coalesce"])
+conn.add_result(r"^explain", rows=plan, columns=["QUERY PLAN"])
+conn.add_result(r"count\(1\), null from", rows=summarize, columns=["c"] * 8)
+conn.add_result(r"width_bucket", rows=count_bins, columns=["bucket", "left_endpoint", "right_endpoint", "num_points"])
+
+t = table.Table("measurements", schema="public", conn=conn)
+x = pd.concat(list(data.values())).x
+
+
+class TestPartitions(unittest.TestCase):
+    def setUp(self):
+        for name in versions:
+            versions[name] = 0
+
+        self.store = summary.SummaryStore()
+
+    def test_list_partitions(self):
+        self.assertEqual([p.table_name for p in t.partitions()], ["m1", "m2", "m3a", "m3b"])
+        self.assertEqual(t.partitions()[0].bound, "FOR VALUES FROM (1) TO (2)")
+
+    def test_describe(self):
+        result = t.describe(columns=["x"], by_partition=True, store=self.store)
+
+        self.assertEqual(result["x"]["count"], len(x))
+        self.assertAlmostEqual(result["x"]["mean"], x.mean())
+        self.assertAlmostEqual(result["x"]["std_dev"], x.std())
+        self.assertAlmostEqual(result["x"]["maximum"], x.max())
+        self.assertAlmostEqual(result["x"]["50%"], x.median(), places=1)
+        self.assertEqual(result.attrs["partitions"], 4)
+        self.assertEqual(result.attrs["partitions_scanned"], 4)
+
+    def test_only_changed_partitions_are_scanned(self):
+        t.describe(columns=["x"], by_partition=True, store=self.store)
+        self.assertEqual(t.describe(columns=["x"], by_partition=True, store=self.store).attrs["partitions_scanned"], 0)
+
+        versions["m2"] = 1
+        self.assertEqual(t.describe(columns=["x"], by_partition=True, store=self.store).attrs["partitions_scanned"], 1)
+
+    def test_pruning(self):
+        result = t.describe(columns=["x"], by_partition=True, where="month > 2", store=self.store)
+
+        self.assertEqual(result["x"]["count"], 3000)
+        self.assertEqual(result.attrs["partitions_pruned"], 2)
+
+        # public.m1 is pruned, though a table of the same name in another schema is scanned
+        self.assertEqual([p.table_name for p in partition.prune_partitions(t, t.partitions(), "month > 2")],
+                         ["m3a", "m3b"])
+        self.assertTrue(conn.queries[-1].startswith("explain (format json, verbose) "))
+
+        self.assertEqual(t.partitioned_count(where="month = 1", store=self.store), 3000)
+        self.assertEqual(t.partitioned_count(store=self.store), len(x))
+
+    def test_parallel(self):
+        result, info = partition.describe(t, ["x"], [0.5], parallel=3, store=self.store)
+
+        self.assertEqual(result["x"][0], len(x))
+        self.assertEqual(info["partitions_scanned"], 4)
+
+    def test_bin_counts(self):
+        counts = bin_counts.counts(t["x"], bins=10, by_partition=True, store=self.store)
+
+        self.assertEqual(sum(c for _, _, c in counts), len(x))
+        self.assertAlmostEqual(counts[0][0], x.min())
+        self.assertAlmostEqual(counts[9][1], x.max())
+
+    def test_where_requires_by_partition(self):
+        with self.assertRaises(ValueError):
+            t.describe(columns=["x"], where="month = 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
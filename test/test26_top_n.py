@@ -0,0 +1,90 @@
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import table, testing
+from pg_utils.sql import queries
+
+rng = np.random.RandomState(0)
+n = 1000
+
+data = pd.DataFrame({"id": np.arange(n), "x": rng.randint(0, 50, size=n).astype(float)})
+data.loc[rng.choice(n, 100, replace=False), "x"] = np.nan
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_top_n", data)
+
+t = table.Table("pg_utils_test_top_n", schema="public", conn=conn)
+
+
+class TestTopN(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_nlargest(self):
+        expected = data.nlargest(10, ["x", "id"])
+
+        result = t.nlargest(10, ["x", "id"])
+        self.assertEqual(result.id.tolist(), expected.id.tolist())
+        self.assertIn("limit 10", conn.queries[-1])
+
+        self.assertEqual(t["x"].nlargest(7).tolist(), data.x.nlargest(7).tolist())
+
+    def test_nsmallest(self):
+        self.assertEqual(t.nsmallest(5, "x").x.tolist(), data.x.nsmallest(5).tolist())
+        self.assertEqual(t["x"].nsmallest(5).tolist(), data.x.nsmallest(5).tolist())
+
+        with self.assertRaises(ValueError):
+            t["x"].nsmallest(0)
+
+    def test_sort_values_limit(self):
+        result = t.sort_values(["x", "id"], ascending=[False, True], limit=20)
+
+        self.assertEqual(len(result), 20)
+        self.assertIn("limit 20", conn.queries[-1])
+
+    def test_iter_sorted(self):
+        pages = list(t.iter_sorted(["x", "id"], page_size=64))
+        result = pd.concat(pages, ignore_index=True)
+
+        self.assertEqual(len(pages), int(np.ceil(900 / 64.0)))
+        self.assertEqual(result.id.tolist(), data.dropna().sort_values(["x", "id"]).id.tolist())
+        self.assertTrue(all("offset" not in q for q in conn.queries))
+
+    def test_iter_sorted_descending(self):
+        result = pd.concat(t.iter_sorted("id", page_size=300, ascending=False), ignore_index=True)
+
+        self.assertEqual(result.id.tolist(), list(range(n - 1, -1, -1)))
+
+    def test_keyset_query(self):
+        self.assertEqual(
+            queries.select_columns("t", ["a", "b"], order_by=[("a", True), ("b", True)], limit=5, after=[1, "x"]),
+            "select a, b from t where (a, b) > (1, 'x') order by a, b limit 5"
+        )
+        self.assertEqual(
+            queries.select_columns("t", ["a", "b"], order_by=[("a", True), ("b", False)], after=[1, "x"]),
+            "select a, b from t where ((a > 1) or (a = 1 and b < 'x')) order by a, b desc"
+        )
+
+        # the keys are taken as text and cast back to the columns' types, so real values compare exactly
+        self.assertEqual(
+            queries.select_columns("t", ["a", "b"], order_by=[("a", True), ("b", True)], after=["0.1", "7"],
+                                   after_types=["real", "bigint"], keys_as_text=True),
+            "select a, b, a::text, b::text from t where (a, b) > ('0.1'::real, '7'::bigint) order by a, b"
+        )
+
+    def test_iter_sorted_single_rows(self):
+        pages = list(t.iter_sorted(["x", "id"], page_size=1))
+
+        self.assertEqual(len(pages), 900)
+        self.assertEqual([p.id.iloc[0] for p in pages], data.dropna().sort_values(["x", "id"]).id.tolist())
+        self.assertEqual(list(pages[0].columns), ["id", "x"])
+        self.assertIn("> ('0.0'::double precision, '", conn.queries[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
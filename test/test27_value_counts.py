@@ -0,0 +1,123 @@
+import hashlib
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import summary, table, testing
+
+rng = np.random.RandomState(0)
+n = 20000
+
+data = pd.DataFrame({"word": ["w{}".format(i) for i in rng.zipf(1.5, size=n) % 5000],
+                     "id": np.arange(n)})
+data.loc[rng.choice(n, 50, replace=False), "word"] = None
+
+statistics = []
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_words", data)
+
+
+def value_counts(sql):
+    counts = data.word.value_counts(dropna="is not null" in sql)
+    counts = counts.rename_axis("value").reset_index().sort_values(["count", "value"], ascending=[False, True])
+    rows = [(None if pd.isnull(v) else v, c, counts["count"].sum()) for v, c in zip(counts.value, counts["count"])]
+
+    return rows[:5] if "limit 5" in sql else rows
+
+
+def registers(sql):
+    # any good 32 bit hash will do in place of PostgreSQL's hashtext
+    ranks = {}
+    has_nulls = False
+
+    for value in data.word:
+        if pd.isnull(value):
+            has_nulls = True
+            continue
+
+        h = int(hashlib.md5(value.encode("utf8")).hexdigest()[:8], 16)
+        register, rest = h & (2 ** 14 - 1), h >> 14
+        ranks[register] = max(ranks.get(register, 0), 18 - rest.bit_length() + 1)
+
+    return list(ranks.items()) + ([(None, None)] if has_nulls else [])
+
+
+conn.add_result(r"sum\(count\(1\)\) over \(\)", rows=value_counts, columns=["word", "count", "total"])
+conn.add_result(r"count\(distinct word\)", rows=[(data.word.nunique(), True)], columns=["count", "coalesce"])
+conn.add_result(r"from pg_stats s", rows=lambda sql: statistics, columns=["n_distinct", "null_frac", "reltuples"])
+conn.add_result(r"hashtext", rows=registers, columns=["register", "max"])
+
+t = table.Table("pg_utils_test_words", schema="public", conn=conn)
+
+
+class TestValueCounts(unittest.TestCase):
+    def setUp(self):
+        del statistics[:]
+
+    def test_value_counts(self):
+        result = t["word"].value_counts(top=5)
+        expected = data.word.value_counts()
+
+        self.assertEqual(result.name, "count")
+        self.assertEqual(result.index.name, "word")
+        self.assertEqual(result.tolist(), expected.tolist()[:5])
+        self.assertEqual(list(result.index), list(expected.index[:5]))
+
+    def test_normalize(self):
+        result = t["word"].value_counts(top=5, normalize=True)
+        expected = data.word.value_counts(normalize=True)
+
+        self.assertEqual(result.name, "proportion")
+        np.testing.assert_allclose(result.values, expected.values[:5])
+
+    def test_dropna(self):
+        result = t["word"].value_counts(dropna=False)
+
+        self.assertEqual(result.sum(), n)
+        self.assertEqual(result[result.index.isnull()].iloc[0], 50)
+
+    def test_nunique_exact(self):
+        self.assertEqual(t["word"].nunique(approx=False), data.word.nunique())
+        self.assertEqual(t["word"].nunique(approx=False, dropna=False), data.word.nunique(dropna=False))
+
+    def test_nunique_statistics(self):
+        statistics.append((-0.25, 0.01, 1000.0))
+        self.assertEqual(t["word"].nunique(), 250)
+        self.assertEqual(t["word"].nunique(dropna=False), 251)
+
+        del statistics[:]
+
+        with self.assertRaises(ValueError):
+            t["word"].nunique(method="statistics")
+
+    def test_nunique_hyperloglog(self):
+        expected = data.word.nunique()
+
+        self.assertAlmostEqual(t["word"].nunique() / float(expected), 1, delta=0.03)
+        self.assertEqual(t["word"].nunique(method="hyperloglog", dropna=False),
+                         t["word"].nunique(method="hyperloglog") + 1)
+
+    def test_hyperloglog(self):
+        sketches = []
+
+        for chunk in range(4):
+            hashes = [int(hashlib.md5(str(i).encode("utf8")).hexdigest()[:8], 16)
+                      for i in range(chunk * 25000, (chunk + 2) * 25000)]
+            sketches.append(summary.HyperLogLog.from_registers(
+                [(h & (2 ** 14 - 1), 18 - (h >> 14).bit_length() + 1) for h in hashes]))
+
+        merged = summary.HyperLogLog()
+
+        for sketch in sketches:
+            merged.merge(sketch)
+
+        self.assertAlmostEqual(merged.estimate() / 125000.0, 1, delta=0.03)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import pandas as pd
+
+from pg_utils import dtypes, table, testing
+from pg_utils.sql import queries
+
+data = pd.DataFrame({
+    "x": [1.0, 2.0, 3.0, None, 5.0],
+    "word": ["a", "b", "a", None, "a"],
+    "flag": [True, False, True, None, True],
+    "taken_at": pd.to_datetime(["2020-01-01", "2020-02-01", None, "2020-03-01", "2020-01-15"]),
+    "tags": [[1, 2], [1], [], None, [1, 2, 3]],
+})
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_profile", data, data_types={"flag": "boolean", "tags": "int[]"})
+
+
+def profile(sql):
+    # what the server would compute for profile_columns, with quartiles
+    row = []
+
+    for name in re.findall(r"count\((\w+)\)", sql):
+        values = data[name].dropna()
+        row.append(len(values))
+        kind = dtypes.kind(t.column_data_types[name])
+
+        if kind == "number":
+            row += [values.mean(), values.std(), values.min()] + list(values.quantile([0.25, 0.5, 0.75])) + \
+                   [values.max()]
+        elif kind == "text":
+            row += [values.nunique(), values.mode()[0]]
+        elif kind == "temporal":
+            row += [values.min().to_pydatetime(), values.max().to_pydatetime(),
+                    (values.max() - values.min()).to_pytimedelta()]
+        elif kind == "boolean":
+            row += [values.astype(int).mean()]
+        elif kind == "array":
+            lengths = values.map(len)
+            row += [lengths.min(), lengths.mean(), lengths.median(), lengths.max()]
+
+    return [tuple(row)]
+
+
+conn.add_result(lambda sql: "count(distinct" in sql or "max(" in sql, rows=profile, columns=["c"] * 22)
+conn.add_result(r"^select count\(nullif\(word = 'a', false\)\) from", rows=[(3,)], columns=["count"])
+
+t = table.Table("pg_utils_test_profile", schema="public", conn=conn)
+
+
+class TestDescribeAll(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_kinds(self):
+        self.assertEqual([dtypes.kind(t.column_data_types[c]) for c in t.column_names],
+                         ["number", "text", "boolean", "temporal", "array"])
+
+    def test_describe_all(self):
+        result = t.describe(include="all")
+
+        self.assertEqual(list(result.columns), list(data.columns))
+        self.assertEqual(list(result.index), ["count", "unique", "top", "freq", "mean", "std_dev", "minimum", "25%",
+                                              "50%", "75%", "maximum", "range", "true_ratio", "min_length",
+                                              "mean_length", "median_length", "max_length"])
+
+        self.assertEqual(result["x"]["count"], 4)
+        self.assertEqual(result["word"]["unique"], 2)
+        self.assertEqual(result["word"]["top"], "a")
+        self.assertEqual(result["word"]["freq"], 3)
+        self.assertEqual(result["taken_at"]["range"].days, 60)
+        self.assertAlmostEqual(result["flag"]["true_ratio"], 0.75)
+        self.assertEqual(result["tags"]["max_length"], 3)
+        self.assertTrue(pd.isnull(result["word"]["mean"]))
+
+        # one scan for every summary, and one more for the frequency of the most common word
+        self.assertEqual(len([q for q in conn.queries if q.startswith("select count(")]), 2)
+
+    def test_include(self):
+        result = t.describe(include=["text", "boolean"])
+
+        self.assertEqual(list(result.columns), ["word", "flag"])
+        self.assertEqual(list(result.index), ["count", "unique", "top", "freq", "true_ratio"])
+
+        with self.assertRaises(ValueError):
+            t.describe(include="strings")
+
+    def test_timetz_and_bytea(self):
+        # there's no timetz - timetz operator, so timetz columns get no range
+        self.assertEqual(
+            queries.profile_columns("t", [("a", "temporal"), ("b", "temporal")], [], data_types=["time with time zone",
+                                                                                                  "date"]),
+            "select count(a), min(a), max(a), null::interval, count(b), min(b), max(b), max(b) - min(b) from t"
+        )
+
+        # bytea values are decoded to memoryviews, which can't be counted as the most common value
+        self.assertEqual(dtypes.kind("bytea"), "other")
+
+    def test_non_numeric_columns(self):
+        result = t.describe(columns=["taken_at"])
+        self.assertEqual(list(result.index), ["count", "minimum", "maximum", "range"])
+
+        with self.assertRaises(ValueError):
+            t.describe(columns=["word"], incremental_on="x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import re
+import struct
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import bin_counts, dtypes, table, testing
+from pg_utils.sql import queries
+
+rng = np.random.RandomState(0)
+n = 200
+
+vectors = rng.normal(loc=[0.0, 10.0, 20.0], size=(n, 3))
+data = pd.DataFrame({"id": np.arange(n), "vector": list(vectors)})
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_vectors", data, data_types={"vector": "double precision[]"})
+
+
+def copy_binary(arrays, oid=701, code=">d"):
+    # what COPY ... TO STDOUT WITH (FORMAT BINARY) sends for a single column of one-dimensional arrays
+    out = [b"PGCOPY\n\xff\r\n\x00", struct.pack(">ii", 0, 0)]
+
+    for array in arrays:
+        if array is None:
+            out.append(struct.pack(">hi", 1, -1))
+            continue
+
+        size = struct.calcsize(code)
+        body = struct.pack(">iiiii", 1, 0, oid, len(array), 1) + \
+            b"".join(struct.pack(">i", size) + struct.pack(code, v) for v in array)
+        out.append(struct.pack(">hi", 1, len(body)) + body)
+
+    out.append(struct.pack(">h", -1))
+
+    return b"".join(out)
+
+
+def describe(sql):
+    elements = vectors.ravel()
+    percentiles = [float(p) for p in re.findall(r"percentile_cont\((\S+)\)", sql)]
+
+    return [("value", len(elements), elements.mean(), elements.std(ddof=1), elements.min()) +
+            tuple(np.quantile(elements, percentiles)) + (elements.max(),)]
+
+
+def describe_positions(sql):
+    return [(i + 1, n, vectors[:, i].mean(), vectors[:, i].std(ddof=1), vectors[:, i].min(),
+             np.quantile(vectors[:, i], 0.5), vectors[:, i].max()) for i in range(3)]
+
+
+def count_bins(sql):
+    minimum, maximum, bins = [float(v) for v in re.search(r"::numeric, (\S+), (\S+), (\d+)::int", sql).groups()]
+    width = (maximum - minimum) / bins
+    buckets = np.clip(np.floor((vectors.ravel() - minimum) / width).astype(int) + 1, 0, int(bins) + 1)
+
+    return [(b, minimum + (b - 1) * width, minimum + b * width, int((buckets == b).sum()))
+            for b in sorted(set(buckets))]
+
+
+copied = []
+
+conn.add_result(r"^copy", rows=lambda sql: [(copied[-1],)], columns=["copy"])
+conn.add_result(r"group by 1 order by 1", rows=describe_positions, columns=["position"] + ["c"] * 6)
+conn.add_result(r"width_bucket", rows=count_bins, columns=["bucket", "left_endpoint", "right_endpoint", "num_points"])
+conn.add_result(r"with ordinality", rows=describe, columns=["column_name"] + ["c"] * 6)
+
+t = table.Table("pg_utils_test_vectors", schema="public", conn=conn)
+
+
+class TestArrayColumns(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+        del copied[:]
+
+    def test_elements_query(self):
+        self.assertEqual(
+            queries.array_elements("t", "xs"),
+            "(\nselect e.value, e.position from t, unnest(xs) with ordinality as e(value, position)\n)elements"
+        )
+
+    def test_describe(self):
+        self.assertTrue(t["vector"].is_numeric_array)
+        self.assertFalse(t["vector"].is_numeric)
+
+        result = t["vector"].describe(percentiles=[0.5])
+
+        self.assertEqual(result["count"], 3 * n)
+        self.assertAlmostEqual(result["mean"], vectors.mean())
+        self.assertEqual(list(result.index), ["count", "mean", "std_dev", "minimum", "50%", "maximum"])
+        self.assertIn("unnest(vector)", conn.queries[-1])
+
+    def test_describe_by_position(self):
+        result = t["vector"].describe_elements(percentiles=[0.5], by_position=True)
+
+        self.assertEqual(list(result.index), [1, 2, 3])
+        self.assertEqual(result.index.name, "position")
+        np.testing.assert_allclose(result["mean"].values, vectors.mean(axis=0))
+
+        with self.assertRaises(ValueError):
+            t["id"].describe_elements()
+
+    def test_bin_counts(self):
+        counts = bin_counts.counts(t["vector"], bins=30)
+
+        self.assertIn("unnest(vector)", conn.queries[-1])
+        self.assertEqual(sum(c for _, _, c in counts), 3 * n)
+        self.assertAlmostEqual(counts[0][0], vectors.min())
+
+        with self.assertRaises(ValueError):
+            bin_counts.counts(t["vector"], bins=30, by_partition=True)
+
+    def test_to_matrix(self):
+        copied.append(copy_binary(vectors))
+        result = t["vector"].to_matrix()
+
+        self.assertEqual(result.shape, (n, 3))
+        self.assertEqual(result.dtype, np.float64)
+        self.assertTrue(result.dtype.isnative)
+        np.testing.assert_array_equal(result, vectors)
+        self.assertEqual(conn.queries[-1],
+                         "copy (select vector from public.pg_utils_test_vectors) to stdout with (format binary)")
+
+        copied.append(copy_binary(vectors[:5]))
+        self.assertEqual(t["vector"].to_matrix(num_rows=5).shape, (5, 3))
+        self.assertIn("limit 5", conn.queries[-1])
+
+    def test_decode_integers(self):
+        arrays = [[1, 2], [3, -4]]
+
+        result = dtypes.decode_matrix(copy_binary(arrays, oid=23, code=">i"))
+        self.assertEqual(result.dtype, np.int32)
+        np.testing.assert_array_equal(result, arrays)
+
+        self.assertEqual(dtypes.decode_matrix(copy_binary([])).shape, (0, 0))
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError):
+            dtypes.decode_matrix(copy_binary([[1.0, 2.0], [3.0]]))
+
+        with self.assertRaises(ValueError):
+            dtypes.decode_matrix(copy_binary([[1.0, 2.0], None]))
+
+        with self.assertRaises(ValueError):
+            dtypes.decode_matrix(copy_binary([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0, 7.0, 8.0]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import decimal
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import bin_counts, table, testing
+from pg_utils.column import plot
+
+_has_matplotlib = True
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+except ImportError:
+    _has_matplotlib = False
+
+rng = np.random.RandomState(0)
+n = 5000
+
+data = pd.DataFrame({"x": np.append(rng.normal(size=n - 3), [8.0, 9.0, -7.0]),
+                     "word": rng.choice(["a", "b", "c"], size=n, p=[0.5, 0.3, 0.2])})
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_plots", data)
+
+x = data.x.values
+
+
+def describe(sql):
+    percentiles = [float(p) for p in re.findall(r"percentile_cont\((\S+)\)", sql)]
+
+    return [("x", len(x), x.mean(), x.std(ddof=1), x.min()) + tuple(np.quantile(x, percentiles)) + (x.max(),)]
+
+
+def whiskers(sql):
+    low, high = [float(v) for v in re.search(r"x >= (\S+)\).*x <= (\S+)\)", sql).groups()]
+
+    return [(x[x >= low].min(), x[x <= high].max(), int(((x < low) | (x > high)).sum()))]
+
+
+def outside(sql):
+    low, high, limit = re.search(r"x < (\S+) or x > (\S+)\) limit (\d+)", sql).groups()
+    values = x[(x < float(low)) | (x > float(high))]
+
+    return [(v,) for v in values[:int(limit)]]
+
+
+def count_bins(sql, x=x):
+    minimum, maximum, bins = [float(v) for v in re.search(r"::numeric, (\S+), (\S+), (\d+)::int", sql).groups()]
+    width = (maximum - minimum) / bins
+    buckets = np.clip(np.floor((x - minimum) / width).astype(int) + 1, 0, int(bins) + 1)
+
+    return [(b, minimum + (b - 1) * width, minimum + b * width, int((buckets == b).sum()))
+            for b in sorted(set(buckets))]
+
+
+conn.add_result(r"filter \(where", rows=whiskers, columns=["min", "max", "count"])
+conn.add_result(r"where \(x <", rows=outside, columns=["x"])
+conn.add_result(r"width_bucket", rows=count_bins, columns=["bucket", "left_endpoint", "right_endpoint", "num_points"])
+conn.add_result(r"stddev_samp\(x\)", rows=describe, columns=["column_name"] + ["c"] * 7)
+conn.add_result(r"sum\(count\(1\)\) over \(\)",
+                rows=lambda sql: [(v, c, n) for v, c in data.word.value_counts().items()],
+                columns=["word", "count", "total"])
+
+t = table.Table("pg_utils_test_plots", schema="public", conn=conn)
+
+
+class TestServerSidePlots(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_box_statistics(self):
+        stats = plot.box_statistics(t["x"], max_fliers=10)
+        q1, median, q3 = np.quantile(x, [0.25, 0.5, 0.75])
+        low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+
+        self.assertAlmostEqual(stats["med"], median)
+        self.assertEqual(stats["whislo"], x[x >= low].min())
+        self.assertEqual(stats["whishi"], x[x <= high].max())
+
+        # the extremes are among the outliers, even if not among the first ones fetched
+        self.assertLessEqual(len(stats["fliers"]), 12)
+        self.assertIn(9.0, stats["fliers"])
+        self.assertIn(-7.0, stats["fliers"])
+
+    def test_box_statistics_without_outliers(self):
+        stats = plot.box_statistics(t["x"], whis=100)
+
+        self.assertEqual(stats["whishi"], 9.0)
+        self.assertEqual(len(stats["fliers"]), 0)
+        self.assertEqual(len(conn.queries), 1)
+
+    def test_kde_curve(self):
+        ind, density = plot.kde_curve(t["x"], ind=np.linspace(-4, 4, 81))
+
+        bandwidth = n ** (-1.0 / 5) * x.std(ddof=1)
+        expected = np.exp(-0.5 * ((ind[:, None] - x[None, :]) / bandwidth) ** 2).sum(axis=1) / \
+            (n * bandwidth * np.sqrt(2 * np.pi))
+
+        np.testing.assert_allclose(density, expected, atol=0.005)
+        self.assertTrue(all("width_bucket" in q or "stddev_samp" in q for q in conn.queries))
+
+        with self.assertRaises(ValueError):
+            plot.kde_curve(t["x"], bw_method="wide")
+
+    def test_numeric_column(self):
+        # the statistics of numeric columns come back as Decimals
+        amounts = [decimal.Decimal("{:.2f}".format(v)) for v in np.abs(x)]
+        values = np.array(amounts, dtype="float64")
+
+        numeric = testing.FakeConnection()
+        numeric.add_table("pg_utils_test_amounts", pd.DataFrame({"amount": amounts}), data_types={"amount": "numeric"})
+        numeric.add_result(r"width_bucket", rows=lambda sql: count_bins(sql, values),
+                           columns=["bucket", "left_endpoint", "right_endpoint", "num_points"])
+        numeric.add_result(r"stddev_samp\(amount\)", rows=lambda sql: [
+            ("amount", n, sum(amounts) / n, decimal.Decimal(values.std(ddof=1)), min(amounts)) +
+            tuple(np.quantile(values, [float(p) for p in re.findall(r"percentile_cont\((\S+)\)", sql)])) +
+            (max(amounts),)], columns=["column_name"] + ["c"] * 7)
+
+        column = table.Table("pg_utils_test_amounts", schema="public", conn=numeric)["amount"]
+
+        self.assertEqual(sum(c for _, _, c in bin_counts.counts(column)), n)
+        self.assertEqual(sum(c for _, _, c in bin_counts.counts(column, bins=20)), n)
+        self.assertEqual(len(plot.kde_curve(column, ind=50)[1]), 50)
+
+    @unittest.skipIf(not _has_matplotlib, "matplotlib not found, or there was an issue importing it.")
+    def test_plots(self):
+        for name in ["bar", "barh", "box", "density", "hist", "kde", "pie"]:
+            column = t["word"] if name in ["bar", "barh", "pie"] else t["x"]
+            self.assertTrue(getattr(column.plot, name)(), msg="Problem with {}".format(name))
+
+        # nothing fetched the whole column
+        self.assertFalse(any(re.match(r"^select (x|word) from public.pg_utils_test_plots$", q) for q in conn.queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
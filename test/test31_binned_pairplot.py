@@ -0,0 +1,109 @@
+import itertools
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import bin_counts, table, testing
+
+_has_matplotlib = True
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+except ImportError:
+    _has_matplotlib = False
+
+rng = np.random.RandomState(0)
+n = 3000
+
+data = pd.DataFrame({"x": rng.uniform(size=n), "y": rng.normal(size=n), "z": rng.exponential(size=n),
+                     "label": rng.choice(["a", "b"], size=n)})
+data.loc[:9, "z"] = np.nan
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_binned_pairplot", data)
+
+columns = ["x", "y", "z"]
+
+
+def ranges(sql):
+    names = re.findall(r"min\((\w+)\)", sql)
+
+    return [(n,) + sum(((data[c].min(), data[c].max()) for c in names), ())]
+
+
+def grouping_sets(sql):
+    # what the server would compute for pairwise_bin_counts
+    names = re.findall(r"width_bucket\((\w+)::double precision", sql)
+    edges = [[float(e) for e in inner.split(", ")] for inner in re.findall(r"array\[(.*?)\]", sql)]
+    buckets = [pd.Series(np.searchsorted(e, data[c].values, side="right")).where(data[c].notnull())
+               for c, e in zip(names, edges)]
+    sets = [[int(i) for i in re.findall(r"b(\d+)", s)]
+            for s in re.findall(r"\((b\d+(?:, b\d+)?)\)", sql.split("grouping sets")[1])]
+    rows = []
+
+    for counted in sets:
+        frame = pd.DataFrame({i: buckets[i] for i in counted})
+
+        for key, count in frame.groupby(counted, dropna=False).size().items():
+            key = key if isinstance(key, tuple) else (key,)
+            values = dict(zip(counted, [None if pd.isnull(v) else int(v) for v in key]))
+            rows.append(tuple(0 if i in values else 1 for i in range(len(names))) +
+                        tuple(values.get(i) for i in range(len(names))) + (count,))
+
+    return rows
+
+
+conn.add_result(r"^select count\(1\), min\(", rows=ranges, columns=["count"] + ["c"] * 6)
+conn.add_result(r"grouping sets", rows=grouping_sets, columns=["c"] * 7)
+
+t = table.Table("pg_utils_test_binned_pairplot", schema="public", conn=conn)
+
+
+class TestBinnedPairplot(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_pairwise_counts(self):
+        edges, counts, pair_counts = bin_counts.pairwise_counts(t, bins=8)
+
+        self.assertEqual(sorted(pair_counts), [("x", "y"), ("x", "z"), ("y", "z")])
+        self.assertEqual(len(conn.queries), 2)
+
+        for column in columns:
+            expected, expected_edges = np.histogram(data[column].dropna(), bins=8)
+            np.testing.assert_allclose(edges[column], expected_edges)
+            np.testing.assert_array_equal(counts[column], expected)
+
+        for a, b in itertools.combinations(columns, 2):
+            both = data[[a, b]].dropna()
+            expected, _, _ = np.histogram2d(both[a], both[b], bins=[edges[a], edges[b]])
+            np.testing.assert_array_equal(pair_counts[(a, b)], expected)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            bin_counts.pairwise_counts(t, columns=["x", "label"])
+
+        with self.assertRaises(ValueError):
+            bin_counts.pairwise_counts(t, bins=0)
+
+        with self.assertRaises(ValueError):
+            t.pairplot(binned=True, kind="scatter")
+
+    @unittest.skipIf(not _has_matplotlib, "matplotlib not found, or there was an issue importing it.")
+    def test_pairplot(self):
+        conn.add_result(r"limit 100", rows=[tuple(r) for r in data[columns].values[:100]], columns=columns)
+
+        for kind in ["heatmap", "hexbin"]:
+            axes = t.pairplot(binned=True, bins=10, kind=kind, sample=100)
+            self.assertEqual(axes.shape, (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import table, testing
+
+rng = np.random.RandomState(0)
+n = 2000
+
+# readings at random times over about three days, with a gap of a few hours
+times = pd.Timestamp("2020-01-01") + pd.to_timedelta(np.sort(rng.uniform(0, 72 * 3600, size=n)), unit="s")
+times = times[(times < pd.Timestamp("2020-01-02 05:00")) | (times >= pd.Timestamp("2020-01-02 09:00"))]
+data = pd.DataFrame({"ts": times.floor("us"), "x": rng.normal(size=len(times)),
+                     "y": rng.randint(0, 10, size=len(times))})
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_readings", data)
+
+_functions = {"avg": "mean", "sum": "sum", "count": "count", "min": "min", "max": "max"}
+
+
+def _bucket(ts, sql):
+    unit = re.search(r"date_trunc\('(\w+)'", sql)
+
+    if unit:
+        return ts.dt.to_period("M").dt.start_time if unit.group(1) == "month" else ts.dt.floor(unit.group(1)[0])
+
+    width = re.search(r"date_bin\('(\d+) (microseconds|days)'", sql)
+
+    return ts.dt.floor(pd.Timedelta(int(width.group(1)), unit="us" if width.group(2) == "microseconds" else "D"))
+
+
+def resample(sql, data=data):
+    # what the server would compute for queries.resample
+    inner = sql.split(") select s.bucket")[0]
+    rows = data
+
+    start = re.search(r"ts >= '(.*?)'", inner)
+    end = re.search(r"ts < '(.*?)'", inner)
+
+    if start:
+        rows = rows[rows.ts >= pd.Timestamp(start.group(1))]
+
+    if end:
+        rows = rows[rows.ts < pd.Timestamp(end.group(1))]
+
+    aggregates = [(_functions[f], c) for f, c in re.findall(r"(avg|sum|count|min|max)\((\w+)\)", inner)]
+    grouped = rows.groupby(_bucket(rows.ts, inner))
+    result = pd.DataFrame({i: grouped[c].agg(f) for i, (f, c) in enumerate(aggregates)})
+
+    if "generate_series" in sql:
+        first, last, step = re.search(r"generate_series\((.*?), (.*?), '([^']*)'::interval\)", sql).groups()
+        first, last = [pd.Timestamp(v.split("'")[1]) if v.startswith("'") else None for v in [first, last]]
+        step = {"1 hour": "h", "1 day": "D"}.get(step) or pd.Timedelta(int(step.split()[0]), unit="us")
+        buckets = pd.date_range(result.index.min() if first is None else first,
+                                result.index.max() if last is None else last, freq=step)
+
+        if end:
+            buckets = buckets[buckets < pd.Timestamp(end.group(1))]
+
+        result = result.reindex(buckets)
+
+        for i, (f, _) in enumerate(aggregates):
+            if f in ["sum", "count"]:
+                result[i] = result[i].fillna(0)
+
+    return [(b.to_pydatetime(),) + tuple(None if pd.isnull(v) else v for v in row)
+            for b, row in zip(result.index, result.values.tolist())]
+
+
+conn.add_result(r"date_trunc\('\w+', min\(ts\)|date_bin\(.*min\(ts\)",
+                rows=lambda sql: [(_bucket(pd.Series([data.ts.min()]), sql)[0].to_pydatetime(),
+                                   data.ts.max().to_pydatetime())],
+                columns=["date_trunc", "max"])
+conn.add_result(r"as bucket", rows=resample, columns=["bucket"] + ["a"] * 4)
+
+t = table.Table("pg_utils_test_readings", schema="public", conn=conn)
+indexed = data.set_index("ts")
+
+# a reading a day, on a date column
+days = pd.DataFrame({"ts": pd.date_range("2020-01-01", periods=40, freq="D"), "x": rng.normal(size=40),
+                     "y": rng.randint(0, 10, size=40)})
+
+date_conn = testing.FakeConnection()
+date_conn.add_table("pg_utils_test_daily", days.assign(ts=days.ts.dt.date), data_types={"ts": "date"})
+date_conn.add_result(r"date_trunc\('\w+', min\(ts\)|date_bin\(.*min\(ts\)",
+                     rows=lambda sql: [(_bucket(pd.Series([days.ts.min()]), sql)[0].to_pydatetime(),
+                                        days.ts.max().date())],
+                     columns=["date_trunc", "max"])
+date_conn.add_result(r"as bucket", rows=lambda sql: resample(sql, days), columns=["bucket"] + ["a"] * 4)
+
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_resample(self):
+        result = t.resample("ts", "h", agg={"x": ["mean", "count"], "y": "sum"})
+        expected = indexed.resample("h").agg({"x": ["mean", "count"], "y": ["sum"]})
+        expected = expected[expected["x"]["count"] > 0]
+
+        self.assertEqual(result.index.name, "ts")
+        self.assertEqual(list(result.columns), [("x", "mean"), ("x", "count"), ("y", "sum")])
+        self.assertEqual(list(result.index), list(expected.index))
+        np.testing.assert_allclose(result["x"]["mean"].values, expected["x"]["mean"].values)
+        self.assertEqual(result["y"]["sum"].tolist(), expected["y"]["sum"].tolist())
+        self.assertIn("date_trunc('hour', ts::timestamp)", conn.queries[-1])
+
+    def test_fill(self):
+        result = t.resample("ts", "h", agg={"x": "count", "y": "max"}, fill=True)
+        expected = indexed.resample("h").agg({"x": "count", "y": "max"})
+
+        self.assertEqual(list(result.index), list(expected.index))
+        self.assertEqual(result["x"].tolist(), expected["x"].tolist())
+        self.assertEqual(result["y"].isnull().sum(), 4)
+
+    def test_date_bin(self):
+        result = t["x"].resample("ts", "15min", how="mean")
+        expected = indexed.x.resample("15min").mean().dropna()
+
+        self.assertEqual(result.name, "x")
+        np.testing.assert_allclose(result.values, expected.values)
+        self.assertIn("date_bin('900000000 microseconds'::interval, ts::timestamp, '1970-01-01 00:00:00'::timestamp)",
+                      conn.queries[-1])
+
+    def test_iter_resample(self):
+        pages = list(t.iter_resample("ts", "h", agg="sum", buckets_per_query=10))
+        result = pd.concat(pages)
+
+        self.assertEqual(len(pages), 8)
+        self.assertEqual(list(result.columns), ["x", "y"])
+        self.assertEqual(result["y"].tolist(), t.resample("ts", "h", agg="sum")["y"].tolist())
+
+        filled = pd.concat(t.iter_resample("ts", "h", agg={"y": "count"}, fill=True, buckets_per_query=7))
+        self.assertEqual(filled["y"].tolist(), indexed.y.resample("h").count().tolist())
+
+    def test_iter_resample_dates(self):
+        daily = table.Table("pg_utils_test_daily", schema="public", conn=date_conn)
+        result = pd.concat(daily.iter_resample("ts", "7D", agg={"y": "sum"}, buckets_per_query=2))
+
+        # date_bin aligns the weeks to 1970-01-01
+        self.assertEqual(result["y"].tolist(), days.groupby(days.ts.dt.floor("7D")).y.sum().tolist())
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            t.resample("ts", "W")
+
+        with self.assertRaises(ValueError):
+            t.resample("x", "h")
+
+        with self.assertRaises(ValueError):
+            t.resample("ts", "h", agg={"x": "first"})
+
+
+if __name__ == "__main__":
+    unittest.main()
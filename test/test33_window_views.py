@@ -0,0 +1,205 @@
+import re
+import sys
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+
+from pg_utils import table, testing, view
+from pg_utils.sql import queries
+
+rng = np.random.RandomState(0)
+n = 500
+
+data = pd.DataFrame({"id": np.arange(n),
+                     "ts": pd.Timestamp("2020-01-01") + pd.to_timedelta(np.cumsum(rng.randint(1, 600, size=n)),
+                                                                        unit="s"),
+                     "x": rng.normal(size=n), "k": rng.randint(0, 20, size=n)})
+data.loc[[3, 17, 250], "x"] = np.nan
+
+conn = testing.FakeConnection()
+conn.add_table("pg_utils_test_windows", data)
+
+_functions = {"avg": "mean", "sum": "sum", "count": "count", "min": "min", "max": "max", "stddev_samp": "std",
+              "var_samp": "var"}
+
+
+def _rolling(sql):
+    rows = re.search(r"rows between (\d+) preceding", sql)
+    frame = data[["id" if rows else "ts"]].copy()
+
+    for column, min_periods, function, name in re.findall(
+            r"when count\((\w+)\) over \(.*?\) >= (\d+) then (\w+)\(\w+(?:::double precision)?\) over \(.*?\) "
+            r"end as (\w+)", sql):
+        if rows:
+            window = data[column].rolling(int(rows.group(1)) + 1, min_periods=int(min_periods))
+        else:
+            span = pd.Timedelta(int(re.search(r"'(\d+) microseconds'", sql).group(1)) + 1, unit="us")
+            window = data.set_index("ts")[column].rolling(span, min_periods=int(min_periods))
+
+        frame[name] = getattr(window, _functions[function])().values
+
+    return frame
+
+
+def _rank(sql):
+    ascending = "order by x desc" not in sql
+    pct = "/ count(x) over ()" in sql or "/ (dense_rank" in sql
+
+    if "row_number" in sql:
+        method = "first"
+    elif "/ 2.0" in sql:
+        method = "average"
+    elif "then dense_rank" in sql:
+        method = "dense"
+    elif "+ count(1) over (partition by x) - 1" in sql:
+        method = "max"
+    else:
+        method = "min"
+
+    return pd.DataFrame({"id": data.id, "x": data.x.rank(method=method, ascending=ascending, pct=pct)})
+
+
+def _window_view(sql):
+    # what the server would compute for the views of queries.rolling, cumulative_sum, rank, and difference
+    if "rows between unbounded preceding" in sql:
+        return pd.DataFrame({"id": data.id, "x": data.x.cumsum()})
+
+    if "lag(x" in sql or "lead(x" in sql:
+        periods = int(re.search(r"(?:lag|lead)\(x, (\d+)\)", sql).group(1))
+        return pd.DataFrame({"id": data.id, "x": data.x.diff(periods if "lag(" in sql else -periods)})
+
+    if "rank()" in sql or "row_number()" in sql:
+        return _rank(sql)
+
+    return _rolling(sql)
+
+
+def respond(sql):
+    frame = _window_view(sql)
+    condition = re.search(r" where \((.*?)\)", sql)
+
+    if condition:
+        frame = frame.query(condition.group(1))
+
+    if sql.startswith("select count(1) from ("):
+        return [(len(frame),)]
+
+    aggregates = re.findall(r"(avg|sum|count|min|max)\((\w+)\)", sql.split(" from (")[0])
+
+    if aggregates:
+        return [tuple(getattr(frame[c], _functions[f])() for f, c in aggregates)]
+
+    limit = re.search(r"limit (\d+)$", sql)
+
+    if limit:
+        frame = frame.head(int(limit.group(1)))
+
+    return [tuple(None if pd.isnull(v) else v for v in row) for row in frame.itertuples(index=False)]
+
+
+conn.add_result(r" over \(", rows=respond, columns=["a", "b"])
+
+t = table.Table("pg_utils_test_windows", schema="public", conn=conn)
+
+
+class TestWindowViews(unittest.TestCase):
+    def setUp(self):
+        del conn.queries[:]
+
+    def test_queries(self):
+        self.assertEqual(
+            queries.cumulative_sum("t", "x", ["id"]),
+            "select id, case when x is not null then sum(x) over (order by id rows between unbounded preceding and "
+            "current row) end as x from t"
+        )
+        self.assertEqual(queries.difference("t", "x", ["ts", "id"], periods=-2),
+                         "select ts, id, x - lead(x, 2) over (order by ts, id) as x from t")
+        self.assertIn("rank() over (partition by x is null order by x desc)",
+                      queries.rank("t", "x", method="min", ascending=False))
+
+    def test_rolling(self):
+        result = t.rolling(5, on="id").agg({"x": ["mean", "max"], "k": "sum"})
+
+        self.assertIsInstance(result, view.View)
+        self.assertEqual(result.column_names, ("id", "x_mean", "x_max", "k"))
+        self.assertEqual(conn.queries, [])
+
+        frame = result.head("all")
+        expected = data.rolling(5).agg({"x": ["mean", "max"], "k": "sum"})
+
+        self.assertEqual(frame["id"].tolist(), data["id"].tolist())
+        np.testing.assert_allclose(frame["x_mean"].values.astype(float), expected["x"]["mean"].values)
+        np.testing.assert_allclose(frame["k"].values.astype(float), expected["k"]["sum"].values)
+        self.assertTrue(frame["x_mean"][:4].isnull().all())
+        self.assertIn("rows between 4 preceding and current row", conn.queries[-1])
+
+    def test_rolling_time(self):
+        result = t.rolling("1h", on="ts").mean().head(20)
+        expected = data.rolling("1h", on="ts").mean()
+
+        np.testing.assert_allclose(result["x"].values, expected["x"].values[:20])
+        self.assertIn("range between '3599999999 microseconds'::interval preceding", conn.queries[-1])
+
+    def test_cumsum(self):
+        result = t["x"].cumsum(order_by="id")
+
+        self.assertEqual(result.column_names, ("id", "x"))
+        np.testing.assert_allclose(result.head("all")["x"].values, data.x.cumsum().values)
+        self.assertTrue(conn.queries[-1].endswith(")view order by id"))
+
+    def test_rank(self):
+        for method in ["average", "min", "max", "first", "dense"]:
+            for ascending, pct in [(True, False), (False, True)]:
+                result = t["x"].rank(order_by="id", method=method, ascending=ascending, pct=pct).head("all")
+                expected = data.x.rank(method=method, ascending=ascending, pct=pct)
+
+                np.testing.assert_allclose(result["x"].values.astype(float), expected.values)
+
+        with self.assertRaises(ValueError):
+            t["x"].rank(method="mean")
+
+    def test_diff(self):
+        np.testing.assert_allclose(t["x"].diff(order_by="id").head("all")["x"].values, data.x.diff().values)
+        np.testing.assert_allclose(t["x"].diff(order_by="id", periods=-3).head("all")["x"].values,
+                                   data.x.diff(-3).values)
+
+    def test_where_and_aggregate(self):
+        diffs = t["x"].diff(order_by="id")
+        jumps = diffs.where("x > 1")
+
+        self.assertEqual(jumps.count, int((data.x.diff() > 1).sum()))
+        self.assertAlmostEqual(jumps.agg("mean")["x"], data.x.diff()[data.x.diff() > 1].mean())
+        self.assertAlmostEqual(diffs.agg({"x": ["max", "count"]})["x"]["max"], data.x.diff().max())
+
+        # the rows are filtered and aggregated by the database
+        self.assertTrue(all(q.startswith("select count(1) from (") or q.startswith("select avg(x)::double")
+                            or q.startswith("select max(x), count(x)") for q in conn.queries))
+
+    def test_iter_frames(self):
+        chunks = list(t.rolling(3, on="id").sum().iter_frames(chunk_rows=200))
+
+        self.assertEqual([len(c) for c in chunks], [200, 200, 100])
+        self.assertEqual(list(chunks[0].columns), ["id", "x", "k"])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            t.rolling("1h", on="id")
+
+        with self.assertRaises(ValueError):
+            t.rolling(0, on="id")
+
+        with self.assertRaises(ValueError):
+            t.rolling(3, on="id").agg({"x": "median"})
+
+        with self.assertRaises(ValueError):
+            t["x"].cumsum(order_by="x")
+
+        with self.assertRaises(ValueError):
+            t["ts"].diff(order_by="id")
+
+
+if __name__ == "__main__":
+    unittest.main()
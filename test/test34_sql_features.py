@@ -0,0 +1,238 @@
+import sys
+import tempfile
+import unittest
+
+sys.path = ['..'] + sys.path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from pg_utils import bin_counts, connection, exception, memory, summary, table
+from pg_utils.column import plot
+
+# The SQL-generating features that tests 21-33 cover against pg_utils.testing.FakeConnection, run (at least once)
+# against a real database, and checked against pandas on the same rows.
+
+conn = connection.Connection(numeric_as_float=True)
+
+table_name = "pg_utils_test_features"
+
+t = table.Table.create(table_name,
+                       """create table {} as
+                       select x as id,
+                           timestamp '2020-01-01' + x * interval '7 minutes' as ts,
+                           (date '2020-01-01' + x / 50) as day,
+                           (x % 37)::real / 10 as r,
+                           case when x % 11 = 0 then null else sin(x) end as y,
+                           (x % 13)::numeric / 4 as amount,
+                           'w' || (x % 17) as word,
+                           array[x, x % 5, x % 3]::double precision[] as vector,
+                           current_time as clock,
+                           decode(md5((x % 7)::text), 'hex') as digest
+                       from generate_series(1, 2000) x""".format(table_name),
+                       conn=conn, analyze=True)
+
+parts = table.Table.create("{}_parts".format(table_name),
+                           """create table {0}_parts (month int, x double precision) partition by range (month);
+                           create table {0}_parts_1 partition of {0}_parts for values from (1) to (2);
+                           create table {0}_parts_2 partition of {0}_parts for values from (2) to (3);
+                           insert into {0}_parts select 1 + x % 2, x from generate_series(1, 1000) x""".format(
+                               table_name),
+                           conn=conn, analyze=True)
+
+data = t.head("all")
+
+
+class TestSQLFeatures(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        t.drop()
+        parts.drop()
+
+    def test_typed_decoding(self):
+        self.assertEqual(data["id"].dtype, np.int64)
+        self.assertEqual(data["ts"].dtype, np.dtype("datetime64[ns]"))
+        self.assertEqual(data["amount"].dtype, np.float64)
+
+    def test_citext(self):
+        cur = conn.cursor()
+
+        try:
+            cur.execute("create extension if not exists citext")
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            self.skipTest("The citext extension isn't available")
+
+        words = table.Table.create("{}_citext".format(table_name),
+                                   """create table {}_citext as
+                                   select ('W' || (x % 3))::citext as word from generate_series(1, 30) x""".format(
+                                       table_name),
+                                   conn=conn)
+
+        try:
+            self.assertEqual(words.column_data_types["word"], "citext")
+            self.assertEqual(words.describe(include="all")["word"]["unique"], 3)
+        finally:
+            words.drop()
+
+    def test_iter_sorted(self):
+        expected = data.sort_values(["r", "id"]).id.tolist()
+
+        # real keys, one row at a time
+        self.assertEqual([page.id.iloc[0] for page in t.iter_sorted(["r", "id"], page_size=1)], expected)
+        self.assertEqual(pd.concat(t.iter_sorted(["amount", "id"], page_size=64, ascending=[False, True])).id.tolist(),
+                         data.sort_values(["amount", "id"], ascending=[False, True]).id.tolist())
+
+        self.assertEqual(t.nlargest(5, ["y", "id"]).id.tolist(), data.nlargest(5, ["y", "id"]).id.tolist())
+
+    def test_value_counts(self):
+        result = t["word"].value_counts()
+
+        self.assertEqual(result.to_dict(), data.word.value_counts().to_dict())
+        self.assertEqual(t["word"].nunique(approx=False), 17)
+
+    def test_describe_all(self):
+        result = t.describe(include="all")
+
+        self.assertEqual(result["y"]["count"], data.y.count())
+        self.assertAlmostEqual(result["y"]["mean"], data.y.mean())
+        self.assertEqual(result["word"]["unique"], 17)
+        self.assertEqual(result["ts"]["maximum"], data.ts.max())
+        self.assertEqual(result["vector"]["max_length"], 3)
+        self.assertTrue(pd.isnull(result["clock"]["range"]))
+        self.assertEqual(result["digest"]["count"], len(data))
+        self.assertTrue(pd.isnull(result["digest"]["top"]))
+
+    def test_incremental_describe(self):
+        store = summary.SummaryStore()
+
+        result = t.describe(columns=["y"], incremental_on="id", store=store)
+        self.assertAlmostEqual(result["y"]["mean"], data.y.mean())
+
+        result = t.describe(columns=["y"], incremental_on="id", store=store)
+        self.assertEqual(result["y"]["count"], data.y.count())
+
+    def test_partitions(self):
+        store = summary.SummaryStore()
+
+        self.assertEqual([p.table_name for p in parts.partitions()],
+                         ["{}_parts_1".format(table_name), "{}_parts_2".format(table_name)])
+
+        result = parts.describe(columns=["x"], by_partition=True, store=store)
+        self.assertEqual(result["x"]["count"], 1000)
+        self.assertAlmostEqual(result["x"]["mean"], 500.5)
+        self.assertEqual(parts.partitioned_count(where="month = 1", store=store), 500)
+
+        # a change is seen straight away, though the cumulative statistics haven't caught up with it
+        cur = conn.cursor()
+        cur.execute("insert into {}_parts values (1, 0)".format(table_name))
+        conn.commit()
+
+        self.assertEqual(parts.partitioned_count(where="month = 1", store=store), 501)
+
+    def test_arrays(self):
+        vectors = np.array(data.vector.tolist())
+
+        result = t["vector"].describe_elements(percentiles=[0.5], by_position=True)
+        np.testing.assert_allclose(result["mean"].values, vectors.mean(axis=0))
+
+        np.testing.assert_array_equal(t["vector"].to_matrix(), vectors)
+        self.assertEqual(sum(c for _, _, c in bin_counts.counts(t["vector"], bins=30)), vectors.size)
+
+    def test_server_side_plots(self):
+        self.assertEqual(sum(c for _, _, c in bin_counts.counts(t["amount"], bins=10)), len(data))
+
+        stats = plot.box_statistics(t["y"])
+        self.assertAlmostEqual(stats["med"], data.y.median())
+
+        edges, counts, pair_counts = bin_counts.pairwise_counts(t, columns=["y", "r"], bins=8)
+        self.assertEqual(pair_counts[("y", "r")].sum(), len(data[["y", "r"]].dropna()))
+
+    def test_resample(self):
+        indexed = data.set_index("ts")
+
+        result = t.resample("ts", "h", agg={"y": ["mean", "count"]})
+        expected = indexed.resample("h").agg({"y": ["mean", "count"]})
+        expected = expected[expected["y"]["count"] > 0]
+
+        self.assertEqual(list(result.index), list(expected.index))
+        np.testing.assert_allclose(result["y"]["mean"].values, expected["y"]["mean"].values)
+
+        pages = pd.concat(t.iter_resample("ts", "h", agg={"id": "count"}, fill=True, buckets_per_query=10))
+        self.assertEqual(pages["id"].tolist(), indexed.id.resample("h").count().tolist())
+
+        days = pd.concat(t.iter_resample("day", "7D", agg={"id": "count"}, buckets_per_query=2))
+        self.assertEqual(days["id"].sum(), len(data))
+
+    def test_window_views(self):
+        frame = data.sort_values("id")
+
+        result = t.rolling(5, on="id").agg({"r": "mean"}).head("all")
+        np.testing.assert_allclose(result["r"].values.astype(float), frame.r.rolling(5).mean().values, rtol=1e-6)
+
+        np.testing.assert_allclose(t["amount"].cumsum(order_by="id").head("all")["amount"].values,
+                                   frame.amount.cumsum().values)
+        np.testing.assert_allclose(t["y"].diff(order_by="id").head("all")["y"].values, frame.y.diff().values)
+        np.testing.assert_allclose(t["r"].rank(order_by="id").head("all")["r"].values.astype(float),
+                                   frame.r.rank().values)
+
+    def test_column_cache(self):
+        cached = connection.Connection(column_cache=tempfile.mkdtemp())
+        small = table.Table.create("{}_cached".format(table_name),
+                                   "create table {}_cached as select x from generate_series(1, 10) x".format(
+                                       table_name),
+                                   conn=cached)
+
+        try:
+            self.assertEqual(small.x.values.sum(), 55)
+
+            cur = cached.cursor()
+            cur.execute("update {}_cached set x = x + 1 where x = 10".format(table_name))
+            cached.commit()
+
+            # the statistics may not have caught up with the update yet, but the rows have
+            self.assertEqual(table.Table("{}_cached".format(table_name), conn=cached).x.values.sum(), 56)
+        finally:
+            small.drop()
+
+    def test_column_cache_out_of_order(self):
+        name = "{}_out_of_order".format(table_name)
+        cached = connection.Connection(column_cache=tempfile.mkdtemp())
+        other = connection.Connection()
+        small = table.Table.create(name, "create table {} as select x from generate_series(1, 10) x".format(name),
+                                   conn=cached)
+
+        try:
+            # an older transaction takes its id first...
+            older = other.cursor()
+            older.execute("select txid_current()")
+
+            # ...then a newer one inserts a row and commits
+            cur = cached.cursor()
+            cur.execute("insert into {} values (11)".format(name))
+            cached.commit()
+            self.assertEqual(small.x.values.sum(), 66)
+
+            # the older one's update neither changes the count nor brings a newer xmin, but still changes the token
+            older.execute("update {} set x = 0 where x = 1".format(name))
+            other.commit()
+
+            self.assertEqual(table.Table(name, conn=cached).x.values.sum(), 65)
+        finally:
+            other.close()
+            small.drop()
+
+    def test_memory_budget(self):
+        budget = memory.MemoryBudget(10000, policy="spill", spill_dir=tempfile.gettempdir())
+
+        words = t["word"].head("all", memory_budget=budget)
+        self.assertEqual(sorted(words), sorted(data.word))
+
+        with self.assertRaises(exception.MemoryBudgetExceededError):
+            t.head("all", memory_budget=budget)
+
+
+if __name__ == "__main__":
+    unittest.main()